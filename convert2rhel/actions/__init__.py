@@ -18,17 +18,24 @@ __metaclass__ = type
 
 import abc
 import collections
+import heapq
 import importlib
 import itertools
 import logging
 import pkgutil
+import resource
+import threading
+import time
 import traceback
 
 from functools import wraps
 
 import six
 
-from convert2rhel import utils
+from six.moves import queue
+
+from convert2rhel import toolopts, utils
+from convert2rhel.actions import event_stream, registry, result_cache
 
 
 logger = logging.getLogger(__name__)
@@ -86,6 +93,41 @@ _STATUS_HEADER = {
     202: "Error (Must fix before conversion)",
 }
 
+#: Shared resources that an Action can declare in :attr:`Action.resources`.
+#:
+#: :RPMDB: the Action reads the rpmdb through the rpm, yum or dnf python API.
+#: :NETWORK: the Action talks to remote repositories or servers.
+#: :PACKAGE_MANAGER_LOCK: the Action runs a yum or dnf command which takes the
+#:      package manager lock.
+RESOURCE_RPMDB = "rpmdb"
+RESOURCE_NETWORK = "network"
+RESOURCE_PACKAGE_MANAGER_LOCK = "package_manager_lock"
+
+#: How many Actions holding the same resource may run at the same time.
+#: Resources which are not listed here are not limited.
+_RESOURCE_LIMITS = {
+    RESOURCE_RPMDB: 1,
+    # Don't hammer the mirrors with too many repoquery calls at once.
+    RESOURCE_NETWORK: 2,
+    RESOURCE_PACKAGE_MANAGER_LOCK: 1,
+}
+
+#: error_id given to the Actions which were left out with ``--only`` or
+#: ``--skip``.  See :func:`select_actions`.
+NOT_SELECTED_ERROR_ID = "NOT_SELECTED"
+
+#: Seconds past its timeout after which a Stage stops waiting for a
+#: parallel_safe Action which did not finish once its commands were killed.
+_TIMEOUT_GRACE_PERIOD = 5
+
+#: Maximum number of parallel_safe Actions that a Stage runs at the same time.
+MAX_PARALLEL_ACTIONS = 4
+
+#: rusage to read the CPU time that an Action spends in convert2rhel itself
+#: from.  RUSAGE_THREAD (Linux, Python 3.2+) keeps Actions which run
+#: concurrently from being charged for each other's work.
+_RUSAGE_SELF = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+
 
 def _action_defaults_to_success(func):
     """
@@ -122,19 +164,28 @@ class DependencyError(ActionError):
     """
     Raised when unresolved dependencies are encountered.
 
-    Their are two non-standard attributes.
+    There are several non-standard attributes.
 
     :attr:`unresolved_actions` is a list of dependent actions which were
     not found.
 
     :attr:`resolved_actions` is a list of dependent actions which were
     found.
+
+    :attr:`missing_dependencies` maps the ids of actions to the ids of their
+    dependencies which do not exist.
+
+    :attr:`cycle` is a list of the ids of actions which depend on each other
+    in a circle, starting and ending with the same id.  Empty if there is no
+    circular dependency.
     """
 
     def __init__(self, *args, **kwargs):
-        super(DependencyError, self).__init__(*args, **kwargs)
         self.unresolved_actions = kwargs.pop("unresolved_actions", [])
         self.resolved_actions = kwargs.pop("resolved_actions", [])
+        self.missing_dependencies = kwargs.pop("missing_dependencies", {})
+        self.cycle = kwargs.pop("cycle", [])
+        super(DependencyError, self).__init__(*args, **kwargs)
 
 
 #: Contains Actions which have run, separated into categories by status.
@@ -176,6 +227,29 @@ class Action:
     #: have to import the class to reference them in the Sequence.
     dependencies = ()
 
+    #: Set to True when the Action only inspects the system and does not
+    #: depend on changes made by any other Action besides its
+    #: :attr:`dependencies`.  :meth:`Stage.run` may run such Actions
+    #: concurrently on a pool of threads.  Actions which are not parallel_safe
+    #: run in the main thread, alone, in the order given by
+    #: :func:`resolve_action_order`.
+    parallel_safe = False
+
+    #: Sequence of the ``RESOURCE_*`` names that the Action needs while it
+    #: runs.  Only used for parallel_safe Actions to keep them from
+    #: overusing a shared resource.  See :data:`_RESOURCE_LIMITS`.
+    resources = ()
+
+    #: Rough estimate of how many seconds the Action takes to run.  Used to
+    #: find the critical path through a Stage, see :func:`find_critical_path`.
+    estimated_cost = 1
+
+    #: Seconds that the Action may run for, None for no limit.  The commands
+    #: that the Action runs are killed once it is over its time and the
+    #: Action fails with the ``TIMEOUT`` error_id.  Overridden for all of the
+    #: Actions by the ``action_timeout`` option of the user.
+    timeout = None
+
     def __init__(self):
         """
         The attributes set here should be set when the run() method returns.
@@ -186,6 +260,12 @@ class Action:
         self.status = None
         self.message = None
         self.error_id = None
+        #: What running the Action cost.  Set by the framework, see
+        #: :func:`_run_action`.  None if the Action has not been run.
+        self.metrics = None
+        #: True when the result was reused from a previous run instead of
+        #: running the Action.  See :meth:`cache_inputs`.
+        self.cached = False
         self._has_run = False
 
     @_action_defaults_to_success
@@ -206,6 +286,22 @@ class Action:
 
         self._has_run = True
 
+    def cache_inputs(self):
+        """
+        Describe everything that the result of the Action depends on.
+
+        Override this in Actions which are expensive to run and only inspect
+        the system.  When the inputs are the same as in a previous run of
+        convert2rhel, the result of that run is reused instead of running the
+        Action again.  The helpers in :mod:`convert2rhel.actions.result_cache`
+        return commonly used inputs (the rpmdb, the loaded kernel modules,
+        repository metadata, ...).
+
+        :returns: Data which can be serialized to JSON or None if the result
+            must not be reused.
+        """
+        return None
+
     def set_result(self, status=_NO_USER_VALUE, error_id=_NO_USER_VALUE, message=_NO_USER_VALUE):
         """
         Helper method that sets the resulting values for status, error_id and message.
@@ -275,11 +371,83 @@ def get_actions(actions_path, prefix):
     return actions
 
 
+class RegisteredAction:
+    """
+    Stand-in for an Action class which has not been imported yet.
+
+    It has the class attributes of the Action which are needed to order the
+    Actions of a :class:`Stage` and to schedule them.  The module of the
+    Action is imported the first time that it is instantiated, right before
+    the Action runs.
+
+    The Actions that ship with convert2rhel are listed in
+    :mod:`convert2rhel.actions.registry`.
+    """
+
+    def __init__(
+        self, id, module, class_name, dependencies=(), parallel_safe=False, resources=(), estimated_cost=1
+    ):  # pylint: disable=redefined-builtin
+        self.id = id
+        self.module = module
+        self.class_name = class_name
+        self.dependencies = tuple(dependencies)
+        self.parallel_safe = parallel_safe
+        self.resources = tuple(resources)
+        self.estimated_cost = estimated_cost
+        self._action_class = None
+
+    def __repr__(self):
+        return "%s(%r, %r, %r)" % (self.__class__.__name__, self.id, self.module, self.class_name)
+
+    def load(self):
+        """
+        Import the Action class.
+
+        :raises ActionError: when the registry does not match the Action class.
+        :returns: The Action class.
+        """
+        if self._action_class is None:
+            start = time.time()
+            module = importlib.import_module(self.module)
+            logger.debug("Imported %s for %s in %.3fs" % (self.module, self.id, time.time() - start))
+
+            action_class = getattr(module, self.class_name, None)
+            if action_class is None or action_class.id != self.id:
+                raise ActionError(
+                    "The action registry is out of date: %s.%s is not the %s action."
+                    % (self.module, self.class_name, self.id)
+                )
+            self._action_class = action_class
+
+        return self._action_class
+
+    def __call__(self):
+        return self.load()()
+
+
+#: Names of the Stages which run before the Point of no Return, in the order
+#: that they run in.
+STAGE_NAMES = ("system_checks", "pre_ponr_changes")
+
+
 class Stage:
     #: Private attribute to allow unittests to override this dir
     _actions_dir = "convert2rhel.actions.%s"
 
-    def __init__(self, stage_name, task_header=None, next_stage=None):
+    def __init__(
+        self,
+        stage_name,
+        task_header=None,
+        next_stage=None,
+        max_workers=MAX_PARALLEL_ACTIONS,
+        result_cache=None,
+        event_stream=None,
+        fail_fast=False,
+        cheap_first=False,
+        action_ids=None,
+        action_timeout=None,
+        command_timeout=None,
+    ):
         """
         Stages define a set of Actions which should be executed as a group.
 
@@ -293,6 +461,34 @@ class Stage:
         :param next_stage: A Stage which will automatically be run after the
             Actions in this Stage have had a change to run.
         :type next_stage: str
+        :param max_workers: Maximum number of parallel_safe Actions which may
+            run at the same time.  Setting this to 1 runs all of the Actions
+            one after the other.
+        :type max_workers: int
+        :param result_cache: Results of previous runs to reuse for the Actions
+            which support it.  See :meth:`Action.cache_inputs`.
+        :type result_cache: convert2rhel.actions.result_cache.ActionResultCache | None
+        :param event_stream: Where to send events about the Actions as they
+            start and finish.
+        :type event_stream: convert2rhel.actions.event_stream.EventStream | None
+        :param fail_fast: Once an Action fails with an ERROR, skip all of the
+            Actions which have not been started yet, in this Stage and in
+            the Stages after it.
+        :type fail_fast: bool
+        :param cheap_first: Run the Actions with a low
+            :attr:`Action.estimated_cost` first, as far as the dependencies
+            allow.  See :func:`resolve_action_order`.
+        :type cheap_first: bool
+        :param action_ids: Ids of the Actions of this Stage to run.  The other
+            Actions are left out as if they did not exist.  None runs all of
+            them.  See :func:`select_actions`.
+        :type action_ids: set[str] | None
+        :param action_timeout: Seconds that each Action may run for.  Takes
+            precedence over :attr:`Action.timeout`.
+        :type action_timeout: float | None
+        :param command_timeout: Seconds that each command run by an Action
+            may run for.
+        :type command_timeout: float | None
 
         Stages are used for ordering only. This is different from
         Action.dependencies which are used for both ordering and to determine
@@ -305,10 +501,26 @@ class Stage:
         self.stage_name = stage_name
         self.task_header = task_header if task_header else stage_name
         self.next_stage = next_stage
+        self.max_workers = max(1, max_workers)
+        self.result_cache = result_cache
+        self.event_stream = event_stream
+        self.fail_fast = fail_fast
+        self.cheap_first = cheap_first
+        self.action_ids = action_ids
+        self.action_timeout = action_timeout
+        self.command_timeout = command_timeout
         self._has_run = False
-
-        python_package = importlib.import_module(self._actions_dir % self.stage_name)
-        self.actions = get_actions(python_package.__path__, python_package.__name__ + ".")
+        # Actions which were given up on, mapped to the threads they are still
+        # running on.  They keep their resources until the thread exits.
+        self._abandoned = {}
+
+        package_name = self._actions_dir % self.stage_name
+        if package_name in registry.ACTIONS:
+            # Only import the modules of the Actions once they are about to run
+            self.actions = set(RegisteredAction(**entry) for entry in registry.ACTIONS[package_name])
+        else:
+            python_package = importlib.import_module(package_name)
+            self.actions = get_actions(python_package.__path__, python_package.__name__ + ".")
 
     def check_dependencies(self, _previous_stage_actions=None):
         """
@@ -361,65 +573,487 @@ class Stage:
         failures = [] if failures is None else list(failures)
         skips = [] if skips is None else list(skips)
 
+        stage_actions = self.actions
+        if self.action_ids is not None:
+            stage_actions = [action for action in stage_actions if action.id in self.action_ids]
+
+        action_classes = list(
+            resolve_action_order(
+                stage_actions, previously_resolved_actions=successes + failures + skips, cheap_first=self.cheap_first
+            )
+        )
+        if action_classes:
+            estimated_cost, critical_path = find_critical_path(action_classes)
+            logger.debug(
+                "Critical path of the %s stage (estimated %ss): %s"
+                % (self.stage_name, estimated_cost, " -> ".join(critical_path))
+            )
+
+        # With fail_fast, an earlier Stage may already have failed
+        first_error = None
+        if self.fail_fast:
+            first_error = next((action.id for action in failures if action.status >= STATUS_CODE["ERROR"]), None)
+
+        start = time.time()
+        finished_actions, skipped_action_ids = self._schedule(action_classes, first_error)
+
+        # Categorize the results in the order the Actions were resolved in so
+        # that the output does not depend on which thread finished first.
+        stage_results = FinishedActions([], [], [])
+        for action_class in action_classes:
+            action = finished_actions[action_class.id]
+            if action.id in skipped_action_ids:
+                stage_results.skips.append(action)
+            elif action.status <= STATUS_CODE["WARNING"]:
+                stage_results.successes.append(action)
+            else:
+                stage_results.failures.append(action)
+
+        self._emit(
+            "stage_finished",
+            successes=len(stage_results.successes),
+            failures=len(stage_results.failures),
+            skips=len(stage_results.skips),
+            duration=round(time.time() - start, 3),
+        )
+        successes.extend(stage_results.successes)
+        failures.extend(stage_results.failures)
+        skips.extend(stage_results.skips)
+
+        if self.next_stage:
+            self.next_stage._abandoned = self._abandoned
+            successes, failures, skips = self.next_stage.run(successes, failures, skips)
+
+        return FinishedActions(successes, failures, skips)
+
+    def _schedule(self, action_classes, first_error=None):
+        """
+        Run the Actions of this Stage, concurrently where that is allowed.
+
+        :param action_classes: Actions to run, in the order returned by
+            :func:`resolve_action_order`.
+        :type action_classes: Sequence
+        :param first_error: With :attr:`fail_fast`, the id of an Action of an
+            earlier Stage which failed with an ERROR.
+        :type first_error: str | None
+        :returns: 2-tuple of a mapping of Action ids to the Action instances
+            that have finished and a set of the ids which were skipped.
+        :rtype: tuple(dict, set)
+
+        The Actions are started in order.  An Action which is not
+        :attr:`Action.parallel_safe` acts as a barrier: it waits for every
+        Action before it to finish, runs alone in the main thread and no
+        Action after it is started until it finishes.  parallel_safe Actions
+        are started on a thread as soon as their dependencies have finished,
+        a worker is free and the :attr:`Action.resources` they need are
+        available.  With ``max_workers`` set to 1, this degrades to running
+        the Actions one after the other.
+
+        The commands of an Action which runs out of time are killed, which
+        normally makes the Action finish with a ``TIMEOUT``.  A parallel_safe
+        Action which still has not finished :data:`_TIMEOUT_GRACE_PERIOD`
+        seconds later is given up on: it is reported as timed out and left
+        running on its thread.  Actions running in the main thread cannot be
+        given up on.  The resources of an Action which was given up on stay
+        held, and no Action which is not parallel_safe is started, until its
+        thread exits.  If that does not happen within
+        :data:`_TIMEOUT_GRACE_PERIOD` seconds once nothing else is left to run,
+        the Actions which are waiting for it are skipped.
+        """
+        pending = list(action_classes)
+        finished_actions = {}
         # When testing for failed dependencies, we need the Action ids of failures and skips so
         # record those separately
         failed_action_ids = set()
-
-        for action_class in resolve_action_order(
-            self.actions, previously_resolved_actions=successes + failures + skips
-        ):
-            # Decide if we need to skip because deps have failed
-            failed_deps = [d for d in action_class.dependencies if d in failed_action_ids]
-
-            action = action_class()
-
-            if failed_deps:
-                to_be = "was"
-                if len(failed_deps) > 1:
-                    to_be = "were"
-                message = "Skipped because %s %s not successful" % (
-                    utils.format_sequence_as_message(failed_deps),
-                    to_be,
+        skipped_action_ids = set()
+        stage_action_ids = set(action_class.id for action_class in action_classes)
+        running = {}
+        # When to give up on each of the running Actions which have a timeout
+        give_up_times = {}
+        threads = {}
+        held_resources = collections.defaultdict(int)
+        for abandoned, _ in self._abandoned.values():
+            for resource in abandoned.resources:
+                held_resources[resource] += 1
+        waited_for_abandoned = False
+        completed = queue.Queue()
+        # With fail_fast, the id of the first Action which failed with an ERROR
+        first_errors = [first_error] if first_error else []
+
+        def finish(action):
+            finished_actions[action.id] = action
+            self._emit_action_finished(action)
+            logger.debug("%s finished. %s" % (action.id, format_action_metrics(action.metrics)))
+            if action.status <= STATUS_CODE["WARNING"]:
+                logger.info("%s has succeeded%s" % (action.id, " (cached)" if action.cached else ""))
+            else:
+                message = format_action_status_message(action.status, action.id, action.error_id, action.message)
+                logger.error("%s (cached)" % message if action.cached else message)
+                failed_action_ids.add(action.id)
+                if self.fail_fast and action.status >= STATUS_CODE["ERROR"] and not first_errors:
+                    first_errors.append(action.id)
+                    logger.warning(
+                        "%s failed. Skipping the checks which have not started yet because of the fail-fast mode."
+                        % action.id
+                    )
+
+        def release(action):
+            for resource in action.resources:
+                held_resources[resource] -= 1
+
+        def reap_abandoned():
+            for action_id, (abandoned, thread) in list(self._abandoned.items()):
+                if not thread.is_alive():
+                    del self._abandoned[action_id]
+                    release(abandoned)
+
+        def skip(action_class, failed_deps=None, message=None):
+            pending.remove(action_class)
+            action = _skip_action(action_class, failed_deps, message)
+            finished_actions[action.id] = action
+            self._emit_action_finished(action)
+            failed_action_ids.add(action.id)
+            skipped_action_ids.add(action.id)
+
+        while pending or running:
+            reap_abandoned()
+            pending_count = len(pending)
+
+            if first_errors:
+                # Actions which are already running are allowed to finish
+                message = "Skipped because %s failed and fail-fast mode is enabled" % first_errors[0]
+                for action_class in pending[:]:
+                    skip(action_class, message=message)
+
+            for action_class in pending[:]:
+                unfinished_deps = [
+                    d for d in action_class.dependencies if d in stage_action_ids and d not in finished_actions
+                ]
+                if unfinished_deps:
+                    if not action_class.parallel_safe:
+                        break
+                    continue
+
+                # Decide if we need to skip because deps have failed
+                failed_deps = [d for d in action_class.dependencies if d in failed_action_ids]
+                if failed_deps:
+                    skip(action_class, failed_deps)
+                    continue
+
+                if not action_class.parallel_safe:
+                    if running or self._abandoned or action_class is not pending[0]:
+                        break
+
+                    pending.remove(action_class)
+                    action = action_class()
+                    self._emit("action_started", action_id=action.id)
+                    _run_action(
+                        action,
+                        result_cache=self.result_cache,
+                        timeout=self._get_action_timeout(action),
+                        command_timeout=self.command_timeout,
+                    )
+                    finish(action)
+                    if first_errors:
+                        break
+                    continue
+
+                if len(running) >= self.max_workers:
+                    break
+
+                if not _resources_available(action_class.resources, held_resources):
+                    continue
+
+                pending.remove(action_class)
+                for resource in action_class.resources:
+                    held_resources[resource] += 1
+
+                action = action_class()
+                running[action.id] = action
+                timeout = self._get_action_timeout(action)
+                if timeout is not None:
+                    give_up_times[action.id] = time.time() + timeout + _TIMEOUT_GRACE_PERIOD
+                self._emit("action_started", action_id=action.id)
+                thread = threading.Thread(
+                    target=_run_action,
+                    args=(action, completed, self.result_cache, timeout, self.command_timeout),
+                    name="convert2rhel-%s" % action.id,
                 )
+                thread.daemon = True
+                thread.start()
+                threads[action.id] = thread
+
+            if running:
+                action = _wait_for_action(completed, min(give_up_times.values()) if give_up_times else None)
+                if action is None:
+                    now = time.time()
+                    for action_id, give_up_time in list(give_up_times.items()):
+                        if give_up_time <= now:
+                            abandoned = running.pop(action_id)
+                            del give_up_times[action_id]
+                            # The thread may still be using the resources
+                            self._abandoned[action_id] = (abandoned, threads.pop(action_id))
+                            finish(_abandon_action(abandoned, self._get_action_timeout(abandoned)))
+                elif running.get(action.id) is action:
+                    del running[action.id]
+                    give_up_times.pop(action.id, None)
+                    del threads[action.id]
+                    release(action)
+                    finish(action)
+                elif self._abandoned.get(action.id, (None,))[0] is action:
+                    # An Action which was given up on finished after all
+                    del self._abandoned[action.id]
+                    release(action)
+            elif pending and len(pending) == pending_count:
+                # Nothing is running but the next Action waits for the ones
+                # which were given up on
+                if not waited_for_abandoned:
+                    waited_for_abandoned = True
+                    wait_until = time.time() + _TIMEOUT_GRACE_PERIOD
+                    for _, thread in list(self._abandoned.values()):
+                        thread.join(max(wait_until - time.time(), 0))
+                else:
+                    skip(
+                        pending[0],
+                        message="Skipped because %s did not finish in time and may still be running"
+                        % utils.format_sequence_as_message(sorted(self._abandoned)),
+                    )
+
+        return finished_actions, skipped_action_ids
+
+    def _get_action_timeout(self, action):
+        """Return the seconds that an Action may run for, None for no limit."""
+        if self.action_timeout is not None:
+            return self.action_timeout
+        return action.timeout
+
+    def _emit(self, event, **data):
+        """Send an event about this Stage to the :attr:`event_stream`, if there is one."""
+        if self.event_stream is not None:
+            self.event_stream.emit(event, self.stage_name, **data)
+
+    def _emit_action_finished(self, action):
+        self._emit(
+            "action_finished",
+            action_id=action.id,
+            status=_STATUS_NAME_FROM_CODE[action.status],
+            error_id=action.error_id,
+            message=action.message,
+            duration=action.metrics["wall_time"] if action.metrics else None,
+            cached=action.cached,
+        )
 
-                action.set_result(status="SKIP", error_id="SKIP", message=message)
-                skips.append(action)
-                failed_action_ids.add(action.id)
-                logger.error("Skipped %s. %s" % (action.id, message))
-                continue
 
-            # Run the Action
-            try:
+def _skip_action(action_class, failed_deps=None, message=None):
+    """
+    Create an instance of the Action and mark it as skipped.
+
+    :param action_class: The Action to skip.
+    :param failed_deps: The ids of the dependencies which failed.
+    :type failed_deps: Sequence
+    :param message: Reason for skipping the Action.  Defaults to one naming
+        the failed dependencies.
+    :type message: str | None
+    :returns: The skipped Action.
+    """
+    action = action_class()
+
+    if message is None:
+        to_be = "was"
+        if len(failed_deps) > 1:
+            to_be = "were"
+        message = "Skipped because %s %s not successful" % (
+            utils.format_sequence_as_message(failed_deps),
+            to_be,
+        )
+
+    action.set_result(status="SKIP", error_id="SKIP", message=message)
+    logger.error("Skipped %s. %s" % (action.id, message))
+    return action
+
+
+def _abandon_action(action, timeout):
+    """
+    Report a parallel_safe Action which did not finish in time as timed out.
+
+    The thread running the Action cannot be stopped so the result is recorded
+    on a new instance of the Action, which the thread does not touch.
+
+    :param action: The Action which is still running.
+    :param timeout: Seconds that the Action was allowed to run for.
+    :type timeout: float
+    :returns: The timed out Action.
+    """
+    timed_out = action.__class__()
+    timed_out.set_result(
+        status="ERROR",
+        error_id="TIMEOUT",
+        message="%s did not finish within %g seconds. It was abandoned and may still be running in the background."
+        % (action.id, timeout),
+    )
+    return timed_out
+
+
+def _run_action(action, completed=None, result_cache=None, timeout=None, command_timeout=None):
+    """
+    Run an Action, turning unexpected exceptions into an error result.
+
+    :param action: The Action to run.
+    :param completed: When the Action runs on a thread, the queue on which to
+        put the Action once it has finished.
+    :type completed: six.moves.queue.Queue
+    :param result_cache: When given, reuse the result of a previous run if
+        the inputs of the Action have not changed since then and store the
+        result otherwise.
+    :type result_cache: convert2rhel.actions.result_cache.ActionResultCache
+    :param timeout: Seconds that the Action may run for.  The commands it
+        runs past that are killed and the Action fails with a ``TIMEOUT``.
+    :type timeout: float | None
+    :param command_timeout: Seconds that each command of the Action may run
+        for.
+    :type command_timeout: float | None
+
+    What running the Action cost is recorded in :attr:`Action.metrics`:
+
+    :wall_time: Seconds between the start and the end of the Action.
+    :cpu_time_self: Seconds of CPU time spent by convert2rhel itself.
+    :cpu_time_children: Seconds of CPU time spent by child processes which
+        have exited while the Action ran.
+    :peak_rss_delta: KiB by which the Action raised the peak resident set
+        size of convert2rhel.
+    :subprocesses: Number of child processes the Action started.
+
+    .. note:: Except for ``wall_time`` and ``subprocesses``, these are
+        process wide figures on Python 2 and for child processes.  When
+        Actions run concurrently, they may include the cost of the other
+        Actions running at the same time.
+    """
+    start = _take_resource_snapshot()
+    deadline = start["wall_time"] + timeout if timeout is not None else None
+    fingerprint = _fingerprint_action(action) if result_cache is not None else None
+    cached_result = result_cache.get(action.id, fingerprint) if fingerprint else None
+    try:
+        if cached_result is not None:
+            logger.debug("Reusing the result of %s from a previous run." % action.id)
+            action.status = cached_result.status
+            action.error_id = cached_result.error_id
+            action.message = cached_result.message
+            action.cached = True
+            action._has_run = True
+        else:
+            with utils.command_timeouts(command_timeout, deadline):
                 action.run()
-            except (Exception, SystemExit) as e:
-                # Uncaught exceptions are handled by constructing a generic
-                # failure message here that should be reported
-                message = (
-                    "Unhandled exception was caught: %s\n"
-                    "Please file a bug at https://issues.redhat.com/ to have this"
-                    " fixed or a specific error message added.\n"
-                    "Traceback: %s" % (e, traceback.format_exc())
-                )
-                action.set_result(status="ERROR", error_id="UNEXPECTED_ERROR", message=message)
+            if fingerprint:
+                result_cache.set(action.id, fingerprint, action.status, action.error_id, action.message)
+    except utils.CommandTimeoutError as e:
+        action.set_result(status="ERROR", error_id="TIMEOUT", message=str(e))
+    except (Exception, SystemExit) as e:
+        # Uncaught exceptions are handled by constructing a generic
+        # failure message here that should be reported
+        message = (
+            "Unhandled exception was caught: %s\n"
+            "Please file a bug at https://issues.redhat.com/ to have this"
+            " fixed or a specific error message added.\n"
+            "Traceback: %s" % (e, traceback.format_exc())
+        )
+        action.set_result(status="ERROR", error_id="UNEXPECTED_ERROR", message=message)
 
-            # Categorize the results
-            if action.status <= STATUS_CODE["WARNING"]:
-                logger.info("%s has succeeded" % action.id)
-                successes.append(action)
+    end = _take_resource_snapshot()
+    action.metrics = {
+        "wall_time": round(end["wall_time"] - start["wall_time"], 3),
+        "cpu_time_self": round(end["cpu_time_self"] - start["cpu_time_self"], 3),
+        "cpu_time_children": round(end["cpu_time_children"] - start["cpu_time_children"], 3),
+        "peak_rss_delta": end["peak_rss"] - start["peak_rss"],
+        "subprocesses": end["subprocesses"] - start["subprocesses"],
+    }
 
-            if action.status > STATUS_CODE["WARNING"]:
-                message = format_action_status_message(action.status, action.id, action.error_id, action.message)
-                logger.error(message)
-                failures.append(action)
-                failed_action_ids.add(action.id)
+    if completed is not None:
+        completed.put(action)
 
-        if self.next_stage:
-            successes, failures, skips = self.next_stage.run(successes, failures, skips)
 
-        return FinishedActions(successes, failures, skips)
+def _fingerprint_action(action):
+    """
+    Fingerprint the inputs of an Action for the result cache.
+
+    :param action: The Action to fingerprint.
+    :returns: The fingerprint or None if the result of the Action must not be
+        cached.
+    :rtype: str | None
+    """
+    try:
+        inputs = action.cache_inputs()
+    except Exception as e:
+        logger.debug("Unable to determine the inputs of %s, not using cached results: %s" % (action.id, e))
+        return None
+
+    if inputs is None:
+        return None
+
+    return result_cache.compute_fingerprint(action.id, inputs)
+
+
+def _take_resource_snapshot():
+    """
+    Read the counters from which :func:`_run_action` computes :attr:`Action.metrics`.
 
+    :rtype: dict
+    """
+    self_usage = resource.getrusage(_RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "wall_time": time.time(),
+        "cpu_time_self": self_usage.ru_utime + self_usage.ru_stime,
+        "cpu_time_children": children_usage.ru_utime + children_usage.ru_stime,
+        # ru_maxrss is only meaningful for the whole process (in KiB on Linux)
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "subprocesses": utils.get_subprocess_count(),
+    }
+
+
+def _resources_available(resources, held_resources):
+    """
+    Whether an Action needing ``resources`` can start without exceeding :data:`_RESOURCE_LIMITS`.
 
-def resolve_action_order(potential_actions, previously_resolved_actions=None):
+    :param resources: The resources which the Action needs.
+    :type resources: Sequence
+    :param held_resources: How many running Actions hold each resource.
+    :type held_resources: Mapping
+    :rtype: bool
+    """
+    for resource in resources:
+        limit = _RESOURCE_LIMITS.get(resource)
+        if limit is not None and held_resources[resource] >= limit:
+            return False
+
+    return True
+
+
+def _wait_for_action(completed, give_up_time=None):
+    """
+    Wait until one of the Actions running on a thread has finished.
+
+    :param completed: Queue on which finished Actions are put.
+    :type completed: six.moves.queue.Queue
+    :param give_up_time: Time (as returned by :func:`time.time`) after which
+        to stop waiting.
+    :type give_up_time: float | None
+    :returns: The finished Action or None if none finished by give_up_time.
+    """
+    while True:
+        poll_interval = 1
+        if give_up_time is not None:
+            poll_interval = min(poll_interval, give_up_time - time.time())
+            if poll_interval <= 0:
+                return None
+        try:
+            # On Python 2, a get() without a timeout cannot be interrupted
+            # with Ctrl-C so we poll instead.
+            return completed.get(timeout=poll_interval)
+        except queue.Empty:
+            continue
+
+
+def resolve_action_order(potential_actions, previously_resolved_actions=None, cheap_first=False):
     """
     Order the Actions according to the order in which they need to run.
 
@@ -429,8 +1063,15 @@ def resolve_action_order(potential_actions, previously_resolved_actions=None):
     :param previously_resolved_actions: Sequence of Actions which have already
         been resolved into dependency order.
     :type previously_resolved_actions: Sequence
+    :param cheap_first: Out of the Actions whose dependencies have been
+        sorted, take the one with the lowest :attr:`Action.estimated_cost`
+        first.  Checks which are quick to run then come before the expensive
+        ones wherever the dependencies allow it.
+    :type cheap_first: bool
     :raises DependencyError: when it is impossible to satisfy a dependency in
-        an Action.
+        an Action.  The exception tells missing dependencies
+        (:attr:`DependencyError.missing_dependencies`) apart from circular
+        ones (:attr:`DependencyError.cycle`).
     :returns: Iterator of Actions sorted so that all dependent Actions are run
         before actions which depend on them.
 
@@ -451,65 +1092,246 @@ def resolve_action_order(potential_actions, previously_resolved_actions=None):
     # order is stable. (Always yields the same order if the input and
     # algorithm has not changed)
     potential_actions = sorted(potential_actions, key=lambda action: action.id)
+    previously_resolved_ids = set(action.id for action in previously_resolved_actions)
+    potential_ids = set(action.id for action in potential_actions)
 
-    # We have pre-sorted action by their id so that there is a stable sort order.
-    # Now we have to sort them further so that dependencies are run before
-    # the Actions which depend upon them.
+    # This is Kahn's algorithm: an Action is ready to be sorted once all of
+    # the Actions it depends on have been sorted (its indegree drops to 0).
+    #
+    # The ready Actions are taken in the order of their sort keys.  The key
+    # is (pass, id) where pass is the number of times that the Action would
+    # have been examined by scanning the id-sorted Actions over and over until
+    # they are all sorted.  That keeps the order that this function has always
+    # returned: Actions without dependencies come first, then a dependent
+    # Action comes as soon as a scan reaches it after its dependencies.
+    #
+    # With cheap_first, the key is (estimated_cost, id) instead.
+    indegree = {}
+    dependents = collections.defaultdict(list)
+    missing_dependencies = {}
+    ready = []
+    for action in potential_actions:
+        dependencies = set(action.dependencies) - previously_resolved_ids
+        missing = sorted(dependencies - potential_ids)
+        if missing:
+            missing_dependencies[action.id] = missing
+
+        indegree[action.id] = len(dependencies)
+        for dependency in dependencies:
+            dependents[dependency].append(action)
+
+        if not dependencies:
+            sort_pass = 0 if not action.dependencies else 1
+            heapq.heappush(ready, (action.estimated_cost if cheap_first else sort_pass, action.id, action))
+
+    resolved_actions = []
+    while ready:
+        sort_pass, action_id, action = heapq.heappop(ready)
+        resolved_actions.append(action)
+
+        for dependent in dependents[action_id]:
+            indegree[dependent.id] -= 1
+            if indegree[dependent.id] == 0:
+                # The last dependency was sorted in sort_pass.  The scan finds
+                # the dependent in the same pass if it comes later in id order.
+                if sort_pass == 0:
+                    dependent_pass = 1
+                elif dependent.id > action_id:
+                    dependent_pass = sort_pass
+                else:
+                    dependent_pass = sort_pass + 1
+                heapq.heappush(
+                    ready, (dependent.estimated_cost if cheap_first else dependent_pass, dependent.id, dependent)
+                )
 
-    # Actions which have yet to be resolved.  A resolved Action has been sorted
-    # into its final order and yielded to the caller.
-    unresolved_actions = []
-    # ids of the actions which have already been resolved
-    resolved_action_ids = set(action.id for action in previously_resolved_actions)
+    if len(resolved_actions) != len(potential_actions):
+        # Some of the actions have unsatisfied dependencies.  This could mean
+        # the dependencies aren't present, there was a typo in a dependency
+        # id, or that there is a circular dependency that needs to be broken.
+        unresolved_ids = [action.id for action in potential_actions if indegree[action.id]]
+        cycle = _find_dependency_cycle([action for action in potential_actions if indegree[action.id]])
+
+        details = []
+        if missing_dependencies:
+            details.append(
+                "missing dependencies: %s"
+                % "; ".join(
+                    "%s requires %s" % (action_id, ", ".join(missing))
+                    for action_id, missing in sorted(missing_dependencies.items())
+                )
+            )
+        if cycle:
+            details.append("circular dependency: %s" % " -> ".join(cycle))
 
-    for action in potential_actions:
-        if not action.dependencies:
-            # No dependencies so we can perform this immediately.
-            resolved_action_ids.add(action.id)
-            yield action
-        else:
-            # There are dependencies so we will have to make sure that its
-            # dependencies have been been run first.
-            unresolved_actions.append(action)
-
-    # Add the length of all actions passed in together.  We decide whether
-    # we're done sorting by comparing the previous unresolved actions to the
-    # current number of unresolved_actions so we want this to be more than the
-    # length of unresolved_actions to start with.
-    previous_number_of_unresolved_actions = len(potential_actions) + len(previously_resolved_actions)
-
-    # Keep trying to sort the actions until we haven't resolved any actions
-    # since the last iteration of the while loop (each while loop examines
-    # all of the unresolved actions once)
-    while previous_number_of_unresolved_actions != len(unresolved_actions):
-        previous_number_of_unresolved_actions = len(unresolved_actions)
-
-        # Examine each action.  (Utilize a copy of unresolved_actions for the
-        # loop since we add to unresolved_actions inside of the loop)
-        for action in unresolved_actions[:]:
-            # We can only run the action if all of its dependencies have
-            # previously been run
-            if all(d in resolved_action_ids for d in action.dependencies):
-                # Mark the action as being sorted by removing it from the
-                # list of unresolved actions and adding its id to the set of
-                # resolved actions.
-                unresolved_actions.remove(action)
-                resolved_action_ids.add(action.id)
-
-                # Yield the action so that it will be run now.
-                yield action
-
-    # After exiting the while loop we know that we cannot run anymore actions
-    # because there are no more whose dependencies have all been run.  If
-    # there are any actions which are still unresolved at this point, it means
-    # that some of them have unsatisfied dependencies.  This could mean the
-    # dependencies aren't present, there was a typo in a dependency id, or
-    # that there is a circular dependency that needs to be broken.
-    if previous_number_of_unresolved_actions != 0:
         raise DependencyError(
-            "Unsatisfied dependencies in these actions: %s" % ", ".join(action.id for action in unresolved_actions)
+            "Unsatisfied dependencies in these actions: %s (%s)" % (", ".join(unresolved_ids), "; ".join(details)),
+            unresolved_actions=unresolved_ids,
+            resolved_actions=[action.id for action in resolved_actions],
+            missing_dependencies=missing_dependencies,
+            cycle=cycle,
         )
 
+    for action in resolved_actions:
+        yield action
+
+
+def _find_dependency_cycle(unresolved_actions):
+    """
+    Find a circular dependency between Actions.
+
+    :param unresolved_actions: Actions which :func:`resolve_action_order`
+        could not sort.
+    :type unresolved_actions: Sequence
+    :returns: The ids of the Actions in the cycle, starting and ending with
+        the same id.  An empty list if there is no cycle.
+    :rtype: list[str]
+    """
+    dependencies = dict((action.id, sorted(action.dependencies)) for action in unresolved_actions)
+
+    # Iterative depth first search.  An id on the path that is reached again
+    # closes a cycle.
+    finished = set()
+    for start in sorted(dependencies):
+        if start in finished:
+            continue
+
+        path = [start]
+        on_path = set(path)
+        pending = [iter(dependencies[start])]
+        while pending:
+            for dependency in pending[-1]:
+                if dependency not in dependencies or dependency in finished:
+                    continue
+                if dependency in on_path:
+                    return path[path.index(dependency) :] + [dependency]
+
+                path.append(dependency)
+                on_path.add(dependency)
+                pending.append(iter(dependencies[dependency]))
+                break
+            else:
+                # All of the dependencies have been searched
+                finished_id = path.pop()
+                on_path.discard(finished_id)
+                finished.add(finished_id)
+                pending.pop()
+
+    return []
+
+
+def select_actions(potential_actions, only=None, skip=None):
+    """
+    Find which Actions to run when the user asks for only some of them.
+
+    An Action can only run after its dependencies have, so asking for an
+    Action with ``only`` also selects everything that it depends on,
+    directly or indirectly.  Leaving an Action out with ``skip`` also leaves
+    out everything that depends on it.  ``skip`` wins over ``only``.
+
+    :param potential_actions: All of the Actions, of every Stage.
+    :type potential_actions: Iterable
+    :param only: Ids of the Actions to run.  None or empty selects all of the
+        Actions.
+    :type only: Sequence[str] | None
+    :param skip: Ids of the Actions to leave out.
+    :type skip: Sequence[str] | None
+    :returns: Ids of the Actions to run.
+    :rtype: set[str]
+    :raises ActionError: When one of the ids does not belong to any Action.
+    """
+    only = only or ()
+    skip = skip or ()
+    actions_by_id = dict((action.id, action) for action in potential_actions)
+
+    unknown_ids = sorted(set(only).union(skip).difference(actions_by_id))
+    if unknown_ids:
+        raise ActionError("Unknown action ids: %s" % ", ".join(unknown_ids))
+
+    if only:
+        selected = set()
+        to_visit = list(only)
+        while to_visit:
+            action_id = to_visit.pop()
+            if action_id in selected or action_id not in actions_by_id:
+                continue
+            selected.add(action_id)
+            to_visit.extend(actions_by_id[action_id].dependencies)
+    else:
+        selected = set(actions_by_id)
+
+    dependents = collections.defaultdict(list)
+    for action in actions_by_id.values():
+        for dependency in action.dependencies:
+            dependents[dependency].append(action.id)
+
+    left_out = set()
+    to_visit = list(skip)
+    while to_visit:
+        action_id = to_visit.pop()
+        if action_id in left_out:
+            continue
+        left_out.add(action_id)
+        to_visit.extend(dependents[action_id])
+
+    return selected - left_out
+
+
+def find_critical_path(ordered_actions, costs=None):
+    """
+    Find the chain of dependent Actions which takes the longest to run.
+
+    No matter how many Actions run at the same time, a Stage cannot finish
+    sooner than the Actions on this path take to run one after the other.
+
+    :param ordered_actions: Actions in the order returned by
+        :func:`resolve_action_order`.
+    :type ordered_actions: Sequence
+    :param costs: Estimated cost of each Action keyed by its id.  Actions
+        which are not in the mapping use their :attr:`Action.estimated_cost`.
+    :type costs: Mapping | None
+    :returns: The summed cost of the path and the ids of the Actions on it,
+        in the order that they run.  Dependencies on Actions which are not in
+        ``ordered_actions`` are ignored.
+    :rtype: tuple[float, list[str]]
+    """
+    if costs is None:
+        costs = {}
+
+    # Longest path through a directed acyclic graph: walk the Actions in
+    # dependency order and extend the longest path to any of their
+    # dependencies.
+    path_cost = {}
+    previous_on_path = {}
+    for action in ordered_actions:
+        cost = costs.get(action.id, action.estimated_cost)
+        longest_dependency = None
+        for dependency in sorted(action.dependencies):
+            if dependency not in path_cost:
+                continue
+            if longest_dependency is None or path_cost[dependency] > path_cost[longest_dependency]:
+                longest_dependency = dependency
+
+        previous_on_path[action.id] = longest_dependency
+        path_cost[action.id] = cost + (path_cost[longest_dependency] if longest_dependency else 0)
+
+    if not path_cost:
+        return (0, [])
+
+    # The first Action with the highest cost ends the path
+    action_id = None
+    for action in ordered_actions:
+        if action_id is None or path_cost[action.id] > path_cost[action_id]:
+            action_id = action.id
+    total_cost = path_cost[action_id]
+
+    critical_path = []
+    while action_id is not None:
+        critical_path.append(action_id)
+        action_id = previous_on_path[action_id]
+    critical_path.reverse()
+
+    return (total_cost, critical_path)
+
 
 def run_actions():
     """
@@ -524,8 +1346,41 @@ def run_actions():
     # When we call check_dependencies() or run() on the first Stage
     # (system_checks), it will operate on the first Stage and then recursively
     # call check_dependencies() or run() on the next_stage.
-    pre_ponr_changes = Stage("pre_ponr_changes", "Making recoverable changes")
-    system_checks = Stage("system_checks", "Check whether system is ready for conversion", next_stage=pre_ponr_changes)
+    action_results = result_cache.ActionResultCache()
+    if toolopts.tool_opts.no_cache:
+        logger.info("Not reusing results of checks from previous runs as requested by --no-cache.")
+    else:
+        action_results.load()
+
+    events = None
+    if toolopts.tool_opts.events_file or toolopts.tool_opts.events_socket:
+        events = event_stream.EventStream(toolopts.tool_opts.events_file, toolopts.tool_opts.events_socket)
+        events.open()
+
+    stage_options = {
+        "result_cache": action_results,
+        "event_stream": events,
+        "fail_fast": toolopts.tool_opts.fail_fast,
+        "cheap_first": toolopts.tool_opts.cheap_first,
+        "action_timeout": toolopts.tool_opts.action_timeout,
+        "command_timeout": toolopts.tool_opts.command_timeout,
+    }
+    pre_ponr_changes = Stage("pre_ponr_changes", "Making recoverable changes", **stage_options)
+    system_checks = Stage(
+        "system_checks", "Check whether system is ready for conversion", next_stage=pre_ponr_changes, **stage_options
+    )
+
+    not_selected = []
+    if toolopts.tool_opts.only_actions or toolopts.tool_opts.skip_actions:
+        all_actions = list(itertools.chain(system_checks.actions, pre_ponr_changes.actions))
+        try:
+            selected = select_actions(all_actions, toolopts.tool_opts.only_actions, toolopts.tool_opts.skip_actions)
+        except ActionError as e:
+            logger.critical("%s. Check the values given to --only and --skip." % e)
+
+        not_selected = sorted(action.id for action in all_actions if action.id not in selected)
+        logger.info("Not running these checks as requested by --only and --skip: %s" % ", ".join(not_selected))
+        system_checks.action_ids = pre_ponr_changes.action_ids = selected
 
     try:
         # Check dependencies are satisfied for system_checks and all subsequent
@@ -537,16 +1392,37 @@ def run_actions():
         logger.critical("Some dependencies were set on Actions but not present in convert2rhel: %s" % e)
 
     # Run the Actions in system_checks and all subsequent Stages.
-    results = system_checks.run()
+    try:
+        results = system_checks.run()
+    finally:
+        action_results.save()
+        if events:
+            events.close()
 
     # Format results as a dictionary:
     # {"$Action_id": {"status": int,
     #                 "error_id": "$error_id",
-    #                 "message": "" or "$message"},
+    #                 "message": "" or "$message",
+    #                 "metrics": None or {"wall_time": float, ...},
+    #                 "cached": bool},
     # }
     formatted_results = {}
     for action in itertools.chain(*results):
-        formatted_results[action.id] = {"status": action.status, "error_id": action.error_id, "message": action.message}
+        formatted_results[action.id] = {
+            "status": action.status,
+            "error_id": action.error_id,
+            "message": action.message,
+            "metrics": action.metrics,
+            "cached": action.cached,
+        }
+    for action_id in not_selected:
+        formatted_results[action_id] = {
+            "status": STATUS_CODE["SKIP"],
+            "error_id": NOT_SELECTED_ERROR_ID,
+            "message": "Not run as requested by --only or --skip",
+            "metrics": None,
+            "cached": False,
+        }
     return formatted_results
 
 
@@ -609,3 +1485,20 @@ def format_action_status_message(status_code, action_id, error_id, message):
         ERROR_ID=error_id,
         MESSAGE=message,
     )
+
+
+def format_action_metrics(metrics):
+    """Helper function to format what running an Action cost for the user.
+
+    :param metrics: The metrics of an Action as set by :func:`_run_action`.
+    :type metrics: Mapping | None
+    :return: The formatted message.
+    :rtype: str
+    """
+    if not metrics:
+        return "Not run."
+
+    return (
+        "{wall_time:.2f}s wall clock, {cpu_time_self:.2f}s CPU, {cpu_time_children:.2f}s CPU in"
+        " {subprocesses} subprocess(es), peak RSS +{peak_rss_delta} KiB".format(**metrics)
+    )
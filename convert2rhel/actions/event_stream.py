@@ -0,0 +1,118 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+import logging
+import socket
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+#: Version of the format of the events.  Sent with every event.
+EVENT_FORMAT = 1
+
+
+class EventStream:
+    """
+    Stream events about the Actions as they run, one JSON object per line.
+
+    The events are written to a file, to a connected UNIX socket or to both.
+    Every event has these keys:
+
+    :format: :data:`EVENT_FORMAT`.
+    :event: The type of the event: ``action_started``, ``action_finished``
+        or ``stage_finished``.
+    :timestamp: Seconds since the epoch at which the event happened.
+    :stage: The name of the Stage that the event is about.
+
+    ``action_started`` and ``action_finished`` also have ``action_id``.
+    ``action_finished`` adds ``status`` (the name of the status),
+    ``error_id``, ``message``, ``duration`` (seconds, None for skipped Actions)
+    and ``cached``.  ``stage_finished`` adds ``successes``, ``failures`` and
+    ``skips``, the number of Actions of the Stage in each category, and
+    ``duration``.
+
+    A failure to write an event is logged once and stops the stream; it never
+    interrupts convert2rhel.
+    """
+
+    def __init__(self, path=None, socket_path=None):
+        """
+        :param path: File to append the events to.
+        :type path: str | None
+        :param socket_path: UNIX stream socket to send the events to.
+        :type socket_path: str | None
+        """
+        self.path = path
+        self.socket_path = socket_path
+        self._file = None
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the file and connect to the socket."""
+        try:
+            if self.path:
+                self._file = open(self.path, "a")
+            if self.socket_path:
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._socket.connect(self.socket_path)
+        except (IOError, OSError, socket.error) as e:
+            logger.warning("Unable to open the event stream: %s" % e)
+            self.close()
+
+    def close(self):
+        """Close the file and the socket."""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
+    def emit(self, event, stage, **data):
+        """
+        Send an event.
+
+        :param event: The type of the event.
+        :type event: str
+        :param stage: The name of the Stage that the event is about.
+        :type stage: str
+        :param data: The other keys of the event.
+        """
+        data.update({"format": EVENT_FORMAT, "event": event, "timestamp": time.time(), "stage": stage})
+        line = json.dumps(data, sort_keys=True) + "\n"
+
+        with self._lock:
+            try:
+                if self._file:
+                    self._file.write(line)
+                    self._file.flush()
+                if self._socket:
+                    self._socket.sendall(line.encode("utf-8"))
+            except (IOError, OSError, socket.error) as e:
+                logger.warning("Unable to write to the event stream, no further events will be sent: %s" % e)
+                try:
+                    self._close()
+                except (IOError, OSError, socket.error):
+                    pass
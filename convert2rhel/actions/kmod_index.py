@@ -0,0 +1,343 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Index of the kernel modules available in the RHEL repositories.
+
+The index maps the comparison key of each kernel module (see
+:func:`get_comparison_key`) to the NEVRA of the package that provides it.
+Building it needs the filelists metadata of the repositories, the slowest
+metadata to load, so the index is stored on disk along with the checksums of
+the repomd.xml of the repositories it was built from.  It is reused, across
+analysis and conversion runs, for as long as those checksums do not change.
+
+convert2rhel can also ship the index of a RHEL release as a manifest
+(see :func:`load_manifest`), so that the index doesn't need to be built at all.
+"""
+
+__metaclass__ = type
+
+import gzip
+import json
+import logging
+import os
+
+from convert2rhel import __version__, pkghandler, pkgmanager, repo, utils
+from convert2rhel.systeminfo import system_info
+
+
+logger = logging.getLogger(__name__)
+
+#: File in which the index is kept between runs.
+INDEX_FILE = os.path.join(utils.TMP_DIR, "rhel-kmods-index.json")
+
+#: Version of the format of :data:`INDEX_FILE`.  Indexes stored in a
+#: different format are rebuilt.
+_INDEX_FORMAT = 1
+
+#: Directory with the manifests of the kernel modules of each RHEL
+#: release, shipped with convert2rhel.  See :func:`load_manifest`.
+MANIFESTS_DIR = os.path.join(utils.DATA_DIR, "kmod-manifests")
+
+#: Version of the format of the manifests.
+_MANIFEST_FORMAT = 1
+
+KMOD_SUFFIXES = ("ko.xz", "ko")
+
+#: Only these packages are looked at for kernel modules.
+KMOD_PKG_GLOBS = ("kernel*", "kmod*")
+
+
+def get_comparison_key(path):
+    """
+    Create a comparison key from the absolute path of a kernel module.
+
+    The key is the part of the path after the kernel release, for instance
+    /lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz -> kernel/lib/a.ko.xz,
+    so that modules of different kernel releases can be compared.
+
+    :param path: The absolute path to the kernel module.
+    :type path: str
+    :rtype: str
+    """
+    return "/".join(path.strip().split("/")[4:])
+
+
+def load_index(fingerprint, path=None):
+    """
+    Read the index stored by a previous run.
+
+    :param fingerprint: The current :func:`convert2rhel.repo.repomd_fingerprint` of the
+        repositories.
+    :type fingerprint: dict[str, str]
+    :param path: File to read the index from.  Defaults to :data:`INDEX_FILE`.
+    :type path: str | None
+    :returns: The stored index, None when there is none for this fingerprint.
+    :rtype: dict[str, str] | None
+    """
+    path = path if path else INDEX_FILE
+    try:
+        with open(path) as handler:
+            data = json.load(handler)
+    except (IOError, OSError):
+        logger.debug("No index of the RHEL kernel modules found at %s." % path)
+        return None
+    except ValueError as e:
+        logger.warning("Ignoring the corrupted index of the RHEL kernel modules %s: %s" % (path, e))
+        return None
+
+    if data.get("format") != _INDEX_FORMAT or data.get("convert2rhel_version") != __version__:
+        logger.debug("Ignoring the index of the RHEL kernel modules stored by a different version of convert2rhel.")
+        return None
+
+    if data.get("releasever") != system_info.releasever or data.get("repomd") != fingerprint:
+        logger.debug("The RHEL repositories changed since the index of their kernel modules was built.")
+        return None
+
+    return data.get("kmods", {})
+
+
+def save_index(fingerprint, index, path=None):
+    """
+    Store the index for the next runs.
+
+    :param fingerprint: The :func:`convert2rhel.repo.repomd_fingerprint` of the repositories
+        the index was built from.
+    :type fingerprint: dict[str, str]
+    :param index: The index.
+    :type index: dict[str, str]
+    :param path: File to write the index to.  Defaults to :data:`INDEX_FILE`.
+    :type path: str | None
+    """
+    path = path if path else INDEX_FILE
+    data = {
+        "format": _INDEX_FORMAT,
+        "convert2rhel_version": __version__,
+        "releasever": system_info.releasever,
+        "repomd": fingerprint,
+        "kmods": index,
+    }
+    try:
+        utils.mkdir_p(os.path.dirname(path))
+        utils.write_json_object_to_file(path, data)
+    except (IOError, OSError) as e:
+        logger.warning("Unable to save the index of the RHEL kernel modules to %s: %s" % (path, e))
+
+
+def _add_kmods(index, pkg_obj, paths):
+    nevra = pkghandler.get_pkg_nevra(pkg_obj, include_zero_epoch=True)
+    for path in paths:
+        if path.startswith("/lib/modules/") and path.endswith(KMOD_SUFFIXES):
+            index[get_comparison_key(path)] = nevra
+
+
+def _build_index_yum(repoids, releasever):
+    base = pkgmanager.YumBase()
+    # Disable plugins (when kept enabled yum outputs useless text every call)
+    base.doConfigSetup(init_plugins=False)
+    base.conf.yumvar["releasever"] = releasever
+    pkgmanager.set_metadata_profile(base, pkgmanager.METADATA_FILELISTS)
+    base.repos.disableRepo("*")
+    for repoid in repoids:
+        base.repos.enableRepo(repoid)
+
+    index = {}
+    try:
+        base.repos.populateSack(mdtype="filelists")
+        for pkg_obj in base.pkgSack.returnNewestByName(patterns=list(KMOD_PKG_GLOBS)):
+            _add_kmods(index, pkg_obj, pkg_obj.returnFileEntries())
+    finally:
+        base.close()
+        del base
+
+    return index
+
+
+def _build_index_dnf(repoids, releasever):
+    base = pkgmanager.Base()
+    base.conf.substitutions["releasever"] = releasever
+    # Without the release package installed, dnf can't determine the
+    # modularity platform ID.
+    base.conf.module_platform_id = "platform:el8"
+    pkgmanager.set_metadata_profile(base, pkgmanager.METADATA_FILELISTS)
+    base.read_all_repos()
+    for repository in base.repos.all():
+        if repository.id in repoids:
+            repository.enable()
+        else:
+            repository.disable()
+    base.fill_sack(load_system_repo=False)
+
+    index = {}
+    for pkg_obj in base.sack.query().available().filter(name__glob=list(KMOD_PKG_GLOBS)).latest():
+        _add_kmods(index, pkg_obj, pkg_obj.files)
+
+    return index
+
+
+@utils.run_as_child_process
+def build_index(repoids, releasever=None):
+    """
+    Index the kernel modules in the latest kernel and kmod packages of repositories.
+
+    All the metadata is loaded in a single pass through the yum or dnf API.
+
+    .. important::
+        This function is being executed in a child process so that yum does
+        not handle signals like SIGINT without us knowing about it.
+
+    :param repoids: The ids of the repositories.
+    :type repoids: list[str]
+    :param releasever: The releasever to substitute in the repositories.
+        Defaults to the one of the system.
+    :type releasever: str | None
+    :returns: Mapping of the comparison key of each kernel module to the
+        NEVRA of the package which provides it.
+    :rtype: dict[str, str]
+    :raises pkgmanager.RepoError: When the metadata can't be loaded.
+    """
+    releasever = releasever if releasever else system_info.releasever
+    if pkgmanager.TYPE == "yum":
+        return _build_index_yum(repoids, releasever)
+
+    return _build_index_dnf(repoids, releasever)
+
+
+def get_index(repoids, path=None):
+    """
+    Return the index of the kernel modules in repositories.
+
+    The index stored on disk is used when the repositories have not changed
+    since it was built.  Otherwise it is built and stored again.
+
+    :param repoids: The ids of the repositories.
+    :type repoids: list[str]
+    :param path: File in which the index is kept.  Defaults to
+        :data:`INDEX_FILE`.
+    :type path: str | None
+    :returns: Mapping of the comparison key of each kernel module to the
+        NEVRA of the package which provides it.
+    :rtype: dict[str, str]
+    """
+    repoids = sorted(repoids)
+    fingerprint = repo.repomd_fingerprint(repoids)
+    if fingerprint:
+        index = load_index(fingerprint, path)
+        if index is not None:
+            logger.debug("Using the stored index of the kernel modules in the RHEL repositories.")
+            return index
+
+    logger.debug("Indexing the kernel modules in the RHEL repositories.")
+    index = build_index(repoids)
+
+    # Loading the metadata may have refreshed the repomd.xml files, the index
+    # belongs to their new content.
+    fingerprint = repo.repomd_fingerprint(repoids)
+    if fingerprint:
+        save_index(fingerprint, index, path)
+
+    return index
+
+
+#
+# Manifests shipped with convert2rhel
+#
+
+
+def get_manifest_path(version, manifests_dir=None):
+    """
+    Return the path to the manifest of the kernel modules of a RHEL release.
+
+    :param version: The releasever of the RHEL release, e.g. 8.5 or 7Server.
+    :type version: str
+    :param manifests_dir: Directory with the manifests.  Defaults to
+        :data:`MANIFESTS_DIR`.
+    :type manifests_dir: str | None
+    :rtype: str
+    """
+    return os.path.join(manifests_dir if manifests_dir else MANIFESTS_DIR, "%s.json.gz" % version)
+
+
+def write_manifest(path, index, version, arch, repoids):
+    """
+    Write an index as a manifest that can be shipped with convert2rhel.
+
+    To keep the manifest small, the kernel modules are grouped by the
+    package which provides them and the JSON is compressed.
+
+    :param path: File to write the manifest to.
+    :type path: str
+    :param index: The index, see :func:`build_index`.
+    :type index: dict[str, str]
+    :param version: The releasever of the RHEL release the index is for.
+    :type version: str
+    :param arch: The architecture the index is for.
+    :type arch: str
+    :param repoids: The ids of the repositories the index was built from.
+    :type repoids: list[str]
+    """
+    packages = {}
+    for kmod, nevra in index.items():
+        packages.setdefault(nevra, []).append(kmod)
+
+    data = {
+        "format": _MANIFEST_FORMAT,
+        "version": version,
+        "arch": arch,
+        "repoids": sorted(repoids),
+        "packages": dict((nevra, sorted(kmods)) for nevra, kmods in packages.items()),
+    }
+    utils.mkdir_p(os.path.dirname(path))
+    with gzip.open(path, "wb") as handler:
+        handler.write(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+
+
+def load_manifest(version, arch, manifests_dir=None):
+    """
+    Read the manifest of the kernel modules of a RHEL release.
+
+    :param version: The releasever of the RHEL release, e.g. 8.5 or 7Server.
+    :type version: str
+    :param arch: The architecture.
+    :type arch: str
+    :param manifests_dir: Directory with the manifests.  Defaults to
+        :data:`MANIFESTS_DIR`.
+    :type manifests_dir: str | None
+    :returns: The index stored in the manifest, see :func:`build_index`.
+        None when convert2rhel ships no manifest for this release.
+    :rtype: dict[str, str] | None
+    """
+    path = get_manifest_path(version, manifests_dir)
+    if not os.path.exists(path):
+        logger.debug("No manifest of the kernel modules of RHEL %s found at %s." % (version, path))
+        return None
+
+    try:
+        with gzip.open(path, "rb") as handler:
+            data = json.loads(handler.read().decode("utf-8"))
+    except (IOError, OSError, ValueError) as e:
+        logger.warning("Ignoring the corrupted manifest of the kernel modules %s: %s" % (path, e))
+        return None
+
+    if data.get("format") != _MANIFEST_FORMAT or data.get("version") != version or data.get("arch") != arch:
+        logger.warning("Ignoring the manifest of the kernel modules %s, it is not meant for this system." % path)
+        return None
+
+    index = {}
+    for nevra, kmods in data.get("packages", {}).items():
+        for kmod in kmods:
+            index[kmod] = nevra
+
+    return index
@@ -15,16 +15,12 @@
 
 __metaclass__ = type
 
-import itertools
 import logging
 import os
-import re
 
-from functools import cmp_to_key
-
-from convert2rhel import actions, pkghandler
+from convert2rhel import actions, pkgmanager
+from convert2rhel.actions import kmod_index, result_cache
 from convert2rhel.systeminfo import system_info
-from convert2rhel.utils import run_subprocess
 
 
 logger = logging.getLogger(__name__)
@@ -39,6 +35,22 @@ class RHELKernelModuleNotFound(Exception):
 class EnsureKernelModulesCompatibility(actions.Action):
     id = "ENSURE_KERNEL_MODULES_COMPATIBILITY"
     dependencies = ("SUBSCRIBE_SYSTEM",)
+    estimated_cost = 60
+
+    def cache_inputs(self):
+        """The result depends on the loaded kernel modules and on the content of the RHEL repositories."""
+        return {
+            "kernel_release": result_cache.kernel_release(),
+            "loaded_kmods": result_cache.loaded_kernel_modules(),
+            "releasever": system_info.releasever,
+            "rhel_repos": sorted(system_info.get_enabled_rhel_repos()),
+            "repomd": result_cache.repomd_checksums(
+                enable_repos=system_info.get_enabled_rhel_repos(),
+                disable_repos=["*"],
+                releasever=system_info.releasever,
+            ),
+            "allow_unavailable_kmods": "CONVERT2RHEL_ALLOW_UNAVAILABLE_KMODS" in os.environ,
+        }
 
     def _get_loaded_kmods(self):
         """Get a set of kernel modules loaded on host.
@@ -46,109 +58,50 @@ class EnsureKernelModulesCompatibility(actions.Action):
         Each module we cut part of the path until the kernel release
         (i.e. /lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz ->
         kernel/lib/a.ko.xz) in order to be able to compare with RHEL
-        kernel modules in case of different kernel release
+        kernel modules in case of different kernel release.  Modules whose
+        file could not be found are left out.
         """
-        logger.debug("Getting a list of loaded kernel modules.")
-        lsmod_output, _ = run_subprocess(["lsmod"], print_output=False)
-        modules = re.findall(r"^(\w+)\s.+$", lsmod_output, flags=re.MULTILINE)[1:]
-        kernel_modules = [
-            self._get_kmod_comparison_key(run_subprocess(["modinfo", "-F", "filename", module], print_output=False)[0])
-            for module in modules
-        ]
-        return set(kernel_modules)
+        return set(self._get_kmod_comparison_key(kmod.path) for kmod in system_info.get_loaded_kmods() if kmod.path)
 
     def _get_rhel_supported_kmods(self):
-        """Return set of target RHEL supported kernel modules."""
-        basecmd = [
-            "repoquery",
-            "--releasever=%s" % system_info.releasever,
-        ]
-
-        if system_info.version.major == 8:
-            basecmd.append("--setopt=module_platform_id=platform:el8")
+        """Return the index of the kernel modules available in RHEL.
 
-        for repoid in system_info.get_enabled_rhel_repos():
-            basecmd.extend(("--repoid", repoid))
+        The manifest shipped with convert2rhel for the target RHEL release
+        (the releasever) is preferred.  Without one, the enabled RHEL
+        repositories are indexed.
 
-        cmd = basecmd[:]
-        cmd.append("-f")
-        cmd.append("/lib/modules/*.ko*")
+        :returns: Mapping of the comparison key of each kernel module to the
+            package which provides it, see :mod:`convert2rhel.actions.kmod_index`.
+        :rtype: dict[str, str]
+        """
+        version = system_info.releasever
+        rhel_kmods = kmod_index.load_manifest(version, system_info.arch)
+        if rhel_kmods:
+            logger.info(
+                "Comparing the loaded kernel modules with the modules available in RHEL %s"
+                " according to the manifest shipped with convert2rhel." % version
+            )
+            return rhel_kmods
 
-        # Without the release package installed, dnf can't determine the
-        # modularity platform ID. get output of a command to get all
-        # packages which are the source of kmods
-        kmod_pkgs_str, _ = run_subprocess(cmd, print_output=False)
+        repoids = system_info.get_enabled_rhel_repos()
+        try:
+            rhel_kmods = kmod_index.get_index(repoids)
+        except pkgmanager.RepoError as e:
+            raise RHELKernelModuleNotFound("Unable to load the metadata of the enabled repositories: %s" % e)
 
-        # from these packages we select only the latest one
-        kmod_pkgs = self._get_most_recent_unique_kernel_pkgs(kmod_pkgs_str.rstrip("\n").split())
-        if not kmod_pkgs:
-            logger.debug("Output of the previous repoquery command:\n{0}".format(kmod_pkgs_str))
+        if not rhel_kmods:
             raise RHELKernelModuleNotFound(
-                "No packages containing kernel modules available in the enabled repositories (%s)."
-                % ", ".join(system_info.get_enabled_rhel_repos())
+                "No packages containing kernel modules available in the enabled repositories (%s)." % ", ".join(repoids)
             )
 
         logger.info(
             "Comparing the loaded kernel modules with the modules available in the following RHEL"
-            " kernel packages available in the enabled repositories:\n {0}".format("\n ".join(kmod_pkgs))
+            " kernel packages available in the enabled repositories:\n {0}".format(
+                "\n ".join(sorted(set(rhel_kmods.values())))
+            )
         )
 
-        # querying obtained packages for files they produces
-        cmd = basecmd[:]
-        cmd.append("-l")
-        cmd.extend(kmod_pkgs)
-        rhel_kmods_str, _ = run_subprocess(cmd, print_output=False)
-
-        return self._get_rhel_kmods_keys(rhel_kmods_str)
-
-    def _get_most_recent_unique_kernel_pkgs(self, pkgs):
-        """Return the most recent versions of all kernel packages.
-
-        When we scan kernel modules provided by kernel packages
-        it is expensive to check each kernel pkg. Since each new
-        kernel pkg do not deprecate kernel modules we only select
-        the most recent ones.
-
-        .. note::
-            All RHEL kmods packages starts with kernel* or kmod*
-
-        For example, consider the following list of packages::
-
-            list_of_pkgs = [
-                'kernel-core-0:4.18.0-240.10.1.el8_3.x86_64',
-                'kernel-core-0:4.19.0-240.10.1.el8_3.x86_64',
-                'kmod-debug-core-0:4.18.0-240.10.1.el8_3.x86_64',
-                'kmod-debug-core-0:4.18.0-245.10.1.el8_3.x86_64
-            ]
-
-        And when this function gets called with that same list of packages,
-        we have the following output::
-
-            result = get_most_recent_unique_kernel_pkgs(pkgs=list_of_pkgs)
-            print(result)
-            # (
-            #   'kernel-core-0:4.19.0-240.10.1.el8_3.x86_64',
-            #   'kmod-debug-core-0:4.18.0-245.10.1.el8_3.x86_64'
-            # )
-
-        :param pkgs: A list of package names to be analyzed.
-        :type pkgs: list[str]
-        :return: A tuple of packages name sorted and normalized
-        :rtype: tuple[str]
-        """
-
-        pkgs_groups = itertools.groupby(sorted(pkgs), lambda pkg_name: pkg_name.split(":")[0])
-        list_of_sorted_pkgs = []
-        for distinct_kernel_pkgs in pkgs_groups:
-            if distinct_kernel_pkgs[0].startswith(("kernel", "kmod")):
-                list_of_sorted_pkgs.append(
-                    max(
-                        distinct_kernel_pkgs[1],
-                        key=cmp_to_key(pkghandler.compare_package_versions),
-                    )
-                )
-
-        return tuple(list_of_sorted_pkgs)
+        return rhel_kmods
 
     def _get_kmod_comparison_key(self, path):
         """Create a comparison key from the kernel module absolute path.
@@ -166,18 +119,7 @@ class EnsureKernelModulesCompatibility(actions.Action):
         :param path: The complete path to the kernel module being analyzed.
         :type path: str
         """
-        return "/".join(path.strip().split("/")[4:])
-
-    def _get_rhel_kmods_keys(self, rhel_kmods_str):
-        kernel_module_keys = [
-            self._get_kmod_comparison_key(kmod_path)
-            for kmod_path in filter(
-                lambda path: path.endswith(("ko.xz", "ko")),
-                rhel_kmods_str.rstrip("\n").split(),
-            )
-        ]
-
-        return set(kernel_module_keys)
+        return kmod_index.get_comparison_key(path)
 
     def _get_unsupported_kmods(self, host_kmods, rhel_supported_kmods):
         """
@@ -189,7 +131,10 @@ class EnsureKernelModulesCompatibility(actions.Action):
         retained and we would be incorrectly saying that the modules are not
         supported in RHEL.
         """
-        unsupported_kmods_subpaths = host_kmods - rhel_supported_kmods - set(system_info.kmods_to_ignore)
+        kmods_to_ignore = set(system_info.kmods_to_ignore)
+        unsupported_kmods_subpaths = [
+            kmod for kmod in host_kmods if kmod not in rhel_supported_kmods and kmod not in kmods_to_ignore
+        ]
         unsupported_kmods_full_paths = [
             "/lib/modules/{kver}/{kmod}".format(kver=system_info.booted_kernel, kmod=kmod)
             for kmod in unsupported_kmods_subpaths
@@ -239,9 +184,3 @@ class EnsureKernelModulesCompatibility(actions.Action):
             logger.debug("All loaded kernel modules are available in RHEL.")
         except RHELKernelModuleNotFound as e:
             self.set_result(status="ERROR", error_id="NO_RHEL_KERNEL_MODULES_FOUND", message=str(e))
-        except ValueError as e:
-            self.set_result(
-                status="ERROR",
-                error_id="CANNOT_COMPARE_PACKAGE_VERSIONS",
-                message="Package comparison failed: %s" % e,
-            )
@@ -83,6 +83,7 @@ class SubscribeSystem(actions.Action):
         "REMOVE_REPOSITORY_FILES_PACKAGES",
         "PRE_SUBSCRIPTION",
     )
+    estimated_cost = 30
 
     def run(self):
         super(SubscribeSystem, self).run()
@@ -34,6 +34,11 @@ class ValidatePackageManagerTransaction(actions.Action):
         "ENSURE_KERNEL_MODULES_COMPATIBILITY",
         "SUBSCRIBE_SYSTEM",
     )
+    estimated_cost = 120
+    # The result is never reused from an earlier run (see
+    # Action.cache_inputs()).  Besides being the last check before the point
+    # of no return, the validation records the transaction, downloads its
+    # packages and stages them with --prestage for the conversion.
 
     def run(self):
         """Validate the package manager transaction is passing the tests."""
@@ -0,0 +1,228 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# This file is generated by scripts/generate_action_registry.py.  Do not edit
+# it by hand, run the script again after adding, removing or changing the
+# class attributes of an Action.
+"""
+The Actions that ship with convert2rhel, per Stage.
+
+:class:`convert2rhel.actions.Stage` uses this to order the Actions and check
+their dependencies without importing the modules that they live in.
+"""
+
+__metaclass__ = type
+
+ACTIONS = {
+    "convert2rhel.actions.system_checks": (
+        {
+            "id": "CONVERT2RHEL_LATEST_VERSION",
+            "module": "convert2rhel.actions.system_checks.convert2rhel_latest",
+            "class_name": "Convert2rhelLatest",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": ("network",),
+            "estimated_cost": 10,
+        },
+        {
+            "id": "CUSTOM_REPOSITORIES_ARE_VALID",
+            "module": "convert2rhel.actions.system_checks.custom_repos_are_valid",
+            "class_name": "CustomReposAreValid",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (
+                "network",
+                "package_manager_lock",
+            ),
+            "estimated_cost": 10,
+        },
+        {
+            "id": "DBUS_IS_RUNNING",
+            "module": "convert2rhel.actions.system_checks.dbus",
+            "class_name": "DbusIsRunning",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "EFI",
+            "module": "convert2rhel.actions.system_checks.efi",
+            "class_name": "Efi",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "IS_LOADED_KERNEL_LATEST",
+            "module": "convert2rhel.actions.system_checks.is_loaded_kernel_latest",
+            "class_name": "IsLoadedKernelLatest",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": ("network",),
+            "estimated_cost": 10,
+        },
+        {
+            "id": "PACKAGE_UPDATES",
+            "module": "convert2rhel.actions.system_checks.package_updates",
+            "class_name": "PackageUpdates",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (
+                "rpmdb",
+                "network",
+                "package_manager_lock",
+            ),
+            "estimated_cost": 30,
+        },
+        {
+            "id": "READ_ONLY_MOUNTS_MNT",
+            "module": "convert2rhel.actions.system_checks.readonly_mounts",
+            "class_name": "ReadonlyMountMnt",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "READ_ONLY_MOUNTS_SYS",
+            "module": "convert2rhel.actions.system_checks.readonly_mounts",
+            "class_name": "ReadonlyMountSys",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "RHEL_COMPATIBLE_KERNEL",
+            "module": "convert2rhel.actions.system_checks.rhel_compatible_kernel",
+            "class_name": "RhelCompatibleKernel",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": ("rpmdb",),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "TAINTED_KMODS",
+            "module": "convert2rhel.actions.system_checks.tainted_kmods",
+            "class_name": "TaintedKmods",
+            "dependencies": (),
+            "parallel_safe": True,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+    ),
+    "convert2rhel.actions.pre_ponr_changes": (
+        {
+            "id": "BACKUP_REDHAT_RELEASE",
+            "module": "convert2rhel.actions.pre_ponr_changes.backup_system",
+            "class_name": "BackupRedhatRelease",
+            "dependencies": (),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "BACKUP_REPOSITORY",
+            "module": "convert2rhel.actions.pre_ponr_changes.backup_system",
+            "class_name": "BackupRepository",
+            "dependencies": (),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "ENSURE_KERNEL_MODULES_COMPATIBILITY",
+            "module": "convert2rhel.actions.pre_ponr_changes.kernel_modules",
+            "class_name": "EnsureKernelModulesCompatibility",
+            "dependencies": ("SUBSCRIBE_SYSTEM",),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 60,
+        },
+        {
+            "id": "LIST_THIRD_PARTY_PACKAGES",
+            "module": "convert2rhel.actions.pre_ponr_changes.handle_packages",
+            "class_name": "ListThirdPartyPackages",
+            "dependencies": (),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "PRE_SUBSCRIPTION",
+            "module": "convert2rhel.actions.pre_ponr_changes.subscription",
+            "class_name": "PreSubscription",
+            "dependencies": ("REMOVE_EXCLUDED_PACKAGES",),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "REMOVE_EXCLUDED_PACKAGES",
+            "module": "convert2rhel.actions.pre_ponr_changes.handle_packages",
+            "class_name": "RemoveExcludedPackages",
+            "dependencies": (),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "REMOVE_IWLAX2XX_FIRMWARE",
+            "module": "convert2rhel.actions.pre_ponr_changes.special_cases",
+            "class_name": "RemoveIwlax2xxFirmware",
+            "dependencies": (),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "REMOVE_REPOSITORY_FILES_PACKAGES",
+            "module": "convert2rhel.actions.pre_ponr_changes.handle_packages",
+            "class_name": "RemoveRepositoryFilesPackages",
+            "dependencies": ("BACKUP_REDHAT_RELEASE",),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 1,
+        },
+        {
+            "id": "SUBSCRIBE_SYSTEM",
+            "module": "convert2rhel.actions.pre_ponr_changes.subscription",
+            "class_name": "SubscribeSystem",
+            "dependencies": (
+                "REMOVE_REPOSITORY_FILES_PACKAGES",
+                "PRE_SUBSCRIPTION",
+            ),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 30,
+        },
+        {
+            "id": "VALIDATE_PACKAGE_MANAGER_TRANSACTION",
+            "module": "convert2rhel.actions.pre_ponr_changes.transaction",
+            "class_name": "ValidatePackageManagerTransaction",
+            "dependencies": (
+                "REMOVE_EXCLUDED_PACKAGES",
+                "REMOVE_IWLAX2XX_FIRMWARE",
+                "ENSURE_KERNEL_MODULES_COMPATIBILITY",
+                "SUBSCRIBE_SYSTEM",
+            ),
+            "parallel_safe": False,
+            "resources": (),
+            "estimated_cost": 120,
+        },
+    ),
+}
@@ -20,7 +20,13 @@ import logging
 import textwrap
 
 from convert2rhel import utils
-from convert2rhel.actions import _STATUS_HEADER, find_actions_of_severity, format_action_status_message
+from convert2rhel.actions import (
+    _STATUS_HEADER,
+    NOT_SELECTED_ERROR_ID,
+    find_actions_of_severity,
+    format_action_metrics,
+    format_action_status_message,
+)
 from convert2rhel.logger import colorize
 
 
@@ -43,7 +49,7 @@ _STATUS_TO_COLOR = {
 }
 
 
-def summary(results, include_all_reports=False, with_colors=True):
+def summary(results, include_all_reports=False, with_colors=True, include_metrics=False):
     """Output a summary regarding the actions execution.
 
     This summary is intended to be used to inform the user about the results
@@ -54,7 +60,9 @@ def summary(results, include_all_reports=False, with_colors=True):
             "$Action_id": {
                 "status": int,
                 "error_id": "$error_id",
-                "message": None or "$message"
+                "message": None or "$message",
+                "metrics": None or {"wall_time": float, ...},
+                "cached": bool
             },
         }
 
@@ -74,6 +82,14 @@ def summary(results, include_all_reports=False, with_colors=True):
             * (SKIP) SubscribeSystem.SKIP: Skip message
             * (WARNING) SubscribeSystem.WARNING: Warning message
 
+        Results which were reused from a previous run are marked::
+            * (ERROR) SubscribeSystem.ERROR: Error message (cached)
+
+        Actions which were left out with ``--only`` or ``--skip`` are listed
+        in a section of their own at the end instead::
+            ========== Not run as requested ==========
+            PackageUpdates, SubscribeSystem
+
         In case of `message` being empty (as it is optional for some cases), a
         default message will be used::
             * (ERROR) SubscribeSystem.ERROR: [No further information given]
@@ -89,13 +105,21 @@ def summary(results, include_all_reports=False, with_colors=True):
     :keyword include_all_reports: If all reports should be logged instead of the
         highest ones.
     :type include_all_reports: bool
+    :keyword include_metrics: If the time spent in each action should be
+        logged after the report.
+    :type include_metrics: bool
     """
     logger.task("Pre-conversion analysis report")
 
+    all_results = results
+    not_selected = sorted(
+        action_id for action_id, result in results.items() if result["error_id"] == NOT_SELECTED_ERROR_ID
+    )
     if include_all_reports:
         results = results.items()
     else:
         results = find_actions_of_severity(results, "WARNING")
+    results = [(action_id, result) for action_id, result in results if action_id not in not_selected]
 
     terminal_size = utils.get_terminal_size()
     word_wrapper = textwrap.TextWrapper(subsequent_indent="    ", width=terminal_size[0], replace_whitespace=False)
@@ -112,6 +136,8 @@ def summary(results, include_all_reports=False, with_colors=True):
             last_status = result["status"]
 
         entry = format_action_status_message(result["status"], action_id, result["error_id"], result["message"])
+        if result.get("cached"):
+            entry = "%s (cached)" % entry
         entry = word_wrapper.fill(entry)
         if with_colors:
             entry = colorize(entry, _STATUS_TO_COLOR[result["status"]])
@@ -122,6 +148,14 @@ def summary(results, include_all_reports=False, with_colors=True):
     if not results:
         report.append("No problems detected during the analysis!")
 
+    if not_selected:
+        report.append("")
+        report.append("{highlight} Not run as requested {highlight}".format(highlight="=" * 10))
+        report.append(word_wrapper.fill(", ".join(not_selected)))
+
+    if include_metrics:
+        report.extend(format_metrics_section(all_results))
+
     logger.info("%s\n" % "\n".join(report))
 
 
@@ -139,3 +173,27 @@ def format_report_section_heading(status_code):
 
     heading = "{highlight} {status_header} {highlight}".format(highlight=highlight, status_header=status_header)
     return heading
+
+
+def format_metrics_section(results):
+    """
+    Format the time spent in each action for the report.
+
+    The actions which took the longest are listed first.  Actions which were
+    not run are left out.
+
+    :param results: Results dictionary as returned by :func:`run_actions`
+    :type results: Mapping
+    :return: The lines of the section.
+    :rtype: list[str]
+    """
+    metrics = [(action_id, result["metrics"]) for action_id, result in results.items() if result.get("metrics")]
+    metrics.sort(key=lambda item: (-item[1]["wall_time"], item[0]))
+
+    highlight = "=" * 10
+    section = ["", "{highlight} Time spent in each action {highlight}".format(highlight=highlight)]
+    for action_id, action_metrics in metrics:
+        section.append(
+            "{action_id}: {metrics}".format(action_id=action_id, metrics=format_action_metrics(action_metrics))
+        )
+    return section
@@ -0,0 +1,308 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from collections import namedtuple
+
+from convert2rhel import __version__, pkgmanager, utils
+
+
+logger = logging.getLogger(__name__)
+
+#: File in which the results of the Actions are kept between runs.
+CACHE_FILE = os.path.join(utils.TMP_DIR, "action-results-cache.json")
+
+#: Version of the format of :data:`CACHE_FILE`.  Results stored in a
+#: different format are ignored.
+_CACHE_FORMAT = 1
+
+#: Where yum and dnf keep the repository metadata they downloaded.
+REPOMD_GLOBS = (
+    "/var/cache/dnf/*/repodata/repomd.xml",
+    "/var/cache/yum/*/*/*/repomd.xml",
+)
+
+REPOFILE_GLOB = "/etc/yum.repos.d/*.repo"
+
+#: Result of an Action stored by a previous run.
+CachedResult = namedtuple("CachedResult", ("status", "error_id", "message"))
+
+
+class ActionResultCache:
+    """
+    Results of Actions from previous runs of convert2rhel.
+
+    An Action opts in by returning its inputs from
+    :meth:`convert2rhel.actions.Action.cache_inputs`.  The result of the
+    Action is stored along with a fingerprint of those inputs.  The next time
+    the Action would run with the same fingerprint, its stored result is
+    reused instead.
+
+    Results of Actions which raised an exception are never stored.
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path else CACHE_FILE
+        self._results = {}
+        self._changed = False
+        # Actions running on different threads update the cache
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the results stored by previous runs, if any."""
+        try:
+            with open(self.path) as handler:
+                data = json.load(handler)
+        except (IOError, OSError):
+            logger.debug("No cached action results found at %s." % self.path)
+            return
+        except ValueError as e:
+            logger.warning("Ignoring the corrupted action results cache %s: %s" % (self.path, e))
+            return
+
+        if data.get("format") != _CACHE_FORMAT or data.get("convert2rhel_version") != __version__:
+            logger.debug("Ignoring cached action results stored by a different version of convert2rhel.")
+            return
+
+        self._results = data.get("results", {})
+
+    def save(self):
+        """Write the results to :attr:`path` if they changed since they were loaded."""
+        with self._lock:
+            if not self._changed:
+                return
+
+            data = {"format": _CACHE_FORMAT, "convert2rhel_version": __version__, "results": self._results}
+            try:
+                utils.mkdir_p(os.path.dirname(self.path))
+                utils.write_json_object_to_file(self.path, data)
+            except (IOError, OSError) as e:
+                logger.warning("Unable to save the action results cache to %s: %s" % (self.path, e))
+                return
+
+            self._changed = False
+
+    def get(self, action_id, fingerprint):
+        """
+        Return the stored result of an Action.
+
+        :param action_id: The id of the Action.
+        :type action_id: str
+        :param fingerprint: Fingerprint of the inputs of the Action, see
+            :func:`compute_fingerprint`.
+        :type fingerprint: str
+        :returns: The stored result or None when there is no result stored
+            for these inputs.
+        :rtype: CachedResult | None
+        """
+        with self._lock:
+            result = self._results.get(action_id)
+
+        if not result or result.get("fingerprint") != fingerprint:
+            return None
+        return CachedResult(result.get("status"), result.get("error_id"), result.get("message"))
+
+    def set(self, action_id, fingerprint, status, error_id, message):
+        """
+        Store the result of an Action.
+
+        :param action_id: The id of the Action.
+        :type action_id: str
+        :param fingerprint: Fingerprint of the inputs of the Action, see
+            :func:`compute_fingerprint`.
+        :type fingerprint: str
+        :param status: The status code of the Action.
+        :type status: int
+        :param error_id: The error_id of the Action.
+        :type error_id: str | None
+        :param message: The message of the Action.
+        :type message: str | None
+        """
+        with self._lock:
+            self._results[action_id] = {
+                "fingerprint": fingerprint,
+                "status": status,
+                "error_id": error_id,
+                "message": message,
+            }
+            self._changed = True
+
+
+def compute_fingerprint(action_id, inputs):
+    """
+    Turn the inputs of an Action into a string which changes when they do.
+
+    :param action_id: The id of the Action.
+    :type action_id: str
+    :param inputs: Any data that can be serialized to JSON.
+    :returns: Hex digest identifying the inputs.
+    :rtype: str
+    """
+    serialized = json.dumps([action_id, inputs], sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+#
+# Helpers for Actions to describe their inputs
+#
+
+
+def rpmdb_cookie():
+    """
+    Identify the set of installed packages.
+
+    Like the rpmdb version of yum and dnf, this only depends on which
+    packages are installed.  Removing a package and installing it back (as
+    a rollback does) results in the same cookie.
+
+    :returns: Hex digest of the NEVRAs and header checksums of the installed
+        packages.
+    :rtype: str
+    """
+    output, ret_code = utils.run_subprocess(
+        ["rpm", "-qa", "--qf", "%{NEVRA} %{SIGMD5}\\n"], print_cmd=False, print_output=False
+    )
+    if ret_code != 0:
+        raise ValueError("Unable to list the installed packages: %s" % output)
+
+    packages = sorted(line for line in output.splitlines() if line)
+    return hashlib.sha256("\n".join(packages).encode("utf-8")).hexdigest()
+
+
+def loaded_kernel_modules():
+    """
+    Read the names of the loaded kernel modules.
+
+    :returns: Sorted names of the kernel modules from /proc/modules.
+    :rtype: list[str]
+    """
+    try:
+        with open("/proc/modules") as handler:
+            return sorted(line.split(" ", 1)[0] for line in handler if line.strip())
+    except (IOError, OSError):
+        return []
+
+
+def kernel_release():
+    """
+    Return the release of the running kernel.
+
+    :rtype: str
+    """
+    return os.uname()[2]
+
+
+def file_checksums(paths):
+    """
+    Compute the sha256 checksum of files.
+
+    :param paths: Paths of the files.  Missing files are recorded as None.
+    :type paths: Iterable[str]
+    :returns: Mapping of each path to its checksum.
+    :rtype: dict[str, str | None]
+    """
+    checksums = {}
+    for path in paths:
+        try:
+            with open(path, "rb") as handler:
+                checksums[path] = hashlib.sha256(handler.read()).hexdigest()
+        except (IOError, OSError):
+            checksums[path] = None
+
+    return checksums
+
+
+def refresh_repo_metadata(reposdir=None, enable_repos=None, disable_repos=None, releasever=None):
+    """
+    Download the current repository metadata.
+
+    The metadata in the yum and dnf cache is whatever a previous run left
+    there.  It is expired when the conversion starts (see
+    :func:`convert2rhel.pkgmanager.expire_yum_metadata`), so making the cache
+    again fetches the repomd.xml of the remote repositories.
+
+    :param reposdir: Directory with the repofiles to use instead of the
+        system ones.
+    :type reposdir: str | None
+    :param enable_repos: Repositories to enable.
+    :type enable_repos: list[str] | None
+    :param disable_repos: Repositories to disable.  They are disabled before
+        the ones in `enable_repos` are enabled.
+    :type disable_repos: list[str] | None
+    :param releasever: Value of the $releasever yum variable.
+    :type releasever: str | None
+    :raises ValueError: If the metadata could not be downloaded.
+    """
+    cmd = ["yum", "makecache", "--quiet"]
+    if pkgmanager.TYPE == "yum":
+        # Only download the repomd.xml and the primary metadata
+        cmd.append("fast")
+    if reposdir:
+        cmd.append("--setopt=reposdir=%s" % reposdir)
+    for repo in disable_repos or []:
+        cmd.append("--disablerepo=%s" % repo)
+    for repo in enable_repos or []:
+        cmd.append("--enablerepo=%s" % repo)
+    if releasever:
+        cmd.append("--releasever=%s" % releasever)
+
+    output, ret_code = utils.run_subprocess(cmd, print_cmd=False, print_output=False)
+    if ret_code != 0:
+        raise ValueError("Unable to refresh the repository metadata: %s" % output)
+
+
+def repomd_checksums(**repos):
+    """
+    Compute checksums of the current repository metadata.
+
+    The repomd.xml of a repository changes whenever the content of the
+    repository does.  The metadata is refreshed first so that the checksums
+    describe the remote repositories and not a copy left by a previous run.
+
+    :param repos: Passed to :func:`refresh_repo_metadata` to select the
+        repositories to refresh.
+    :returns: Mapping of the path to each repomd.xml to its checksum.
+    :rtype: dict[str, str | None]
+    :raises ValueError: If the metadata could not be refreshed.
+    """
+    refresh_repo_metadata(**repos)
+
+    paths = []
+    for pattern in REPOMD_GLOBS:
+        paths.extend(glob.glob(pattern))
+
+    return file_checksums(sorted(paths))
+
+
+def repofile_checksums(reposdir=None):
+    """
+    Compute checksums of the repository definitions.
+
+    :param reposdir: Directory with the repofiles.  Defaults to the system
+        repositories in /etc/yum.repos.d/.
+    :type reposdir: str | None
+    :returns: Mapping of the path to each repofile to its checksum.
+    :rtype: dict[str, str | None]
+    """
+    pattern = os.path.join(reposdir, "*.repo") if reposdir else REPOFILE_GLOB
+    return file_checksums(sorted(glob.glob(pattern)))
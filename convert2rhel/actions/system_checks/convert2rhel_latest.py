@@ -51,6 +51,9 @@ gpgkey=file://%s""" % (
 
 class Convert2rhelLatest(actions.Action):
     id = "CONVERT2RHEL_LATEST_VERSION"
+    parallel_safe = True
+    resources = (actions.RESOURCE_NETWORK,)
+    estimated_cost = 10
 
     def run(self):
         """Make sure that we are running the latest downstream version of convert2rhel"""
@@ -17,7 +17,7 @@ __metaclass__ = type
 
 import logging
 
-from convert2rhel import actions
+from convert2rhel import actions, pkgmanager
 from convert2rhel.pkghandler import call_yum_cmd
 from convert2rhel.toolopts import tool_opts
 
@@ -27,6 +27,9 @@ logger = logging.getLogger(__name__)
 
 class CustomReposAreValid(actions.Action):
     id = "CUSTOM_REPOSITORIES_ARE_VALID"
+    parallel_safe = True
+    resources = (actions.RESOURCE_NETWORK, actions.RESOURCE_PACKAGE_MANAGER_LOCK)
+    estimated_cost = 10
 
     def run(self):
         """To prevent failures past the PONR, make sure that the enabled custom repositories are valid.
@@ -41,9 +44,16 @@ class CustomReposAreValid(actions.Action):
             logger.info("Skipping the check of repositories due to the use of RHSM for the conversion.")
             return
 
+        args = ["-v", "--setopt=*.skip_if_unavailable=False"]
+        if pkgmanager.TYPE == "yum":
+            # Without "fast", yum downloads all the metadata of the repositories again, including the filelists which
+            # the rest of the run rarely needs. The cached metadata has been expired at this point, so yum still
+            # checks that the repositories are accessible.
+            args.insert(0, "fast")
+
         output, ret_code = call_yum_cmd(
             command="makecache",
-            args=["-v", "--setopt=*.skip_if_unavailable=False"],
+            args=args,
             print_output=False,
         )
         if ret_code != 0:
@@ -27,6 +27,7 @@ logger = logging.getLogger(__name__)
 
 class DbusIsRunning(actions.Action):
     id = "DBUS_IS_RUNNING"
+    parallel_safe = True
 
     def run(self):
         """Error out if we need to register with rhsm and the dbus daemon is not running."""
@@ -27,6 +27,7 @@ logger = logging.getLogger(__name__)
 
 class Efi(actions.Action):
     id = "EFI"
+    parallel_safe = True
 
     def run(self):
         """Inhibit the conversion when we are not able to handle UEFI."""
@@ -30,6 +30,9 @@ logger = logging.getLogger(__name__)
 
 class IsLoadedKernelLatest(actions.Action):
     id = "IS_LOADED_KERNEL_LATEST"
+    parallel_safe = True
+    resources = (actions.RESOURCE_NETWORK,)
+    estimated_cost = 10
     # disabling here as some of the return statements would be raised as exceptions in normal code
     # but we don't do that in an Action class
     def run(self):  # pylint: disable= too-many-return-statements
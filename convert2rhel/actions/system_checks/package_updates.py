@@ -18,9 +18,11 @@ __metaclass__ = type
 import logging
 
 from convert2rhel import actions, pkgmanager, utils
+from convert2rhel.actions import result_cache
 from convert2rhel.pkghandler import get_total_packages_to_update
 from convert2rhel.repo import get_hardcoded_repofiles_dir
 from convert2rhel.systeminfo import system_info
+from convert2rhel.toolopts import tool_opts
 
 
 logger = logging.getLogger(__name__)
@@ -28,6 +30,23 @@ logger = logging.getLogger(__name__)
 
 class PackageUpdates(actions.Action):
     id = "PACKAGE_UPDATES"
+    parallel_safe = True
+    resources = (actions.RESOURCE_RPMDB, actions.RESOURCE_NETWORK, actions.RESOURCE_PACKAGE_MANAGER_LOCK)
+    estimated_cost = 30
+
+    def cache_inputs(self):
+        """The result depends on the installed packages and the repositories they are checked against."""
+        reposdir = get_hardcoded_repofiles_dir()
+        return {
+            "system": [system_info.id, list(system_info.version)],
+            "has_internet_access": system_info.has_internet_access,
+            "rpmdb": result_cache.rpmdb_cookie(),
+            "repofiles": result_cache.repofile_checksums(reposdir),
+            "enablerepo": sorted(tool_opts.enablerepo),
+            "disablerepo": sorted(tool_opts.disablerepo),
+            "no_rhsm": tool_opts.no_rhsm,
+            "repomd": result_cache.repomd_checksums(reposdir=reposdir),
+        }
 
     def run(self):
         """Ensure that the system packages installed are up-to-date."""
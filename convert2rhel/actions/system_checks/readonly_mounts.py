@@ -45,6 +45,7 @@ def readonly_mount_detection(mount_point):
 
 class ReadonlyMountMnt(actions.Action):
     id = "READ_ONLY_MOUNTS_MNT"
+    parallel_safe = True
 
     def run(self):
         super(ReadonlyMountMnt, self).run()
@@ -63,6 +64,7 @@ class ReadonlyMountMnt(actions.Action):
 
 class ReadonlyMountSys(actions.Action):
     id = "READ_ONLY_MOUNTS_SYS"
+    parallel_safe = True
 
     def run(self):
         super(ReadonlyMountSys, self).run()
@@ -35,6 +35,8 @@ BAD_KERNEL_RELEASE_SUBSTRINGS = ("uek", "rt", "linode")
 
 class RhelCompatibleKernel(actions.Action):
     id = "RHEL_COMPATIBLE_KERNEL"
+    parallel_safe = True
+    resources = (actions.RESOURCE_RPMDB,)
 
     def run(self):
         """Ensure the booted kernel is signed, is standard (not UEK, realtime, ...), and has the same version as in RHEL.
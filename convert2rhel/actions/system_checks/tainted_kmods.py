@@ -18,7 +18,7 @@ __metaclass__ = type
 import logging
 
 from convert2rhel import actions
-from convert2rhel.utils import run_subprocess
+from convert2rhel.systeminfo import system_info
 
 
 logger = logging.getLogger(__name__)
@@ -29,6 +29,7 @@ LINK_PREVENT_KMODS_FROM_LOADING = "https://access.redhat.com/solutions/41278"
 
 class TaintedKmods(actions.Action):
     id = "TAINTED_KMODS"
+    parallel_safe = True
 
     def run(self):
         """Stop the conversion when a loaded tainted kernel module is detected.
@@ -41,8 +42,8 @@ class TaintedKmods(actions.Action):
         super(TaintedKmods, self).run()
 
         logger.task("Prepare: Check if loaded kernel modules are not tainted")
-        unsigned_modules, _ = run_subprocess(["grep", "(", "/proc/modules"])
-        module_names = "\n  ".join([mod.split(" ")[0] for mod in unsigned_modules.splitlines()])
+        unsigned_modules = [kmod.name for kmod in system_info.get_loaded_kmods() if kmod.taints]
+        module_names = "\n  ".join(unsigned_modules)
         if unsigned_modules:
             self.set_result(
                 status="ERROR",
@@ -19,18 +19,45 @@ import abc
 import logging
 import os
 import re
-import shutil
+import sys
+import threading
+import time
 
 import six
 
-from convert2rhel import utils
+from six.moves import queue
+
+from convert2rhel import journal, repackage, utils
+from convert2rhel.backup_store import file_store
 from convert2rhel.repo import get_hardcoded_repofiles_dir
 from convert2rhel.systeminfo import system_info
-from convert2rhel.utils import BACKUP_DIR, download_pkg, remove_orphan_folders, run_subprocess
+from convert2rhel.utils import BACKUP_DIR, download_pkg, remove_orphan_folders, report_failed_download, run_subprocess
 
 
 loggerinst = logging.getLogger(__name__)
 
+#: Resource of the changes to the rpm database: installed packages and imported GPG keys.
+RESOURCE_RPMDB = "rpmdb"
+
+#: Resource of the changes to the registration of the system with RHSM.
+RESOURCE_RHSM = "rhsm"
+
+#: How many changes are restored at the same time at most.
+MAX_PARALLEL_RESTORES = 4
+
+#: Seconds after which :func:`restore_concurrently` stops waiting for a restore.
+RESTORE_TIMEOUT = 60 * 60
+
+#: The message rpm prints for a failing scriptlet, e.g. "error: %preun(pkg-1.0-1.el8.x86_64) scriptlet failed".
+SCRIPTLET_FAILED_RE = re.compile(r"^(?:error|warning): %\w+\((\S+)\) scriptlet failed", re.MULTILINE)
+
+#: The epoch in the NEVRA printed by rpm, e.g. "-1:" in "pkg-1:1.0-1.el8.x86_64".
+EPOCH_RE = re.compile(r"-\d+:")
+
+
+class RestoreTimeoutError(Exception):
+    """Raised when restoring a change does not finish in time."""
+
 
 class ChangedRPMPackagesController(object):
     """Keep control of installed/removed RPM pkgs for backup/restore."""
@@ -38,14 +65,34 @@ class ChangedRPMPackagesController(object):
     def __init__(self):
         self.installed_pkgs = []
         self.removed_pkgs = []
+        # Journal entries of the packages about to be installed
+        self._install_entries = {}
+
+    def journal_pkgs_to_install(self, pkgs):
+        """Journal the packages which are about to be installed, before installing them.
+
+        If convert2rhel is killed during the installation, the rollback then
+        knows to remove the packages which got installed.
+
+        :param pkgs: The packages to install.
+        :type pkgs: list[str]
+        """
+        for pkg in pkgs:
+            self._install_entries[pkg] = rollback_journal.record(journal.INSTALLED_PKG, pkg=pkg)
 
     def track_installed_pkg(self, pkg):
         """Add a installed RPM pkg to the list of installed pkgs."""
+        if pkg in self._install_entries:
+            entry = self._install_entries.pop(pkg)
+        else:
+            entry = rollback_journal.record(journal.INSTALLED_PKG, pkg=pkg)
+        rollback_journal.complete(entry)
         self.installed_pkgs.append(pkg)
 
     def track_installed_pkgs(self, pkgs):
         """Track packages installed before the PONR to be able to remove them later (roll them back) if needed."""
-        self.installed_pkgs += pkgs
+        for pkg in pkgs:
+            self.track_installed_pkg(pkg)
 
     def backup_and_track_removed_pkg(
         self,
@@ -63,6 +110,7 @@ class ChangedRPMPackagesController(object):
             custom_releasever=custom_releasever,
             varsdir=varsdir,
         )
+        rollback_journal.record(journal.REMOVED_PKG, pkg=restorable_pkg.name, path=restorable_pkg.path)
         self.removed_pkgs.append(restorable_pkg)
 
     def _remove_installed_pkgs(self):
@@ -97,6 +145,9 @@ class ChangedRPMPackagesController(object):
         for pkg in pkgs_to_install:
             loggerinst.info("\t%s" % pkg)
 
+        nvras = [os.path.splitext(os.path.basename(path))[0] for path in pkgs_to_install]
+        self.journal_pkgs_to_install(nvras)
+
         cmd = cmd_param + pkgs_to_install
         output, ret_code = run_subprocess(cmd, print_output=False)
         if ret_code != 0:
@@ -108,9 +159,7 @@ class ChangedRPMPackagesController(object):
             loggerinst.warning("Couldn't install %s packages." % pkgs_as_str)
             return False
 
-        for path in pkgs_to_install:
-            nvra, _ = os.path.splitext(os.path.basename(path))
-            self.track_installed_pkg(nvra)
+        self.track_installed_pkgs(nvras)
 
         return True
 
@@ -147,7 +196,11 @@ class BackupController(object):
         if not isinstance(restorable, RestorableChange):
             raise TypeError("`%s` is not a RestorableChange object" % restorable)
 
+        entry = rollback_journal.record(
+            journal.RESTORABLE, name=type(restorable).__name__, data=restorable.to_journal()
+        )
         restorable.enable()
+        rollback_journal.complete(entry, data=restorable.to_journal())
 
         self._restorables.append(restorable)
 
@@ -186,8 +239,8 @@ class BackupController(object):
             raise IndexError("No backups to restore")
 
         # We want to restore in the reverse order the changes were enabled.
-        for restorable in reversed(restorables):
-            restorable.restore()
+        # Only the changes to the same resources have to wait for each other.
+        restore_concurrently([(restorable.restore, restorable.resources) for restorable in reversed(restorables)])
 
         # Reset the internal storage in case we want to use it again
         self._restorables = []
@@ -197,6 +250,20 @@ class BackupController(object):
 
         return restorables
 
+    @property
+    def resources(self):
+        """
+        The resources that :meth:`pop_all` changes.
+
+        :rtype: tuple[str] | None
+        """
+        resources = ()
+        for restorable in self._restorables:
+            if restorable.resources is None:
+                return None
+            resources += tuple(resource for resource in restorable.resources if resource not in resources)
+        return resources
+
 
 @six.add_metaclass(abc.ABCMeta)
 class RestorableChange(object):
@@ -204,6 +271,11 @@ class RestorableChange(object):
     Interface definition for types which can be restored.
     """
 
+    #: The resources the change is made to: :data:`RESOURCE_RPMDB`,
+    #: :data:`RESOURCE_RHSM` or paths.  None when the change can touch
+    #: anything, it is then restored once everything before it has been.
+    resources = None
+
     @abc.abstractmethod
     def __init__(self):
         self.enabled = False
@@ -223,10 +295,37 @@ class RestorableChange(object):
         """
         self.enabled = False
 
+    def to_journal(self):
+        """
+        Describe the change for the rollback journal.
+
+        It is called both before and after the change is enabled.
+
+        :returns: What :meth:`from_journal` needs to recreate the change, None
+            when the change can't be recreated.
+        :rtype: dict[str, Any] | None
+        """
+        return None
+
+    @classmethod
+    def from_journal(cls, data):
+        """
+        Recreate an enabled change from the rollback journal.
+
+        Restoring the change has to be safe even when it was not enabled.
+        convert2rhel may have been killed before enabling it.
+
+        :arg data: What :meth:`to_journal` returned.
+        :returns: The change, ready to be restored.
+        """
+        raise NotImplementedError("%s can't be recreated from the rollback journal" % cls.__name__)
+
 
 class RestorableRpmKey(RestorableChange):
     """Import a GPG key into rpm in a reversible fashion."""
 
+    resources = (RESOURCE_RPMDB,)
+
     def __init__(self, keyfile):
         """
         Setup a RestorableRpmKey to reflect the GPG key in a file.
@@ -273,24 +372,51 @@ class RestorableRpmKey(RestorableChange):
         )
 
     def restore(self):
-        """Ensure the rpmdb has or does not have the GPG key according to the state before we ran."""
+        """Ensure the rpmdb has or does not have the GPG key according to the state before we ran.
+
+        When it isn't known whether the key was in the rpmdb before, it is left there.
+        """
         if self.enabled and self.previously_installed is False:
             utils.run_subprocess(["rpm", "-e", "gpg-pubkey-%s" % self.keyid])
 
         super(RestorableRpmKey, self).restore()
 
+    def to_journal(self):
+        return {
+            "keyfile": self.keyfile,
+            "keyid": self.keyid,
+            "previously_installed": self.previously_installed,
+        }
+
+    @classmethod
+    def from_journal(cls, data):
+        # The key file may not be around anymore, so the key id comes from
+        # the journal instead of __init__().
+        restorable = cls.__new__(cls)
+        restorable.keyfile = data["keyfile"]
+        restorable.keyid = data["keyid"]
+        restorable.previously_installed = data["previously_installed"]
+        restorable.enabled = True
+        return restorable
+
 
 class RestorableFile(object):
     def __init__(self, filepath):
         self.filepath = filepath
 
+    @property
+    def resources(self):
+        """The resources that :meth:`restore` changes, see :func:`restore_concurrently`."""
+        # The path is None when the file wasn't found.
+        return (self.filepath,) if self.filepath else ()
+
     def backup(self):
         """Save current version of a file"""
         loggerinst.info("Backing up %s." % self.filepath)
         if os.path.isfile(self.filepath):
             try:
-                loggerinst.debug("Copying %s to %s." % (self.filepath, BACKUP_DIR))
-                shutil.copy2(self.filepath, BACKUP_DIR)
+                loggerinst.debug("Copying %s to %s." % (self.filepath, file_store.directory))
+                file_store.backup(self.filepath)
             except (OSError, IOError) as err:
                 # IOError for py2 and OSError for py3
                 loggerinst.critical("Error(%s): %s" % (err.errno, err.strerror))
@@ -299,17 +425,16 @@ class RestorableFile(object):
 
     def restore(self, rollback=True):
         """Restore a previously backed up file"""
-        backup_filepath = os.path.join(BACKUP_DIR, os.path.basename(self.filepath))
         if rollback:
             loggerinst.task("Rollback: Restore %s from backup" % self.filepath)
         else:
             loggerinst.info("Restoring %s from backup" % self.filepath)
 
-        if not os.path.isfile(backup_filepath):
+        if not file_store.is_backed_up(self.filepath):
             loggerinst.info("%s hasn't been backed up." % self.filepath)
             return
         try:
-            shutil.copy2(backup_filepath, self.filepath)
+            restored = file_store.restore(self.filepath)
         except (OSError, IOError) as err:
             # Do not call 'critical' which would halt the program. We are in
             # a rollback phase now and we want to rollback as much as possible.
@@ -317,7 +442,9 @@ class RestorableFile(object):
             loggerinst.warning("Error(%s): %s" % (err.errno, err.strerror))
             return
 
-        if rollback:
+        if not restored:
+            loggerinst.debug("File %s hasn't changed since the backup." % self.filepath)
+        elif rollback:
             loggerinst.info("File %s restored." % self.filepath)
         else:
             loggerinst.debug("File %s restored." % self.filepath)
@@ -375,6 +502,7 @@ class RestorablePackage(object):
                     set_releasever=set_releasever,
                     custom_releasever=custom_releasever,
                     varsdir=varsdir,
+                    report_failure=False,
                 )
             else:
                 if reposdir:
@@ -386,10 +514,31 @@ class RestorablePackage(object):
                     reposdir=reposdir,
                     custom_releasever=custom_releasever,
                     varsdir=varsdir,
+                    report_failure=False,
                 )
+
+            if not self.path:
+                self._repackage()
         else:
             loggerinst.warning("Can't access %s" % BACKUP_DIR)
 
+    def _repackage(self):
+        """Rebuild the package from the rpm database when it can't be downloaded.
+
+        The vendor may no longer publish the installed version of the package
+        or its repositories may not be reachable. The rebuilt package is not
+        signed, a rollback can't install it where rpm is set to verify the
+        signatures of packages.
+        """
+        self.path = repackage.repackage_pkgs([self.name], BACKUP_DIR).get(self.name)
+        if self.path:
+            loggerinst.warning(
+                "Couldn't download the %s package, backed it up by rebuilding it from the rpm database instead."
+                " The rebuilt package is not signed." % self.name
+            )
+        else:
+            report_failed_download(self.name)
+
 
 def remove_pkgs(
     pkgs_to_remove,
@@ -400,7 +549,12 @@ def remove_pkgs(
     custom_releasever=None,
     varsdir=None,
 ):
-    """Remove packages not heeding to their dependencies."""
+    """Remove packages not heeding to their dependencies.
+
+    The packages are removed in a single rpm transaction. Each of the packages
+    that can't be removed is reported, with ``critical`` set the conversion
+    then stops naming them.
+    """
     # NOTE(r0x0d): This function is tied to the class
     # ChangedRPMPackagesController and a couple of other places too, ideally, we
     # should decide if we want to use this function as an entrypoint or the
@@ -426,18 +580,87 @@ def remove_pkgs(
                 custom_releasever=custom_releasever,
                 varsdir=varsdir,
             )
-    for nevra in pkgs_to_remove:
-        # It's necessary to remove an epoch from the NEVRA string returned by yum because the rpm command does not
-        # handle the epoch well and considers the package we want to remove as not installed. On the other hand, the
-        # epoch in NEVRA returned by dnf is handled by rpm just fine.
-        nvra = remove_epoch_from_yum_nevra_notation(nevra)
+    # It's necessary to remove an epoch from the NEVRA string returned by yum because the rpm command does not
+    # handle the epoch well and considers the package we want to remove as not installed. On the other hand, the
+    # epoch in NEVRA returned by dnf is handled by rpm just fine.
+    nvras = [remove_epoch_from_yum_nevra_notation(nevra) for nevra in pkgs_to_remove]
+    for nvra in nvras:
         loggerinst.info("Removing package: %s" % nvra)
-        _, ret_code = run_subprocess(["rpm", "-e", "--nodeps", nvra])
-        if ret_code != 0:
-            if critical:
-                loggerinst.critical("Error: Couldn't remove %s." % nvra)
-            else:
-                loggerinst.warning("Couldn't remove %s." % nvra)
+
+    failed = _remove_pkgs_with_rpm(nvras)
+    if failed and critical:
+        loggerinst.critical("Error: Couldn't remove %s." % ", ".join(failed))
+
+    for nvra in failed:
+        loggerinst.warning("Couldn't remove %s." % nvra)
+
+
+def _remove_pkgs_with_rpm(nvras):
+    """Remove packages in a single rpm transaction, bisecting the packages when it fails.
+
+    Removing all the packages with one rpm call opens, locks and rewrites the
+    rpm database once instead of once per package. When the call fails, the
+    packages that are still installed are split in two halves that are
+    removed separately, until the packages that can't be removed are found.
+
+    A package whose scriptlet fails is reported as well, even when rpm has
+    erased it, e.g. after a failing %postun scriptlet.
+
+    :param nvras: The packages to remove.
+    :type nvras: list[str]
+    :return: The packages that couldn't be removed, in the order they were
+        passed.
+    :rtype: list[str]
+    """
+    output, ret_code = run_subprocess(["rpm", "-e", "--nodeps"] + nvras)
+    failed = _get_pkgs_with_failed_scriptlets(output, nvras)
+    if ret_code == 0 and not failed:
+        return []
+
+    # rpm doesn't remove anything when one of the packages is not installed.
+    not_installed = [nvra for nvra in nvras if "package %s is not installed" % nvra in output]
+    if not_installed:
+        remaining = [nvra for nvra in nvras if nvra not in not_installed]
+        not_installed.extend(_remove_pkgs_with_rpm(remaining) if remaining else [])
+        return [nvra for nvra in nvras if nvra in not_installed]
+
+    if ret_code == 0 or len(nvras) == 1:
+        return failed or nvras
+
+    # Otherwise the packages with a failing scriptlet have been reported, the
+    # packages that are still installed without a reason given are bisected.
+    remaining = [nvra for nvra in nvras if nvra not in failed]
+    if remaining:
+        output, _ = run_subprocess(["rpm", "-q"] + remaining, print_output=False)
+        remaining = [nvra for nvra in remaining if "package %s is not installed" % nvra not in output]
+    if len(remaining) > 1:
+        loggerinst.debug("Removing the %d remaining packages in smaller transactions." % len(remaining))
+        middle = len(remaining) // 2
+        remaining = _remove_pkgs_with_rpm(remaining[:middle]) + _remove_pkgs_with_rpm(remaining[middle:])
+
+    failed.extend(remaining)
+    return [nvra for nvra in nvras if nvra in failed]
+
+
+def _get_pkgs_with_failed_scriptlets(output, nvras):
+    """Get the packages reported by rpm to have a failing scriptlet.
+
+    rpm reports them as e.g. ``error: %preun(pkg-1:1.0-1.el8.x86_64) scriptlet
+    failed, exit status 1``, with the epoch the package has in the rpm database.
+
+    :param output: The output of the rpm command.
+    :type output: str
+    :param nvras: The packages passed to the rpm command.
+    :type nvras: list[str]
+    :return: The packages with a failing scriptlet, in the order they were
+        passed.
+    :rtype: list[str]
+    """
+    reported = set()
+    for match in SCRIPTLET_FAILED_RE.finditer(output):
+        reported.add(match.group(1))
+        reported.add(EPOCH_RE.sub("-", match.group(1)))
+    return [nvra for nvra in nvras if nvra in reported]
 
 
 def remove_epoch_from_yum_nevra_notation(package_nevra):
@@ -457,5 +680,229 @@ def remove_epoch_from_yum_nevra_notation(package_nevra):
     return package_nevra
 
 
+def _resources_overlap(resources, other_resources):
+    """Whether two sets of resources have a resource in common, None stands for every resource."""
+    if resources is None or other_resources is None:
+        return True
+
+    for resource in resources:
+        for other_resource in other_resources:
+            if resource == other_resource:
+                return True
+            # A directory contains the files under it.
+            if resource.startswith("/") and other_resource.startswith("/"):
+                shorter, longer = sorted((resource.rstrip("/") + "/", other_resource.rstrip("/") + "/"), key=len)
+                if longer.startswith(shorter):
+                    return True
+
+    return False
+
+
+class _RestoreLogBuffer(logging.Filter):
+    """
+    Hold back the log records of restores running on other threads.
+
+    Installed on the handlers of the convert2rhel logger, so that the output
+    of the restores is not interleaved.  The records are logged again with
+    :meth:`flush`.
+    """
+
+    def __init__(self):
+        super(_RestoreLogBuffer, self).__init__()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._records = {}
+        self._handlers = []
+
+    def install(self):
+        """Add the filter to the handlers of the convert2rhel logger and its parents."""
+        logger = logging.getLogger("convert2rhel")
+        while logger:
+            self._handlers.extend(logger.handlers)
+            logger = logger.parent if logger.propagate else None
+        for handler in self._handlers:
+            handler.addFilter(self)
+
+    def uninstall(self):
+        for handler in self._handlers:
+            handler.removeFilter(self)
+        self._handlers = []
+
+    def capture(self, index):
+        """Hold back the records logged from the current thread, for the restore at index."""
+        with self._lock:
+            self._records[index] = []
+        self._local.index = index
+
+    def flush(self, index):
+        """Log the records held back for the restore at index and stop holding them back."""
+        with self._lock:
+            records = self._records.pop(index, [])
+        for record in records:
+            logging.getLogger(record.name).handle(record)
+
+    def filter(self, record):
+        with self._lock:
+            records = self._records.get(getattr(self._local, "index", None))
+            if records is None:
+                return True
+            # Each of the handlers asks for the same record.
+            if not records or records[-1] is not record:
+                records.append(record)
+        return False
+
+
+def restore_concurrently(restores, max_workers=MAX_PARALLEL_RESTORES, timeout=RESTORE_TIMEOUT):
+    """
+    Restore changes, at the same time when they are made to different resources.
+
+    A restore starts once every restore before it in the list with a
+    resource in common has finished, so the changes to a resource are
+    restored in the order of the list.  A path as a resource includes what
+    is under it.  What the restores log is held back and logged in the
+    order of the list.
+
+    :param restores: Pairs of a function restoring a change and the
+        resources it changes, None when it can change anything.
+    :type restores: list[tuple[Callable[[], Any], tuple[str] | None]]
+    :param max_workers: How many restores run at the same time at most.
+    :type max_workers: int
+    :param timeout: Seconds after which a restore which has not finished is
+        given up on, None to wait for it as long as it takes.  It is left
+        running in the background.
+    :type timeout: float | None
+    :raises Exception: What the first failed restore raised.  No restore is
+        started after it fails and the running ones are waited for.
+    :raises RestoreTimeoutError: When a restore is given up on.
+    """
+    completed = queue.Queue()
+    pending = list(enumerate(restores))
+    running = {}
+    give_up_times = {}
+    finished = set()
+    next_to_log = 0
+    failure = None
+    log_buffer = _RestoreLogBuffer()
+
+    def run(index, restore):
+        log_buffer.capture(index)
+        try:
+            restore()
+        except BaseException:  # pylint: disable=broad-except
+            completed.put((index, sys.exc_info()))
+        else:
+            completed.put((index, None))
+
+    log_buffer.install()
+    try:
+        while pending or running:
+            if failure is None:
+                busy_resources = list(running.values())
+                for index, (restore, resources) in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if not any(_resources_overlap(resources, other_resources) for other_resources in busy_resources):
+                        pending.remove((index, (restore, resources)))
+                        running[index] = resources
+                        if timeout is not None:
+                            give_up_times[index] = time.time() + timeout
+                        thread = threading.Thread(target=run, args=(index, restore))
+                        # Don't keep convert2rhel from exiting when a restore hangs
+                        thread.daemon = True
+                        thread.start()
+                    busy_resources.append(resources)
+            elif not running:
+                break
+
+            try:
+                # On Python 2, a get() without a timeout cannot be interrupted
+                # with Ctrl-C so we poll instead.
+                index, exc_info = completed.get(timeout=1)
+            except queue.Empty:
+                now = time.time()
+                for index, give_up_time in list(give_up_times.items()):
+                    if give_up_time <= now:
+                        # It may still be changing its resources, no restore is started after it.
+                        del give_up_times[index]
+                        del running[index]
+                        finished.add(index)
+                        if failure is None:
+                            error = RestoreTimeoutError(
+                                "Restoring the changes did not finish within %g seconds." % timeout
+                            )
+                            failure = (RestoreTimeoutError, error, None)
+            else:
+                if index in running:
+                    del running[index]
+                    give_up_times.pop(index, None)
+                    finished.add(index)
+                    if exc_info and failure is None:
+                        failure = exc_info
+
+            while next_to_log in finished:
+                log_buffer.flush(next_to_log)
+                next_to_log += 1
+    finally:
+        log_buffer.uninstall()
+        # Also what was held back for the restores which didn't finish
+        for index in range(next_to_log, len(restores)):
+            log_buffer.flush(index)
+
+    if failure:
+        six.reraise(*failure)
+
+
+def load_journal(entries):
+    """Recreate the tracked changes from the entries of the rollback journal.
+
+    The installed and removed packages are added to
+    :data:`changed_pkgs_control` and the restorable changes to
+    :data:`backup_control`, in the order they were journaled, as if this run
+    had made the changes.
+
+    A change without a :data:`convert2rhel.journal.COMPLETED` entry may not
+    have been made.  Such a package is only removed if it is installed and a
+    restorable change is recreated from what was known before it was enabled.
+
+    :param entries: The entries, see :meth:`convert2rhel.journal.RollbackJournal.read`.
+    :type entries: list[dict[str, Any]]
+    :return: The options of the run that made the changes.
+    :rtype: dict[str, Any]
+    """
+    restorable_changes = dict((cls.__name__, cls) for cls in (RestorableRpmKey,))
+    completions = dict((entry["entry"], entry) for entry in entries if entry["type"] == journal.COMPLETED)
+    for index, entry in enumerate(entries):
+        if index == 0 or entry["type"] == journal.COMPLETED:
+            continue
+
+        if entry["type"] == journal.INSTALLED_PKG:
+            if index not in completions and not system_info.is_rpm_installed(entry["pkg"]):
+                loggerinst.debug("The installation of %s did not complete, it isn't installed." % entry["pkg"])
+                continue
+            changed_pkgs_control.installed_pkgs.append(entry["pkg"])
+        elif entry["type"] == journal.REMOVED_PKG:
+            restorable_pkg = RestorablePackage(entry["pkg"])
+            restorable_pkg.path = entry["path"]
+            changed_pkgs_control.removed_pkgs.append(restorable_pkg)
+        elif entry["type"] == journal.RESTORABLE:
+            if entry["name"] not in restorable_changes or entry["data"] is None:
+                loggerinst.warning("Unable to restore the %s change from the rollback journal." % entry["name"])
+                continue
+            data = entry["data"]
+            if index in completions:
+                data = completions[index].get("data", data)
+            else:
+                loggerinst.warning(
+                    "The %s change may not have been made by the interrupted run. Restoring it anyway." % entry["name"]
+                )
+            # Bypass push(), the change has been enabled by the interrupted run.
+            backup_control._restorables.append(restorable_changes[entry["name"]].from_journal(data))
+        else:
+            loggerinst.warning("Ignoring the unknown %s entry of the rollback journal." % entry["type"])
+
+    return entries[0].get("options", {})
+
+
 changed_pkgs_control = ChangedRPMPackagesController()  # pylint: disable=C0103
 backup_control = BackupController()
+rollback_journal = journal.RollbackJournal()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Content-addressed store of the files backed up before the conversion.
+
+The content of every backed up file is kept once, in an object named after
+its sha256 checksum, so that files with the same content share an object.
+Objects are reflinks of the backed up files when the filesystem supports
+them and the data isn't copied at all.
+
+The backups are also laid out under their original paths in
+:attr:`BackupStore.tree_dir`, as hard links to the objects, for the tools that
+need a directory of them like the ``reposdir`` of yum.  The original files
+are never hard linked to the store: they are changed in place during the
+conversion and their backup would change with them.
+
+An index maps each backed up path to its object, mode, owner and
+modification time.  It is written with every backup so that
+``convert2rhel rollback --resume`` finds the backups of an interrupted run.
+"""
+
+__metaclass__ = type
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from convert2rhel import utils
+
+
+loggerinst = logging.getLogger(__name__)
+
+#: Directory of the store.
+STORE_DIR = os.path.join(utils.BACKUP_DIR, "store")
+
+#: The FICLONE ioctl from linux/fs.h, shares the data of a file with another one.
+FICLONE = 0x40049409
+
+#: Version of the format of the index.
+_INDEX_FORMAT = 1
+
+
+def _get_checksum(path):
+    checksum = hashlib.sha256()
+    with open(path, "rb") as handler:
+        for chunk in iter(lambda: handler.read(1024 * 1024), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def _clone(source, destination):
+    """
+    Copy the content of a file, as a reflink when the filesystem supports it.
+
+    :param source: The file to copy.
+    :type source: str
+    :param destination: The copy.  Overwritten when it exists.
+    :type destination: str
+    :returns: Whether the copy is a reflink.
+    :rtype: bool
+    """
+    with open(source, "rb") as source_handler:
+        with open(destination, "wb") as destination_handler:
+            try:
+                fcntl.ioctl(destination_handler.fileno(), FICLONE, source_handler.fileno())
+                return True
+            except (IOError, OSError):
+                # The filesystem doesn't support reflinks or the files are on
+                # different filesystems.
+                shutil.copyfileobj(source_handler, destination_handler, 1024 * 1024)
+    return False
+
+
+class BackupStore:
+    """
+    Backups of files, stored by content.
+
+    :param directory: Directory of the store.  Defaults to :data:`STORE_DIR`.
+    :type directory: str | None
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+
+    @property
+    def directory(self):
+        return self._directory if self._directory else STORE_DIR
+
+    @property
+    def tree_dir(self):
+        """Directory in which the backups are laid out under their original paths."""
+        return os.path.join(self.directory, "tree")
+
+    @property
+    def _index_file(self):
+        return os.path.join(self.directory, "index.json")
+
+    def _get_object_path(self, checksum):
+        return os.path.join(self.directory, "objects", checksum[:2], checksum)
+
+    def _read_index(self):
+        try:
+            with open(self._index_file) as handler:
+                data = json.load(handler)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        if data.get("format") != _INDEX_FORMAT:
+            return {}
+
+        return data.get("files", {})
+
+    def _write_index(self, files):
+        # Replace the index atomically, a torn index would lose every backup.
+        partial_path = self._index_file + ".partial"
+        utils.write_json_object_to_file(partial_path, {"format": _INDEX_FORMAT, "files": files})
+        os.rename(partial_path, self._index_file)
+
+    def get_backup_path(self, path):
+        """
+        Get the path of the backup of a file in :attr:`tree_dir`.
+
+        :param path: The backed up file.
+        :type path: str
+        :rtype: str
+        """
+        return os.path.join(self.tree_dir, os.path.abspath(path).lstrip("/"))
+
+    def is_backed_up(self, path):
+        """Whether a file has been backed up."""
+        return os.path.abspath(path) in self._read_index()
+
+    def get_backed_up_paths(self, directory):
+        """
+        Get the backed up files of a directory.
+
+        :param directory: The directory the files are in.  Files in its
+            subdirectories aren't included.
+        :type directory: str
+        :returns: The paths of the files, sorted.
+        :rtype: list[str]
+        """
+        directory = os.path.abspath(directory)
+        return sorted(path for path in self._read_index() if os.path.dirname(path) == directory)
+
+    def backup(self, path):
+        """
+        Back up a file.
+
+        The backup of a file that was backed up before is replaced.
+
+        :param path: The file to back up.
+        :type path: str
+        :returns: The checksum of the content of the file.
+        :rtype: str
+        :raises IOError, OSError: When the file can't be backed up.
+        """
+        path = os.path.abspath(path)
+        checksum = _get_checksum(path)
+        object_path = self._get_object_path(checksum)
+
+        if os.path.exists(object_path):
+            loggerinst.debug("The content of %s is already in the backup store." % path)
+        else:
+            utils.mkdir_p(os.path.dirname(object_path))
+            partial_path = object_path + ".partial"
+            if not _clone(path, partial_path):
+                loggerinst.debug("Reflinks are not supported, copied %s to the backup store." % path)
+            os.chmod(partial_path, 0o600)
+            os.rename(partial_path, object_path)
+
+        backup_path = self.get_backup_path(path)
+        utils.mkdir_p(os.path.dirname(backup_path))
+        if os.path.lexists(backup_path):
+            os.remove(backup_path)
+        try:
+            os.link(object_path, backup_path)
+        except OSError:
+            shutil.copyfile(object_path, backup_path)
+
+        stat = os.stat(path)
+        files = self._read_index()
+        files[path] = {
+            "sha256": checksum,
+            "mode": stat.st_mode & 0o7777,
+            "uid": stat.st_uid,
+            "gid": stat.st_gid,
+            "mtime": stat.st_mtime,
+        }
+        self._write_index(files)
+        return checksum
+
+    def restore(self, path):
+        """
+        Put the backed up content, mode, owner and modification time of a file back.
+
+        The file is left alone when its content matches the backup.  The
+        backup is kept, the file can be restored again.
+
+        :param path: The backed up file.
+        :type path: str
+        :returns: Whether the file was changed.
+        :rtype: bool
+        :raises KeyError: When the file hasn't been backed up.
+        :raises IOError, OSError: When the file can't be restored.
+        """
+        path = os.path.abspath(path)
+        backup = self._read_index()[path]
+
+        if os.path.isfile(path) and _get_checksum(path) == backup["sha256"]:
+            return False
+
+        # Write through symbolic links like /etc/system-release, the rename
+        # would replace the link itself.
+        target = os.path.realpath(path)
+        utils.mkdir_p(os.path.dirname(target))
+        # Restore next to the file and rename, so that the file is never left
+        # half written.
+        partial_path = target + ".convert2rhel-restore"
+        try:
+            _clone(self._get_object_path(backup["sha256"]), partial_path)
+            os.chown(partial_path, backup["uid"], backup["gid"])
+            os.chmod(partial_path, backup["mode"])
+            os.utime(partial_path, (backup["mtime"], backup["mtime"]))
+            os.rename(partial_path, target)
+        except (IOError, OSError):
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        return True
+
+    def clear(self):
+        """Remove every backup."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+#: The store of the backups taken by convert2rhel.
+file_store = BackupStore()
@@ -51,7 +51,7 @@ class Breadcrumbs(object):
         # Record what type of convert2rhel run we are performing.  Valid options right now are convert or analyze.
         self.activity = "null"
         # Version of the JSON schema of the breadcrumbs file. To be changed when the JSON schema changes.
-        self.version = "1"
+        self.version = "2"
         # The convert2rhel command as executed by the user including all the options.
         self.executed = "null"
         # NEVRA = Name, Epoch, Version, Release, Architecture
@@ -68,6 +68,8 @@ class Breadcrumbs(object):
         self.env = {}
         # Run ID is to be populated by Leapp only. The value should be null in the json generated by convert2rhel.
         self.run_id = "null"
+        # What running each of the pre-conversion actions cost (wall clock and CPU time, peak RSS, subprocesses).
+        self.action_metrics = {}
         # The convert2rhel package object from the yum/dnf python API for further information extraction.
         self._pkg_object = None
         # Flag to inform the user about DISABLE_TELEMETRY. If not informed, we shouldn't save rhsm_facts.
@@ -183,8 +185,20 @@ class Breadcrumbs(object):
             "target_os": self.target_os,
             "env": self.env,
             "run_id": self.run_id,
+            "action_metrics": self.action_metrics,
         }
 
+    def set_action_metrics(self, results):
+        """Record what running each of the pre-conversion actions cost.
+
+        :param results: Results dictionary as returned by
+            :func:`convert2rhel.actions.run_actions`
+        :type results: Mapping
+        """
+        self.action_metrics = dict(
+            (action_id, result["metrics"]) for action_id, result in results.items() if result.get("metrics")
+        )
+
     def _save_migration_results(self):
         """Write the results of the breadcrumbs to the migration-results file."""
         loggerinst.info("Writing breadcrumbs to '%s'.", MIGRATION_RESULTS_FILE)
@@ -202,7 +216,11 @@ class Breadcrumbs(object):
             # are only writable by root
             utils.mkdir_p(RHSM_CUSTOM_FACTS_FOLDER)
 
-        data = utils.flatten(dictionary=self.data, parent_key=RHSM_CUSTOM_FACTS_NAMESPACE)
+        # The per-action metrics are only useful for troubleshooting a single
+        # run. They would bloat the facts uploaded to the subscription service.
+        data = self.data
+        del data["action_metrics"]
+        data = utils.flatten(dictionary=data, parent_key=RHSM_CUSTOM_FACTS_NAMESPACE)
         loggerinst.info("Writing RHSM custom facts to '%s'.", RHSM_CUSTOM_FACTS_FILE)
         # We don't need to use `_write_obj_to_array_json` function here, because
         # we only care about dumping the facts without having multiple copies of
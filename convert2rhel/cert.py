@@ -25,10 +25,13 @@ from convert2rhel import utils
 
 loggerinst = logging.getLogger(__name__)
 
+#: Directory in which subscription-manager looks for the certificate of the installed product.
+TARGET_CERT_DIR = "/etc/pki/product-default/"
+
 
 class SystemCert(object):
     def __init__(self):
-        self._target_cert_dir = "/etc/pki/product-default/"
+        self._target_cert_dir = TARGET_CERT_DIR
         self._cert_filename, self._source_cert_dir = self._get_cert()
         self._source_cert_path = self._get_source_cert_path()
         self._target_cert_path = self._get_target_cert_path()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Journal of the changes that a rollback needs to undo.
+
+The controllers in :mod:`convert2rhel.backup` keep the changes made before the
+point of no return in memory.  So that a rollback is still possible when
+convert2rhel is killed, each change is also appended to :data:`JOURNAL_FILE`
+and synced to the disk before it is made.  Once the change has been made, a
+:data:`COMPLETED` entry pointing back to it is appended.  A change without one
+may or may not have been made when convert2rhel was killed.
+
+The journal exists only while the changes can be rolled back: it is started
+at the beginning of a run and removed once the changes are rolled back or the
+point of no return is passed.  A journal left behind belongs to a run that
+was interrupted; ``convert2rhel rollback --resume`` replays it into the
+controllers and rolls the changes back.
+"""
+
+__metaclass__ = type
+
+import json
+import logging
+import os
+
+from convert2rhel import __version__, utils
+
+
+loggerinst = logging.getLogger(__name__)
+
+#: File the changes are journaled to.
+JOURNAL_FILE = os.path.join(utils.TMP_DIR, "rollback-journal")
+
+#: Version of the format of :data:`JOURNAL_FILE`.
+_JOURNAL_FORMAT = 1
+
+#: Entry starting the journal, with the options the rollback depends on.
+START = "start"
+#: A package about to be installed by convert2rhel.
+INSTALLED_PKG = "installed-pkg"
+#: A package removed by convert2rhel, with the path to its backup.
+REMOVED_PKG = "removed-pkg"
+#: A change about to be pushed to :data:`convert2rhel.backup.backup_control`.
+RESTORABLE = "restorable"
+#: The change of an earlier entry has been made.  ``entry`` is the index of
+#: that entry in :meth:`RollbackJournal.read`.
+COMPLETED = "completed"
+
+
+class JournalError(Exception):
+    """Raised when the journal can't be read."""
+
+
+class RollbackJournal:
+    """
+    Append-only journal of the changes to roll back.
+
+    Every entry is a JSON object on its own line.  Nothing is journaled until
+    :meth:`start` is called.
+
+    :param path: File of the journal.  Defaults to :data:`JOURNAL_FILE`.
+    :type path: str | None
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self.active = False
+        self._entry_count = 0
+
+    @property
+    def path(self):
+        return self._path if self._path else JOURNAL_FILE
+
+    def exists(self):
+        """Whether a journal was left behind by a run of convert2rhel."""
+        return os.path.exists(self.path)
+
+    def start(self, **options):
+        """
+        Start a new journal.
+
+        :param options: The options of the run that the rollback depends on.
+        :raises JournalError: When the journal of an interrupted run exists.
+        """
+        if self.exists():
+            raise JournalError("The changes of an interrupted run of convert2rhel have not been rolled back.")
+
+        utils.mkdir_p(os.path.dirname(self.path))
+        self.active = True
+        self._entry_count = 0
+        self.record(START, format=_JOURNAL_FORMAT, convert2rhel_version=__version__, options=options)
+        # Make the new file itself durable, not only its content.
+        directory = os.open(os.path.dirname(self.path), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def record(self, entry_type, **data):
+        """
+        Append an entry and sync it to the disk.
+
+        Does nothing when the journal hasn't been started.
+
+        :param entry_type: The type of the entry, like :data:`INSTALLED_PKG`.
+        :type entry_type: str
+        :param data: The content of the entry.  Has to be serializable to JSON.
+        :returns: The index of the entry in :meth:`read`, None when the
+            journal hasn't been started.
+        :rtype: int | None
+        """
+        if not self.active:
+            return None
+
+        data["type"] = entry_type
+        with open(self.path, "a") as handler:
+            handler.write(json.dumps(data, sort_keys=True) + "\n")
+            handler.flush()
+            os.fsync(handler.fileno())
+
+        self._entry_count += 1
+        return self._entry_count - 1
+
+    def complete(self, entry, **data):
+        """
+        Record that the change of an entry has been made.
+
+        :param entry: The index of the entry, as returned by :meth:`record`.
+        :type entry: int | None
+        :param data: More content of the entry, like the state of the change
+            once it has been made.
+        """
+        if entry is None:
+            return
+
+        self.record(COMPLETED, entry=entry, **data)
+
+    def stop(self):
+        """Stop journaling the changes, the journal is kept."""
+        self.active = False
+
+    def remove(self):
+        """Stop journaling the changes and remove the journal."""
+        self.active = False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def read(self):
+        """
+        Read the entries of the journal.
+
+        A last line that is incomplete, because convert2rhel was killed while
+        writing it, is ignored: the change it belongs to hasn't been made yet.
+
+        :returns: The entries, :data:`START` first, in the order they were
+            recorded.
+        :rtype: list[dict[str, Any]]
+        :raises JournalError: When the journal can't be read or belongs to a
+            different version of convert2rhel.
+        """
+        try:
+            with open(self.path) as handler:
+                lines = handler.read().splitlines()
+        except (IOError, OSError) as e:
+            raise JournalError("Unable to read the rollback journal %s: %s" % (self.path, e))
+
+        entries = []
+        for number, line in enumerate(lines):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if number == len(lines) - 1:
+                    loggerinst.debug("Ignoring the incomplete last entry of the rollback journal.")
+                    break
+                raise JournalError("The rollback journal %s is corrupted at line %d." % (self.path, number + 1))
+
+        if not entries or entries[0].get("type") != START or entries[0].get("format") != _JOURNAL_FORMAT:
+            raise JournalError("The rollback journal %s is not in a known format." % self.path)
+
+        if entries[0].get("convert2rhel_version") != __version__:
+            raise JournalError(
+                "The rollback journal %s was written by convert2rhel %s, it needs to be rolled back with that version."
+                % (self.path, entries[0].get("convert2rhel_version"))
+            )
+
+        return entries
@@ -17,8 +17,9 @@
 
 import logging
 import os
+import sys
 
-from convert2rhel import actions, backup, breadcrumbs, cert, checks, grub
+from convert2rhel import actions, backup, backup_store, breadcrumbs, cert, checks, grub, journal
 from convert2rhel import logger as logger_module
 from convert2rhel import pkghandler, pkgmanager, redhatrelease, repo, subscription, systeminfo, toolopts, utils
 from convert2rhel.actions import report
@@ -68,6 +69,9 @@ def main():
     # the tool will not run if not executed under the root user
     utils.require_root()
 
+    if sys.argv[1:2] == [toolopts.ROLLBACK_COMMAND]:
+        return resume_rollback()
+
     process_phase = ConversionPhase.INIT
 
     # initialize logging
@@ -80,15 +84,20 @@ def main():
         perform_boilerplate()
 
         gather_system_info()
-        prepare_system()
 
         # Note: set pre_conversion_results before changing to the next phase so
         # we don't fail in case rollback is triggered during
         # actions.run_actions() (either from a bug or from the user hitting
         # Ctrl-C)
         pre_conversion_results = None
+        # The journal of an interrupted run has to be found before anything on
+        # the system is changed, preparing the system already changes the
+        # version locks.
+        start_rollback_journal()
         process_phase = ConversionPhase.PRE_PONR_CHANGES
+        prepare_system()
         pre_conversion_results = actions.run_actions()
+        breadcrumbs.breadcrumbs.set_action_metrics(pre_conversion_results)
 
         if toolopts.tool_opts.activity == "analysis":
             process_phase = ConversionPhase.ANALYZE_EXIT
@@ -104,6 +113,7 @@ def main():
             pre_conversion_results,
             include_all_reports=False,
             with_colors=logger_module.should_disable_color_output(),
+            include_metrics=toolopts.tool_opts.debug,
         )
 
         loggerinst.warning("********************************************************")
@@ -117,6 +127,8 @@ def main():
         utils.ask_to_continue()
 
         process_phase = ConversionPhase.POST_PONR_CHANGES
+        # The changes can't be rolled back anymore
+        backup.rollback_journal.remove()
         post_ponr_changes()
         loggerinst.info("\nConversion successful!\n")
 
@@ -132,6 +144,7 @@ def main():
             pre_conversion_results,
             include_all_reports=True,
             with_colors=logger_module.should_disable_color_output(),
+            include_metrics=toolopts.tool_opts.debug,
         )
         return 0
 
@@ -158,6 +171,7 @@ def main():
                     pre_conversion_results,
                     include_all_reports=(toolopts.tool_opts.activity == "analysis"),
                     with_colors=logger_module.should_disable_color_output(),
+                    include_metrics=toolopts.tool_opts.debug,
                 )
         elif process_phase == ConversionPhase.POST_PONR_CHANGES:
             # After the process of subscription is done and the mass update of
@@ -225,8 +239,16 @@ def prepare_system():
     loggerinst.task("Prepare: Clear YUM/DNF version locks")
     pkghandler.clear_versionlock()
 
-    loggerinst.task("Prepare: Clean yum cache metadata")
-    pkgmanager.clean_yum_metadata()
+    loggerinst.task("Prepare: Expire yum cache metadata")
+    pkgmanager.expire_yum_metadata()
+
+
+def start_rollback_journal():
+    """Journal the changes from now on, so that they can be rolled back even when convert2rhel gets killed."""
+    try:
+        backup.rollback_journal.start(keep_rhsm=toolopts.tool_opts.keep_rhsm)
+    except journal.JournalError as e:
+        loggerinst.critical("%s Run 'convert2rhel rollback --resume' to roll them back first." % e)
 
 
 #
@@ -292,15 +314,41 @@ def rollback_changes():
     """Perform a rollback of changes made during conversion."""
 
     loggerinst.warning("Abnormal exit! Performing rollback ...")
-    subscription.rollback()
-    backup.changed_pkgs_control.restore_pkgs()
-    repo.restore_varsdir()
-    repo.restore_yum_repos()
-    redhatrelease.system_release_file.restore()
-    redhatrelease.os_release_file.restore()
-    pkghandler.versionlock_file.restore()
+    # The packages reinstalled by the rollback are tracked as installed ones,
+    # they must not be removed when an interrupted rollback is resumed.
+    backup.rollback_journal.stop()
+    # Changes to different resources are restored at the same time, see
+    # backup.restore_concurrently().
+    backup.restore_concurrently(
+        [
+            # Unregistering runs subscription-manager, which the packages
+            # installed by convert2rhel are removed with.
+            (subscription.rollback, (backup.RESOURCE_RHSM, backup.RESOURCE_RPMDB)),
+            # Reinstalling the removed packages writes their files, anywhere
+            # on the system, the files are restored after it.
+            (backup.changed_pkgs_control.restore_pkgs, (backup.RESOURCE_RPMDB, "/")),
+            (repo.restore_varsdir, (repo.DEFAULT_YUM_VARS_DIR, repo.DEFAULT_DNF_VARS_DIR)),
+            (repo.restore_yum_repos, (repo.DEFAULT_YUM_REPOFILE_DIR,)),
+            (redhatrelease.system_release_file.restore, redhatrelease.system_release_file.resources),
+            (redhatrelease.os_release_file.restore, redhatrelease.os_release_file.resources),
+            (pkghandler.versionlock_file.restore, pkghandler.versionlock_file.resources),
+            (_remove_system_cert, (cert.TARGET_CERT_DIR,)),
+            (_restore_backup_control, backup.backup_control.resources),
+        ]
+    )
+
+    backup.rollback_journal.remove()
+    # The backups of the files are kept until here so that an interrupted
+    # rollback can be resumed, a later run must not restore them.
+    backup_store.file_store.clear()
+
+
+def _remove_system_cert():
     system_cert = cert.SystemCert()
     system_cert.remove()
+
+
+def _restore_backup_control():
     try:
         backup.backup_control.pop_all()
     except IndexError as e:
@@ -308,3 +356,32 @@ def rollback_changes():
             loggerinst.info("During rollback there were no backups to restore")
         else:
             raise
+
+
+def resume_rollback():
+    """Roll back the changes of a run of convert2rhel that was interrupted, as recorded in its rollback journal."""
+    initialize_logger("convert2rhel.log", logger_module.LOG_DIR)
+    toolopts.RollbackCLI()
+
+    try:
+        if not backup.rollback_journal.exists():
+            loggerinst.info("No interrupted run of convert2rhel found, there is nothing to roll back.")
+            return 0
+
+        loggerinst.task("Rollback: Read the rollback journal")
+        try:
+            options = backup.load_journal(backup.rollback_journal.read())
+        except journal.JournalError as e:
+            loggerinst.critical(str(e))
+        toolopts.tool_opts.keep_rhsm = options.get("keep_rhsm", False)
+
+        loggerinst.task("Prepare: Gather system information")
+        systeminfo.system_info.resolve_system_info()
+        rollback_changes()
+    except (Exception, SystemExit, KeyboardInterrupt):
+        utils.log_traceback(toolopts.tool_opts.debug)
+        loggerinst.warning("The rollback did not complete. Run 'convert2rhel rollback --resume' again to finish it.")
+        return 1
+
+    loggerinst.info("\nRollback of the interrupted run of convert2rhel finished.\n")
+    return 0
@@ -19,12 +19,13 @@ import glob
 import logging
 import os
 import re
+import threading
 
 from collections import namedtuple
 
 import rpm
 
-from convert2rhel import backup, pkgmanager, utils
+from convert2rhel import backup, pkgmanager, staging, utils
 from convert2rhel.backup import RestorableFile, RestorableRpmKey, remove_pkgs
 from convert2rhel.systeminfo import system_info
 from convert2rhel.toolopts import tool_opts
@@ -37,6 +38,22 @@ loggerinst = logging.getLogger(__name__)
 MAX_YUM_CMD_CALLS = 3
 
 
+#: Files of the rpm database that change when packages are installed or
+#: removed, depending on the backend the rpm database uses.
+RPMDB_FILES = (
+    "/var/lib/rpm/Packages",
+    "/var/lib/rpm/Packages.db",
+    "/var/lib/rpm/rpmdb.sqlite",
+    "/var/lib/rpm/rpmdb.sqlite-wal",
+)
+
+#: dnf bases with the installed packages loaded, by metadata profile, along
+#: with the state of the rpm database they were loaded from.  See
+#: :func:`_get_installed_pkgs_base_dnf`.
+_installed_pkgs_bases = {}
+# Actions running on different threads query the installed packages
+_installed_pkgs_bases_lock = threading.Lock()
+
 _VERSIONLOCK_FILE_PATH = "/etc/yum/pluginconf.d/versionlock.list"  # This file is used by the dnf plugin as well
 versionlock_file = RestorableFile(_VERSIONLOCK_FILE_PATH)  # pylint: disable=C0103
 
@@ -277,6 +294,7 @@ def _get_installed_pkg_objects_yum(name=None, version=None, release=None, arch=N
     yum_base = pkgmanager.YumBase()
     # Disable plugins (when kept enabled yum outputs useless text every call)
     yum_base.doConfigSetup(init_plugins=False)
+    pkgmanager.set_metadata_profile(yum_base, pkgmanager.METADATA_SYSTEM)
 
     if name:
         pattern = name
@@ -297,37 +315,79 @@ def _get_installed_pkg_objects_yum(name=None, version=None, release=None, arch=N
     return installed_packages
 
 
-def _get_installed_pkg_objects_dnf(name=None, version=None, release=None, arch=None):
+def _get_rpmdb_stamp():
+    """Identify the state of the rpm database without reading it.
+
+    :return: The path, modification time, size and inode of each of the
+        :data:`RPMDB_FILES` that exist.
+    :rtype: tuple[tuple[str, float, int, int]]
+    """
+    stamp = []
+    for path in RPMDB_FILES:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stamp.append((path, stat.st_mtime, stat.st_size, stat.st_ino))
+
+    return tuple(stamp)
+
+
+def _get_installed_pkgs_base_dnf(profile=pkgmanager.METADATA_SYSTEM):
+    """Return a dnf base with the installed packages loaded in its sack.
+
+    Loading the system repository is the slowest part of querying the
+    installed packages, so the base is reused for as long as the rpm database
+    doesn't change.  The caller has to hold :data:`_installed_pkgs_bases_lock`
+    while using the base.
+
+    :param profile: The metadata profile to set up the base with, see
+        :func:`convert2rhel.pkgmanager.set_metadata_profile`.
+    :type profile: str
+    :rtype: dnf.Base
+    """
+    stamp = _get_rpmdb_stamp()
+    cached = _installed_pkgs_bases.get(profile)
+    if cached and stamp and cached[0] == stamp:
+        return cached[1]
+
     dnf_base = pkgmanager.Base()
     dnf_base.conf.module_platform_id = "platform:el8"
+    pkgmanager.set_metadata_profile(dnf_base, profile)
     dnf_base.fill_sack(load_system_repo=True, load_available_repos=False)
-    query = dnf_base.sack.query()
-    installed = query.installed()
+    _installed_pkgs_bases[profile] = (stamp, dnf_base)
+    return dnf_base
 
-    if name:
-        # Appending the kwargs here dynamically based if they exist or not
-        # because the query filter cannot handle properly the situation where
-        # any of those parameters are "empty". Basically, dnf thinks that if you
-        # specified an empty string in any of those parameters, then it should
-        # "match" exactly that, and then to avoid extra logic to play with
-        # `__glob`, `__neq` and so on, it's easier to build the `kwargs`
-        # dinamycally.
-        kwargs = {}
 
-        if version:
-            kwargs.update({"version__glob": version})
+def _get_installed_pkg_objects_dnf(name=None, version=None, release=None, arch=None):
+    with _installed_pkgs_bases_lock:
+        query = _get_installed_pkgs_base_dnf(pkgmanager.METADATA_SYSTEM).sack.query()
+        installed = query.installed()
 
-        if release:
-            kwargs.update({"release__glob": release})
+        if name:
+            # Appending the kwargs here dynamically based if they exist or not
+            # because the query filter cannot handle properly the situation where
+            # any of those parameters are "empty". Basically, dnf thinks that if you
+            # specified an empty string in any of those parameters, then it should
+            # "match" exactly that, and then to avoid extra logic to play with
+            # `__glob`, `__neq` and so on, it's easier to build the `kwargs`
+            # dinamycally.
+            kwargs = {}
 
-        if arch:
-            kwargs.update({"arch__glob": arch})
+            if version:
+                kwargs.update({"version__glob": version})
+
+            if release:
+                kwargs.update({"release__glob": release})
+
+            if arch:
+                kwargs.update({"arch__glob": arch})
 
-        # name provides "shell-style wildcard match" per
-        # https://dnf.readthedocs.io/en/latest/api_queries.html#dnf.query.Query.filter
-        installed = installed.filter(name__glob=name, **kwargs)
+            # name provides "shell-style wildcard match" per
+            # https://dnf.readthedocs.io/en/latest/api_queries.html#dnf.query.Query.filter
+            installed = installed.filter(name__glob=name, **kwargs)
 
-    return list(installed)
+        return list(installed)
 
 
 def get_third_party_pkgs():
@@ -684,6 +744,8 @@ def install_rhel_kernel():
     later on.
     """
     loggerinst.info("Installing RHEL kernel ...")
+    # Put the staged kernel package, if any, in the yum/dnf cache
+    staging.restore(staging.KERNEL)
     output, ret_code = call_yum_cmd(command="install", args=["kernel"])
 
     if ret_code != 0:
@@ -1015,6 +1077,9 @@ def _get_packages_to_update_yum():
     """
     all_packages = []
     base = pkgmanager.YumBase()
+    # Comparing the versions needs only the primary metadata, yum doesn't need
+    # to download the updateinfo and the comps.
+    pkgmanager.set_metadata_profile(base, pkgmanager.METADATA_PRIMARY)
     packages = base.doPackageLists(pkgnarrow="updates")
     for package in packages.updates:
         all_packages.append(package.name)
@@ -1047,6 +1112,9 @@ def _get_packages_to_update_dnf(reposdir):
     # https://bugzilla.redhat.com/show_bug.cgi?id=1920735#c2
     base.conf.read(priority=pkgmanager.conf.PRIO_MAINCONFIG)
     base.conf.substitutions.update_from_etc(installroot=base.conf.installroot, varsdir=base.conf.varsdir)
+    # Resolving the upgrades may need the packages providing a file, dnf
+    # doesn't load the filelists on demand.
+    pkgmanager.set_metadata_profile(base, pkgmanager.METADATA_FILELISTS)
     base.read_all_repos()
     base.fill_sack()
 
@@ -52,6 +52,52 @@ except ImportError as e:
 
     TYPE = "dnf"
 
+#: Metadata profiles, the minimum repository metadata needed by a yum or dnf
+#: base.  See :func:`set_metadata_profile`.
+#:
+#: Only the rpm database of the system, no repository metadata.
+METADATA_SYSTEM = "system"
+#: The primary metadata of the repositories: the names, versions, requires
+#: and provides of the packages.
+METADATA_PRIMARY = "primary"
+#: The primary metadata and the lists of files in the packages.
+METADATA_FILELISTS = "filelists"
+
+# The yum mdpolicy that downloads the metadata of each profile up front.
+_YUM_MDPOLICIES = {
+    METADATA_SYSTEM: "instant",
+    METADATA_PRIMARY: "group:primary",
+    METADATA_FILELISTS: "group:main",
+}
+
+
+def set_metadata_profile(base, profile):
+    """Limit the repository metadata that a yum or dnf base downloads and loads.
+
+    Has to be called before the repositories of the base are set up.  The
+    profile is the minimum the base needs, the package managers may still
+    load more when they need it: yum imports the filelists on demand when it
+    resolves a dependency on a file, and older dnf versions always load them.
+
+    With :data:`METADATA_SYSTEM` the caller is expected not to load the
+    repositories at all, for instance by passing load_available_repos=False
+    to dnf's fill_sack().
+
+    :param base: The yum.YumBase or dnf.Base instance.
+    :param profile: One of :data:`METADATA_SYSTEM`, :data:`METADATA_PRIMARY`
+        or :data:`METADATA_FILELISTS`.
+    :type profile: str
+    """
+    if TYPE == "yum":
+        base.conf.mdpolicy = _YUM_MDPOLICIES[profile]
+        return
+
+    metadata_types = set(base.conf.optional_metadata_types)
+    metadata_types.discard("filelists")
+    if profile == METADATA_FILELISTS:
+        metadata_types.add("filelists")
+    base.conf.optional_metadata_types = sorted(metadata_types)
+
 
 def create_transaction_handler():
     """Create a new instance of TransactionHandler class.
@@ -80,12 +126,18 @@ def create_transaction_handler():
     return DnfTransactionHandler()
 
 
-def clean_yum_metadata():
-    """Remove cached metadata from yum.
+def expire_yum_metadata():
+    """Make yum/dnf check that the cached metadata of the repositories is up to date.
 
     This is to make sure that Convert2RHEL works with up-to-date data from repositories before, for instance, querying
     whether the system has the latest package versions installed, or before checking whether enabled repositories have
     accessible URLs.
+
+    The cached metadata is marked as expired instead of being removed. The first yum, repoquery or dnf invocation that
+    uses a repository afterwards downloads only its repomd.xml and compares the checksums listed there with the cached
+    metadata. Only the metadata that changed is downloaded again. After that check the metadata of the repository is
+    fresh for its whole metadata_expire period, so the following invocations during the run share the cached metadata
+    instead of downloading it again.
     """
     # We are using run_subprocess here as an alternative to call_yum_cmd
     # which doesn't apply the correct --enablerepos option because if we call this
@@ -93,15 +145,15 @@ def clean_yum_metadata():
     # The viable solution was calling the yum command as a subprocess manually
     # instead of using that function wrapper.
     output, ret_code = utils.run_subprocess(
-        ("yum", "clean", "metadata", "--enablerepo=*", "--quiet"), print_output=False
+        ("yum", "clean", "expire-cache", "--enablerepo=*", "--quiet"), print_output=False
     )
-    loggerinst.debug("Output of yum clean metadata:\n%s" % output)
+    loggerinst.debug("Output of yum clean expire-cache:\n%s" % output)
 
     if ret_code != 0:
-        loggerinst.warning("Failed to clean yum metadata:\n%s" % output)
+        loggerinst.warning("Failed to expire the cached yum metadata:\n%s" % output)
         return
 
-    loggerinst.info("Cached repositories metadata cleaned successfully.")
+    loggerinst.info("Cached repositories metadata marked to be checked for updates.")
 
 
 @contextmanager
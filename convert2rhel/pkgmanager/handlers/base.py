@@ -16,9 +16,37 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import abc
+import json
+import logging
+import os
+import resource
+import time
+
+from collections import deque
 
 import six
 
+from convert2rhel import __version__, repo, staging, utils
+from convert2rhel.logger import LOG_DIR
+from convert2rhel.systeminfo import system_info
+from convert2rhel.toolopts import tool_opts
+
+
+loggerinst = logging.getLogger(__name__)
+"""Instance of the logger used in this module."""
+
+TRANSACTION_RECORD_FILE = os.path.join(utils.TMP_DIR, "validated-transaction.json")
+"""File in which the transaction validated before the point of no return is kept."""
+
+_TRANSACTION_RECORD_FORMAT = 1
+"""Version of the format of :data:`TRANSACTION_RECORD_FILE`."""
+
+TRANSACTION_TIMINGS_FILE = os.path.join(LOG_DIR, "transaction-timings.json")
+"""File to which the timings of the transaction replacing the packages are written."""
+
+REMAINING_PACKAGES_FILE = os.path.join(utils.TMP_DIR, "packages-not-replaced.txt")
+"""File listing the original packages left when replacing them in chunks is stopped."""
+
 
 @six.add_metaclass(abc.ABCMeta)
 class TransactionHandlerBase:
@@ -33,6 +61,13 @@ class TransactionHandlerBase:
         Instance of the base class, either YumBase() or Base()
     _enabled_repos: list[str]
         List of repositories to be enabled.
+
+    The handlers record the transaction that passed the validation, before
+    the point of no return, in :data:`TRANSACTION_RECORD_FILE`.  The
+    transaction that replaces the packages replays that record instead of
+    marking and resolving every package again, as long as the installed
+    packages, the releasever and the enabled RHEL repositories did not change
+    in between.
     """
 
     @abc.abstractmethod
@@ -48,3 +83,712 @@ class TransactionHandlerBase:
         :type validate_transaction: bool
         """
         pass
+
+    @abc.abstractmethod
+    def _get_rpmdb_version(self):
+        """Identify the set of installed packages known to the base class.
+
+        :return: A string that changes whenever the installed packages do.
+        :rtype: str
+        """
+        pass
+
+    def _get_record_inputs(self):
+        """Collect what the validated transaction depends on.
+
+        .. note::
+            The metadata of the repositories has to be loaded before calling
+            this, as loading it may refresh the repomd.xml files.
+
+        :return: The installed packages, the releasever and the enabled RHEL
+            repositories along with the checksums of their metadata.
+        :rtype: dict[str, Any]
+        """
+        enabled_repos = sorted(system_info.get_enabled_rhel_repos())
+        return {
+            "rpmdb": self._get_rpmdb_version(),
+            "releasever": system_info.releasever,
+            "repos": enabled_repos,
+            "repomd": repo.repomd_fingerprint(enabled_repos),
+        }
+
+    def _save_transaction_record(self, items=None):
+        """Record the validated transaction so that it can be replayed.
+
+        :param items: Description of the transaction that the handler needs
+            to replay it.
+        :type items: Any
+        """
+        data = {
+            "format": _TRANSACTION_RECORD_FORMAT,
+            "convert2rhel_version": __version__,
+            "inputs": self._get_record_inputs(),
+            "items": items,
+        }
+        try:
+            utils.mkdir_p(os.path.dirname(TRANSACTION_RECORD_FILE))
+            utils.write_json_object_to_file(TRANSACTION_RECORD_FILE, data)
+        except (IOError, OSError) as e:
+            loggerinst.warning("Unable to record the validated transaction in %s: %s" % (TRANSACTION_RECORD_FILE, e))
+
+    def _load_transaction_record(self):
+        """Read the validated transaction if it can still be replayed.
+
+        :return: The items passed to :meth:`_save_transaction_record`. None
+            when there is no record or when what the transaction depends on
+            changed since it was validated.
+        :rtype: Any
+        """
+        try:
+            with open(TRANSACTION_RECORD_FILE) as handler:
+                data = json.load(handler)
+        except (IOError, OSError, ValueError):
+            loggerinst.debug("No validated transaction recorded in %s." % TRANSACTION_RECORD_FILE)
+            return None
+
+        if data.get("format") != _TRANSACTION_RECORD_FORMAT or data.get("convert2rhel_version") != __version__:
+            loggerinst.debug("Ignoring the transaction recorded by a different version of convert2rhel.")
+            return None
+
+        inputs = self._get_record_inputs()
+        if not inputs["repomd"] or data.get("inputs") != inputs:
+            loggerinst.info(
+                "The installed packages or the RHEL repositories changed since the transaction was validated."
+            )
+            return None
+
+        return data.get("items")
+
+    def _remove_transaction_record(self):
+        """Remove the record of the validated transaction."""
+        try:
+            os.remove(TRANSACTION_RECORD_FILE)
+        except OSError:
+            pass
+
+    def _stage_downloaded_packages(self, transaction_pkgs, kernel_pkg):
+        """Stage the downloaded packages, see :mod:`convert2rhel.staging`.
+
+        :param transaction_pkgs: The packages of the transaction.
+        :type transaction_pkgs: Iterable[yum.packages.YumAvailablePackage | dnf.package.Package]
+        :param kernel_pkg: The RHEL kernel package, installed after the
+            transaction. None when it could not be downloaded.
+        :type kernel_pkg: yum.packages.YumAvailablePackage | dnf.package.Package | None
+        """
+        staging.stage(staging.TRANSACTION, [pkg.localPkg() for pkg in transaction_pkgs])
+        if kernel_pkg:
+            staging.stage(staging.KERNEL, [kernel_pkg.localPkg()])
+
+    @abc.abstractmethod
+    def _process_transaction(self, validate_transaction, timings=None):
+        """Process the resolved transaction.
+
+        :param validate_transaction: Determines if the transaction needs to be
+            validated or not.
+        :type validate_transaction: bool
+        :param timings: Where to record the timings of the transaction.  When
+            given, reporting them is left to the caller.
+        :type timings: TransactionTimings | None
+        :raises SystemExit: If we can't process the transaction.
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_install_nevras(self):
+        """Return the NEVRAs of the packages that the resolved transaction installs.
+
+        :rtype: set[str]
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_install_pkgs_dependencies(self):
+        """Describe the dependencies of the packages that the resolved transaction installs.
+
+        :return: For each package, its name.arch, its NEVRA, the names of
+            what it requires and the names of what it provides, files included.
+        :rtype: list[tuple[str, str, set[str], set[str]]]
+        """
+        pass
+
+    @abc.abstractmethod
+    def _prepare_chunk(self, original_os_pkgs):
+        """Mark and resolve a transaction replacing only some of the original packages.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.
+        :type original_os_pkgs: list[str]
+        :raises SystemExit: If the transaction can't be resolved.
+        """
+        pass
+
+    def _process_replacement_transaction(self, original_os_pkgs):
+        """Process the resolved transaction replacing the packages.
+
+        The packages are replaced in chunks when a transaction chunk size or
+        memory limit was set through the tool options.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.
+        :type original_os_pkgs: list[str]
+        :raises SystemExit: If we can't process the transaction.
+        """
+        if not tool_opts.transaction_chunk_size and not tool_opts.transaction_memory_limit:
+            self._process_transaction(validate_transaction=False)
+            return
+
+        # The limit is set in MiB
+        memory_limit = tool_opts.transaction_memory_limit * 1024 * 1024 if tool_opts.transaction_memory_limit else None
+        self._run_chunked_transaction(original_os_pkgs, tool_opts.transaction_chunk_size, memory_limit)
+
+    def _run_chunked_transaction(self, original_os_pkgs, chunk_size=None, memory_limit=None):
+        """Replace the packages in several transactions instead of a single one.
+
+        The resolved transaction is split so that the packages a package
+        depends on are replaced in the same or in an earlier transaction, see
+        :func:`plan_chunks`.  Each transaction is marked and resolved anew, on
+        a new base, so the memory used by a transaction is bound by the size
+        of the chunk rather than by the number of packages in the system.
+
+        The complete transaction was validated before the point of no return.
+        A transaction that would install packages outside of it is not
+        processed.
+
+        With a `memory_limit`, the peak memory usage is measured for each
+        transaction.  A transaction that used more than the limit while being
+        resolved is split in two before any of its packages are replaced, and
+        the remaining transactions are made smaller when processing one used
+        more than the limit.  A transaction that can't be split any further
+        stops the conversion before its packages are touched.  The packages
+        replaced until then depend only on each other, and the original
+        packages that are left are listed in :data:`REMAINING_PACKAGES_FILE`.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.
+        :type original_os_pkgs: list[str]
+        :param chunk_size: The number of packages to aim for in each
+            transaction.  Defaults to all of them in one transaction.
+        :type chunk_size: int | None
+        :param memory_limit: The peak memory usage, in bytes, allowed for a
+            transaction.
+        :type memory_limit: int | None
+        :raises SystemExit: If one of the transactions fails or needs more
+            memory than the limit.
+        """
+        packages = self._get_install_pkgs_dependencies()
+        validated = set(nevra for _, nevra, _, _ in packages)
+        nevras_by_key = {}
+        for key, nevra, _, _ in packages:
+            nevras_by_key.setdefault(key, set()).add(nevra)
+
+        components = deque(_get_strongly_connected_components(get_requirements(packages)))
+        if not chunk_size:
+            chunk_size = max(len(packages), 1)
+        if len(packages) <= chunk_size and not memory_limit:
+            self._process_transaction(validate_transaction=False)
+            return
+
+        loggerinst.info(
+            "Replacing the %s packages in transactions of about %d packages each." % (system_info.name, chunk_size)
+        )
+        if memory_limit:
+            loggerinst.info("Each transaction may use up to %s of memory." % format_size(memory_limit))
+
+        original_os_pkgs = set(original_os_pkgs)
+        processed = set()
+        timings = TransactionTimings()
+        number = 0
+        while components:
+            chunk = _take_chunk(components, chunk_size)
+            # Packages pulled in by the dependencies of an earlier chunk are
+            # replaced already.
+            chunk_pkgs = [
+                key
+                for component in chunk
+                for key in component
+                if key in original_os_pkgs and not nevras_by_key[key] <= processed
+            ]
+            if not chunk_pkgs:
+                continue
+
+            number += 1
+            loggerinst.info("Preparing transaction %d with %d packages." % (number, len(chunk_pkgs)))
+            reset_peak_memory()
+            self._prepare_chunk(chunk_pkgs)
+            nevras = self._get_install_nevras()
+            unexpected = nevras - validated
+            if unexpected:
+                loggerinst.debug("Packages not in the validated transaction:\n%s" % "\n".join(sorted(unexpected)))
+                loggerinst.critical(
+                    "Transaction %d installs packages that are not in the validated transaction." % number
+                )
+
+            peak_memory = get_peak_memory()
+            if memory_limit and peak_memory > memory_limit:
+                if len(chunk) > 1:
+                    chunk_size = max(sum(len(component) for component in chunk) // 2, 1)
+                    loggerinst.warning(
+                        "Resolving transaction %d used %s of memory, more than the limit of %s."
+                        " Splitting it into transactions of about %d packages."
+                        % (number, format_size(peak_memory), format_size(memory_limit), chunk_size)
+                    )
+                    components.extendleft(reversed(chunk))
+                    number -= 1
+                    continue
+
+                _write_remaining_packages(
+                    key
+                    for component in chunk + list(components)
+                    for key in component
+                    if key in original_os_pkgs and not nevras_by_key[key] <= processed
+                )
+                loggerinst.critical(
+                    "Resolving transaction %d used %s of memory, more than the limit of %s, and it can't be split"
+                    " any further. None of its packages were replaced. The packages replaced so far only depend on"
+                    " each other. The original packages that are left are listed in %s, replace them"
+                    " with 'yum distro-sync' and 'yum reinstall' once more memory is available."
+                    % (number, format_size(peak_memory), format_size(memory_limit), REMAINING_PACKAGES_FILE)
+                )
+
+            self._process_transaction(validate_transaction=False, timings=timings)
+            processed.update(nevras)
+            peak_memory = get_peak_memory()
+            loggerinst.info("Peak memory usage of transaction %d: %s." % (number, format_size(peak_memory)))
+            if memory_limit and peak_memory > memory_limit and chunk_size > 1:
+                chunk_size = max(chunk_size // 2, 1)
+                loggerinst.warning(
+                    "Transaction %d used more than the memory limit of %s. Replacing the remaining packages in"
+                    " transactions of about %d packages." % (number, format_size(memory_limit), chunk_size)
+                )
+
+        timings.finish()
+        timings.log_summary()
+        timings.write()
+
+        not_processed = validated - processed
+        if not_processed:
+            loggerinst.warning(
+                "The following packages of the validated transaction were not installed:\n%s"
+                % "\n".join(sorted(not_processed))
+            )
+
+
+def _write_remaining_packages(original_os_pkgs):
+    """Record the original packages that are left when replacing them in chunks is stopped.
+
+    :param original_os_pkgs: The original packages, as name.arch.
+    :type original_os_pkgs: Iterable[str]
+    """
+    try:
+        utils.mkdir_p(os.path.dirname(REMAINING_PACKAGES_FILE))
+        with open(REMAINING_PACKAGES_FILE, "w") as handler:
+            handler.write("".join("%s\n" % key for key in sorted(original_os_pkgs)))
+    except (IOError, OSError) as e:
+        loggerinst.warning("Unable to write the packages that are left to %s: %s" % (REMAINING_PACKAGES_FILE, e))
+
+
+def reset_peak_memory():
+    """Start measuring the peak resident memory of convert2rhel anew.
+
+    Writing 5 to /proc/self/clear_refs resets the VmHWM of the process to
+    its current resident memory (Linux 4.0 and later).
+
+    :return: Whether the peak was reset.
+    :rtype: bool
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as handler:
+            handler.write("5")
+    except (IOError, OSError):
+        return False
+
+    return True
+
+
+def get_peak_memory():
+    """Return the peak resident memory of convert2rhel in bytes.
+
+    This is the peak since :func:`reset_peak_memory` was last called, or since
+    the process started when the kernel can't reset it.
+
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/status") as handler:
+            for line in handler:
+                if line.startswith("VmHWM:"):
+                    # The value is in kilobytes, like "VmHWM:  123456 kB"
+                    return 1024 * int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+
+    # ru_maxrss is in kilobytes on Linux
+    return 1024 * resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_requirements(packages):
+    """Find which packages require which other packages.
+
+    Requirements are matched to the packages by name only, regardless of the
+    versions: a package may appear to require more packages than it does,
+    never fewer.
+
+    :param packages: The packages, as returned by
+        :meth:`TransactionHandlerBase._get_install_pkgs_dependencies`.
+    :type packages: list[tuple[str, str, set[str], set[str]]]
+    :return: For the name.arch of each package, the name.arch of the other
+        packages that it requires.
+    :rtype: dict[str, set[str]]
+    """
+    providers = {}
+    for key, _, _, provides in packages:
+        for provide in provides:
+            providers.setdefault(provide, set()).add(key)
+
+    requirements = dict((key, set()) for key, _, _, _ in packages)
+    for key, _, requires, _ in packages:
+        for require in requires:
+            requirements[key].update(providers.get(require, ()))
+        requirements[key].discard(key)
+
+    return requirements
+
+
+def _get_strongly_connected_components(graph):
+    """Group the nodes of a graph that are reachable from each other.
+
+    This is Tarjan's algorithm, without recursion so that long dependency
+    chains don't hit the recursion limit.  A component comes after all the
+    components that it has edges to.
+
+    :param graph: The edges from each node.
+    :type graph: dict[str, set[str]]
+    :rtype: list[list[str]]
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    for root in sorted(graph):
+        if root in index:
+            continue
+
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(sorted(graph[root])))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = lowlink[neighbor] = len(index)
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(sorted(graph[neighbor]))))
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+
+    return components
+
+
+def plan_chunks(requirements, chunk_size):
+    """Split packages into chunks that can be replaced one after the other.
+
+    Packages that require each other, directly or not, always end up in the
+    same chunk, and the packages that a package requires end up in the same
+    or in an earlier chunk.  Such a group of packages is never split, so a
+    chunk may exceed `chunk_size`.
+
+    :param requirements: For each package, the packages that it requires, see
+        :func:`get_requirements`.
+    :type requirements: dict[str, set[str]]
+    :param chunk_size: The number of packages to aim for in each chunk.
+    :type chunk_size: int
+    :rtype: list[list[str]]
+    """
+    components = deque(_get_strongly_connected_components(requirements))
+    chunks = []
+    while components:
+        chunks.append([key for component in _take_chunk(components, chunk_size) for key in component])
+
+    return chunks
+
+
+def _take_chunk(components, chunk_size):
+    """Take the groups of packages for the next chunk.
+
+    :param components: The groups of packages that require each other, in the
+        order to replace them.  The groups taken are removed.
+    :type components: collections.deque[list[str]]
+    :param chunk_size: The number of packages to aim for in the chunk.
+    :type chunk_size: int
+    :return: The groups of packages of the chunk, at least one.
+    :rtype: list[list[str]]
+    """
+    chunk = [components.popleft()]
+    size = len(chunk[0])
+    while components and size + len(components[0]) <= chunk_size:
+        size += len(components[0])
+        chunk.append(components.popleft())
+
+    return chunk
+
+
+def format_size(size):
+    """Format a number of bytes to be read by humans, like 1.5 MiB.
+
+    :param size: The number of bytes.
+    :type size: int | float
+    :rtype: str
+    """
+    if size < 1024:
+        return "%d B" % size
+
+    for unit in ("KiB", "MiB", "GiB"):
+        size /= 1024.0
+        if size < 1024:
+            break
+
+    return "%.1f %s" % (size, unit)
+
+
+class DownloadStatistics(object):
+    """Measure the download of the packages of a transaction.
+
+    The download callbacks of the handlers report when each package starts
+    and finishes downloading.  As the packages can download in parallel, the
+    throughput is computed over the whole download phase, from :meth:`start`
+    to :meth:`finish`, instead of from the durations of the packages.
+
+    transaction_size: int
+        Size, in bytes, of all the packages of the transaction, including
+        those that were already downloaded.
+    sizes: dict[str, int]
+        Size of each package downloaded.
+    durations: dict[str, float]
+        Seconds it took to download each package, when known.
+    """
+
+    def __init__(self):
+        self.transaction_size = 0
+        self.sizes = {}
+        self.durations = {}
+        self._start_time = None
+        self._end_time = None
+        self._started = {}
+
+    def start(self, transaction_size):
+        """Start the download phase.
+
+        :param transaction_size: Size, in bytes, of all the packages of the
+            transaction.
+        :type transaction_size: int
+        """
+        self.transaction_size = transaction_size
+        self._start_time = time.time()
+
+    def package_started(self, package):
+        """Record that a package started downloading.
+
+        :param package: Name of the package.
+        :type package: str
+        """
+        self._started.setdefault(package, time.time())
+
+    def package_finished(self, package, size):
+        """Record that a package was downloaded.
+
+        :param package: Name of the package.
+        :type package: str
+        :param size: Number of bytes downloaded.
+        :type size: int
+        """
+        self.sizes[package] = size
+        started = self._started.pop(package, None)
+        if started is not None:
+            self.durations[package] = time.time() - started
+
+    def finish(self):
+        """End the download phase."""
+        self._end_time = time.time()
+
+    @property
+    def downloaded_size(self):
+        """Number of bytes downloaded."""
+        return sum(self.sizes.values())
+
+    @property
+    def duration(self):
+        """Seconds the download phase took."""
+        if self._start_time is None or self._end_time is None:
+            return 0.0
+        return self._end_time - self._start_time
+
+    @property
+    def throughput(self):
+        """Bytes downloaded per second over the download phase."""
+        return self.downloaded_size / self.duration if self.duration > 0 else 0.0
+
+    def log_summary(self):
+        """Report the size of the transaction and how fast it was downloaded."""
+        for package in sorted(self.durations, key=self.durations.get, reverse=True):
+            loggerinst.debug(
+                "Downloaded %s, %s in %.1f seconds."
+                % (package, format_size(self.sizes[package]), self.durations[package])
+            )
+
+        if not self.sizes:
+            loggerinst.info(
+                "All the packages of the transaction, %s in total, were already downloaded."
+                % format_size(self.transaction_size)
+            )
+            return
+
+        loggerinst.info(
+            "Downloaded %d packages, %s of the %s of the transaction, in %.1f seconds (%s/s)."
+            % (
+                len(self.sizes),
+                format_size(self.downloaded_size),
+                format_size(self.transaction_size),
+                self.duration,
+                format_size(self.throughput),
+            )
+        )
+
+
+class TransactionTimings(object):
+    """Measure how long each package and scriptlet of a transaction takes.
+
+    The transaction display callbacks of the handlers report every event of
+    the transaction: the install, erase or cleanup of a package, or one of its
+    scriptlets running.  rpm processes one element of the transaction at a
+    time, so an event lasts from the first time it is reported until another
+    event is reported or the event is ended explicitly, for instance when rpm
+    reports the output of the scriptlets of a package.
+
+    events: list[dict[str, Any]]
+        The events of the transaction, in order, with the package, the
+        action, when the event started, in seconds since the start of the
+        transaction, and how many seconds it took.
+    """
+
+    slowest_count = 20
+    """Number of events listed in the summary."""
+
+    def __init__(self):
+        self.events = []
+        self._start_time = None
+        self._end_time = None
+        self._current = None
+
+    def event(self, package, action):
+        """Record that rpm is processing a package.
+
+        The callbacks report the same event over and over while it makes
+        progress; only the first report starts it.
+
+        :param package: Name of the package.
+        :type package: str
+        :param action: What rpm does with the package, like Installing or
+            Running scriptlet.
+        :type action: str
+        """
+        now = time.time()
+        if self._start_time is None:
+            self._start_time = now
+
+        if self._current and self._current[:2] == (package, action):
+            return
+
+        self._end_event(now)
+        self._current = (package, action, now)
+
+    def end_event(self):
+        """Record that rpm finished processing the current event."""
+        self._end_event(time.time())
+
+    def _end_event(self, now):
+        if not self._current:
+            return
+
+        package, action, start = self._current
+        self.events.append(
+            {
+                "package": package,
+                "action": action,
+                "start": round(start - self._start_time, 3),
+                "duration": round(now - start, 3),
+            }
+        )
+        self._current = None
+
+    def finish(self):
+        """End the transaction."""
+        self._end_time = time.time()
+        self._end_event(self._end_time)
+
+    @property
+    def duration(self):
+        """Seconds from the first event of the transaction to its end."""
+        if self._start_time is None or self._end_time is None:
+            return 0.0
+        return self._end_time - self._start_time
+
+    def slowest(self):
+        """Return the :attr:`slowest_count` events which took the longest.
+
+        :rtype: list[dict[str, Any]]
+        """
+        return sorted(self.events, key=lambda event: event["duration"], reverse=True)[: self.slowest_count]
+
+    def log_summary(self):
+        """Report the packages and scriptlets which took the longest."""
+        if not self.events:
+            return
+
+        loggerinst.info(
+            "The transaction took %.1f seconds. The %d slowest packages and scriptlets:"
+            % (self.duration, len(self.slowest()))
+        )
+        for event in self.slowest():
+            loggerinst.info("%8.1fs  %s: %s" % (event["duration"], event["action"], event["package"]))
+
+    def write(self, path=None):
+        """Write the timings of all the events to a JSON file.
+
+        :param path: File to write the timings to.  Defaults to
+            :data:`TRANSACTION_TIMINGS_FILE`.
+        :type path: str | None
+        """
+        path = path if path else TRANSACTION_TIMINGS_FILE
+        data = {
+            "duration": round(self.duration, 3),
+            "slowest": self.slowest(),
+            "events": self.events,
+        }
+        try:
+            utils.mkdir_p(os.path.dirname(path))
+            utils.write_json_object_to_file(path, data, mode=0o644)
+        except (IOError, OSError) as e:
+            loggerinst.warning("Unable to write the timings of the transaction to %s: %s" % (path, e))
+            return
+
+        loggerinst.info("The timings of the transaction were written to %s." % path)
@@ -15,23 +15,63 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import hashlib
 import logging
 
-from convert2rhel import pkgmanager
-from convert2rhel.pkghandler import get_system_packages_for_replacement
-from convert2rhel.pkgmanager.handlers.base import TransactionHandlerBase
+from convert2rhel import pkgmanager, staging
+from convert2rhel.pkghandler import get_pkg_nevra, get_system_packages_for_replacement
+from convert2rhel.pkgmanager.handlers.base import (
+    DownloadStatistics,
+    TransactionHandlerBase,
+    TransactionTimings,
+    format_size,
+    get_peak_memory,
+)
 from convert2rhel.pkgmanager.handlers.dnf.callback import (
     DependencySolverProgressIndicatorCallback,
     PackageDownloadCallback,
     TransactionDisplayCallback,
 )
 from convert2rhel.systeminfo import system_info
+from convert2rhel.toolopts import tool_opts
 
 
 loggerinst = logging.getLogger(__name__)
 """Instance of the logger used in this module."""
 
 
+def _get_replayable_operations():
+    """Map the actions of the transaction items to the Base methods replaying them.
+
+    The actions on the packages being replaced (upgraded, obsoleted, ...)
+    follow from these and are not replayed.
+    """
+    return {
+        pkgmanager.transaction.PKG_INSTALL: "install",
+        pkgmanager.transaction.PKG_OBSOLETE: "install",
+        pkgmanager.transaction.PKG_UPGRADE: "upgrade",
+        pkgmanager.transaction.PKG_REINSTALL: "reinstall",
+        pkgmanager.transaction.PKG_DOWNGRADE: "downgrade",
+        pkgmanager.transaction.PKG_REMOVE: "remove",
+    }
+
+
+def _get_nevra_key(pkg):
+    """Identify a package by its NEVRA, to look it up among other packages."""
+    return (pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch)
+
+
+def _index_by_name_arch(pkgs):
+    """Index packages by their name and architecture.
+
+    :param pkgs: The packages, at most one per name and architecture, like
+        the result of a latest() query.
+    :type pkgs: Iterable[dnf.package.Package]
+    :rtype: dict[tuple[str, str], dnf.package.Package]
+    """
+    return dict(((pkg.name, pkg.arch), pkg) for pkg in pkgs)
+
+
 class DnfTransactionHandler(TransactionHandlerBase):
     """Implementation of the DNF transaction handler.
 
@@ -42,6 +82,11 @@ class DnfTransactionHandler(TransactionHandlerBase):
 
     _base: dnf.Base()
         The actual instance of the `dnf.Base()` class.
+    metadata_profile: str
+        The repository metadata loaded by `_base`, see
+        `pkgmanager.set_metadata_profile()`. Resolving the transaction may
+        need the packages providing a file and dnf doesn't load the filelists
+        on demand.
     """
 
     def __init__(self):
@@ -55,6 +100,7 @@ class DnfTransactionHandler(TransactionHandlerBase):
         # dnf transaction to be processed and change the packages (i.e:
         # reinstall, upgrade, downgrade, ...).
         self._base = None
+        self.metadata_profile = pkgmanager.METADATA_FILELISTS
 
     def _set_up_base(self):
         """Create a new instance of the dnf.Base() class
@@ -78,6 +124,11 @@ class DnfTransactionHandler(TransactionHandlerBase):
         # issues in the second run of this class.
         # Ref: https://dnf.readthedocs.io/en/latest/conf_ref.html#keepcache-label
         self._base.conf.keepcache = True
+        pkgmanager.set_metadata_profile(self._base, self.metadata_profile)
+
+        # dnf downloads 3 packages at the same time by default.
+        if tool_opts.parallel_downloads:
+            self._base.conf.max_parallel_downloads = tool_opts.parallel_downloads
 
         # Currently, the depsolver callback associated with `_ds_callback` is
         # just a bypass. We are overriding this property to use our own
@@ -104,40 +155,68 @@ class DnfTransactionHandler(TransactionHandlerBase):
             loggerinst.debug("Loading repository metadata failed: %s" % e)
             loggerinst.critical("Failed to populate repository metadata.")
 
-    def _perform_operations(self):
+    def _perform_operations(self, original_os_pkgs=None):
         """Perform the necessary operations in the transaction.
 
         This internal method will actually perform three operations in the
         transaction: update, reinstall and downgrade. The downgrade
-        will be executed only when the reinstall step raises
-        `PackagesNotAvailableError`.
+        will be executed only when none of the installed packages can be
+        reinstalled, i.e. when the exact same version of them is not available.
+
+        The sack is queried only once for each kind of package and the results
+        are indexed, so that looking up the packages to mark doesn't depend on
+        the number of packages in the system. The packages are marked as
+        package objects, sparing dnf to resolve a package spec for each of
+        them.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.  Defaults to all of them.
+        :type original_os_pkgs: list[str] | None
         """
-        original_os_pkgs = get_system_packages_for_replacement()
-        upgrades = self._base.sack.query().upgrades().latest()
+        if original_os_pkgs is None:
+            original_os_pkgs = get_system_packages_for_replacement()
+        query = self._base.sack.query()
+        upgrades = _index_by_name_arch(query.upgrades().latest())
+        downgrades = _index_by_name_arch(query.downgrades().latest())
+        available = dict((_get_nevra_key(pkg), pkg) for pkg in query.available())
+        installed = {}
+        for pkg in query.installed():
+            installed.setdefault((pkg.name, pkg.arch), []).append(pkg)
 
         loggerinst.info("Adding %s packages to the dnf transaction set.", system_info.name)
 
         for pkg in original_os_pkgs:
-            # Splitting the name and arch so we can filter it out in the list
-            # of packages to upgrade.
+            # Splitting the name and arch so we can look it up in the indexes
+            # of the packages.
             name, arch = tuple(pkg.rsplit(".", 1))
-            upgrade_pkg = next(iter(upgrades.filter(name=name, arch=arch)), None)
+            upgrade_pkg = upgrades.get((name, arch))
 
             # If a package is marked for update, then we don't need to
             # proceed with reinstall, and possibly, the downgrade of this
             # package. This is an inconsistency that could lead to packages
             # being outdated in the system after the conversion.
             if upgrade_pkg:
-                self._base.upgrade(pkg_spec=pkg)
+                self._base.package_upgrade(upgrade_pkg)
                 continue
 
-            try:
-                self._base.reinstall(pkg_spec=pkg)
-            except pkgmanager.exceptions.PackagesNotAvailableError:
-                try:
-                    self._base.downgrade(pkg_spec=pkg)
-                except pkgmanager.exceptions.PackagesNotInstalledError:
-                    loggerinst.warning("Package %s not available in RHEL repositories.", pkg)
+            # Installonly packages, like the kernel, can be installed in
+            # multiple versions. Each of them is reinstalled when available.
+            reinstall_pkgs = [
+                available[_get_nevra_key(installed_pkg)]
+                for installed_pkg in installed.get((name, arch), [])
+                if _get_nevra_key(installed_pkg) in available
+            ]
+            if reinstall_pkgs:
+                for reinstall_pkg in reinstall_pkgs:
+                    self._base.package_reinstall(reinstall_pkg)
+                continue
+
+            downgrade_pkg = downgrades.get((name, arch))
+            if downgrade_pkg:
+                self._base.package_downgrade(downgrade_pkg)
+                continue
+
+            loggerinst.warning("Package %s not available in RHEL repositories.", pkg)
 
     def _resolve_dependencies(self):
         """Resolve the dependencies for the transaction.
@@ -156,19 +235,116 @@ class DnfTransactionHandler(TransactionHandlerBase):
             loggerinst.debug("Got the following exception message: %s" % e)
             loggerinst.critical("Failed to resolve dependencies in the transaction.")
 
+        self._download_packages()
+
+    def _download_packages(self):
+        """Download the packages of the resolved transaction.
+
+        :raises SystemExit: If we fail to download the packages.
+        """
         loggerinst.info("Downloading the packages that were added to the dnf transaction set.")
+        install_set = self._base.transaction.install_set
+        statistics = DownloadStatistics()
+        statistics.start(sum(pkg.downloadsize for pkg in install_set))
         try:
-            self._base.download_packages(self._base.transaction.install_set, PackageDownloadCallback())
+            self._base.download_packages(install_set, PackageDownloadCallback(statistics))
         except pkgmanager.exceptions.DownloadError as e:
             loggerinst.debug("Got the following exception message: %s" % e)
             loggerinst.critical("Failed to download the transaction packages.")
 
-    def _process_transaction(self, validate_transaction):
+        statistics.finish()
+        statistics.log_summary()
+
+    def _stage_payload(self):
+        """Stage the packages of the transaction along with the RHEL kernel.
+
+        The latest RHEL kernel is installed after the transaction, so it is
+        downloaded here to be staged as well.
+        """
+        kernel = next(iter(self._base.sack.query().available().filter(name="kernel").latest()), None)
+        if kernel:
+            try:
+                self._base.download_packages([kernel], PackageDownloadCallback())
+            except pkgmanager.exceptions.DownloadError as e:
+                loggerinst.warning("Unable to download the RHEL kernel to stage it: %s" % e)
+                kernel = None
+
+        self._stage_downloaded_packages(self._base.transaction.install_set, kernel)
+
+    def _get_rpmdb_version(self):
+        """Identify the installed packages by a checksum of their NEVRAs.
+
+        :rtype: str
+        """
+        installed = sorted(get_pkg_nevra(pkg, include_zero_epoch=True) for pkg in self._base.sack.query().installed())
+        return hashlib.sha256("\n".join(installed).encode("utf-8")).hexdigest()
+
+    def _get_transaction_items(self):
+        """Describe the resolved transaction in a form that can be replayed.
+
+        :return: Sorted pairs of the operation and the NEVRA of the package.
+        :rtype: list[list[str]]
+        """
+        operations = _get_replayable_operations()
+        items = []
+        for tsi in self._base.transaction:
+            operation = operations.get(tsi.action)
+            if operation:
+                items.append([operation, get_pkg_nevra(tsi.pkg, include_zero_epoch=True)])
+
+        return sorted(items)
+
+    def _replay_transaction(self):
+        """Mark the packages of the validated transaction again and resolve it.
+
+        Every package is marked by its exact NEVRA, skipping the marking of the
+        original packages one by one done by `_perform_operations`.  The
+        result is only used if it resolves to the same transaction that was
+        validated.
+
+        :return: Whether the validated transaction was replayed.
+        :rtype: bool
+        """
+        items = self._load_transaction_record()
+        if not items:
+            return False
+
+        loggerinst.info("Replaying the dnf transaction validated before the point of no return.")
+        query = self._base.sack.query()
+        available = dict((get_pkg_nevra(pkg, include_zero_epoch=True), pkg) for pkg in query.available())
+        installed = dict((get_pkg_nevra(pkg, include_zero_epoch=True), pkg) for pkg in query.installed())
+        try:
+            for operation, nevra in items:
+                pkg = (installed if operation == "remove" else available).get(nevra)
+                if not pkg:
+                    raise pkgmanager.exceptions.PackageNotFoundError("Package %s not found." % nevra)
+
+                if operation == "install":
+                    self._base.package_install(pkg, strict=True)
+                else:
+                    getattr(self._base, "package_%s" % operation)(pkg)
+
+            self._base.resolve(allow_erasing=True)
+        except pkgmanager.exceptions.Error as e:
+            loggerinst.debug("Got the following exception message: %s" % e)
+            items = None
+
+        if items != self._get_transaction_items():
+            loggerinst.warning("Unable to replay the validated transaction, building it again.")
+            self._base.reset(goal=True)
+            return False
+
+        return True
+
+    def _process_transaction(self, validate_transaction, timings=None):
         """Internal method that will process the transaction.
 
         :param validate_transaction: Determines if the transaction needs to be
         validated or not.
         :type validate_transaction: bool
+        :param timings: Where to record the timings of the transaction. When
+            given, reporting them is left to the caller.
+        :type timings: TransactionTimings | None
         :raises SystemExit: If we can't process the transaction.
         """
 
@@ -178,8 +354,9 @@ class DnfTransactionHandler(TransactionHandlerBase):
         else:
             loggerinst.info("Replacing %s packages. This process may take some time to finish." % system_info.name)
 
+        transaction_timings = timings if timings is not None else TransactionTimings()
         try:
-            self._base.do_transaction(display=TransactionDisplayCallback())
+            self._base.do_transaction(display=TransactionDisplayCallback(transaction_timings))
         except (
             pkgmanager.exceptions.Error,
             pkgmanager.exceptions.TransactionCheckError,
@@ -189,8 +366,58 @@ class DnfTransactionHandler(TransactionHandlerBase):
 
         if validate_transaction:
             loggerinst.info("Successfully validated the dnf transaction set.")
+            loggerinst.info("Peak memory usage while validating the transaction: %s." % format_size(get_peak_memory()))
         else:
             loggerinst.info("System packages replaced successfully.")
+            if timings is None:
+                loggerinst.info("Peak memory usage while replacing the packages: %s." % format_size(get_peak_memory()))
+                transaction_timings.finish()
+                transaction_timings.log_summary()
+                transaction_timings.write()
+
+    def _get_install_nevras(self):
+        """Return the NEVRAs of the packages that the resolved transaction installs.
+
+        :rtype: set[str]
+        """
+        return set(get_pkg_nevra(pkg, include_zero_epoch=True) for pkg in self._base.transaction.install_set)
+
+    def _get_install_pkgs_dependencies(self):
+        """Describe the dependencies of the packages that the resolved transaction installs.
+
+        :return: For each package, its name.arch, its NEVRA, the names of
+            what it requires and the names of what it provides, files included.
+        :rtype: list[tuple[str, str, set[str], set[str]]]
+        """
+        packages = []
+        for pkg in self._base.transaction.install_set:
+            # A reldep reads like "glibc >= 2.28", only the name is used.
+            requires = set(str(reldep).split(" ")[0] for reldep in pkg.requires)
+            provides = set(str(reldep).split(" ")[0] for reldep in pkg.provides)
+            provides.update(pkg.files)
+            packages.append(
+                ("%s.%s" % (pkg.name, pkg.arch), get_pkg_nevra(pkg, include_zero_epoch=True), requires, provides)
+            )
+
+        return packages
+
+    def _prepare_chunk(self, original_os_pkgs):
+        """Mark and resolve a transaction replacing only some of the original packages.
+
+        The previous base is closed first, so that the memory it holds is
+        released and the sack is loaded with the packages installed by the
+        previous transactions.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.
+        :type original_os_pkgs: list[str]
+        :raises SystemExit: If the transaction can't be resolved.
+        """
+        self._base.close()
+        self._set_up_base()
+        self._enable_repos()
+        self._perform_operations(original_os_pkgs)
+        self._resolve_dependencies()
 
     def run_transaction(self, validate_transaction=False):
         """Run the dnf transaction.
@@ -199,17 +426,40 @@ class DnfTransactionHandler(TransactionHandlerBase):
         true, it means the transaction will not be executed, but rather verify
         everything and do an early return.
 
+        The validated transaction is recorded, and replayed when the
+        transaction is executed later on, if nothing it depends on changed.
+
         :param validate_transaction: Determines if the transaction needs to be
             validated or not.
         :type validate_transaction: bool
         :raises SystemExit: If there was any problem during the
         """
+        staging.restore(staging.TRANSACTION)
         self._set_up_base()
         self._enable_repos()
 
-        self._perform_operations()
-        self._resolve_dependencies()
-        self._process_transaction(validate_transaction)
+        if not validate_transaction and self._replay_transaction():
+            self._download_packages()
+        else:
+            self._perform_operations()
+            self._resolve_dependencies()
+
+        if validate_transaction:
+            self._save_transaction_record(self._get_transaction_items())
+            if tool_opts.prestage:
+                self._stage_payload()
+
+        try:
+            if validate_transaction:
+                self._process_transaction(validate_transaction)
+            else:
+                self._process_replacement_transaction(get_system_packages_for_replacement())
+        except SystemExit:
+            self._remove_transaction_record()
+            raise
+
+        if not validate_transaction:
+            self._remove_transaction_record()
 
         # Because we call the same thing multiple times, the rpm database is not
         # properly closed at the end of it, thus, having the need to call
@@ -61,6 +61,7 @@
 import logging
 
 from convert2rhel import pkgmanager
+from convert2rhel.pkgmanager.handlers.base import DownloadStatistics, TransactionTimings
 
 
 loggerinst = logging.getLogger(__name__)
@@ -124,12 +125,17 @@ class PackageDownloadCallback(pkgmanager.DownloadProgress):
     }
     """A mapping of the packages download status to a more formal string representation."""
 
-    def __init__(self):
+    def __init__(self, statistics=None):
         """Constructor for the package download progress indicator.
 
         We initialize a few properties here for keeping track of progression of
         the downloaded files.
+
+        :param statistics: Where to record the size and the duration of the
+            download of each package.
+        :type statistics: DownloadStatistics | None
         """
+        self.statistics = statistics if statistics else DownloadStatistics()
         self.total_drpm = 0
         self.done_drpm = 0
         self.total_files = 0
@@ -163,6 +169,19 @@ class PackageDownloadCallback(pkgmanager.DownloadProgress):
         self.total_size = total_size
         self.total_drpm = total_drpms
 
+    def progress(self, payload, done):
+        """Update the progress of the download of `payload`.
+
+        dnf downloads the packages in parallel, so the download of a package
+        starts when its progress is first reported.
+
+        :param payload: The payload sent in the callback.
+        :type payload: dnf.repo.RPMPayload
+        :param done: The number of bytes of `payload` downloaded so far.
+        :type done: int
+        """
+        self.statistics.package_started(pkgmanager.pycomp.unicode(payload))
+
     def end(self, payload, status, err_msg):
         """Communicate the information that `payload` has finished downloading.
 
@@ -189,6 +208,9 @@ class PackageDownloadCallback(pkgmanager.DownloadProgress):
             self.done_files += 1
             self.done_size += size
 
+        if not status:
+            self.statistics.package_finished(package, size)
+
         message = None
 
         if status:
@@ -221,9 +243,15 @@ class PackageDownloadCallback(pkgmanager.DownloadProgress):
 class TransactionDisplayCallback(pkgmanager.TransactionDisplay):
     """Transaction display callback for DNF transaction."""
 
-    def __init__(self):
-        """Constructor for the transaction display progress in DNF."""
+    def __init__(self, timings=None):
+        """Constructor for the transaction display progress in DNF.
+
+        :param timings: Where to record how long each package and scriptlet
+            of the transaction takes.
+        :type timings: TransactionTimings | None
+        """
         super(TransactionDisplayCallback, self).__init__()
+        self.timings = timings if timings else TransactionTimings()
         self.last_package_seen = None
 
     def progress(self, package, action, ti_done, ti_total, ts_done, ts_total):
@@ -257,6 +285,9 @@ class TransactionDisplayCallback(pkgmanager.TransactionDisplay):
         # different.
         package = str(package)
 
+        # Scriptlets are reported as an action of their package too.
+        self.timings.event(package, pkgmanager.transaction.ACTIONS.get(action))
+
         message = "%s: %s [%s/%s]" % (pkgmanager.transaction.ACTIONS.get(action), package, ts_done, ts_total)
 
         # The base API will call this callback class on every package update,
@@ -270,6 +301,9 @@ class TransactionDisplayCallback(pkgmanager.TransactionDisplay):
     def scriptout(self, msgs):
         """Hook for reporting an rpm scriptlet output.
 
+        dnf reports the output once a package is installed or erased, or once
+        a scriptlet stopped, so the current event of the transaction ends here.
+
         .. note::
             If there is no problem reported during the scriptlet execution,
             then this method will receive a None instead of the normal message.
@@ -277,6 +311,8 @@ class TransactionDisplayCallback(pkgmanager.TransactionDisplay):
         :param msgs: The scriptlet output
         :type msgs: bytes | None
         """
+        self.timings.end_event()
+
         # The base API will call this callback class on every package update,
         # no matter if the messages are empty or not, so, the below statement
         # prevents the same message being sent to the user with empty strings.
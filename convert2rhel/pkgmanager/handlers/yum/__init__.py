@@ -22,13 +22,22 @@ import os
 import re
 import shutil
 
-from convert2rhel import pkgmanager, utils
+from convert2rhel import pkgmanager, staging, utils
 from convert2rhel.backup import remove_pkgs
-from convert2rhel.pkghandler import get_system_packages_for_replacement
-from convert2rhel.pkgmanager.handlers.base import TransactionHandlerBase
+from convert2rhel.backup_store import file_store
+from convert2rhel.pkghandler import get_pkg_nevra, get_system_packages_for_replacement
+from convert2rhel.pkgmanager.handlers.base import (
+    DownloadStatistics,
+    TransactionHandlerBase,
+    TransactionTimings,
+    format_size,
+    get_peak_memory,
+)
 from convert2rhel.pkgmanager.handlers.yum.callback import PackageDownloadCallback, TransactionDisplayCallback
+from convert2rhel.repo import DEFAULT_YUM_REPOFILE_DIR, DEFAULT_YUM_VARS_DIR
 from convert2rhel.systeminfo import system_info
-from convert2rhel.utils import BACKUP_DIR, run_as_child_process
+from convert2rhel.toolopts import tool_opts
+from convert2rhel.utils import run_as_child_process
 
 
 loggerinst = logging.getLogger(__name__)
@@ -40,6 +49,9 @@ MAX_NUM_OF_ATTEMPTS_TO_RESOLVE_DEPS = 3
 EXTRACT_PKG_FROM_YUM_DEPSOLVE = re.compile(r".*?(?=requires)")
 """Extract the first package that appears in the yum depsolve error."""
 
+YUM_TRANSACTION_FILE = os.path.join(utils.TMP_DIR, "validated-transaction.yumtx")
+"""File in which yum saves the validated transaction, see `YumBase.save_ts()`."""
+
 
 def _resolve_yum_problematic_dependencies(output):
     """Internal function to parse yum resolve dependencies errors.
@@ -75,9 +87,9 @@ def _resolve_yum_problematic_dependencies(output):
             backup=True,
             critical=True,
             set_releasever=True,
-            reposdir=BACKUP_DIR,
+            reposdir=file_store.get_backup_path(DEFAULT_YUM_REPOFILE_DIR),
             custom_releasever=system_info.version.major,
-            varsdir=os.path.join(BACKUP_DIR, "yum", "vars"),
+            varsdir=file_store.get_backup_path(DEFAULT_YUM_VARS_DIR),
         )
 
         loggerinst.debug("Finished backing up and removing the packages.")
@@ -95,6 +107,11 @@ class YumTransactionHandler(TransactionHandlerBase):
 
     _base: yum.YumBase()
         The actual instance of the `yum.YumBase()` class.
+    metadata_profile: str
+        The repository metadata downloaded by `_base` up front, see
+        `pkgmanager.set_metadata_profile()`. The packages are marked by name
+        and yum imports the filelists on demand when resolving a dependency
+        on a file.
     """
 
     def __init__(self):
@@ -107,6 +124,7 @@ class YumTransactionHandler(TransactionHandlerBase):
         # class needs to be instantiated through the `_set_up_base()` private
         # method.
         self._base = None
+        self.metadata_profile = pkgmanager.METADATA_PRIMARY
 
     def _close_yum_base(self):
         """Helper method to close the yum object.
@@ -138,6 +156,12 @@ class YumTransactionHandler(TransactionHandlerBase):
         pkgmanager.misc.setup_locale(override_time=True)
         self._base = pkgmanager.YumBase()
         self._base.conf.yumvar["releasever"] = system_info.releasever
+        pkgmanager.set_metadata_profile(self._base, self.metadata_profile)
+
+        # yum downloads the packages of a transaction in parallel, over up to
+        # max_connections connections.
+        if tool_opts.parallel_downloads:
+            self._base.conf.max_connections = tool_opts.parallel_downloads
 
     def _enable_repos(self):
         """Enable a list of required repositories.
@@ -157,15 +181,20 @@ class YumTransactionHandler(TransactionHandlerBase):
             loggerinst.debug("Loading repository metadata failed: %s" % e)
             loggerinst.critical("Failed to populate repository metadata.")
 
-    def _perform_operations(self):
+    def _perform_operations(self, original_os_pkgs=None):
         """Perform the necessary operations in the transaction.
 
         This internal method will actually perform three operations in the
         transaction: downgrade, reinstall and downgrade. The downgrade only
         will be executed in case of the the reinstall step raises the
         `ReinstallInstallError`.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.  Defaults to all of them.
+        :type original_os_pkgs: list[str] | None
         """
-        original_os_pkgs = get_system_packages_for_replacement()
+        if original_os_pkgs is None:
+            original_os_pkgs = get_system_packages_for_replacement()
         self._set_up_base()
         self._enable_repos()
 
@@ -252,12 +281,141 @@ class YumTransactionHandler(TransactionHandlerBase):
 
         return True
 
-    def _process_transaction(self, validate_transaction):
+    def _get_rpmdb_version(self):
+        """Identify the installed packages by the rpmdb version of yum.
+
+        :rtype: str
+        """
+        return str(self._base.rpmdb.simpleVersion(main_only=True)[0])
+
+    def _save_transaction(self):
+        """Save the resolved transaction with yum and record it."""
+        try:
+            utils.mkdir_p(os.path.dirname(YUM_TRANSACTION_FILE))
+            self._base.save_ts(filename=YUM_TRANSACTION_FILE, auto=False)
+        except (OSError, pkgmanager.Errors.YumBaseError) as e:
+            loggerinst.warning("Unable to save the validated transaction: %s" % e)
+            return
+
+        self._save_transaction_record(YUM_TRANSACTION_FILE)
+
+    def _replay_transaction(self):
+        """Load the validated transaction into a new yum base.
+
+        `YumBase.load_ts()` restores the resolved transaction saved during the
+        validation, skipping the marking of the original packages one by one.
+        It refuses to load the transaction when the installed packages changed
+        or when a package is no longer available.  Checking the dependencies
+        of the complete transaction afterwards is then a formality.
+
+        When it is not loaded, the yum base is closed again as
+        `_perform_operations` sets up one of its own.
+
+        :return: Whether the validated transaction was loaded.
+        :rtype: bool
+        """
+        self._set_up_base()
+        self._enable_repos()
+        if self._load_validated_transaction():
+            return True
+
+        self._close_yum_base()
+        return False
+
+    def _load_validated_transaction(self):
+        """Load the validated transaction into the yum base and resolve it.
+
+        :return: Whether the validated transaction was loaded.
+        :rtype: bool
+        """
+        ts_file = self._load_transaction_record()
+        if not ts_file:
+            return False
+
+        loggerinst.info("Replaying the yum transaction validated before the point of no return.")
+        try:
+            self._base.load_ts(filename=ts_file)
+        except pkgmanager.Errors.YumBaseError as e:
+            loggerinst.debug("Got the following exception message: %s", e)
+            loggerinst.warning("Unable to replay the validated transaction, building it again.")
+            return False
+
+        if not self._resolve_dependencies(validate_transaction=False):
+            loggerinst.warning("Unable to replay the validated transaction, building it again.")
+            return False
+
+        return True
+
+    def _get_install_pkgs(self):
+        """Return the packages that the resolved transaction installs.
+
+        :rtype: list[yum.packages.YumAvailablePackage]
+        """
+        return [txmbr.po for txmbr in self._base.tsInfo.getMembersWithState(output_states=pkgmanager.TS_INSTALL_STATES)]
+
+    def _download_packages(self):
+        """Download the packages of the resolved transaction.
+
+        `YumBase.processTransaction()` would download them anyway, finding
+        them in the cache afterwards.  Downloading them beforehand makes the
+        download a phase of its own that can be measured.
+
+        :raises SystemExit: If we fail to download the packages.
+        """
+        loggerinst.info("Downloading the packages that were added to the yum transaction set.")
+        pkgs = self._get_install_pkgs()
+        statistics = DownloadStatistics()
+        statistics.start(sum(int(pkg.size) for pkg in pkgs))
+        self._base.repos.setProgressBar(PackageDownloadCallback(statistics))
+
+        def record_downloaded(remote_pkgs, remote_size, beg_download):
+            # With parallel downloads, yum doesn't report the progress of each
+            # package, only the packages downloaded once they all are.
+            for pkg in remote_pkgs:
+                name = os.path.basename(pkg.localPkg())
+                if name not in statistics.sizes:
+                    statistics.package_finished(name, int(pkg.size))
+
+        try:
+            problems = self._base.downloadPkgs(pkgs, callback_total=record_downloaded)
+        except pkgmanager.Errors.YumBaseError as e:
+            problems = {None: [str(e)]}
+
+        if problems:
+            for errors in problems.values():
+                for error in errors:
+                    loggerinst.debug("Got the following download error: %s", error)
+            loggerinst.critical("Failed to download the transaction packages.")
+
+        statistics.finish()
+        statistics.log_summary()
+
+    def _stage_payload(self):
+        """Stage the packages of the transaction along with the RHEL kernel.
+
+        The latest RHEL kernel is installed after the transaction, so it is
+        downloaded here to be staged as well.
+        """
+        try:
+            kernel = self._base.pkgSack.returnNewestByName("kernel")[0]
+        except pkgmanager.Errors.PackageSackError:
+            kernel = None
+
+        if kernel and self._base.downloadPkgs([kernel]):
+            loggerinst.warning("Unable to download the RHEL kernel to stage it.")
+            kernel = None
+
+        self._stage_downloaded_packages(self._get_install_pkgs(), kernel)
+
+    def _process_transaction(self, validate_transaction, timings=None):
         """Internal method to process the transaction.
 
         :param validate_transaction: Determines if the transaction needs to be
             validated or not.
         :type validate_transaction: bool
+        :param timings: Where to record the timings of the transaction. When
+            given, reporting them is left to the caller.
+        :type timings: TransactionTimings | None
         :raises SystemExit: If we can't process the transaction.
         """
 
@@ -273,9 +431,10 @@ class YumTransactionHandler(TransactionHandlerBase):
                 system_info.name,
             )
 
+        transaction_timings = timings if timings is not None else TransactionTimings()
         try:
             self._base.processTransaction(
-                rpmDisplay=TransactionDisplayCallback(),
+                rpmDisplay=TransactionDisplayCallback(transaction_timings),
             )
         except pkgmanager.Errors.YumBaseError as e:
             # We are catching only `pkgmanager.Errors.YumBaseError` as the base
@@ -296,8 +455,66 @@ class YumTransactionHandler(TransactionHandlerBase):
 
         if validate_transaction:
             loggerinst.info("Successfully validated the yum transaction set.")
+            loggerinst.info("Peak memory usage while validating the transaction: %s." % format_size(get_peak_memory()))
         else:
             loggerinst.info("System packages replaced successfully.")
+            if timings is None:
+                loggerinst.info("Peak memory usage while replacing the packages: %s." % format_size(get_peak_memory()))
+                transaction_timings.finish()
+                transaction_timings.log_summary()
+                transaction_timings.write()
+
+    def _get_install_nevras(self):
+        """Return the NEVRAs of the packages that the resolved transaction installs.
+
+        :rtype: set[str]
+        """
+        return set(get_pkg_nevra(pkg, include_zero_epoch=True) for pkg in self._get_install_pkgs())
+
+    def _get_install_pkgs_dependencies(self):
+        """Describe the dependencies of the packages that the resolved transaction installs.
+
+        Only the files listed in the primary metadata are read, loading the
+        filelists of the repositories would take more memory than the chunks
+        save.
+
+        :return: For each package, its name.arch, its NEVRA, the names of
+            what it requires and the names of what it provides, files included.
+        :rtype: list[tuple[str, str, set[str], set[str]]]
+        """
+        packages = []
+        for pkg in self._get_install_pkgs():
+            provides = set(pkg.provides_names)
+            provides.update(pkg.returnFileEntries(primary_only=True))
+            packages.append(
+                (
+                    "%s.%s" % (pkg.name, pkg.arch),
+                    get_pkg_nevra(pkg, include_zero_epoch=True),
+                    set(pkg.requires_names),
+                    provides,
+                )
+            )
+
+        return packages
+
+    def _prepare_chunk(self, original_os_pkgs):
+        """Mark and resolve a transaction replacing only some of the original packages.
+
+        The previous base is closed first, so that the memory it holds is
+        released and the installed packages are read again.
+
+        :param original_os_pkgs: The original packages to replace, as
+            name.arch.
+        :type original_os_pkgs: list[str]
+        :raises SystemExit: If the transaction can't be resolved or its
+            packages downloaded.
+        """
+        self._close_yum_base()
+        self._perform_operations(original_os_pkgs)
+        if not self._resolve_dependencies(validate_transaction=False):
+            loggerinst.critical("Failed to resolve dependencies in the transaction.")
+
+        self._download_packages()
 
     @utils.run_as_child_process
     def run_transaction(self, validate_transaction=False):
@@ -342,6 +559,9 @@ class YumTransactionHandler(TransactionHandlerBase):
             This might be optimized in the future, but for now, it's somewhat
             reliable.
 
+            The validated transaction is saved, and replayed when the
+            transaction is executed later on, if nothing it depends on changed.
+
         :param vaidate_transaction: Determines if the transaction needs to be
             validated or not.
         :type validate_transaction: bool
@@ -351,7 +571,11 @@ class YumTransactionHandler(TransactionHandlerBase):
         # Do not allow this to loop until eternity.
         attempts = 0
         try:
-            while attempts <= MAX_NUM_OF_ATTEMPTS_TO_RESOLVE_DEPS:
+            staging.restore(staging.TRANSACTION)
+            if not validate_transaction and self._replay_transaction():
+                resolve_deps_finished = True
+
+            while not resolve_deps_finished and attempts <= MAX_NUM_OF_ATTEMPTS_TO_RESOLVE_DEPS:
                 self._perform_operations()
                 resolved = self._resolve_dependencies(validate_transaction)
                 if not resolved:
@@ -364,6 +588,23 @@ class YumTransactionHandler(TransactionHandlerBase):
             if not resolve_deps_finished:
                 loggerinst.critical("Failed to resolve dependencies in the transaction.")
 
-            self._process_transaction(validate_transaction)
+            if validate_transaction:
+                self._save_transaction()
+
+            try:
+                self._download_packages()
+                if validate_transaction and tool_opts.prestage:
+                    self._stage_payload()
+
+                if validate_transaction:
+                    self._process_transaction(validate_transaction)
+                else:
+                    self._process_replacement_transaction(get_system_packages_for_replacement())
+            except SystemExit:
+                self._remove_transaction_record()
+                raise
+
+            if not validate_transaction:
+                self._remove_transaction_record()
         finally:
             self._close_yum_base()
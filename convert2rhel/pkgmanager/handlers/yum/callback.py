@@ -59,6 +59,7 @@
 import logging
 
 from convert2rhel import pkgmanager
+from convert2rhel.pkgmanager.handlers.base import DownloadStatistics, TransactionTimings
 
 
 loggerinst = logging.getLogger(__name__)
@@ -69,13 +70,18 @@ loggerinst = logging.getLogger(__name__)
 class PackageDownloadCallback(pkgmanager.DownloadProgress, object):
     """Package download callback for YUM transaction."""
 
-    def __init__(self):
+    def __init__(self, statistics=None):
         """Constructor for the package download progress indicator.
 
         We initialize a few properties here for keeping track of progression of
         the downloaded files.
+
+        :param statistics: Where to record the size and the duration of the
+            download of each package.
+        :type statistics: DownloadStatistics | None
         """
         super(PackageDownloadCallback, self).__init__()
+        self.statistics = statistics if statistics else DownloadStatistics()
         # Same strategy as used in yum.rpmtrans.SimpleCliCallBack. We
         # hold the last package name to not print it twice, avoiding
         # spamming msgs.
@@ -105,18 +111,30 @@ class PackageDownloadCallback(pkgmanager.DownloadProgress, object):
             # Metadata download abut repositories will be sent to this class too.
             if name.endswith(".rpm"):
                 loggerinst.info("Downloading package: %s", name)
+                self.statistics.package_started(name)
             else:
                 loggerinst.debug("Downloading repository metadata: %s", name)
 
+        # yum reports the download of a file as complete once, with the
+        # number of bytes read kept by the meter.
+        if name.endswith(".rpm") and frac >= 1 and name not in self.statistics.sizes:
+            self.statistics.package_finished(name, getattr(self, "last_amount_read", None) or 0)
+
         self.last_package_seen = name
 
 
 class TransactionDisplayCallback(pkgmanager.TransactionDisplay, object):
     """Transaction display callback for YUM transaction."""
 
-    def __init__(self):
-        """Constructor that overrides initialization for SimpleCliCallBack()."""
+    def __init__(self, timings=None):
+        """Constructor that overrides initialization for SimpleCliCallBack().
+
+        :param timings: Where to record how long each package of the
+            transaction takes.
+        :type timings: TransactionTimings | None
+        """
         super(TransactionDisplayCallback, self).__init__()
+        self.timings = timings if timings else TransactionTimings()
         # Hold the last package name to not print it twice, avoiding
         # spamming msgs.
         self.last_package_seen = None
@@ -154,6 +172,8 @@ class TransactionDisplayCallback(pkgmanager.TransactionDisplay, object):
         # different.
         package = str(package)
 
+        self.timings.event(package, self.action[action])
+
         message = message % (self.action[action], package, ts_current, ts_total)
 
         # The base API will call this callback class on every package update,
@@ -167,6 +187,9 @@ class TransactionDisplayCallback(pkgmanager.TransactionDisplay, object):
     def scriptout(self, package, msgs):
         """Hook for reporting output from an rpm scriptlet.
 
+        yum reports the output once a package is installed or erased, after
+        its scriptlets ran, so the current event of the transaction ends here.
+
         .. note::
             If there is no problem reported during the scriptlet execution,
             then this method will receive a None instead of the normal message.
@@ -176,6 +199,8 @@ class TransactionDisplayCallback(pkgmanager.TransactionDisplay, object):
         :param msgs: The scriptlet output
         :type msgs: str | None
         """
+        self.timings.end_event()
+
         # The base API will call this callback class on every package update,
         # no matter if the messages are empty or not, so, the below statement
         # prevents the same message being sent to the user with empty strings.
@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Backups of installed packages rebuilt from the rpm database.
+
+Downloading the backup of a package needs the repositories of the original
+vendor to be reachable and to still publish the installed version.  When the
+download fails, a package whose files are unchanged on the disk, as verified
+with ``rpm -V``, is instead rebuilt from its header in the rpm database and
+its installed files, without any network access.
+
+The rpm database keeps the header of a package as it was built, in its
+immutable region.  The rebuilt package has that header, except for the
+payload: the installed files are archived again and compressed with gzip,
+and the digests of the payload in the header are updated to match.  The
+rebuilt package is not signed, its digests are checked with ``rpm -K``
+before it is used.
+
+As the rebuilt packages are not signed, a rollback fails to install them
+where rpm is set to verify signatures, for instance with
+``%_pkgverify_level signature``.  That is why the original packages are
+always downloaded first.
+"""
+
+__metaclass__ = type
+
+import gzip
+import hashlib
+import logging
+import os
+import stat
+import struct
+
+from multiprocessing.pool import ThreadPool
+
+import rpm
+
+from convert2rhel import utils
+
+
+loggerinst = logging.getLogger(__name__)
+
+#: Maximum number of packages rebuilt at the same time.
+MAX_PARALLEL_REPACKAGES = 4
+
+_LEAD_MAGIC = b"\xed\xab\xee\xdb"
+_HEADER_MAGIC = b"\x8e\xad\xe8\x01\x00\x00\x00\x00"
+_CPIO_MAGIC = "070701"
+_CPIO_TRAILER = b"TRAILER!!!"
+
+# Types of the entries of a header.
+_CHAR = 1
+_INT8 = 2
+_INT16 = 3
+_INT32 = 4
+_INT64 = 5
+_STRING = 6
+_BIN = 7
+_STRING_ARRAY = 8
+_I18NSTRING = 9
+
+_TYPE_FORMATS = {_CHAR: "B", _INT8: "B", _INT16: "H", _INT32: "I", _INT64: "Q"}
+
+# Tags of the region entries.
+_HEADERSIGNATURES = 62
+_HEADERIMMUTABLE = 63
+
+# Tags of the signature header.
+_SIGTAG_SHA1 = 269
+_SIGTAG_SHA256 = 273
+_SIGTAG_SIZE = 1000
+_SIGTAG_MD5 = 1004
+_SIGTAG_PAYLOADSIZE = 1007
+
+# Tags of the header.
+_NAME = 1000
+_VERSION = 1001
+_RELEASE = 1002
+_EPOCH = 1003
+_ARCH = 1022
+_FILESTATES = 1029
+_FILEMODES = 1030
+_FILEMTIMES = 1034
+_FILEFLAGS = 1037
+_ARCHIVESIZE = 1046
+_FILEDEVICES = 1095
+_FILEINODES = 1096
+_PREFIXES = 1098
+_INSTPREFIXES = 1099
+_DIRINDEXES = 1116
+_BASENAMES = 1117
+_DIRNAMES = 1118
+_PAYLOADCOMPRESSOR = 1125
+_PAYLOADFLAGS = 1126
+_LONGARCHIVESIZE = 271
+_PAYLOADDIGEST = 5092
+_PAYLOADDIGESTALGO = 5093
+_PAYLOADDIGESTALT = 5097
+
+_FILE_GHOST = 1 << 6
+_FILE_STATE_NORMAL = 0
+
+#: The digest algorithms of the payload, by their id in the header.
+_DIGEST_ALGORITHMS = {1: "md5", 2: "sha1", 8: "sha256", 9: "sha384", 10: "sha512"}
+
+# cpio archives in the "newc" format can't hold files of 4 GiB or more.
+_MAX_FILE_SIZE = 1 << 32
+
+
+class RepackageError(Exception):
+    """Raised when a package can't be rebuilt from the rpm database."""
+
+
+def _get_data_length(entry_type, count, data, offset):
+    if entry_type == _STRING:
+        return data.index(b"\0", offset) - offset + 1
+    if entry_type in (_STRING_ARRAY, _I18NSTRING):
+        end = offset
+        for _ in range(count):
+            end = data.index(b"\0", end) + 1
+        return end - offset
+    if entry_type in _TYPE_FORMATS:
+        return count * struct.calcsize(">" + _TYPE_FORMATS[entry_type])
+    return count
+
+
+def _parse_header(blob, region_tag=_HEADERIMMUTABLE):
+    """
+    Parse a header, as exported by the rpm database.
+
+    :param blob: The header, with or without its magic.
+    :type blob: bytes
+    :param region_tag: The tag of the region, :data:`_HEADERSIGNATURES` for
+        a signature header.
+    :type region_tag: int
+    :returns: 2-tuple of the entries of the immutable region, the header of
+        the package as it was built, and of the entries added when the
+        package was installed.  Entries are ``(type, count, data)`` tuples by
+        tag.
+    :rtype: tuple(dict[int, tuple], dict[int, tuple])
+    :raises RepackageError: When the header has no immutable region.
+    """
+    if blob.startswith(_HEADER_MAGIC):
+        blob = blob[len(_HEADER_MAGIC) :]
+    index_length, data_length = struct.unpack(">ii", blob[:8])
+    data_start = 8 + index_length * 16
+    data = blob[data_start : data_start + data_length]
+    index = [struct.unpack(">iiii", blob[8 + number * 16 : 24 + number * 16]) for number in range(index_length)]
+
+    regions = [entry for entry in index if entry[0] == region_tag]
+    if not regions:
+        raise RepackageError("The header has no immutable region.")
+    region_length = regions[0][2] + 16
+
+    immutable = {}
+    installed = {}
+    for tag, entry_type, offset, count in index:
+        if tag == region_tag:
+            continue
+        length = _get_data_length(entry_type, count, data, offset)
+        entries = immutable if offset < region_length else installed
+        entries[tag] = (entry_type, count, data[offset : offset + length])
+    return immutable, installed
+
+
+def _build_header(entries, region_tag=_HEADERIMMUTABLE):
+    """
+    Build a header whose entries are all in its immutable region.
+
+    :param entries: The entries, ``(type, count, data)`` tuples by tag.
+    :type entries: dict[int, tuple]
+    :param region_tag: The tag of the region, :data:`_HEADERSIGNATURES` for
+        a signature header.
+    :type region_tag: int
+    :returns: The header, with its magic.
+    :rtype: bytes
+    """
+    index = []
+    data = bytearray()
+    for tag in sorted(entries):
+        entry_type, count, value = entries[tag]
+        data.extend(b"\0" * (-len(data) % struct.calcsize(">" + _TYPE_FORMATS.get(entry_type, "B"))))
+        index.append(struct.pack(">iiii", tag, entry_type, len(data), count))
+        data.extend(value)
+
+    # The region entry comes first and points to a trailer at the end of the
+    # data, which tells how many entries the region has.
+    index.insert(0, struct.pack(">iiii", region_tag, _BIN, len(data), 16))
+    data.extend(struct.pack(">iiii", region_tag, _BIN, -len(index) * 16, 16))
+    return _HEADER_MAGIC + struct.pack(">ii", len(index), len(data)) + b"".join(index) + bytes(data)
+
+
+def _get_strings(entry):
+    return entry[2].split(b"\0")[: entry[1]]
+
+
+def _get_numbers(entry):
+    return list(struct.unpack(">%d%s" % (entry[1], _TYPE_FORMATS[entry[0]]), entry[2]))
+
+
+def _string_entry(value):
+    return (_STRING, 1, value + b"\0")
+
+
+def _number_entry(entry_type, value):
+    return (entry_type, 1, struct.pack(">" + _TYPE_FORMATS[entry_type], value))
+
+
+def _get_nvra(immutable):
+    """Get the name-version-release.arch of a package from its header."""
+    return "%s-%s-%s.%s" % tuple(
+        _get_strings(immutable[tag])[0].decode("utf-8") for tag in (_NAME, _VERSION, _RELEASE, _ARCH)
+    )
+
+
+def _get_files(immutable, installed):
+    """
+    Get the files of the payload of a package.
+
+    :returns: For each file, in the order of the header, a 5-tuple of its
+        path, mode, modification time, the index of its set of hard links
+        and the number of files in that set.
+    :rtype: list[tuple(bytes, int, int, int, int)]
+    :raises RepackageError: When a file of the package is not installed.
+    """
+    if _BASENAMES not in immutable:
+        return []
+
+    if _PREFIXES in immutable and installed.get(_INSTPREFIXES, immutable[_PREFIXES]) != immutable[_PREFIXES]:
+        raise RepackageError("The package was installed in a different location than it was built for.")
+
+    dirnames = _get_strings(immutable[_DIRNAMES])
+    paths = [
+        dirnames[index] + basename
+        for index, basename in zip(_get_numbers(immutable[_DIRINDEXES]), _get_strings(immutable[_BASENAMES]))
+    ]
+    flags = _get_numbers(immutable[_FILEFLAGS])
+    states = _get_numbers(installed[_FILESTATES]) if _FILESTATES in installed else [_FILE_STATE_NORMAL] * len(paths)
+    modes = _get_numbers(immutable[_FILEMODES])
+    mtimes = _get_numbers(immutable[_FILEMTIMES])
+    inodes = list(zip(_get_numbers(immutable[_FILEDEVICES]), _get_numbers(immutable[_FILEINODES])))
+
+    files = []
+    for number, path in enumerate(paths):
+        # Ghost files are not part of the payload.
+        if flags[number] & _FILE_GHOST:
+            continue
+        if states[number] != _FILE_STATE_NORMAL:
+            raise RepackageError("%s was not installed with the package." % path.decode("utf-8", "replace"))
+        # Regular files with the same device and inode in the header are
+        # hard links of each other.
+        link_set = inodes[number] if stat.S_ISREG(modes[number]) else ("file", number)
+        files.append((path, modes[number], mtimes[number], link_set))
+
+    link_indexes = {}
+    link_counts = {}
+    for file_info in files:
+        link_indexes.setdefault(file_info[3], len(link_indexes) + 1)
+        link_counts[file_info[3]] = link_counts.get(file_info[3], 0) + 1
+    return [(path, mode, mtime, link_indexes[link_set], link_counts[link_set]) for path, mode, mtime, link_set in files]
+
+
+class _DigestWriter:
+    """File object that digests and counts the bytes written to another one."""
+
+    def __init__(self, handler, algorithm):
+        self._handler = handler
+        self.digest = hashlib.new(algorithm)
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        self._handler.write(data)
+
+    def flush(self):
+        self._handler.flush()
+
+
+def _write_cpio_entry(handler, name, inode, mode, nlink, mtime, size):
+    name += b"\0"
+    fields = (inode, mode, 0, 0, nlink, mtime, size, 0, 0, 0, 0, len(name), 0)
+    header = (_CPIO_MAGIC + "".join("%08x" % field for field in fields)).encode("ascii") + name
+    handler.write(header + b"\0" * (-len(header) % 4))
+
+
+def _write_payload(files, handler):
+    """
+    Archive installed files in the cpio format of the payload of a package.
+
+    The content of a set of hard links is only in the last of its files.
+
+    :param files: The files, as returned by :func:`_get_files`.
+    :type files: list[tuple]
+    :param handler: File object the archive is written to.
+    """
+    written_links = {}
+    for path, mode, mtime, link_index, link_count in files:
+        written_links[link_index] = written_links.get(link_index, 0) + 1
+        content = b""
+        size = 0
+        if stat.S_ISLNK(mode):
+            content = os.readlink(path)
+            size = len(content)
+        elif stat.S_ISREG(mode) and written_links[link_index] == link_count:
+            size = os.path.getsize(path)
+            if size >= _MAX_FILE_SIZE:
+                raise RepackageError("%s is too large to be archived." % path.decode("utf-8", "replace"))
+
+        _write_cpio_entry(handler, b"." + path, link_index, mode, link_count, mtime, size)
+        if content:
+            handler.write(content)
+        elif size:
+            with open(path, "rb") as file_handler:
+                for chunk in iter(lambda file_handler=file_handler: file_handler.read(1024 * 1024), b""):
+                    handler.write(chunk)
+        handler.write(b"\0" * (-size % 4))
+
+    _write_cpio_entry(handler, _CPIO_TRAILER, 0, 0, 1, 0, 0)
+
+
+def _build_lead(nvr):
+    return struct.pack(">4sBBhh66shh16s", _LEAD_MAGIC, 3, 0, 0, 1, nvr.encode("utf-8")[:65], 1, 5, b"")
+
+
+def _repackage_pkg(pkg, blob, dest):
+    """
+    Rebuild an installed package.
+
+    :returns: The path to the rebuilt package.
+    :rtype: str
+    :raises RepackageError: When the package can't be rebuilt.
+    """
+    immutable, installed = _parse_header(blob)
+    nvra = _get_nvra(immutable)
+
+    output, ret_code = utils.run_subprocess(
+        ["rpm", "-V", "--nodeps", "--noscripts", "--nomtime", "--nomode", "--nouser", "--nogroup", "--nordev"]
+        + ["--nocaps", nvra],
+        print_cmd=False,
+        print_output=False,
+    )
+    if ret_code != 0:
+        raise RepackageError("The files of %s have changed since it was installed:\n%s" % (pkg, output.strip()))
+
+    files = _get_files(immutable, installed)
+    path = os.path.join(dest, "%s.rpm" % nvra)
+    payload_path = path + ".payload"
+    algorithm = _DIGEST_ALGORITHMS.get(
+        _get_numbers(immutable[_PAYLOADDIGESTALGO])[0] if _PAYLOADDIGESTALGO in immutable else 8, "sha256"
+    )
+    try:
+        with open(payload_path, "wb") as handler:
+            compressed = _DigestWriter(handler, algorithm)
+            archive = gzip.GzipFile(filename="", mode="wb", compresslevel=6, fileobj=compressed, mtime=0)
+            uncompressed = _DigestWriter(archive, algorithm)
+            _write_payload(files, uncompressed)
+            archive.close()
+
+        if uncompressed.size >= _MAX_FILE_SIZE:
+            raise RepackageError("The payload of %s is too large." % pkg)
+
+        immutable[_PAYLOADCOMPRESSOR] = _string_entry(b"gzip")
+        immutable[_PAYLOADFLAGS] = _string_entry(b"6")
+        if _PAYLOADDIGEST in immutable:
+            immutable[_PAYLOADDIGEST] = (_STRING_ARRAY, 1, compressed.digest.hexdigest().encode("ascii") + b"\0")
+        if _PAYLOADDIGESTALT in immutable:
+            immutable[_PAYLOADDIGESTALT] = (_STRING_ARRAY, 1, uncompressed.digest.hexdigest().encode("ascii") + b"\0")
+        if _ARCHIVESIZE in immutable:
+            immutable[_ARCHIVESIZE] = _number_entry(_INT32, uncompressed.size)
+        if _LONGARCHIVESIZE in immutable:
+            immutable[_LONGARCHIVESIZE] = _number_entry(_INT64, uncompressed.size)
+        header = _build_header(immutable)
+
+        signature_entries = {
+            _SIGTAG_SHA1: _string_entry(hashlib.sha1(header).hexdigest().encode("ascii")),
+            _SIGTAG_SHA256: _string_entry(hashlib.sha256(header).hexdigest().encode("ascii")),
+            _SIGTAG_SIZE: _number_entry(_INT32, len(header) + compressed.size),
+            _SIGTAG_PAYLOADSIZE: _number_entry(_INT32, uncompressed.size),
+        }
+        try:
+            checksum = hashlib.md5(header)
+        except ValueError:
+            # MD5 is not available in FIPS mode, the payload is covered by
+            # its digest in the header then.
+            checksum = None
+        if checksum:
+            with open(payload_path, "rb") as handler:
+                for chunk in iter(lambda: handler.read(1024 * 1024), b""):
+                    checksum.update(chunk)
+            signature_entries[_SIGTAG_MD5] = (_BIN, 16, checksum.digest())
+        signature = _build_header(signature_entries, region_tag=_HEADERSIGNATURES)
+
+        with open(path, "wb") as handler:
+            handler.write(_build_lead(nvra.rsplit(".", 1)[0]))
+            handler.write(signature + b"\0" * (-len(signature) % 8))
+            handler.write(header)
+            with open(payload_path, "rb") as payload_handler:
+                for chunk in iter(lambda: payload_handler.read(1024 * 1024), b""):
+                    handler.write(chunk)
+    except (IOError, OSError) as e:
+        _remove(path)
+        raise RepackageError("Unable to rebuild %s: %s" % (pkg, e))
+    finally:
+        _remove(payload_path)
+
+    output, ret_code = utils.run_subprocess(["rpm", "-K", "--nosignature", path], print_cmd=False, print_output=False)
+    if ret_code != 0:
+        _remove(path)
+        raise RepackageError("The digests of the rebuilt %s package are wrong:\n%s" % (pkg, output.strip()))
+
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _get_headers(pkgs):
+    """
+    Get the headers of installed packages from the rpm database.
+
+    :param pkgs: The packages, as name-version-release.arch with or without
+        an epoch, like the package managers print them.
+    :type pkgs: list[str]
+    :returns: The headers of the packages that are installed, as exported
+        by the rpm database.
+    :rtype: dict[str, bytes]
+    """
+    wanted = set(pkgs)
+    headers = {}
+    transaction_set = rpm.TransactionSet()
+    for header in transaction_set.dbMatch():
+        # Older rpm bindings return bytes on Python 3.
+        name, version, release, arch = [
+            value.decode("utf-8") if isinstance(value, bytes) and str is not bytes else value
+            for value in (
+                header[_NAME],
+                header[_VERSION],
+                header[_RELEASE],
+                header[_ARCH],
+            )
+        ]
+        epoch = header[_EPOCH]
+        nvra = "%s-%s-%s.%s" % (name, version, release, arch)
+        names = [nvra, "%s:%s" % (epoch or 0, nvra), "%s-%s:%s-%s.%s" % (name, epoch or 0, version, release, arch)]
+        for pkg in wanted.intersection(names):
+            headers[pkg] = header.unload()
+    return headers
+
+
+def repackage_pkgs(pkgs, dest):
+    """
+    Rebuild installed packages from the rpm database and their installed files.
+
+    Up to :data:`MAX_PARALLEL_REPACKAGES` packages are rebuilt at the same
+    time.
+
+    :param pkgs: The packages, as name-version-release.arch with or without
+        an epoch.
+    :type pkgs: list[str]
+    :param dest: Directory to write the rebuilt packages to.
+    :type dest: str
+    :returns: The paths to the rebuilt packages, by package.  Packages that
+        couldn't be rebuilt are left out.
+    :rtype: dict[str, str]
+    """
+    try:
+        headers = _get_headers(pkgs)
+    except rpm.error as e:
+        loggerinst.warning("Unable to read the rpm database to rebuild the packages: %s" % e)
+        return {}
+
+    def _repackage(pkg):
+        try:
+            return pkg, _repackage_pkg(pkg, headers[pkg], dest)
+        except RepackageError as e:
+            loggerinst.debug("Unable to rebuild %s from the rpm database: %s" % (pkg, e))
+            return pkg, None
+
+    if not headers:
+        return {}
+
+    pool = ThreadPool(min(MAX_PARALLEL_REPACKAGES, len(headers)))
+    try:
+        results = pool.map(_repackage, sorted(headers))
+    finally:
+        pool.close()
+        pool.join()
+
+    repackaged = {}
+    for pkg, path in results:
+        if path:
+            loggerinst.info("Backed up %s by rebuilding it from the rpm database." % pkg)
+            repackaged[pkg] = path
+    return repackaged
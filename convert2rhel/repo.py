@@ -15,18 +15,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import glob
+import hashlib
 import logging
 import os
-import shutil
+import re
 
+from convert2rhel.backup_store import file_store
 from convert2rhel.systeminfo import system_info
-from convert2rhel.utils import BACKUP_DIR, DATA_DIR
+from convert2rhel.utils import DATA_DIR
 
 
 DEFAULT_YUM_REPOFILE_DIR = "/etc/yum.repos.d/"
 DEFAULT_YUM_VARS_DIR = "/etc/yum/vars"
 DEFAULT_DNF_VARS_DIR = "/etc/dnf/vars"
 
+#: Where dnf and yum keep the repomd.xml of a repository, by repoid.
+DNF_REPOMD_GLOB = "/var/cache/dnf/%s-*/repodata/repomd.xml"
+YUM_REPOMD_GLOB = "/var/cache/yum/*/*/%s/repomd.xml"
+
+# dnf appends a hash of the repository configuration to the name of the cache
+# directory of the repository.
+_DNF_CACHEDIR_RE = re.compile(r"^(?P<repoid>.+)-[0-9a-f]{16}$")
+
 loggerinst = logging.getLogger(__name__)
 
 
@@ -55,7 +66,7 @@ def backup_yum_repos():
     for repo in os.listdir(DEFAULT_YUM_REPOFILE_DIR):
         if repo.endswith(".repo") and repo != "redhat.repo":
             repo_path = os.path.join(DEFAULT_YUM_REPOFILE_DIR, repo)
-            shutil.copy2(repo_path, BACKUP_DIR)
+            file_store.backup(repo_path)
             loggerinst.debug("Backed up .repo file: %s" % repo_path)
             repo_files_backed_up = True
     if not repo_files_backed_up:
@@ -67,13 +78,12 @@ def restore_yum_repos():
     """Rollback all .repo files in /etc/yum.repos.d/ that were backed up."""
     loggerinst.task("Rollback: Restore .repo files to /etc/yum.repos.d/")
     repo_has_restored = False
-    for repo in os.listdir(BACKUP_DIR):
-        if repo.endswith(".repo"):
-            repo_path_from = os.path.join(BACKUP_DIR, repo)
-            repo_path_to = os.path.join("/etc/yum.repos.d/", repo)
-            shutil.move(repo_path_from, repo_path_to)
-            loggerinst.info("Restored .repo file: %s" % (repo))
-            repo_has_restored = True
+    for repo_path in file_store.get_backed_up_paths(DEFAULT_YUM_REPOFILE_DIR):
+        if file_store.restore(repo_path):
+            loggerinst.info("Restored .repo file: %s" % os.path.basename(repo_path))
+        else:
+            loggerinst.debug("The .repo file %s hasn't changed since the backup." % os.path.basename(repo_path))
+        repo_has_restored = True
 
     if not repo_has_restored:
         loggerinst.info("No .repo files to rollback")
@@ -114,13 +124,9 @@ def backup_varsdir():
         :type path: str
         """
         variable_files_backed_up = False
-        backup_dir = os.path.join(BACKUP_DIR, path.rsplit("/etc/")[-1])
         for variable in os.listdir(path):
             variable_path = os.path.join(path, variable)
-            # Create the directory if it doesn't exist
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            shutil.copy2(variable_path, backup_dir)
+            file_store.backup(variable_path)
             loggerinst.debug("Backed up variable file: %s" % variable_path)
             variable_files_backed_up = True
 
@@ -146,22 +152,17 @@ def restore_varsdir():
         :type path: str
         """
         variables_is_restored = False
-        backup_dir = os.path.join(BACKUP_DIR, path.rsplit("/etc/")[-1])
-
-        if not os.path.exists(backup_dir):
-            loggerinst.warning("Couldn't find backup directory at %s.", backup_dir)
-            return
-
-        for variable in os.listdir(backup_dir):
-            variable_path_from = os.path.join(backup_dir, variable)
-            variable_path_to = os.path.join(path, variable)
-
-            shutil.move(variable_path_from, variable_path_to)
-            loggerinst.info("Restored variable file: %s" % (variable))
+        for variable_path in file_store.get_backed_up_paths(path):
+            if file_store.restore(variable_path):
+                loggerinst.info("Restored variable file: %s" % os.path.basename(variable_path))
+            else:
+                loggerinst.debug(
+                    "The variable file %s hasn't changed since the backup." % os.path.basename(variable_path)
+                )
             variables_is_restored = True
 
         if not variables_is_restored:
-            loggerinst.info("No varaibles files to rollback")
+            loggerinst.info("No variables files to rollback.")
 
     loggerinst.task("Rollback: Restore variable files to %s", DEFAULT_YUM_VARS_DIR)
     _restore_varsdir(DEFAULT_YUM_VARS_DIR)
@@ -169,3 +170,41 @@ def restore_varsdir():
     if system_info.version.major == 8:
         loggerinst.task("Rollback: Restore variable files to %s", DEFAULT_DNF_VARS_DIR)
         _restore_varsdir(DEFAULT_DNF_VARS_DIR)
+
+
+def _find_repomd(repoid):
+    """Return the path to the cached repomd.xml of a repository, None if there is none."""
+    for path in sorted(glob.glob(DNF_REPOMD_GLOB % repoid)):
+        # The glob also matches the repositories whose id starts with this one
+        # followed by a dash.
+        match = _DNF_CACHEDIR_RE.match(os.path.basename(os.path.dirname(os.path.dirname(path))))
+        if match and match.group("repoid") == repoid:
+            return path
+
+    paths = glob.glob(YUM_REPOMD_GLOB % repoid)
+    return sorted(paths)[0] if paths else None
+
+
+def repomd_fingerprint(repoids):
+    """Identify the content of repositories by the checksums of their repomd.xml.
+
+    :param repoids: The ids of the repositories.
+    :type repoids: Iterable[str]
+    :returns: Mapping of each repoid to the sha256 checksum of its cached
+        repomd.xml.  None when the metadata of any of the repositories has
+        not been downloaded.
+    :rtype: dict[str, str] | None
+    """
+    fingerprint = {}
+    for repoid in repoids:
+        path = _find_repomd(repoid)
+        if not path:
+            return None
+
+        try:
+            with open(path, "rb") as handler:
+                fingerprint[repoid] = hashlib.sha256(handler.read()).hexdigest()
+        except (IOError, OSError):
+            return None
+
+    return fingerprint
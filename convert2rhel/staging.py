@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Packages staged ahead of the conversion.
+
+With --prestage, the packages that the conversion installs are copied to
+:data:`STAGING_DIR` as they get downloaded, and a manifest records their
+checksums.  It is meant to be used when analyzing the system, so that the
+packages are already on the system when it is converted.
+
+Whenever the packages are needed again, the staged copies are verified
+against the manifest and put back where they were downloaded to.  yum and
+dnf then find the packages in their cache, and subscription-manager in
+:data:`convert2rhel.subscription.SUBMGR_RPMS_DIR`, instead of downloading
+them.
+"""
+
+__metaclass__ = type
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from convert2rhel import __version__, utils
+from convert2rhel.systeminfo import system_info
+
+
+logger = logging.getLogger(__name__)
+
+#: Directory in which the packages are staged.
+STAGING_DIR = os.path.join(utils.TMP_DIR, "staged-payload")
+
+#: Manifest of the staged packages.
+MANIFEST_FILE = os.path.join(STAGING_DIR, "manifest.json")
+
+#: Version of the format of :data:`MANIFEST_FILE`.
+_MANIFEST_FORMAT = 1
+
+#: The packages of the transaction replacing the original packages.
+TRANSACTION = "transaction"
+#: The RHEL kernel installed after the transaction.
+KERNEL = "kernel"
+#: The RHEL subscription-manager packages.
+SUBSCRIPTION_MANAGER = "subscription-manager"
+
+
+def _get_checksum(path):
+    checksum = hashlib.sha256()
+    with open(path, "rb") as handler:
+        for chunk in iter(lambda: handler.read(1024 * 1024), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def load_manifest():
+    """
+    Read the manifest of the staged packages.
+
+    :returns: For each part of the payload, like :data:`TRANSACTION`, the
+        staged packages by file name.  Empty when nothing usable is staged.
+    :rtype: dict[str, dict[str, dict[str, Any]]]
+    """
+    try:
+        with open(MANIFEST_FILE) as handler:
+            data = json.load(handler)
+    except (IOError, OSError, ValueError):
+        logger.debug("No staged packages found in %s." % STAGING_DIR)
+        return {}
+
+    if data.get("format") != _MANIFEST_FORMAT or data.get("convert2rhel_version") != __version__:
+        logger.debug("Ignoring the packages staged by a different version of convert2rhel.")
+        return {}
+
+    if data.get("releasever") != system_info.releasever:
+        logger.info("Ignoring the packages staged for RHEL %s." % data.get("releasever"))
+        return {}
+
+    return data.get("payload", {})
+
+
+def _save_manifest(payload):
+    data = {
+        "format": _MANIFEST_FORMAT,
+        "convert2rhel_version": __version__,
+        "releasever": system_info.releasever,
+        "payload": payload,
+    }
+    utils.write_json_object_to_file(MANIFEST_FILE, data)
+
+
+def stage(part, paths):
+    """
+    Copy downloaded packages to the staging area.
+
+    Any package staged before for the same part of the payload is replaced.
+
+    :param part: The part of the payload, like :data:`TRANSACTION`.
+    :type part: str
+    :param paths: The downloaded packages.  They are put back at the same
+        paths by :func:`restore`.
+    :type paths: list[str]
+    """
+    part_dir = os.path.join(STAGING_DIR, part)
+    packages = {}
+    try:
+        if os.path.isdir(part_dir):
+            shutil.rmtree(part_dir)
+        utils.mkdir_p(part_dir)
+
+        for path in paths:
+            filename = os.path.basename(path)
+            staged_path = os.path.join(part_dir, filename)
+            shutil.copy2(path, staged_path)
+            packages[filename] = {
+                "sha256": _get_checksum(staged_path),
+                "size": os.path.getsize(staged_path),
+                "path": path,
+            }
+
+        payload = load_manifest()
+        payload[part] = packages
+        _save_manifest(payload)
+    except (IOError, OSError) as e:
+        logger.warning("Unable to stage the %s packages: %s" % (part, e))
+        return
+
+    logger.info("Staged %d %s packages in %s." % (len(packages), part, part_dir))
+
+
+def restore(part):
+    """
+    Put the staged packages of a part of the payload back where they were downloaded to.
+
+    Every staged package is verified against the manifest first.  Packages
+    already in place are left alone.
+
+    :param part: The part of the payload, like :data:`TRANSACTION`.
+    :type part: str
+    :returns: The paths of the restored packages.  None when nothing is
+        staged for this part of the payload or when a staged package is
+        missing or corrupted; the packages need to be downloaded then.
+    :rtype: list[str] | None
+    """
+    packages = load_manifest().get(part)
+    if not packages:
+        return None
+
+    part_dir = os.path.join(STAGING_DIR, part)
+    restored = []
+    try:
+        for filename, package in sorted(packages.items()):
+            staged_path = os.path.join(part_dir, filename)
+            if _get_checksum(staged_path) != package["sha256"]:
+                logger.warning(
+                    "The staged package %s is corrupted, the %s packages will be downloaded." % (filename, part)
+                )
+                return None
+
+            if not os.path.exists(package["path"]) or _get_checksum(package["path"]) != package["sha256"]:
+                utils.mkdir_p(os.path.dirname(package["path"]))
+                shutil.copy2(staged_path, package["path"])
+            restored.append(package["path"])
+    except (IOError, OSError) as e:
+        logger.warning("Unable to restore the staged %s packages, they will be downloaded: %s" % (part, e))
+        return None
+
+    logger.info("Using the %d %s packages staged in %s." % (len(restored), part, part_dir))
+    return restored
@@ -27,7 +27,7 @@ import dbus
 import dbus.connection
 import dbus.exceptions
 
-from convert2rhel import backup, i18n, pkghandler, utils
+from convert2rhel import backup, i18n, pkghandler, staging, utils
 from convert2rhel.redhatrelease import os_release_file
 from convert2rhel.systeminfo import system_info
 from convert2rhel.toolopts import tool_opts
@@ -598,6 +598,9 @@ def install_rhel_subscription_manager():
     # installation of subscription-manager.
     pkg_names = pkghandler.get_pkg_names_from_rpm_paths(rpms_to_install)
     pkgs_to_not_track = pkghandler.filter_installed_pkgs(pkg_names)
+    backup.changed_pkgs_control.journal_pkgs_to_install(
+        [pkg_name for pkg_name in pkg_names if pkg_name not in pkgs_to_not_track]
+    )
 
     loggerinst.info("Installing subscription-manager RPMs.")
     _, ret_code = pkghandler.call_yum_cmd(
@@ -887,11 +890,16 @@ def download_rhsm_pkgs():
     """Download all the packages necessary for a successful registration to the Red Hat Subscription Management.
 
     The packages are available in non-standard repositories, so additional repofiles need to be used. The downloaded
-    RPMs are to be installed in a later stage of the conversion.
+    RPMs are to be installed in a later stage of the conversion. The packages staged by a previous run with
+    --prestage are used instead when they are intact.
     """
     if tool_opts.keep_rhsm:
         loggerinst.info("Skipping due to the use of --keep-rhsm.")
         return
+
+    if staging.restore(staging.SUBSCRIPTION_MANAGER):
+        return
+
     utils.mkdir_p(_RHSM_TMP_DIR)
 
     pkgs_to_download = [
@@ -927,6 +935,9 @@ def _download_rhsm_pkgs(pkgs_to_download, repo_path, repo_content):
     _log_rhsm_download_directory_contents(SUBMGR_RPMS_DIR, "after RHEL rhsm packages download")
     exit_on_failed_download(paths)
 
+    if tool_opts.prestage:
+        staging.stage(staging.SUBSCRIPTION_MANAGER, paths)
+
 
 def _log_rhsm_download_directory_contents(directory, when_message):
     pkgs = ["<download directory does not exist>"]
@@ -18,6 +18,7 @@ import difflib
 import logging
 import os
 import re
+import threading
 import time
 
 from collections import namedtuple
@@ -59,6 +60,18 @@ EUS_MINOR_VERSIONS = ["8.6"]
 
 Version = namedtuple("Version", ["major", "minor"])
 
+# Kernel modules loaded on the system: one line per module, taint flags in parentheses at the end
+PROC_MODULES = "/proc/modules"
+
+# Directory with the kernel modules of each kernel release, including their modules.dep and modules.builtin indexes
+KERNEL_MODULES_DIR = "/lib/modules"
+
+# A kernel module loaded on the system. The path is the absolute path to the file of the module (None when it could
+# not be found) and taints are its taint flags, e.g. "OE" ("" for modules which do not taint the kernel).
+LoadedKernelModule = namedtuple("LoadedKernelModule", ["name", "path", "taints"])
+
+loggerinst = logging.getLogger(__name__)
+
 
 class SystemInfo(object):
     def __init__(self):
@@ -102,6 +115,9 @@ class SystemInfo(object):
         self.kmods_to_ignore = []
         # Booted kernel VRA (version, release, architecture), e.g. "4.18.0-240.22.1.el8_3.x86_64"
         self.booted_kernel = ""
+        # Kernel modules loaded on the system, see get_loaded_kmods()
+        self._loaded_kmods = None
+        self._loaded_kmods_lock = threading.Lock()
 
     def resolve_system_info(self):
         self.logger = logging.getLogger(__name__)
@@ -280,6 +296,21 @@ class SystemInfo(object):
         self.logger.debug("Booted kernel VRA (version, release, architecture): {0}".format(kernel_vra))
         return kernel_vra
 
+    def get_loaded_kmods(self):
+        """Get the kernel modules loaded on the system.
+
+        The modules are read from /proc/modules the first time this is called and then shared by all of the callers.
+        The paths to their files are looked up in the modules.dep and modules.builtin indexes of the booted kernel.
+        modinfo is only run for the modules missing from those.
+
+        :return: The loaded kernel modules.
+        :rtype: list[LoadedKernelModule]
+        """
+        with self._loaded_kmods_lock:
+            if self._loaded_kmods is None:
+                self._loaded_kmods = _read_loaded_kmods(self.booted_kernel)
+            return self._loaded_kmods
+
     def generate_rpm_va(self, log_filename=PRE_RPM_VA_LOG_FILENAME):
         """RPM is able to detect if any file installed as part of a package has been changed in any way after the
         package installation.
@@ -487,5 +518,82 @@ def _is_systemd_managed_dbus_running():
     return running
 
 
+def _normalize_kmod_name(name):
+    """The kernel treats dashes and underscores in the names of modules as the same character."""
+    return name.replace("-", "_")
+
+
+def _read_kmod_paths(kernel_release):
+    """Map the names of the kernel modules of a kernel release to the absolute paths to their files.
+
+    :param kernel_release: The kernel release, e.g. "4.18.0-240.22.1.el8_3.x86_64".
+    :type kernel_release: str
+    :return: Paths to the module files keyed by the normalized names of the modules.
+    :rtype: dict[str, str]
+    """
+    modules_dir = os.path.join(KERNEL_MODULES_DIR, kernel_release)
+    kmod_paths = {}
+    for index_name in ("modules.builtin", "modules.dep"):
+        index_path = os.path.join(modules_dir, index_name)
+        try:
+            with open(index_path) as index_file:
+                for line in index_file:
+                    # modules.dep: "kernel/fs/xfs/xfs.ko.xz: kernel/lib/libcrc32c.ko.xz"
+                    # modules.builtin: "kernel/fs/ext4/ext4.ko"
+                    module_path = line.split(":", 1)[0].strip()
+                    if not module_path:
+                        continue
+                    name = os.path.basename(module_path).split(".ko", 1)[0]
+                    kmod_paths[_normalize_kmod_name(name)] = os.path.join(modules_dir, module_path)
+        except (IOError, OSError) as err:
+            loggerinst.debug("Unable to read %s: %s" % (index_path, err))
+
+    return kmod_paths
+
+
+def _get_kmod_path_from_modinfo(name):
+    output, ret_code = run_subprocess(["modinfo", "-F", "filename", name], print_output=False)
+    path = output.strip()
+    if ret_code != 0 or not path.startswith("/"):
+        loggerinst.debug("Unable to find the file of the %s kernel module: %s" % (name, path))
+        return None
+    return path
+
+
+def _read_loaded_kmods(kernel_release):
+    """Read the kernel modules loaded on the system and find the files they were loaded from.
+
+    :param kernel_release: Release of the booted kernel.
+    :type kernel_release: str
+    :rtype: list[LoadedKernelModule]
+    """
+    loggerinst.debug("Getting a list of loaded kernel modules.")
+    try:
+        with open(PROC_MODULES) as proc_modules:
+            lines = proc_modules.read().splitlines()
+    except (IOError, OSError) as err:
+        loggerinst.warning("Unable to read the loaded kernel modules from %s: %s" % (PROC_MODULES, err))
+        return []
+
+    kmod_paths = _read_kmod_paths(kernel_release)
+    loaded_kmods = []
+    for line in lines:
+        # e.g. "system76_io 16384 0 - Live 0x0000000000000000 (OE)"
+        fields = line.split()
+        if not fields:
+            continue
+        name = fields[0]
+        taints = ""
+        if fields[-1].startswith("(") and fields[-1].endswith(")"):
+            taints = fields[-1][1:-1]
+
+        path = kmod_paths.get(_normalize_kmod_name(name))
+        if path is None:
+            path = _get_kmod_path_from_modinfo(name)
+        loaded_kmods.append(LoadedKernelModule(name, path, taints))
+
+    return loaded_kmods
+
+
 # Code to be executed upon module import
 system_info = SystemInfo()  # pylint: disable=C0103
@@ -32,6 +32,10 @@ loggerinst = logging.getLogger(__name__)
 # Paths for configuration files
 CONFIG_PATHS = ["~/.convert2rhel.ini", "/etc/convert2rhel.ini"]
 
+#: The most packages dnf downloads at the same time, see max_parallel_downloads
+#: in dnf.conf(5).  Applied to yum as well.
+MAX_PARALLEL_DOWNLOADS = 20
+
 #: Map name of the convert2rhel mode to run in from the command line to the
 #: activity name that we use in the code and breadcrumbs.  CLI commands should
 #: be verbs but an activity is a noun.
@@ -41,6 +45,9 @@ _COMMAND_TO_ACTIVITY = {
     "analyse": "analysis",
 }
 
+#: Command rolling back the changes of an interrupted run, see :class:`RollbackCLI`.
+ROLLBACK_COMMAND = "rollback"
+
 
 class ToolOpts(object):
     def __init__(self):
@@ -63,6 +70,19 @@ class ToolOpts(object):
         self.org = None
         self.arch = None
         self.no_rpm_va = False
+        self.no_cache = False
+        self.events_file = None
+        self.events_socket = None
+        self.fail_fast = False
+        self.cheap_first = False
+        self.prestage = False
+        self.only_actions = []
+        self.skip_actions = []
+        self.action_timeout = None
+        self.command_timeout = None
+        self.parallel_downloads = None
+        self.transaction_chunk_size = None
+        self.transaction_memory_limit = None
         self.keep_rhsm = False
         self.activity = None
 
@@ -91,13 +111,23 @@ class CLI(object):
             "\n"
             "  convert2rhel [-h]\n"
             "  convert2rhel [--version]\n"
-            "  convert2rhel [-u username] [-p password | -c conf_file_path] [--pool pool_id | -a] [--disablerepo repoid]"
-            " [--enablerepo repoid] [--serverurl url] [--keep-rhsm] [--no-rpm-va] [--debug] [--restart]"
-            " [-y]\n"
-            "  convert2rhel [--no-rhsm] [--disablerepo repoid]"
-            " [--enablerepo repoid] [--no-rpm-va] [--debug] [--restart] [-y]\n"
-            "  convert2rhel [-k activation_key | -c conf_file_path] [-o organization] [--pool pool_id | -a] [--disablerepo repoid] [--enablerepo"
-            " repoid] [--serverurl url] [--keep-rhsm] [--no-rpm-va] [--debug] [--restart] [-y]"
+            "  convert2rhel [-u username] [-p password | -c conf_file_path] [--pool pool_id | -a]"
+            " [--disablerepo repoid] [--enablerepo repoid] [--serverurl url] [--keep-rhsm] [--no-rpm-va]"
+            " [--no-cache] [--fail-fast] [--cheap-first] [--action-timeout seconds] [--command-timeout seconds]"
+            " [--parallel-downloads number] [--transaction-chunk-size number] [--transaction-memory-limit mib]"
+            " [--prestage] [--only action_id[,action_id...]] [--skip action_id[,action_id...]]"
+            " [--events-file path] [--events-socket path] [--debug] [--restart] [-y]\n"
+            "  convert2rhel [--no-rhsm] [--disablerepo repoid] [--enablerepo repoid] [--no-rpm-va] [--no-cache]"
+            " [--fail-fast] [--cheap-first] [--action-timeout seconds] [--command-timeout seconds]"
+            " [--parallel-downloads number] [--transaction-chunk-size number] [--transaction-memory-limit mib]"
+            " [--prestage] [--only action_id[,action_id...]] [--skip action_id[,action_id...]]"
+            " [--events-file path] [--events-socket path] [--debug] [--restart] [-y]\n"
+            "  convert2rhel [-k activation_key | -c conf_file_path] [-o organization] [--pool pool_id | -a]"
+            " [--disablerepo repoid] [--enablerepo repoid] [--serverurl url] [--keep-rhsm] [--no-rpm-va]"
+            " [--no-cache] [--fail-fast] [--cheap-first] [--action-timeout seconds] [--command-timeout seconds]"
+            " [--parallel-downloads number] [--transaction-chunk-size number] [--transaction-memory-limit mib]"
+            " [--prestage] [--only action_id[,action_id...]] [--skip action_id[,action_id...]]"
+            " [--events-file path] [--events-socket path] [--debug] [--restart] [-y]"
             "\n\n"
             "*WARNING* The tool needs to be run under the root user"
         )
@@ -139,6 +169,105 @@ class CLI(object):
             " to show you what rpm files have been affected by the conversion."
             % (PRE_RPM_VA_LOG_FILENAME, POST_RPM_VA_LOG_FILENAME),
         )
+        self._parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Do not reuse the results of checks from previous runs of convert2rhel. By default, the results of"
+            " expensive checks are stored in %s and reused as long as the system state they depend on has not changed."
+            % utils.TMP_DIR,
+        )
+        self._parser.add_argument(
+            "--fail-fast",
+            action="store_true",
+            help="Stop running the pre-conversion checks after the first one that fails with an error. The checks"
+            " that have not started yet are reported as skipped. Can also be set with fail_fast in the [settings]"
+            " section of the configuration file.",
+        )
+        self._parser.add_argument(
+            "--cheap-first",
+            action="store_true",
+            help="Run the quick pre-conversion checks before the slow ones, as far as the dependencies between the"
+            " checks allow. Useful together with --fail-fast. Can also be set with cheap_first in the [settings]"
+            " section of the configuration file.",
+        )
+        self._parser.add_argument(
+            "--prestage",
+            action="store_true",
+            help="Keep a verified copy of every package that the conversion installs in %s as they get downloaded."
+            " Use it when analyzing the system so that the conversion installs the staged packages instead of"
+            " downloading them. Can also be set with prestage in the [settings] section of the configuration file."
+            % os.path.join(utils.TMP_DIR, "staged-payload"),
+        )
+        self._parser.add_argument(
+            "--only",
+            metavar="ACTION_ID[,ACTION_ID...]",
+            action="append",
+            help="Only run these pre-conversion checks, along with the checks that they depend on. Can only be used"
+            " when only analyzing the system (CONVERT2RHEL_EXPERIMENTAL_ANALYSIS=1). Use this option multiple times"
+            " or separate the ids with commas to give more than one. The ids are the ones shown in the pre-conversion"
+            " analysis report.",
+        )
+        self._parser.add_argument(
+            "--skip",
+            metavar="ACTION_ID[,ACTION_ID...]",
+            action="append",
+            help="Do not run these pre-conversion checks, nor the checks that depend on them. Can only be used when"
+            " only analyzing the system (CONVERT2RHEL_EXPERIMENTAL_ANALYSIS=1). Use this option multiple times or"
+            " separate the ids with commas to give more than one.",
+        )
+        self._parser.add_argument(
+            "--action-timeout",
+            metavar="SECONDS",
+            type=int,
+            help="Stop each pre-conversion check that runs for longer than this. The commands that the check runs are"
+            " killed and the check fails with the TIMEOUT error id. Can also be set with action_timeout in the"
+            " [settings] section of the configuration file.",
+        )
+        self._parser.add_argument(
+            "--command-timeout",
+            metavar="SECONDS",
+            type=int,
+            help="Kill each command run by the pre-conversion checks that runs for longer than this. The check fails"
+            " with the TIMEOUT error id. Can also be set with command_timeout in the [settings] section of the"
+            " configuration file.",
+        )
+        self._parser.add_argument(
+            "--parallel-downloads",
+            metavar="NUMBER",
+            type=int,
+            help="Download up to this many RHEL packages at the same time during the conversion, at most %d."
+            " Defaults to the setting of dnf or yum. Can also be set with parallel_downloads in the [settings]"
+            " section of the configuration file." % MAX_PARALLEL_DOWNLOADS,
+        )
+        self._parser.add_argument(
+            "--transaction-chunk-size",
+            metavar="NUMBER",
+            type=int,
+            help="Replace the packages in several smaller transactions of about this many packages each instead of a"
+            " single one, to bound the memory used on systems with little RAM. The packages that depend on each other"
+            " are replaced in the same or in a later transaction. Can also be set with transaction_chunk_size in the"
+            " [settings] section of the configuration file.",
+        )
+        self._parser.add_argument(
+            "--transaction-memory-limit",
+            metavar="MIB",
+            type=int,
+            help="Replace the packages in transactions that use at most this many MiB of memory each. A transaction"
+            " that needs more is split before any of its packages are replaced; one that can't be split stops the"
+            " conversion, listing the packages that are left. Can be combined with --transaction-chunk-size. Can also"
+            " be set with transaction_memory_limit in the [settings] section of the configuration file.",
+        )
+        self._parser.add_argument(
+            "--events-file",
+            metavar="path",
+            help="Append a JSON object to this file for each pre-conversion check as it starts and finishes"
+            " (action_started, action_finished) and for each group of checks once it has finished (stage_finished).",
+        )
+        self._parser.add_argument(
+            "--events-socket",
+            metavar="path",
+            help="Send the same events as --events-file, one JSON object per line, to this UNIX stream socket.",
+        )
         self._parser.add_argument(
             "--enablerepo",
             metavar="repoidglob",
@@ -334,6 +463,59 @@ class CLI(object):
         if parsed_opts.no_rpm_va:
             tool_opts.no_rpm_va = True
 
+        if parsed_opts.no_cache:
+            tool_opts.no_cache = True
+
+        if parsed_opts.fail_fast:
+            tool_opts.fail_fast = True
+
+        if parsed_opts.cheap_first:
+            tool_opts.cheap_first = True
+
+        if parsed_opts.prestage:
+            tool_opts.prestage = True
+
+        if parsed_opts.only:
+            tool_opts.only_actions = _split_action_ids(parsed_opts.only)
+
+        if parsed_opts.skip:
+            tool_opts.skip_actions = _split_action_ids(parsed_opts.skip)
+
+        if (tool_opts.only_actions or tool_opts.skip_actions) and tool_opts.activity != "analysis":
+            loggerinst.critical(
+                "The --only and --skip options can only be used when analyzing the system. A conversion needs all"
+                " of the pre-conversion checks and changes to run."
+            )
+
+        for timeout_name in ("action_timeout", "command_timeout"):
+            timeout = getattr(parsed_opts, timeout_name)
+            if timeout is not None:
+                setattr(tool_opts, timeout_name, timeout)
+            timeout = getattr(tool_opts, timeout_name)
+            if timeout is not None and timeout <= 0:
+                loggerinst.critical("The %s must be a positive number of seconds." % timeout_name.replace("_", " "))
+
+        if parsed_opts.parallel_downloads is not None:
+            tool_opts.parallel_downloads = parsed_opts.parallel_downloads
+        if tool_opts.parallel_downloads is not None and not 0 < tool_opts.parallel_downloads <= MAX_PARALLEL_DOWNLOADS:
+            loggerinst.critical("The parallel downloads must be a number between 1 and %d." % MAX_PARALLEL_DOWNLOADS)
+
+        if parsed_opts.transaction_chunk_size is not None:
+            tool_opts.transaction_chunk_size = parsed_opts.transaction_chunk_size
+        if tool_opts.transaction_chunk_size is not None and tool_opts.transaction_chunk_size <= 0:
+            loggerinst.critical("The transaction chunk size must be a positive number of packages.")
+
+        if parsed_opts.transaction_memory_limit is not None:
+            tool_opts.transaction_memory_limit = parsed_opts.transaction_memory_limit
+        if tool_opts.transaction_memory_limit is not None and tool_opts.transaction_memory_limit <= 0:
+            loggerinst.critical("The transaction memory limit must be a positive number of MiB.")
+
+        if parsed_opts.events_file:
+            tool_opts.events_file = parsed_opts.events_file
+
+        if parsed_opts.events_socket:
+            tool_opts.events_socket = parsed_opts.events_socket
+
         if parsed_opts.username:
             tool_opts.username = parsed_opts.username
 
@@ -480,6 +662,39 @@ class CLI(object):
             tool_opts.credentials_thru_cli = True
 
 
+class RollbackCLI(object):
+    """Command line of ``convert2rhel rollback``, which rolls back the changes of an interrupted run."""
+
+    def __init__(self):
+        self._parser = argparse.ArgumentParser(
+            prog="convert2rhel %s" % ROLLBACK_COMMAND,
+            description="Roll back the changes made by a run of convert2rhel that was interrupted before the point of"
+            " no return, for instance because it was killed or the connection to the system was lost.",
+        )
+        self._parser.add_argument(
+            "--resume",
+            action="store_true",
+            required=True,
+            help="Replay the rollback journal that the interrupted run left in %s and roll back the changes it"
+            " records." % utils.TMP_DIR,
+        )
+        self._parser.add_argument(
+            "--debug",
+            action="store_true",
+            help="Print traceback in case of an abnormal exit and messages that could help find an issue.",
+        )
+        self._process_cli_options()
+
+    def _process_cli_options(self):
+        _log_command_used()
+
+        parsed_opts = self._parser.parse_args(sys.argv[2:])
+
+        tool_opts.activity = "rollback"
+        if parsed_opts.debug:
+            tool_opts.debug = True
+
+
 def warn_on_unsupported_options():
     if any(x in sys.argv[1:] for x in ["--variant", "-v"]):
         loggerinst.warning(
@@ -515,14 +730,35 @@ def options_from_config_files(cfg_path=None):
     :type cfg_path: str
 
     :return: Dict with the supported options alongside their values.
-    :rtype: dict[str, str | None]
+    :rtype: dict[str, str | bool | int | None]
     """
-    headers = ["subscription_manager"]  # supported sections in config file
+    # Supported sections in config file and the options supported in each of them
+    headers = {
+        "subscription_manager": ("username", "password", "activation_key", "org"),
+        "settings": (
+            "fail_fast",
+            "cheap_first",
+            "action_timeout",
+            "command_timeout",
+            "parallel_downloads",
+            "transaction_chunk_size",
+            "transaction_memory_limit",
+            "prestage",
+        ),
+    }
+    boolean_opts = ("fail_fast", "cheap_first", "prestage")
+    integer_opts = (
+        "action_timeout",
+        "command_timeout",
+        "parallel_downloads",
+        "transaction_chunk_size",
+        "transaction_memory_limit",
+    )
     # Create dict with all supported options, all of them set to None
     # needed for avoiding problems with files priority
     # The name of supported option MUST correspond with the name in ToolOpts()
     # Otherwise it won't be used
-    supported_opts = {"username": None, "password": None, "activation_key": None, "org": None}
+    supported_opts = dict((option, None) for options in headers.values() for option in options)
 
     config_file = configparser.ConfigParser()
     paths = [os.path.expanduser(path) for path in CONFIG_PATHS]
@@ -542,10 +778,25 @@ def options_from_config_files(cfg_path=None):
             for header in config_file.sections():
                 if header in headers:
                     for option in config_file.options(header):
-                        if option.lower() in supported_opts:
+                        if option.lower() in headers[header]:
                             # Solving priority
                             if supported_opts[option.lower()] is None:
-                                supported_opts[option] = config_file.get(header, option)
+                                if option.lower() in boolean_opts:
+                                    try:
+                                        supported_opts[option] = config_file.getboolean(header, option)
+                                    except ValueError:
+                                        loggerinst.critical(
+                                            "The value of %s in %s must be either true or false." % (option, path)
+                                        )
+                                elif option.lower() in integer_opts:
+                                    try:
+                                        supported_opts[option] = config_file.getint(header, option)
+                                    except ValueError:
+                                        loggerinst.critical(
+                                            "The value of %s in %s must be a whole number." % (option, path)
+                                        )
+                                else:
+                                    supported_opts[option] = config_file.get(header, option)
                                 loggerinst.debug("Found %s in %s" % (option, path))
                         else:
                             loggerinst.warning("Unsupported option %s in %s" % (option, path))
@@ -555,6 +806,20 @@ def options_from_config_files(cfg_path=None):
     return supported_opts
 
 
+def _split_action_ids(values):
+    """
+    Turn the values given to --only or --skip into a list of action ids.
+
+    :param values: Each value is one or more ids separated by commas.
+    :type values: list[str]
+    :rtype: list[str]
+    """
+    action_ids = []
+    for value in values:
+        action_ids.extend(action_id.strip() for action_id in value.split(",") if action_id.strip())
+    return action_ids
+
+
 def _parse_subscription_manager_serverurl(serverurl):
     """Parse a url string in a manner mostly compatible with subscription-manager --serverurl."""
     # This is an adaptation of what subscription-manager's cli enforces:
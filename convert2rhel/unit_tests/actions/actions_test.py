@@ -19,6 +19,8 @@ __metaclass__ = type
 
 import os.path
 import re
+import threading
+import time
 
 from collections import defaultdict
 
@@ -29,8 +31,8 @@ import six
 six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
 from six.moves import mock
 
-from convert2rhel import actions
-from convert2rhel.actions import STATUS_CODE
+from convert2rhel import actions, utils
+from convert2rhel.actions import STATUS_CODE, result_cache
 
 
 class _ActionForTesting(actions.Action):
@@ -48,6 +50,24 @@ class _ActionForTesting(actions.Action):
         pass
 
 
+def _make_action_class(action_id, run_hook=None, **class_attrs):
+    """
+    Create an Action subclass which a Stage can instantiate without arguments.
+
+    :param action_id: The id of the new Action.
+    :param run_hook: Callable which is passed the Action instance when it runs.
+    :param class_attrs: Other class attributes, for instance dependencies.
+    """
+
+    def run(self):
+        super(self.__class__, self).run()
+        if run_hook:
+            run_hook(self)
+
+    class_attrs.update({"id": action_id, "run": run})
+    return type(str(action_id), (actions.Action,), class_attrs)
+
+
 class TestAction:
     """Tests across all of the Actions we ship."""
 
@@ -303,6 +323,384 @@ class TestStage:
         assert sorted(action.id for action in actual.failures) == sorted(expected[1])
         assert sorted(action.id for action in actual.skips) == sorted(expected[2])
 
+    @pytest.mark.parametrize(("max_workers",), ((1,), (4,)))
+    def test_run_parallel_keeps_order_and_skips(self, stage_actions, max_workers):
+        def fail(action):
+            action.set_result(status="ERROR", error_id="FAILED")
+
+        stage = actions.Stage("good_deps1", max_workers=max_workers)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", parallel_safe=True),
+                _make_action_class("BETA", fail, parallel_safe=True),
+                _make_action_class("CHARLIE", dependencies=("BETA",), parallel_safe=True),
+                _make_action_class("DELTA", dependencies=("ALPHA",)),
+                _make_action_class("ECHO", parallel_safe=True),
+            )
+        )
+
+        actual = stage.run()
+
+        assert [action.id for action in actual.successes] == ["ALPHA", "ECHO", "DELTA"]
+        assert [action.id for action in actual.failures] == ["BETA"]
+        assert [action.id for action in actual.skips] == ["CHARLIE"]
+        assert actual.skips[0].message == "Skipped because BETA was not successful"
+
+    def test_run_parallel_safe_actions_concurrently(self, stage_actions):
+        started = {"ALPHA": threading.Event(), "BETA": threading.Event()}
+
+        def wait_for_other(action):
+            started[action.id].set()
+            other = "BETA" if action.id == "ALPHA" else "ALPHA"
+            if not started[other].wait(5):
+                action.set_result(status="ERROR", error_id="NOT_CONCURRENT")
+
+        stage = actions.Stage("good_deps1", max_workers=2)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", wait_for_other, parallel_safe=True),
+                _make_action_class("BETA", wait_for_other, parallel_safe=True),
+            )
+        )
+
+        actual = stage.run()
+
+        assert sorted(action.id for action in actual.successes) == ["ALPHA", "BETA"]
+
+    def test_run_respects_resource_limits(self, stage_actions):
+        lock = threading.Lock()
+        holders = []
+
+        def hold_rpmdb(action):
+            if not lock.acquire(False):
+                action.set_result(status="ERROR", error_id="RESOURCE_SHARED")
+                return
+            holders.append(action.id)
+            threading.Event().wait(0.1)
+            lock.release()
+
+        stage = actions.Stage("good_deps1", max_workers=4)
+        stage.actions = set(
+            _make_action_class(action_id, hold_rpmdb, parallel_safe=True, resources=(actions.RESOURCE_RPMDB,))
+            for action_id in ("ALPHA", "BETA", "CHARLIE")
+        )
+
+        actual = stage.run()
+
+        assert not actual.failures
+        assert sorted(holders) == ["ALPHA", "BETA", "CHARLIE"]
+
+    def test_run_not_parallel_safe_actions_in_main_thread(self, stage_actions):
+        threads = {}
+
+        def record_thread(action):
+            threads[action.id] = threading.current_thread()
+
+        stage = actions.Stage("good_deps1")
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", record_thread, parallel_safe=True),
+                _make_action_class("BETA", record_thread),
+            )
+        )
+
+        stage.run()
+
+        assert threads["ALPHA"] is not threading.current_thread()
+        assert threads["BETA"] is threading.current_thread()
+
+    @pytest.mark.parametrize("parallel_safe", (False, True))
+    def test_run_records_metrics(self, parallel_safe, stage_actions):
+        def run_echo(action):
+            utils.run_subprocess(["echo", "convert2rhel"], print_cmd=False, print_output=False)
+
+        def fail(action):
+            action.set_result(status="ERROR", error_id="FAILED", message="Failed")
+
+        stage = actions.Stage("good_deps1")
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", run_echo, parallel_safe=parallel_safe),
+                _make_action_class("BETA", fail),
+                _make_action_class("CHARLIE", dependencies=("BETA",)),
+            )
+        )
+
+        successes, failures, skips = stage.run()
+
+        metrics = successes[0].metrics
+        assert sorted(metrics) == [
+            "cpu_time_children",
+            "cpu_time_self",
+            "peak_rss_delta",
+            "subprocesses",
+            "wall_time",
+        ]
+        assert metrics["subprocesses"] == 1
+        assert metrics["wall_time"] >= 0
+        assert failures[0].metrics["subprocesses"] == 0
+        assert skips[0].metrics is None
+
+    def test_run_emits_events(self, stage_actions):
+        def fail(action):
+            action.set_result(status="ERROR", error_id="FAILED", message="Failed")
+
+        events = mock.Mock()
+        stage = actions.Stage("good_deps1", event_stream=events)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA"),
+                _make_action_class("BETA", fail),
+                _make_action_class("CHARLIE", dependencies=("BETA",)),
+            )
+        )
+
+        stage.run()
+
+        emitted = [(c[0][0], c[0][1], c[1].get("action_id"), c[1].get("status")) for c in events.emit.call_args_list]
+        assert emitted == [
+            ("action_started", "good_deps1", "ALPHA", None),
+            ("action_finished", "good_deps1", "ALPHA", "SUCCESS"),
+            ("action_started", "good_deps1", "BETA", None),
+            ("action_finished", "good_deps1", "BETA", "ERROR"),
+            ("action_finished", "good_deps1", "CHARLIE", "SKIP"),
+            ("stage_finished", "good_deps1", None, None),
+        ]
+        beta_finished = events.emit.call_args_list[3][1]
+        assert beta_finished["error_id"] == "FAILED"
+        assert beta_finished["message"] == "Failed"
+        assert beta_finished["duration"] >= 0
+        assert beta_finished["cached"] is False
+        assert events.emit.call_args_list[4][1]["duration"] is None
+        stage_finished = events.emit.call_args_list[5][1]
+        assert (stage_finished["successes"], stage_finished["failures"], stage_finished["skips"]) == (1, 1, 1)
+
+    def test_run_reuses_cached_results(self, stage_actions, tmpdir):
+        runs = []
+
+        def succeed(action):
+            runs.append(action.id)
+
+        def fail(action):
+            runs.append(action.id)
+            action.set_result(status="ERROR", error_id="FAILED", message="Failed")
+
+        def explode(action):
+            runs.append(action.id)
+            raise Exception("Explosion")
+
+        def make_stage(cache):
+            stage = actions.Stage("good_deps1", result_cache=cache)
+            stage.actions = set(
+                (
+                    _make_action_class("ALPHA", fail, cache_inputs=lambda self: {"input": 1}),
+                    _make_action_class("BETA", succeed, cache_inputs=lambda self: {"input": 2}),
+                    _make_action_class("CHARLIE", explode, cache_inputs=lambda self: {"input": 3}),
+                    _make_action_class("DELTA", succeed),
+                )
+            )
+            return stage
+
+        cache_file = str(tmpdir.join("cache.json"))
+        cache = result_cache.ActionResultCache(cache_file)
+        make_stage(cache).run()
+        cache.save()
+
+        cache = result_cache.ActionResultCache(cache_file)
+        cache.load()
+        runs[:] = []
+        successes, failures, _ = make_stage(cache).run()
+
+        # Only the results of Actions which declared their inputs and did not
+        # raise an exception were reused.
+        assert sorted(runs) == ["CHARLIE", "DELTA"]
+        assert [(action.id, action.cached) for action in successes] == [("BETA", True), ("DELTA", False)]
+        assert [(action.id, action.cached) for action in failures] == [("ALPHA", True), ("CHARLIE", False)]
+        assert (failures[0].status, failures[0].error_id, failures[0].message) == (
+            STATUS_CODE["ERROR"],
+            "FAILED",
+            "Failed",
+        )
+
+    @pytest.mark.parametrize(
+        ("status", "expected"),
+        (
+            ("ERROR", (["ALPHA"], ["BETA"], ["CHARLIE", "DELTA"])),
+            ("OVERRIDABLE", (["ALPHA", "CHARLIE", "DELTA"], ["BETA"], [])),
+        ),
+    )
+    @pytest.mark.parametrize(("parallel_safe",), ((True,), (False,)))
+    def test_run_fail_fast(self, status, expected, parallel_safe, stage_actions):
+        def fail(action):
+            action.set_result(status=status, error_id="FAILED", message="Failed")
+
+        stage = actions.Stage("good_deps1", max_workers=1, fail_fast=True)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", parallel_safe=parallel_safe),
+                _make_action_class("BETA", fail, parallel_safe=parallel_safe),
+                _make_action_class("CHARLIE", parallel_safe=parallel_safe),
+                _make_action_class("DELTA", dependencies=("CHARLIE",), parallel_safe=parallel_safe),
+            )
+        )
+
+        actual = stage.run()
+
+        assert [action.id for action in actual.successes] == expected[0]
+        assert [action.id for action in actual.failures] == expected[1]
+        assert [action.id for action in actual.skips] == expected[2]
+        for action in actual.skips:
+            assert action.status == actions.STATUS_CODE["SKIP"]
+            assert action.message == "Skipped because BETA failed and fail-fast mode is enabled"
+
+    def test_run_fail_fast_skips_next_stage(self, stage_actions):
+        def fail(action):
+            action.set_result(status="ERROR", error_id="FAILED", message="Failed")
+
+        next_stage = actions.Stage("good_deps1", fail_fast=True)
+        next_stage.actions = set((_make_action_class("CHARLIE"),))
+        stage = actions.Stage("good_deps1", next_stage=next_stage, fail_fast=True)
+        stage.actions = set((_make_action_class("ALPHA", fail), _make_action_class("BETA")))
+
+        actual = stage.run()
+
+        assert [action.id for action in actual.failures] == ["ALPHA"]
+        assert [action.id for action in actual.skips] == ["BETA", "CHARLIE"]
+        assert actual.skips[1].message == "Skipped because ALPHA failed and fail-fast mode is enabled"
+
+    @pytest.mark.parametrize(("parallel_safe",), ((True,), (False,)))
+    def test_run_command_timeout(self, parallel_safe, stage_actions):
+        def hang(action):
+            utils.run_subprocess(["sleep", "30"])
+
+        stage = actions.Stage("good_deps1", command_timeout=0.5)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", hang, parallel_safe=parallel_safe),
+                _make_action_class("BETA", parallel_safe=parallel_safe),
+            )
+        )
+
+        actual = stage.run()
+
+        assert [action.id for action in actual.successes] == ["BETA"]
+        assert [action.id for action in actual.failures] == ["ALPHA"]
+        assert actual.failures[0].error_id == "TIMEOUT"
+        assert "Command 'sleep 30' did not finish within 0.5 seconds" in actual.failures[0].message
+
+    def test_run_action_timeout(self, stage_actions):
+        def hang(action):
+            utils.run_subprocess(["sleep", "30"])
+
+        stage = actions.Stage("good_deps1")
+        stage.actions = set((_make_action_class("ALPHA", hang, timeout=0.5),))
+
+        actual = stage.run()
+
+        assert actual.failures[0].error_id == "TIMEOUT"
+
+    def test_run_gives_up_on_hung_parallel_action(self, stage_actions, monkeypatch):
+        monkeypatch.setattr(actions, "_TIMEOUT_GRACE_PERIOD", 0)
+        release = threading.Event()
+
+        def hang(action):
+            release.wait(30)
+
+        stage = actions.Stage("good_deps1", action_timeout=0.5)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", hang, parallel_safe=True),
+                _make_action_class("BETA", parallel_safe=True),
+            )
+        )
+
+        try:
+            actual = stage.run()
+        finally:
+            release.set()
+
+        assert [action.id for action in actual.successes] == ["BETA"]
+        assert [action.id for action in actual.failures] == ["ALPHA"]
+        assert actual.failures[0].error_id == "TIMEOUT"
+        assert actual.failures[0].message.startswith("ALPHA did not finish within 0.5 seconds.")
+
+    def test_run_keeps_resources_of_abandoned_action(self, stage_actions, monkeypatch):
+        monkeypatch.setattr(actions, "_TIMEOUT_GRACE_PERIOD", 0)
+        times = {}
+
+        def hang(action):
+            time.sleep(1.5)
+            times["ALPHA"] = time.time()
+
+        def record(action):
+            times["BETA"] = time.time()
+
+        stage = actions.Stage("good_deps1")
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", hang, parallel_safe=True, resources=(actions.RESOURCE_RPMDB,), timeout=0.5),
+                _make_action_class("BETA", record, parallel_safe=True, resources=(actions.RESOURCE_RPMDB,)),
+                # Keeps the Stage busy until ALPHA exits
+                _make_action_class("CHARLIE", lambda action: time.sleep(2.5), parallel_safe=True),
+            )
+        )
+
+        actual = stage.run()
+
+        assert [action.id for action in actual.successes] == ["BETA", "CHARLIE"]
+        assert actual.failures[0].error_id == "TIMEOUT"
+        # BETA only started once ALPHA was no longer using the rpmdb
+        assert times["BETA"] >= times["ALPHA"]
+
+    @pytest.mark.parametrize(
+        ("beta_attrs",),
+        (
+            ({"parallel_safe": True, "resources": (actions.RESOURCE_RPMDB,)},),
+            ({"parallel_safe": False},),
+        ),
+    )
+    def test_run_skips_actions_waiting_for_abandoned_action(self, beta_attrs, stage_actions, monkeypatch):
+        monkeypatch.setattr(actions, "_TIMEOUT_GRACE_PERIOD", 0)
+        release = threading.Event()
+        beta = mock.Mock()
+
+        def hang(action):
+            release.wait(30)
+
+        stage = actions.Stage("good_deps1", action_timeout=0.5)
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA", hang, parallel_safe=True, resources=(actions.RESOURCE_RPMDB,)),
+                _make_action_class("BETA", beta, **beta_attrs),
+            )
+        )
+
+        try:
+            actual = stage.run()
+        finally:
+            release.set()
+
+        assert not beta.called
+        assert [action.id for action in actual.failures] == ["ALPHA"]
+        assert [action.id for action in actual.skips] == ["BETA"]
+        assert actual.skips[0].message == "Skipped because ALPHA did not finish in time and may still be running"
+
+    def test_run_only_selected_actions(self, stage_actions):
+        stage = actions.Stage("good_deps1", action_ids=set(("ALPHA", "CHARLIE")))
+        stage.actions = set(
+            (
+                _make_action_class("ALPHA"),
+                _make_action_class("BETA"),
+                _make_action_class("CHARLIE", dependencies=("ALPHA",)),
+            )
+        )
+
+        actual = stage.run()
+
+        assert [action.id for action in actual.successes] == ["ALPHA", "CHARLIE"]
+        assert actual.failures == []
+        assert actual.skips == []
+
     def test_stages_cannot_be_run_twice(self, stage_actions):
         """Test that an Action can only be run once."""
         stage = actions.Stage("good_deps1")
@@ -628,6 +1026,127 @@ class TestResolveActionOrder:
         with pytest.raises(actions.DependencyError):
             list(actions.resolve_action_order(potential, previous))
 
+    def test_missing_dependencies(self):
+        potential_actions = [
+            _ActionForTesting(id="One"),
+            _ActionForTesting(id="Two", dependencies=("One", "Zero")),
+            _ActionForTesting(id="Three", dependencies=("Two",)),
+        ]
+
+        with pytest.raises(actions.DependencyError, match="missing dependencies: Two requires Zero") as excinfo:
+            list(actions.resolve_action_order(potential_actions))
+
+        assert excinfo.value.missing_dependencies == {"Two": ["Zero"]}
+        assert excinfo.value.unresolved_actions == ["Three", "Two"]
+        assert excinfo.value.resolved_actions == ["One"]
+        assert excinfo.value.cycle == []
+
+    def test_circular_dependencies(self):
+        potential_actions = [
+            _ActionForTesting(id="One"),
+            _ActionForTesting(id="Two", dependencies=("One", "Four")),
+            _ActionForTesting(id="Three", dependencies=("Two",)),
+            _ActionForTesting(id="Four", dependencies=("Three",)),
+        ]
+
+        with pytest.raises(
+            actions.DependencyError, match="circular dependency: Four -> Three -> Two -> Four"
+        ) as excinfo:
+            list(actions.resolve_action_order(potential_actions))
+
+        assert excinfo.value.missing_dependencies == {}
+        assert excinfo.value.cycle == ["Four", "Three", "Two", "Four"]
+
+    def test_cheap_first(self):
+        potential_actions = [
+            _ActionForTesting(id="One", estimated_cost=30),
+            _ActionForTesting(id="Two", estimated_cost=5),
+            _ActionForTesting(id="Three", dependencies=("One",)),
+            _ActionForTesting(id="Four", estimated_cost=10),
+        ]
+
+        assert [action.id for action in actions.resolve_action_order(potential_actions)] == [
+            "Four",
+            "One",
+            "Two",
+            "Three",
+        ]
+        assert [action.id for action in actions.resolve_action_order(potential_actions, cheap_first=True)] == [
+            "Two",
+            "Four",
+            "One",
+            "Three",
+        ]
+
+
+class TestFindCriticalPath:
+    @pytest.mark.parametrize(
+        ("ordered_actions", "costs", "expected"),
+        (
+            ([], None, (0, [])),
+            ([_ActionForTesting(id="One")], None, (1, ["One"])),
+            (
+                [
+                    _ActionForTesting(id="One"),
+                    _ActionForTesting(id="Two"),
+                    _ActionForTesting(id="Three", dependencies=("One",)),
+                    _ActionForTesting(id="Four", dependencies=("Two", "Three")),
+                ],
+                None,
+                (3, ["One", "Three", "Four"]),
+            ),
+            (
+                [
+                    _ActionForTesting(id="One"),
+                    _ActionForTesting(id="Two"),
+                    _ActionForTesting(id="Three", dependencies=("One",)),
+                    _ActionForTesting(id="Four", dependencies=("Two", "Three")),
+                ],
+                {"Two": 10},
+                (11, ["Two", "Four"]),
+            ),
+            (
+                [
+                    _ActionForTesting(id="One", estimated_cost=5),
+                    _ActionForTesting(id="Two", dependencies=("One", "Previous")),
+                    _ActionForTesting(id="Three"),
+                ],
+                None,
+                (6, ["One", "Two"]),
+            ),
+        ),
+    )
+    def test_find_critical_path(self, ordered_actions, costs, expected):
+        assert actions.find_critical_path(ordered_actions, costs) == expected
+
+
+class TestSelectActions:
+    potential_actions = [
+        _ActionForTesting(id="One"),
+        _ActionForTesting(id="Two", dependencies=("One",)),
+        _ActionForTesting(id="Three", dependencies=("Two",)),
+        _ActionForTesting(id="Four"),
+        _ActionForTesting(id="Five", dependencies=("Four", "Other")),
+    ]
+
+    @pytest.mark.parametrize(
+        ("only", "skip", "expected"),
+        (
+            (None, None, ["Five", "Four", "One", "Three", "Two"]),
+            (["Three"], None, ["One", "Three", "Two"]),
+            (["Two", "Five"], None, ["Five", "Four", "One", "Two"]),
+            (None, ["One"], ["Five", "Four"]),
+            (None, ["Three", "Four"], ["One", "Two"]),
+            (["Three", "Four"], ["Two"], ["Four", "One"]),
+        ),
+    )
+    def test_select_actions(self, only, skip, expected):
+        assert sorted(actions.select_actions(self.potential_actions, only, skip)) == expected
+
+    def test_select_actions_unknown_ids(self):
+        with pytest.raises(actions.ActionError, match="Unknown action ids: Other, Zero"):
+            actions.select_actions(self.potential_actions, ["Zero"], ["Other"])
+
 
 class TestRunActions:
     @pytest.mark.parametrize(
@@ -647,7 +1166,13 @@ class TestRunActions:
                     [],
                 ),
                 {
-                    "One": {"error_id": None, "message": None, "status": STATUS_CODE["SUCCESS"]},
+                    "One": {
+                        "error_id": None,
+                        "message": None,
+                        "status": STATUS_CODE["SUCCESS"],
+                        "metrics": None,
+                        "cached": False,
+                    },
                 },
             ),
             (
@@ -661,7 +1186,13 @@ class TestRunActions:
                     [],
                 ),
                 {
-                    "One": {"error_id": "DANGER", "message": "Warned about danger", "status": STATUS_CODE["WARNING"]},
+                    "One": {
+                        "error_id": "DANGER",
+                        "message": "Warned about danger",
+                        "status": STATUS_CODE["WARNING"],
+                        "metrics": None,
+                        "cached": False,
+                    },
                 },
             ),
             (
@@ -682,9 +1213,11 @@ class TestRunActions:
                     [],
                 ),
                 {
-                    "One": dict(error_id=None, message=None, status=STATUS_CODE["WARNING"]),
-                    "Two": dict(error_id=None, message=None, status=STATUS_CODE["SUCCESS"]),
-                    "Three": dict(error_id=None, message=None, status=STATUS_CODE["SUCCESS"]),
+                    "One": dict(error_id=None, message=None, status=STATUS_CODE["WARNING"], metrics=None, cached=False),
+                    "Two": dict(error_id=None, message=None, status=STATUS_CODE["SUCCESS"], metrics=None, cached=False),
+                    "Three": dict(
+                        error_id=None, message=None, status=STATUS_CODE["SUCCESS"], metrics=None, cached=False
+                    ),
                 },
             ),
             # Single Failures
@@ -697,7 +1230,7 @@ class TestRunActions:
                     [],
                 ),
                 {
-                    "One": dict(error_id=None, message=None, status=STATUS_CODE["ERROR"]),
+                    "One": dict(error_id=None, message=None, status=STATUS_CODE["ERROR"], metrics=None, cached=False),
                 },
             ),
             (
@@ -709,7 +1242,9 @@ class TestRunActions:
                     [],
                 ),
                 {
-                    "One": dict(error_id=None, message=None, status=STATUS_CODE["OVERRIDABLE"]),
+                    "One": dict(
+                        error_id=None, message=None, status=STATUS_CODE["OVERRIDABLE"], metrics=None, cached=False
+                    ),
                 },
             ),
             (
@@ -721,7 +1256,7 @@ class TestRunActions:
                     ],
                 ),
                 {
-                    "One": dict(error_id=None, message=None, status=STATUS_CODE["SKIP"]),
+                    "One": dict(error_id=None, message=None, status=STATUS_CODE["SKIP"], metrics=None, cached=False),
                 },
             ),
             # Mixture of failures and successes.
@@ -739,10 +1274,12 @@ class TestRunActions:
                     ],
                 ),
                 {
-                    "One": dict(error_id=None, message=None, status=STATUS_CODE["WARNING"]),
-                    "Two": dict(error_id=None, message=None, status=STATUS_CODE["ERROR"]),
-                    "Three": dict(error_id=None, message=None, status=STATUS_CODE["SKIP"]),
-                    "Four": dict(error_id=None, message=None, status=STATUS_CODE["SUCCESS"]),
+                    "One": dict(error_id=None, message=None, status=STATUS_CODE["WARNING"], metrics=None, cached=False),
+                    "Two": dict(error_id=None, message=None, status=STATUS_CODE["ERROR"], metrics=None, cached=False),
+                    "Three": dict(error_id=None, message=None, status=STATUS_CODE["SKIP"], metrics=None, cached=False),
+                    "Four": dict(
+                        error_id=None, message=None, status=STATUS_CODE["SUCCESS"], metrics=None, cached=False
+                    ),
                 },
             ),
         ),
@@ -756,6 +1293,33 @@ class TestRunActions:
 
         assert actions.run_actions() == expected
 
+    def test_run_actions_with_selection(self, monkeypatch):
+        monkeypatch.setattr(actions.toolopts.tool_opts, "only_actions", ["IS_LOADED_KERNEL_LATEST"])
+        monkeypatch.setattr(actions.toolopts.tool_opts, "skip_actions", [])
+        monkeypatch.setattr(actions.Stage, "check_dependencies", mock.Mock())
+        monkeypatch.setattr(actions.Stage, "run", mock.Mock(return_value=actions.FinishedActions([], [], [])))
+
+        results = actions.run_actions()
+
+        assert "IS_LOADED_KERNEL_LATEST" not in results
+        assert results["TAINTED_KMODS"] == dict(
+            status=STATUS_CODE["SKIP"],
+            error_id=actions.NOT_SELECTED_ERROR_ID,
+            message="Not run as requested by --only or --skip",
+            metrics=None,
+            cached=False,
+        )
+
+    def test_run_actions_with_unknown_selection(self, monkeypatch, caplog):
+        monkeypatch.setattr(actions.toolopts.tool_opts, "only_actions", ["NO_SUCH_ACTION"])
+        monkeypatch.setattr(actions.toolopts.tool_opts, "skip_actions", [])
+        monkeypatch.setattr(actions.Stage, "check_dependencies", mock.Mock())
+
+        with pytest.raises(SystemExit):
+            actions.run_actions()
+
+        assert "Unknown action ids: NO_SUCH_ACTION" in caplog.records[-1].message
+
     def test_dependency_errors(self, monkeypatch, caplog):
         check_deps_mock = mock.Mock(side_effect=actions.DependencyError("Failure message"))
         monkeypatch.setattr(actions.Stage, "check_dependencies", check_deps_mock)
@@ -0,0 +1,112 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+
+import pytest
+
+from convert2rhel.actions import event_stream
+
+
+@pytest.fixture
+def socket_dir():
+    # UNIX socket paths are limited to ~100 characters which the pytest
+    # tmpdir may exceed.
+    directory = tempfile.mkdtemp(prefix="c2r-events")
+    yield directory
+    shutil.rmtree(directory)
+
+
+def test_emit_to_file(tmpdir):
+    path = str(tmpdir.join("events.jsonl"))
+    stream = event_stream.EventStream(path=path)
+    stream.open()
+
+    stream.emit("action_started", "system_checks", action_id="EFI")
+    stream.emit("stage_finished", "system_checks", successes=1, failures=0, skips=0, duration=0.5)
+    stream.close()
+
+    with open(path) as handler:
+        events = [json.loads(line) for line in handler]
+
+    assert [(event["event"], event["stage"], event["format"]) for event in events] == [
+        ("action_started", "system_checks", 1),
+        ("stage_finished", "system_checks", 1),
+    ]
+    assert events[0]["action_id"] == "EFI"
+    assert events[1]["successes"] == 1
+    assert events[0]["timestamp"] <= events[1]["timestamp"]
+
+
+def test_emit_to_socket(socket_dir):
+    socket_path = os.path.join(socket_dir, "events.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+
+    stream = event_stream.EventStream(socket_path=socket_path)
+    stream.open()
+    connection, _ = server.accept()
+
+    stream.emit("action_started", "system_checks", action_id="EFI")
+    stream.close()
+
+    data = b""
+    while True:
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    connection.close()
+    server.close()
+
+    event = json.loads(data.decode("utf-8"))
+    assert event["event"] == "action_started"
+    assert event["action_id"] == "EFI"
+
+
+def test_open_failure(socket_dir, caplog):
+    stream = event_stream.EventStream(socket_path=os.path.join(socket_dir, "missing.sock"))
+    stream.open()
+
+    assert "Unable to open the event stream" in caplog.records[-1].message
+
+    # Emitting does nothing
+    stream.emit("action_started", "system_checks", action_id="EFI")
+
+
+def test_emit_failure(socket_dir, caplog):
+    socket_path = os.path.join(socket_dir, "events.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+
+    stream = event_stream.EventStream(socket_path=socket_path)
+    stream.open()
+    connection, _ = server.accept()
+    connection.close()
+    server.close()
+
+    # The peer may only notice on the second write
+    for _ in range(2):
+        stream.emit("action_started", "system_checks", action_id="EFI")
+
+    assert "no further events will be sent" in caplog.records[-1].message
@@ -0,0 +1,126 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+
+import pytest
+import six
+
+
+six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
+from six.moves import mock
+
+from convert2rhel import repo
+from convert2rhel.actions import kmod_index
+from convert2rhel.systeminfo import system_info
+
+
+INDEX = {"kernel/lib/a.ko.xz": "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64"}
+
+
+@pytest.fixture
+def repomd_cache(tmpdir, monkeypatch):
+    """Pretend that dnf and yum keep their metadata under tmpdir."""
+    monkeypatch.setattr(repo, "DNF_REPOMD_GLOB", str(tmpdir.join("dnf", "%s-*", "repodata", "repomd.xml")))
+    monkeypatch.setattr(repo, "YUM_REPOMD_GLOB", str(tmpdir.join("yum", "*", "*", "%s", "repomd.xml")))
+    return tmpdir
+
+
+@pytest.fixture
+def index_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(system_info, "releasever", "8.5")
+    return str(tmpdir.join("index", "rhel-kmods-index.json"))
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    (
+        ("/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz", "kernel/lib/a.ko.xz"),
+        ("/lib/modules/6.1.18-200.fc37.x86_64/extra/b.ko\n", "extra/b.ko"),
+    ),
+)
+def test_get_comparison_key(path, expected):
+    assert kmod_index.get_comparison_key(path) == expected
+
+
+def test_save_and_load_index(index_file, monkeypatch):
+    kmod_index.save_index({"baseos": "abc"}, INDEX, index_file)
+
+    assert kmod_index.load_index({"baseos": "abc"}, index_file) == INDEX
+    assert kmod_index.load_index({"baseos": "def"}, index_file) is None
+
+    monkeypatch.setattr(system_info, "releasever", "8.6")
+    assert kmod_index.load_index({"baseos": "abc"}, index_file) is None
+
+
+@pytest.mark.parametrize(
+    "content",
+    (
+        "not json",
+        json.dumps({"format": 0, "releasever": "8.5", "repomd": {"baseos": "abc"}, "kmods": INDEX}),
+    ),
+)
+def test_load_index_ignored(index_file, tmpdir, content):
+    tmpdir.join("index", "rhel-kmods-index.json").write(content, ensure=True)
+
+    assert kmod_index.load_index({"baseos": "abc"}, index_file) is None
+
+
+def test_get_index_reuses_stored_index(repomd_cache, index_file, monkeypatch):
+    repomd_cache.join("dnf", "baseos-0123456789abcdef", "repodata", "repomd.xml").write("baseos", ensure=True)
+    build_index_mock = mock.Mock(return_value=INDEX)
+    monkeypatch.setattr(kmod_index, "build_index", build_index_mock)
+
+    assert kmod_index.get_index(["baseos"], index_file) == INDEX
+    assert kmod_index.get_index(["baseos"], index_file) == INDEX
+    assert build_index_mock.call_count == 1
+
+    # The content of the repository changed
+    repomd_cache.join("dnf", "baseos-0123456789abcdef", "repodata", "repomd.xml").write("new baseos")
+    assert kmod_index.get_index(["baseos"], index_file) == INDEX
+    assert build_index_mock.call_count == 2
+
+
+def test_get_index_without_metadata(repomd_cache, index_file, monkeypatch, tmpdir):
+    build_index_mock = mock.Mock(return_value=INDEX)
+    monkeypatch.setattr(kmod_index, "build_index", build_index_mock)
+
+    assert kmod_index.get_index(["baseos"], index_file) == INDEX
+    build_index_mock.assert_called_once_with(["baseos"])
+    # Without a repomd.xml the index can't be identified, so it isn't stored
+    assert not tmpdir.join("index").check()
+
+
+def test_write_and_load_manifest(tmpdir):
+    index = {
+        "kernel/lib/a.ko.xz": "kernel-core-0:4.18.0-348.el8.x86_64",
+        "kernel/lib/b.ko.xz": "kernel-core-0:4.18.0-348.el8.x86_64",
+        "extra/c.ko": "kmod-c-0:1.0-1.el8.x86_64",
+    }
+    path = kmod_index.get_manifest_path("8.5", str(tmpdir))
+    kmod_index.write_manifest(path, index, "8.5", "x86_64", ["rhel-8-for-x86_64-baseos-rpms"])
+
+    assert kmod_index.load_manifest("8.5", "x86_64", str(tmpdir)) == index
+    assert kmod_index.load_manifest("8.5", "ppc64le", str(tmpdir)) is None
+    assert kmod_index.load_manifest("8.6", "x86_64", str(tmpdir)) is None
+
+
+def test_load_corrupted_manifest(tmpdir, caplog):
+    tmpdir.join("8.5.json.gz").write("not gzip")
+
+    assert kmod_index.load_manifest("8.5", "x86_64", str(tmpdir)) is None
+    assert "Ignoring the corrupted manifest" in caplog.records[-1].message
@@ -21,11 +21,12 @@ import re
 import pytest
 import six
 
+from convert2rhel import pkgmanager, systeminfo
+from convert2rhel.actions import kmod_index
 from convert2rhel.actions.pre_ponr_changes import kernel_modules
 from convert2rhel.systeminfo import system_info
-from convert2rhel.unit_tests import assert_actions_result, run_subprocess_side_effect
+from convert2rhel.unit_tests import assert_actions_result
 from convert2rhel.unit_tests.conftest import centos7, centos8
-from convert2rhel.utils import run_subprocess
 
 
 six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
@@ -53,32 +54,13 @@ HOST_MODULES_STUB_BAD = frozenset(
     )
 )
 
-REPOQUERY_F_STUB_GOOD = (
-    "kernel-core-0:4.18.0-240.10.1.el8_3.x86_64\n"
-    "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64\n"
-    "kernel-debug-core-0:4.18.0-240.10.1.el8_3.x86_64\n"
-    "kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64\n"
-)
-REPOQUERY_F_STUB_BAD = (
-    "kernel-idontexpectyou-core-sdsdsd.ell8_3.x86_64\n"
-    "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64\n"
-    "kernel-debug-core-0:4.18.0-240.10.1.el8_3.x86_64\n"
-    "kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64\n"
-)
-REPOQUERY_L_STUB_GOOD = (
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/b.ko.xz\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/c.ko.xz\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/c.ko\n"
-)
-REPOQUERY_L_STUB_BAD = (
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/d.ko.xz\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/d.ko\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/e.ko.xz\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/f.ko.xz\n"
-    "/lib/modules/5.8.0-7642-generic/kernel/lib/f.ko\n"
-)
+RHEL_KMODS_INDEX_STUB = {
+    "kernel/lib/a.ko.xz": "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
+    "kernel/lib/a.ko": "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
+    "kernel/lib/b.ko.xz": "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
+    "kernel/lib/c.ko.xz": "kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64",
+    "kernel/lib/c.ko": "kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64",
+}
 
 
 @pytest.fixture
@@ -122,18 +104,7 @@ def test_ensure_compatibility_of_kmods(
     monkeypatch.setattr(
         ensure_kernel_modules_compatibility_instance, "_get_loaded_kmods", mock.Mock(return_value=host_kmods)
     )
-    run_subprocess_mock = mock.Mock(
-        side_effect=run_subprocess_side_effect(
-            (("uname",), ("5.8.0-7642-generic\n", 0)),
-            (("repoquery", "-f"), (REPOQUERY_F_STUB_GOOD, 0)),
-            (("repoquery", "-l"), (REPOQUERY_L_STUB_GOOD, 0)),
-        )
-    )
-    monkeypatch.setattr(
-        kernel_modules,
-        "run_subprocess",
-        value=run_subprocess_mock,
-    )
+    monkeypatch.setattr(kmod_index, "get_index", mock.Mock(return_value=RHEL_KMODS_INDEX_STUB))
 
     if exception:
         ensure_kernel_modules_compatibility_instance.run()
@@ -162,18 +133,7 @@ def test_ensure_compatibility_of_kmods_check_env(
     monkeypatch.setattr(
         ensure_kernel_modules_compatibility_instance, "_get_loaded_kmods", mock.Mock(return_value=HOST_MODULES_STUB_BAD)
     )
-    run_subprocess_mock = mock.Mock(
-        side_effect=run_subprocess_side_effect(
-            (("uname",), ("5.8.0-7642-generic\n", 0)),
-            (("repoquery", "-f"), (REPOQUERY_F_STUB_GOOD, 0)),
-            (("repoquery", "-l"), (REPOQUERY_L_STUB_GOOD, 0)),
-        )
-    )
-    monkeypatch.setattr(
-        kernel_modules,
-        "run_subprocess",
-        value=run_subprocess_mock,
-    )
+    monkeypatch.setattr(kmod_index, "get_index", mock.Mock(return_value=RHEL_KMODS_INDEX_STUB))
 
     ensure_kernel_modules_compatibility_instance.run()
     should_be_in_logs = (
@@ -225,18 +185,7 @@ def test_ensure_compatibility_of_kmods_excluded(
         ),
     )
     get_unsupported_kmods_mocked = mock.Mock(wraps=ensure_kernel_modules_compatibility_instance._get_unsupported_kmods)
-    run_subprocess_mock = mock.Mock(
-        side_effect=run_subprocess_side_effect(
-            (("uname",), ("5.8.0-7642-generic\n", 0)),
-            (("repoquery", "-f"), (REPOQUERY_F_STUB_GOOD, 0)),
-            (("repoquery", "-l"), (REPOQUERY_L_STUB_GOOD, 0)),
-        )
-    )
-    monkeypatch.setattr(
-        kernel_modules,
-        "run_subprocess",
-        value=run_subprocess_mock,
-    )
+    monkeypatch.setattr(kmod_index, "get_index", mock.Mock(return_value=RHEL_KMODS_INDEX_STUB))
     monkeypatch.setattr(
         ensure_kernel_modules_compatibility_instance,
         "_get_unsupported_kmods",
@@ -266,15 +215,7 @@ def test_ensure_compatibility_of_kmods_excluded(
             )
         ),
         # rhel supported kmods
-        set(
-            (
-                "kernel/lib/c.ko",
-                "kernel/lib/b.ko.xz",
-                "kernel/lib/c.ko.xz",
-                "kernel/lib/a.ko.xz",
-                "kernel/lib/a.ko",
-            )
-        ),
+        RHEL_KMODS_INDEX_STUB,
     )
     if msg_in_logs and not exception:
         assert any(msg_in_logs in record.message for record in caplog.records)
@@ -283,191 +224,60 @@ def test_ensure_compatibility_of_kmods_excluded(
 
 
 def test_get_loaded_kmods(ensure_kernel_modules_compatibility_instance, monkeypatch):
-    run_subprocess_mocked = mock.Mock(
-        spec=run_subprocess,
-        side_effect=run_subprocess_side_effect(
-            (
-                ("lsmod",),
-                (
-                    "Module                  Size  Used by\n"
-                    "a                 81920  4\n"
-                    "b    49152  0\n"
-                    "c              40960  1\n",
-                    0,
-                ),
-            ),
-            (
-                ("modinfo", "-F", "filename", "a"),
-                (MODINFO_STUB.split()[0] + "\n", 0),
-            ),
-            (
-                ("modinfo", "-F", "filename", "b"),
-                (MODINFO_STUB.split()[1] + "\n", 0),
-            ),
-            (
-                ("modinfo", "-F", "filename", "c"),
-                (MODINFO_STUB.split()[2] + "\n", 0),
-            ),
-        ),
-    )
-    monkeypatch.setattr(
-        kernel_modules,
-        "run_subprocess",
-        value=run_subprocess_mocked,
-    )
+    loaded_kmods = [
+        systeminfo.LoadedKernelModule(name, path, "") for name, path in zip(("a", "b", "c"), MODINFO_STUB.split())
+    ]
+    loaded_kmods.append(systeminfo.LoadedKernelModule("d", None, ""))
+    monkeypatch.setattr(system_info, "get_loaded_kmods", mock.Mock(return_value=loaded_kmods))
+
     assert ensure_kernel_modules_compatibility_instance._get_loaded_kmods() == frozenset(
         ("kernel/lib/c.ko.xz", "kernel/lib/a.ko.xz", "kernel/lib/b.ko.xz")
     )
 
 
-@pytest.mark.parametrize(
-    ("repoquery_f_stub", "repoquery_l_stub"),
-    (
-        (REPOQUERY_F_STUB_GOOD, REPOQUERY_L_STUB_GOOD),
-        (REPOQUERY_F_STUB_BAD, REPOQUERY_L_STUB_GOOD),
-    ),
-)
 @centos8
-def test_get_rhel_supported_kmods(
-    ensure_kernel_modules_compatibility_instance,
-    monkeypatch,
-    pretend_os,
-    repoquery_f_stub,
-    repoquery_l_stub,
-):
-    run_subprocess_mock = mock.Mock(
-        side_effect=run_subprocess_side_effect(
-            (
-                ("repoquery", "-f"),
-                (repoquery_f_stub, 0),
-            ),
-            (
-                ("repoquery", "-l"),
-                (repoquery_l_stub, 0),
-            ),
-        )
-    )
-    monkeypatch.setattr(
-        kernel_modules,
-        "run_subprocess",
-        value=run_subprocess_mock,
+def test_get_rhel_supported_kmods(ensure_kernel_modules_compatibility_instance, monkeypatch, pretend_os, caplog):
+    monkeypatch.setattr(system_info, "get_enabled_rhel_repos", mock.Mock(return_value=["rhel-repo"]))
+    monkeypatch.setattr(kmod_index, "load_manifest", mock.Mock(return_value=None))
+    get_index_mock = mock.Mock(return_value=RHEL_KMODS_INDEX_STUB)
+    monkeypatch.setattr(kmod_index, "get_index", get_index_mock)
+
+    assert ensure_kernel_modules_compatibility_instance._get_rhel_supported_kmods() == RHEL_KMODS_INDEX_STUB
+    get_index_mock.assert_called_once_with(["rhel-repo"])
+    assert (
+        "kernel packages available in the enabled repositories:\n"
+        " kernel-core-0:4.18.0-240.15.1.el8_3.x86_64\n"
+        " kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64" in caplog.records[-1].message
     )
 
-    res = ensure_kernel_modules_compatibility_instance._get_rhel_supported_kmods()
-    assert res == set(
-        (
-            "kernel/lib/a.ko",
-            "kernel/lib/a.ko.xz",
-            "kernel/lib/b.ko.xz",
-            "kernel/lib/c.ko.xz",
-            "kernel/lib/c.ko",
-        )
-    )
 
+@centos8
+def test_get_rhel_supported_kmods_from_manifest(ensure_kernel_modules_compatibility_instance, monkeypatch, pretend_os):
+    load_manifest_mock = mock.Mock(return_value=RHEL_KMODS_INDEX_STUB)
+    monkeypatch.setattr(kmod_index, "load_manifest", load_manifest_mock)
+    get_index_mock = mock.Mock()
+    monkeypatch.setattr(kmod_index, "get_index", get_index_mock)
 
-@pytest.mark.parametrize(
-    ("pkgs", "exp_res"),
-    (
-        (
-            (
-                "kernel-core-0:4.18.0-240.10.1.el8_3.x86_64",
-                "kernel-debug-core-0:4.18.0-240.10.1.el8_3.x86_64",
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-                "kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            (
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-                "kernel-debug-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-        ),
-        (
-            (
-                "kmod-core-0:4.18.0-240.10.1.el8_3.x86_64",
-                "kmod-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            ("kmod-core-0:4.18.0-240.15.1.el8_3.x86_64",),
-        ),
-        (
-            (
-                "kmod-core-0:10.18.0-240.10.1.el8_3.x86_64",
-                "kmod-core-0:9.18.0-240.15.1.el8_3.x86_64",
-            ),
-            ("kmod-core-0:10.18.0-240.10.1.el8_3.x86_64",),
-        ),
-        (
-            (
-                "not-expected-core-0:4.18.0-240.10.1.el8_3.x86_64",
-                "kmod-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            ("kmod-core-0:4.18.0-240.15.1.el8_3.x86_64",),
-        ),
-        (
-            (
-                "kernel-core-0:4.18.0-240.beta5.1.el8_3.x86_64",
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            ("kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",),
-        ),
-        (
-            (
-                "kernel-core-0:4.18.0-240.15.beta5.1.el8_3.x86_64",
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            ("kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",),
-        ),
-        (
-            (
-                "kernel-core-0:4.18.0-240.16.beta5.1.el8_3.x86_64",
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            ("kernel-core-0:4.18.0-240.16.beta5.1.el8_3.x86_64",),
-        ),
-        (("kernel_bad_package:111111",), ("kernel_bad_package:111111",)),
-        (
-            (
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-                "kernel_bad_package:111111",
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-            ),
-            (
-                "kernel-core-0:4.18.0-240.15.1.el8_3.x86_64",
-                "kernel_bad_package:111111",
-            ),
-        ),
-    ),
-)
-def test_get_most_recent_unique_kernel_pkgs(pkgs, exp_res, ensure_kernel_modules_compatibility_instance):
-    assert tuple(ensure_kernel_modules_compatibility_instance._get_most_recent_unique_kernel_pkgs(pkgs)) == exp_res
+    assert ensure_kernel_modules_compatibility_instance._get_rhel_supported_kmods() == RHEL_KMODS_INDEX_STUB
+    load_manifest_mock.assert_called_once_with("8.5", "x86_64")
+    get_index_mock.assert_not_called()
 
 
 @pytest.mark.parametrize(
-    ("rhel_kmods_str", "expected"),
+    ("get_index_mock", "message"),
     (
-        (
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n",
-            {"kernel/lib/a.ko.xz"},
-        ),
-        (
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-            "/lib/modules/6.1.18-200.fc37.x86_64/kernel/lib/lru_cache.ko.xz\n"
-            "/lib/modules/6.1.18-200.fc37.x86_64/kernel/lib/crc8.ko\n"
-            "/lib/modules/6.1.18-200.fc37.x86_64/kernel/lib/ts_bm.ko\n",
-            {"kernel/lib/a.ko.xz", "kernel/lib/lru_cache.ko.xz", "kernel/lib/crc8.ko", "kernel/lib/ts_bm.ko"},
-        ),
-        (
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n"
-            "/lib/modules/5.8.0-7642-generic/kernel/lib/a.ko.xz\n",
-            {"kernel/lib/a.ko.xz"},
-        ),
+        (mock.Mock(return_value={}), "No packages containing kernel modules available"),
+        (mock.Mock(side_effect=pkgmanager.RepoError("Cannot download")), "Unable to load the metadata"),
     ),
 )
-def test_get_rhel_kmods_keys(ensure_kernel_modules_compatibility_instance, rhel_kmods_str, expected):
-    result = ensure_kernel_modules_compatibility_instance._get_rhel_kmods_keys(rhel_kmods_str)
-    assert result == expected
+@centos8
+def test_get_rhel_supported_kmods_not_found(
+    ensure_kernel_modules_compatibility_instance, monkeypatch, pretend_os, get_index_mock, message
+):
+    monkeypatch.setattr(kmod_index, "get_index", get_index_mock)
+
+    with pytest.raises(kernel_modules.RHELKernelModuleNotFound, match=message):
+        ensure_kernel_modules_compatibility_instance._get_rhel_supported_kmods()
 
 
 @pytest.mark.parametrize(
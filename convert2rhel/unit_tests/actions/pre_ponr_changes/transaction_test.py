@@ -43,6 +43,10 @@ def test_validate_package_manager_transaction_dependency_order(validate_package_
     assert expected_dependencies == validate_package_manager_transaction.dependencies
 
 
+def test_validate_package_manager_transaction_is_not_cached(validate_package_manager_transaction):
+    assert validate_package_manager_transaction.cache_inputs() is None
+
+
 class TransactionHandlerMock(unit_tests.MockFunction):
     def __init__(self):
         self.called = 0
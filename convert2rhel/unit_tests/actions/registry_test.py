@@ -0,0 +1,112 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import sys
+
+import pytest
+
+from convert2rhel import actions
+from convert2rhel.actions import registry
+
+
+STAGE_TESTS_MODULE = "convert2rhel.unit_tests.actions.data.stage_tests.good_deps1.test"
+
+
+@pytest.mark.parametrize("stage_name", actions.STAGE_NAMES)
+def test_registry_is_up_to_date(stage_name):
+    """The registry lists the attributes of every Action that we ship.
+
+    If this fails, run scripts/generate_action_registry.py.
+    """
+    package = actions.Stage._actions_dir % stage_name
+    python_package = __import__(package, fromlist=["__path__"])
+    expected = sorted(
+        (
+            {
+                "id": action.id,
+                "module": action.__module__,
+                "class_name": action.__name__,
+                "dependencies": tuple(action.dependencies),
+                "parallel_safe": action.parallel_safe,
+                "resources": tuple(action.resources),
+                "estimated_cost": action.estimated_cost,
+            }
+            for action in actions.get_actions(python_package.__path__, package + ".")
+        ),
+        key=lambda entry: entry["id"],
+    )
+
+    assert list(registry.ACTIONS[package]) == expected
+
+
+class TestRegisteredAction:
+    def test_instantiate(self, monkeypatch):
+        monkeypatch.delitem(sys.modules, STAGE_TESTS_MODULE, raising=False)
+        registered_action = actions.RegisteredAction(
+            id="SECONDTEST", module=STAGE_TESTS_MODULE, class_name="SecondTest", dependencies=("REALTEST",)
+        )
+
+        # Nothing is imported until the Action is needed
+        assert STAGE_TESTS_MODULE not in sys.modules
+
+        action = registered_action()
+
+        assert action.id == "SECONDTEST"
+        assert action.__class__.__name__ == "SecondTest"
+        assert registered_action.load() is action.__class__
+
+    @pytest.mark.parametrize(
+        ("action_id", "class_name"),
+        (
+            ("SECONDTEST", "ThirdTest"),
+            ("SECONDTEST", "MissingTest"),
+        ),
+    )
+    def test_out_of_date(self, action_id, class_name):
+        registered_action = actions.RegisteredAction(id=action_id, module=STAGE_TESTS_MODULE, class_name=class_name)
+
+        with pytest.raises(actions.ActionError, match="The action registry is out of date"):
+            registered_action()
+
+    def test_stage_uses_registry(self, monkeypatch):
+        monkeypatch.setattr(actions.Stage, "_actions_dir", "convert2rhel.unit_tests.actions.data.stage_tests.%s")
+        monkeypatch.setattr(
+            registry,
+            "ACTIONS",
+            {
+                "convert2rhel.unit_tests.actions.data.stage_tests.good_deps1": (
+                    {"id": "REALTEST", "module": STAGE_TESTS_MODULE, "class_name": "RealTest"},
+                    {
+                        "id": "SECONDTEST",
+                        "module": STAGE_TESTS_MODULE,
+                        "class_name": "SecondTest",
+                        "dependencies": ("REALTEST",),
+                    },
+                ),
+            },
+        )
+        monkeypatch.delitem(sys.modules, STAGE_TESTS_MODULE, raising=False)
+
+        stage = actions.Stage("good_deps1")
+        stage.check_dependencies()
+
+        assert STAGE_TESTS_MODULE not in sys.modules
+
+        successes, failures, skips = stage.run()
+
+        assert [action.id for action in successes] == ["REALTEST", "SECONDTEST"]
+        assert failures == skips == []
@@ -19,7 +19,7 @@ import re
 
 import pytest
 
-from convert2rhel.actions import STATUS_CODE, report
+from convert2rhel.actions import NOT_SELECTED_ERROR_ID, STATUS_CODE, report
 from convert2rhel.logger import bcolors
 
 
@@ -267,3 +267,58 @@ def test_summary_ordering(results, include_all_reports, expected_results, caplog
 def test_summary_colors(results, expected, caplog):
     report.summary(results, include_all_reports=True, with_colors=True)
     assert expected in caplog.records[-1].message
+
+
+def test_summary_metrics(caplog):
+    metrics = {"cpu_time_self": 0.5, "cpu_time_children": 1.25, "peak_rss_delta": 1024, "subprocesses": 3}
+    report.summary(
+        {
+            "FastAction": dict(
+                status=STATUS_CODE["SUCCESS"], error_id=None, message=None, metrics=dict(metrics, wall_time=0.1)
+            ),
+            "SlowAction": dict(
+                status=STATUS_CODE["WARNING"],
+                error_id="WARN",
+                message="WARNING MESSAGE",
+                metrics=dict(metrics, wall_time=12),
+            ),
+            "SkipAction": dict(status=STATUS_CODE["SKIP"], error_id="SKIP", message="SKIP MESSAGE", metrics=None),
+        },
+        with_colors=False,
+        include_metrics=True,
+    )
+
+    lines = caplog.records[-1].message.splitlines()
+    section = lines[lines.index("========== Time spent in each action ==========") + 1 :]
+    assert section == [
+        "SlowAction: 12.00s wall clock, 0.50s CPU, 1.25s CPU in 3 subprocess(es), peak RSS +1024 KiB",
+        "FastAction: 0.10s wall clock, 0.50s CPU, 1.25s CPU in 3 subprocess(es), peak RSS +1024 KiB",
+    ]
+
+
+def test_summary_without_metrics(caplog):
+    report.summary(
+        {"SuccessfulAction": dict(status=STATUS_CODE["SUCCESS"], error_id=None, message=None, metrics=None)},
+        with_colors=False,
+    )
+
+    assert "Time spent in each action" not in caplog.records[-1].message
+
+
+def test_summary_not_selected(caplog):
+    not_selected = dict(
+        status=STATUS_CODE["SKIP"], error_id=NOT_SELECTED_ERROR_ID, message="Not run as requested", metrics=None
+    )
+    report.summary(
+        {
+            "SuccessfulAction": dict(status=STATUS_CODE["SUCCESS"], error_id=None, message=None, metrics=None),
+            "SkippedAction": not_selected,
+            "OtherSkippedAction": not_selected,
+        },
+        include_all_reports=True,
+        with_colors=False,
+    )
+
+    lines = caplog.records[-1].message.splitlines()
+    assert "(SKIP) SkippedAction" not in caplog.records[-1].message
+    assert lines[-2:] == ["========== Not run as requested ==========", "OtherSkippedAction, SkippedAction"]
@@ -0,0 +1,189 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+
+import pytest
+import six
+
+
+six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
+from six.moves import mock
+
+from convert2rhel import __version__, pkgmanager, utils
+from convert2rhel.actions import result_cache
+
+
+@pytest.fixture
+def cache_file(tmpdir):
+    return str(tmpdir.join("cache").join("action-results-cache.json"))
+
+
+class TestActionResultCache:
+    def test_save_and_load(self, cache_file):
+        cache = result_cache.ActionResultCache(cache_file)
+        cache.set("ACTION", "abc", 202, "FAILED", "Failed")
+        cache.save()
+
+        cache = result_cache.ActionResultCache(cache_file)
+        cache.load()
+
+        assert cache.get("ACTION", "abc") == result_cache.CachedResult(202, "FAILED", "Failed")
+        assert cache.get("ACTION", "def") is None
+        assert cache.get("OTHER_ACTION", "abc") is None
+
+    def test_save_unchanged(self, cache_file, tmpdir):
+        cache = result_cache.ActionResultCache(cache_file)
+        cache.save()
+
+        assert not tmpdir.join("cache").check()
+
+    @pytest.mark.parametrize(
+        ("content", "message"),
+        (
+            (
+                json.dumps({"format": 1, "convert2rhel_version": "0.1", "results": {"ACTION": {"fingerprint": "abc"}}}),
+                "Ignoring cached action results stored by a different version of convert2rhel.",
+            ),
+            ("{not json", "Ignoring the corrupted action results cache"),
+        ),
+    )
+    def test_load_ignored(self, content, message, cache_file, tmpdir, caplog):
+        tmpdir.join("cache").ensure(dir=True)
+        with open(cache_file, "w") as handler:
+            handler.write(content)
+
+        cache = result_cache.ActionResultCache(cache_file)
+        cache.load()
+
+        assert message in caplog.text
+        assert cache.get("ACTION", "abc") is None
+
+    def test_load_current_version(self, cache_file, tmpdir):
+        tmpdir.join("cache").ensure(dir=True)
+        with open(cache_file, "w") as handler:
+            json.dump(
+                {
+                    "format": 1,
+                    "convert2rhel_version": __version__,
+                    "results": {"ACTION": {"fingerprint": "abc", "status": 0, "error_id": None, "message": None}},
+                },
+                handler,
+            )
+
+        cache = result_cache.ActionResultCache(cache_file)
+        cache.load()
+
+        assert cache.get("ACTION", "abc").status == 0
+
+
+def test_compute_fingerprint():
+    fingerprint = result_cache.compute_fingerprint("ACTION", {"a": 1, "b": [1, 2]})
+
+    assert fingerprint == result_cache.compute_fingerprint("ACTION", {"b": [1, 2], "a": 1})
+    assert fingerprint != result_cache.compute_fingerprint("OTHER_ACTION", {"a": 1, "b": [1, 2]})
+    assert fingerprint != result_cache.compute_fingerprint("ACTION", {"a": 2, "b": [1, 2]})
+
+
+def test_rpmdb_cookie(monkeypatch):
+    run_subprocess_mock = mock.Mock(
+        side_effect=(
+            ("bash-4.4.20-4.el8.x86_64 abc\nkernel-4.18.0-425.el8.x86_64 def\n", 0),
+            ("kernel-4.18.0-425.el8.x86_64 def\nbash-4.4.20-4.el8.x86_64 abc\n", 0),
+            ("bash-4.4.20-4.el8.x86_64 abc\n", 0),
+        )
+    )
+    monkeypatch.setattr(utils, "run_subprocess", run_subprocess_mock)
+
+    cookie = result_cache.rpmdb_cookie()
+
+    assert cookie == result_cache.rpmdb_cookie()
+    assert cookie != result_cache.rpmdb_cookie()
+
+
+def test_rpmdb_cookie_failure(monkeypatch):
+    monkeypatch.setattr(utils, "run_subprocess", mock.Mock(return_value=("error: rpmdb open failed", 1)))
+
+    with pytest.raises(ValueError, match="Unable to list the installed packages"):
+        result_cache.rpmdb_cookie()
+
+
+def test_file_checksums(tmpdir):
+    existing = tmpdir.join("existing.repo")
+    existing.write("[repo]\n")
+    missing = str(tmpdir.join("missing.repo"))
+
+    checksums = result_cache.file_checksums([str(existing), missing])
+
+    assert checksums == {
+        str(existing): "316641c6ed6e6b56fb81d0de1eda7b96c1310b078ec0ef4d756309e46fc80fe1",
+        missing: None,
+    }
+
+
+@pytest.mark.parametrize(
+    ("pkg_manager", "kwargs", "expected_cmd"),
+    (
+        ("yum", {}, ["yum", "makecache", "--quiet", "fast"]),
+        (
+            "dnf",
+            {"reposdir": "/usr/share/convert2rhel/repos", "enable_repos": ["rhel"], "disable_repos": ["*"]},
+            [
+                "yum",
+                "makecache",
+                "--quiet",
+                "--setopt=reposdir=/usr/share/convert2rhel/repos",
+                "--disablerepo=*",
+                "--enablerepo=rhel",
+            ],
+        ),
+        ("dnf", {"releasever": "8.5"}, ["yum", "makecache", "--quiet", "--releasever=8.5"]),
+    ),
+)
+def test_refresh_repo_metadata(pkg_manager, kwargs, expected_cmd, monkeypatch):
+    run_subprocess_mock = mock.Mock(return_value=("", 0))
+    monkeypatch.setattr(utils, "run_subprocess", run_subprocess_mock)
+    monkeypatch.setattr(pkgmanager, "TYPE", pkg_manager)
+
+    result_cache.refresh_repo_metadata(**kwargs)
+
+    assert run_subprocess_mock.call_args[0][0] == expected_cmd
+
+
+def test_refresh_repo_metadata_failure(monkeypatch):
+    monkeypatch.setattr(utils, "run_subprocess", mock.Mock(return_value=("Cannot download repomd.xml", 1)))
+
+    with pytest.raises(ValueError, match="Unable to refresh the repository metadata"):
+        result_cache.refresh_repo_metadata()
+
+
+def test_repomd_checksums_refreshes_metadata(monkeypatch, tmpdir):
+    repomd = tmpdir.join("repo").join("repodata").join("repomd.xml")
+
+    def refresh(**repos):
+        # The previous run left no metadata behind, only the refresh downloads it
+        repomd.write("<repomd/>", ensure=True)
+
+    refresh_mock = mock.Mock(side_effect=refresh)
+    monkeypatch.setattr(result_cache, "refresh_repo_metadata", refresh_mock)
+    monkeypatch.setattr(result_cache, "REPOMD_GLOBS", (str(tmpdir.join("*").join("repodata").join("repomd.xml")),))
+
+    checksums = result_cache.repomd_checksums(enable_repos=["rhel"])
+
+    refresh_mock.assert_called_once_with(enable_repos=["rhel"])
+    assert list(checksums) == [str(repomd)]
+    assert checksums[str(repomd)] is not None
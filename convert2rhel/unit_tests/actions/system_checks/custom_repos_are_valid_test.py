@@ -19,11 +19,18 @@ __metaclass__ = type
 
 import unittest
 
-from convert2rhel import actions, unit_tests
+import pytest
+import six
+
+from convert2rhel import actions, pkgmanager, unit_tests
 from convert2rhel.actions.system_checks import custom_repos_are_valid
 from convert2rhel.unit_tests import GetLoggerMocked
 
 
+six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
+from six.moves import mock
+
+
 class CallYumCmdMocked(unit_tests.MockFunction):
     def __init__(self, ret_code, ret_string):
         self.called = 0
@@ -78,3 +85,21 @@ class TestCustomReposAreValid(unittest.TestCase):
             "Unable to access the repositories passed through the --enablerepo option. ",
             self.custom_repos_are_valid_action.message,
         )
+
+
+@pytest.mark.parametrize(
+    ("pkg_manager", "expected_args"),
+    (
+        ("yum", ["fast", "-v", "--setopt=*.skip_if_unavailable=False"]),
+        ("dnf", ["-v", "--setopt=*.skip_if_unavailable=False"]),
+    ),
+)
+def test_custom_repos_are_valid_makecache_args(pkg_manager, expected_args, monkeypatch):
+    call_yum_cmd_mock = mock.Mock(return_value=("Abcdef", 0))
+    monkeypatch.setattr(custom_repos_are_valid, "call_yum_cmd", call_yum_cmd_mock)
+    monkeypatch.setattr(custom_repos_are_valid.tool_opts, "no_rhsm", True)
+    monkeypatch.setattr(pkgmanager, "TYPE", pkg_manager)
+
+    custom_repos_are_valid.CustomReposAreValid().run()
+
+    call_yum_cmd_mock.assert_called_once_with(command="makecache", args=expected_args, print_output=False)
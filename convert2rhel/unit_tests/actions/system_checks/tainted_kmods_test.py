@@ -19,7 +19,7 @@ __metaclass__ = type
 import pytest
 import six
 
-from convert2rhel import unit_tests
+from convert2rhel import systeminfo, unit_tests
 from convert2rhel.actions.system_checks import tainted_kmods
 
 
@@ -33,28 +33,21 @@ def tainted_kmods_action():
 
 
 @pytest.mark.parametrize(
-    ("command_return", "is_error"),
+    ("loaded_kmods", "is_error"),
     (
-        (("", 0), False),
+        ([systeminfo.LoadedKernelModule("multipath", "/lib/modules/multipath.ko", "")], False),
         (
-            (
-                (
-                    "system76_io 16384 0 - Live 0x0000000000000000 (OE)\n"
-                    "system76_acpi 16384 0 - Live 0x0000000000000000 (OE)"
-                ),
-                0,
-            ),
+            [
+                systeminfo.LoadedKernelModule("multipath", "/lib/modules/multipath.ko", ""),
+                systeminfo.LoadedKernelModule("system76_io", "/lib/modules/system76_io.ko", "OE"),
+                systeminfo.LoadedKernelModule("system76_acpi", "/lib/modules/system76_acpi.ko", "OE"),
+            ],
             True,
         ),
     ),
 )
-def test_check_tainted_kmods(monkeypatch, command_return, is_error, tainted_kmods_action):
-    run_subprocess_mock = mock.Mock(return_value=command_return)
-    monkeypatch.setattr(
-        tainted_kmods,
-        "run_subprocess",
-        value=run_subprocess_mock,
-    )
+def test_check_tainted_kmods(monkeypatch, loaded_kmods, is_error, tainted_kmods_action):
+    monkeypatch.setattr(systeminfo.system_info, "get_loaded_kmods", mock.Mock(return_value=loaded_kmods))
     if is_error:
         tainted_kmods_action.run()
         unit_tests.assert_actions_result(
@@ -0,0 +1,159 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import os
+
+import pytest
+import six
+
+from convert2rhel import backup_store
+
+
+six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
+from six.moves import mock
+
+
+@pytest.fixture
+def store(tmpdir):
+    return backup_store.BackupStore(str(tmpdir.join("store")))
+
+
+def test_backup_and_restore(store, tmpdir):
+    path = tmpdir.join("etc", "file.conf")
+    path.write("original", ensure=True)
+    path.chmod(0o640)
+    os.utime(str(path), (1000000000, 1000000000))
+
+    store.backup(str(path))
+    path.write("changed")
+    path.chmod(0o600)
+
+    assert store.restore(str(path))
+    assert path.read() == "original"
+    assert os.stat(str(path)).st_mode & 0o7777 == 0o640
+    assert os.stat(str(path)).st_mtime == 1000000000
+    assert not tmpdir.join("etc", "file.conf.convert2rhel-restore").exists()
+
+
+def test_restore_removed_file(store, tmpdir):
+    path = tmpdir.join("etc", "file.conf")
+    path.write("original", ensure=True)
+    store.backup(str(path))
+    path.remove()
+
+    assert store.restore(str(path))
+    assert path.read() == "original"
+
+
+def test_restore_through_symlink(store, tmpdir):
+    target = tmpdir.join("centos-release")
+    target.write("original")
+    path = tmpdir.join("system-release")
+    path.mksymlinkto(target)
+    store.backup(str(path))
+    target.write("changed")
+
+    assert store.restore(str(path))
+    assert path.islink()
+    assert target.read() == "original"
+
+
+def test_restore_unchanged_file(store, tmpdir, monkeypatch):
+    path = tmpdir.join("file.conf")
+    path.write("original")
+    store.backup(str(path))
+    clone_mock = mock.Mock()
+    monkeypatch.setattr(backup_store, "_clone", clone_mock)
+
+    assert not store.restore(str(path))
+    assert clone_mock.call_count == 0
+
+
+def test_restore_not_backed_up(store, tmpdir):
+    with pytest.raises(KeyError):
+        store.restore(str(tmpdir.join("file.conf")))
+
+
+def test_identical_content_is_stored_once(store, tmpdir):
+    first = tmpdir.join("first", "file.conf")
+    second = tmpdir.join("second", "file.conf")
+    first.write("content", ensure=True)
+    second.write("content", ensure=True)
+
+    assert store.backup(str(first)) == store.backup(str(second))
+
+    objects = [files for _, _, files in os.walk(os.path.join(store.directory, "objects")) if files]
+    assert len(objects) == 1
+    assert os.path.samefile(store.get_backup_path(str(first)), store.get_backup_path(str(second)))
+
+
+def test_same_file_names_do_not_collide(store, tmpdir):
+    first = tmpdir.join("yum", "vars", "releasever")
+    second = tmpdir.join("dnf", "vars", "releasever")
+    first.write("7", ensure=True)
+    second.write("8", ensure=True)
+    store.backup(str(first))
+    store.backup(str(second))
+    first.remove()
+    second.remove()
+
+    store.restore(str(first))
+    store.restore(str(second))
+
+    assert first.read() == "7"
+    assert second.read() == "8"
+    assert store.get_backed_up_paths(str(tmpdir.join("yum", "vars"))) == [str(first)]
+
+
+def test_backup_replaces_previous_backup(store, tmpdir):
+    path = tmpdir.join("file.conf")
+    path.write("first")
+    store.backup(str(path))
+    path.write("second")
+    store.backup(str(path))
+    path.write("changed")
+
+    store.restore(str(path))
+
+    assert path.read() == "second"
+    with open(store.get_backup_path(str(path))) as handler:
+        assert handler.read() == "second"
+
+
+def test_backup_without_reflinks(store, tmpdir, monkeypatch):
+    path = tmpdir.join("file.conf")
+    path.write("content")
+    monkeypatch.setattr(backup_store.fcntl, "ioctl", mock.Mock(side_effect=IOError(95, "Operation not supported")))
+
+    store.backup(str(path))
+    path.remove()
+    store.restore(str(path))
+
+    assert path.read() == "content"
+
+
+def test_index_survives_the_store(store, tmpdir):
+    path = tmpdir.join("file.conf")
+    path.write("content")
+    store.backup(str(path))
+
+    assert backup_store.BackupStore(store.directory).is_backed_up(str(path))
+
+    store.clear()
+
+    assert not store.is_backed_up(str(path))
+    assert not os.path.exists(store.directory)
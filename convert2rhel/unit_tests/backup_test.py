@@ -1,11 +1,14 @@
 import collections
+import logging
 import os
+import threading
 import unittest
 
 import pytest
 import six
 
-from convert2rhel import backup, repo, unit_tests, utils  # Imports unit_tests/__init__.py
+from convert2rhel import backup, journal, repo, unit_tests, utils  # Imports unit_tests/__init__.py
+from convert2rhel.logger import LogLevelFile
 from convert2rhel.unit_tests.conftest import centos8
 
 
@@ -57,17 +60,15 @@ class TestBackup(unittest.TestCase):
         backup.remove_pkgs(pkgs, False)
         self.assertEqual(backup.changed_pkgs_control.backup_and_track_removed_pkg.called, 0)
 
-        self.assertEqual(backup.run_subprocess.called, len(pkgs))
-
-        rpm_remove_cmd = ["rpm", "-e", "--nodeps"]
-        for cmd, pkg in zip(backup.run_subprocess.cmds, pkgs):
-            self.assertEqual(rpm_remove_cmd + [pkg], cmd)
+        self.assertEqual(backup.run_subprocess.called, 1)
+        self.assertEqual(backup.run_subprocess.cmds, [["rpm", "-e", "--nodeps"] + pkgs])
 
     @unit_tests.mock(
         backup.ChangedRPMPackagesController,
         "backup_and_track_removed_pkg",
         DummyFuncMocked(),
     )
+    @unit_tests.mock(backup.repackage, "repackage_pkgs", mock.Mock(return_value={}))
     @unit_tests.mock(backup, "run_subprocess", RunSubprocessMocked())
     def test_remove_pkgs_with_backup(self):
         pkgs = ["pkg1", "pkg2", "pkg3"]
@@ -77,11 +78,8 @@ class TestBackup(unittest.TestCase):
             len(pkgs),
         )
 
-        self.assertEqual(backup.run_subprocess.called, len(pkgs))
-
-        rpm_remove_cmd = ["rpm", "-e", "--nodeps"]
-        for cmd, pkg in zip(backup.run_subprocess.cmds, pkgs):
-            self.assertEqual(rpm_remove_cmd + [pkg], cmd)
+        self.assertEqual(backup.run_subprocess.called, 1)
+        self.assertEqual(backup.run_subprocess.cmds, [["rpm", "-e", "--nodeps"] + pkgs])
 
     @unit_tests.mock(backup.RestorablePackage, "backup", DummyFuncMocked())
     def test_backup_and_track_removed_pkg(self):
@@ -121,6 +119,62 @@ class TestBackup(unittest.TestCase):
         )
 
 
+@centos8
+def test_remove_pkgs_with_repackaged_backup(pretend_os, tmpdir, monkeypatch, caplog):
+    monkeypatch.setattr(backup, "changed_pkgs_control", backup.ChangedRPMPackagesController())
+    monkeypatch.setattr(backup, "run_subprocess", mock.Mock(return_value=("", 0)))
+    repackage_mock = mock.Mock(return_value={"pkg1": "/backup/pkg1.rpm"})
+    monkeypatch.setattr(backup.repackage, "repackage_pkgs", repackage_mock)
+    download_mock = mock.Mock(side_effect=[None, "/backup/pkg2.rpm"])
+    monkeypatch.setattr(backup, "download_pkg", download_mock)
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmpdir))
+    monkeypatch.setattr(backup.system_info, "corresponds_to_rhel_eus_release", lambda: False)
+    monkeypatch.setattr(backup.system_info, "has_internet_access", True, raising=False)
+
+    backup.remove_pkgs(["pkg1", "pkg2"])
+
+    assert [pkg.path for pkg in backup.changed_pkgs_control.removed_pkgs] == ["/backup/pkg1.rpm", "/backup/pkg2.rpm"]
+    # Only the package that couldn't be downloaded is rebuilt.
+    repackage_mock.assert_called_once_with(["pkg1"], str(tmpdir))
+    assert all(call[1]["report_failure"] is False for call in download_mock.call_args_list)
+    assert "The rebuilt package is not signed." in caplog.text
+
+
+@centos8
+def test_remove_pkgs_downloads_signed_backups(pretend_os, tmpdir, monkeypatch):
+    monkeypatch.setattr(backup, "changed_pkgs_control", backup.ChangedRPMPackagesController())
+    monkeypatch.setattr(backup, "run_subprocess", mock.Mock(return_value=("", 0)))
+    repackage_mock = mock.Mock(return_value={})
+    monkeypatch.setattr(backup.repackage, "repackage_pkgs", repackage_mock)
+    download_mock = mock.Mock(return_value="/backup/pkg1.rpm")
+    monkeypatch.setattr(backup, "download_pkg", download_mock)
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmpdir))
+    monkeypatch.setattr(backup.system_info, "corresponds_to_rhel_eus_release", lambda: False)
+    monkeypatch.setattr(backup.system_info, "has_internet_access", True, raising=False)
+
+    backup.remove_pkgs(["pkg1"])
+
+    assert repackage_mock.call_count == 0
+    assert download_mock.call_count == 1
+
+
+@centos8
+def test_remove_pkgs_without_any_backup(pretend_os, tmpdir, monkeypatch):
+    monkeypatch.setattr(backup, "changed_pkgs_control", backup.ChangedRPMPackagesController())
+    monkeypatch.setattr(backup.repackage, "repackage_pkgs", mock.Mock(return_value={}))
+    monkeypatch.setattr(backup, "download_pkg", mock.Mock(return_value=None))
+    report_failed_download_mock = mock.Mock(side_effect=SystemExit)
+    monkeypatch.setattr(backup, "report_failed_download", report_failed_download_mock)
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmpdir))
+    monkeypatch.setattr(backup.system_info, "corresponds_to_rhel_eus_release", lambda: False)
+    monkeypatch.setattr(backup.system_info, "has_internet_access", True, raising=False)
+
+    with pytest.raises(SystemExit):
+        backup.remove_pkgs(["pkg1"])
+
+    report_failed_download_mock.assert_called_once_with("pkg1")
+
+
 def test_remove_pkgs_with_empty_list(caplog):
     backup.remove_pkgs([])
     assert "No package to remove" in caplog.messages[-1]
@@ -204,29 +258,29 @@ def test_changed_pkgs_control_restore_pkgs(monkeypatch):
 
 
 @pytest.mark.parametrize(
-    ("filepath", "backup_dir", "file_content", "expected"),
+    ("file_content", "expected"),
     (
-        ("test.rpm", "backup", "test", None),
-        ("test.rpm", "backup", "", "Can't find"),
+        ("test", None),
+        ("", "Can't find"),
     ),
 )
-def test_restorable_file_backup(filepath, backup_dir, file_content, expected, tmpdir, monkeypatch, caplog):
-    tmp_file = tmpdir.join(filepath)
-    tmp_backup = tmpdir.mkdir(backup_dir)
+def test_restorable_file_backup(file_content, expected, tmpdir, file_store, caplog):
+    tmp_file = tmpdir.join("test.rpm")
     if file_content:
         tmp_file.write(file_content)
 
-    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_backup))
     rf = backup.RestorableFile(filepath=str(tmp_file))
     rf.backup()
 
     if expected:
         assert expected in caplog.records[-1].message
+    assert file_store.is_backed_up(str(tmp_file)) == bool(file_content)
 
 
-def test_restorable_file_backup_oserror(tmpdir, caplog):
+def test_restorable_file_backup_oserror(tmpdir, monkeypatch, caplog):
     tmp_file = tmpdir.join("test.rpm")
     tmp_file.write("test")
+    monkeypatch.setattr(backup.file_store, "backup", mock.Mock(side_effect=OSError(2, "No such file or directory")))
     rf = backup.RestorableFile(filepath=str(tmp_file))
 
     with pytest.raises(SystemExit):
@@ -236,38 +290,39 @@ def test_restorable_file_backup_oserror(tmpdir, caplog):
 
 
 @pytest.mark.parametrize(
-    ("filepath", "backup_dir", "file_content", "expected"),
+    ("backed_up", "changed", "expected"),
     (
-        ("test.rpm", "backup", "test", "restored"),
-        ("test.rpm", "backup", "", "hasn't been backed up"),
+        (True, True, "restored"),
+        (True, False, "hasn't changed since the backup"),
+        (False, True, "hasn't been backed up"),
     ),
 )
-def test_restorable_file_restore(filepath, backup_dir, file_content, expected, tmpdir, monkeypatch, caplog):
-    tmp_backup = tmpdir
-    tmp_file = tmpdir.join(filepath)
-    tmp_backup = tmp_backup.mkdir(backup_dir).join(filepath)
-    if file_content:
-        tmp_backup.write(file_content)
-
-    monkeypatch.setattr(backup, "BACKUP_DIR", os.path.dirname(str(tmp_backup)))
+def test_restorable_file_restore(backed_up, changed, expected, tmpdir, caplog):
+    tmp_file = tmpdir.join("test.rpm")
+    tmp_file.write("test")
     rf = backup.RestorableFile(filepath=str(tmp_file))
-    rf.restore()
+    if backed_up:
+        rf.backup()
+    if changed:
+        tmp_file.write("changed")
 
-    if expected:
-        assert expected in caplog.records[-1].message
+    caplog.set_level(LogLevelFile.level)
+    rf.restore()
 
+    assert expected in caplog.records[-1].message
+    if backed_up:
+        assert tmp_file.read() == "test"
 
-def test_restorable_file_restore_oserror(tmpdir, caplog, monkeypatch):
-    tmp_backup = tmpdir
-    tmp_backup = tmp_backup.mkdir("backup").join("test.rpm")
-    tmp_backup.write("test")
 
-    monkeypatch.setattr(backup, "BACKUP_DIR", os.path.dirname(str(tmp_backup)))
+def test_restorable_file_restore_oserror(tmpdir, monkeypatch, caplog):
+    tmp_file = tmpdir.join("test.rpm")
+    tmp_file.write("test")
+    rf = backup.RestorableFile(filepath=str(tmp_file))
+    rf.backup()
+    monkeypatch.setattr(backup.file_store, "restore", mock.Mock(side_effect=OSError(2, "No such file or directory")))
 
-    rf = backup.RestorableFile(filepath="/non-existing/test.rpm")
     rf.restore()
 
-    # Source and dest files are the same, which throws this error
     assert "Error(2): No such file or directory" in caplog.records[-1].message
 
 
@@ -311,6 +366,126 @@ def test_remove_pkgs_failed_to_remove(
     assert expected.format(pkgs_to_remove[0]) in caplog.records[-1].message
 
 
+class RpmMocked:
+    """Pretend to remove packages with rpm.
+
+    :param installed: The installed packages.
+    :param failing: The packages with a failing scriptlet.
+    :param scriptlet: The failing scriptlet. A failing %preun scriptlet keeps
+        the package installed, a failing %postun scriptlet doesn't. None keeps
+        the package installed without rpm saying why.
+    """
+
+    def __init__(self, installed, failing=(), scriptlet="%preun"):
+        self.installed = list(installed)
+        self.failing = failing
+        self.scriptlet = scriptlet
+        self.cmds = []
+
+    def __call__(self, cmd, print_cmd=True, print_output=True):
+        self.cmds.append(cmd)
+        pkgs = [arg for arg in cmd[1:] if not arg.startswith("-")]
+        not_installed = ["package %s is not installed" % pkg for pkg in pkgs if pkg not in self.installed]
+        if cmd[1] == "-q":
+            return "\n".join(pkg if pkg in self.installed else "package %s is not installed" % pkg for pkg in pkgs), 1
+        if not_installed:
+            return "\n".join("error: %s" % line for line in not_installed), 1
+
+        output = []
+        for pkg in pkgs:
+            if pkg in self.failing and self.scriptlet:
+                output.append("error: %s(%s) scriptlet failed, exit status 1" % (self.scriptlet, pkg))
+            if pkg not in self.failing or self.scriptlet == "%postun":
+                self.installed.remove(pkg)
+        return "\n".join(output), 1 if any(pkg in self.failing for pkg in pkgs) else 0
+
+
+@pytest.mark.parametrize(
+    ("installed", "failing", "scriptlet", "expected", "expected_installed"),
+    (
+        (["pkg1", "pkg2", "pkg3", "pkg4"], (), "%preun", [], []),
+        (["pkg1", "pkg2", "pkg4"], (), "%preun", ["pkg3"], []),
+        (["pkg1", "pkg2", "pkg3", "pkg4"], ("pkg2",), "%preun", ["pkg2"], ["pkg2"]),
+        (["pkg1", "pkg2", "pkg3", "pkg4"], ("pkg2", "pkg4"), "%preun", ["pkg2", "pkg4"], ["pkg2", "pkg4"]),
+        (["pkg2", "pkg3", "pkg4"], ("pkg3",), "%preun", ["pkg1", "pkg3"], ["pkg3"]),
+        # The packages are erased, only the rpm output tells about the failure
+        (["pkg1", "pkg2", "pkg3", "pkg4"], ("pkg2", "pkg3"), "%postun", ["pkg2", "pkg3"], []),
+        # Found by bisecting the packages that are still installed
+        (["pkg1", "pkg2", "pkg3", "pkg4"], ("pkg2", "pkg4"), None, ["pkg2", "pkg4"], ["pkg2", "pkg4"]),
+    ),
+)
+def test_remove_pkgs_with_rpm(installed, failing, scriptlet, expected, expected_installed, monkeypatch):
+    rpm_mock = RpmMocked(installed, failing, scriptlet)
+    monkeypatch.setattr(backup, "run_subprocess", rpm_mock)
+
+    assert backup._remove_pkgs_with_rpm(["pkg1", "pkg2", "pkg3", "pkg4"]) == expected
+    assert rpm_mock.installed == expected_installed
+
+
+def test_remove_pkgs_with_rpm_parses_scriptlet_failures(monkeypatch):
+    rpm_mock = RpmMocked(["pkg1", "pkg2", "pkg3", "pkg4"], ("pkg1", "pkg3"))
+    monkeypatch.setattr(backup, "run_subprocess", rpm_mock)
+
+    assert backup._remove_pkgs_with_rpm(["pkg1", "pkg2", "pkg3", "pkg4"]) == ["pkg1", "pkg3"]
+    # The failing packages are known from the output, nothing is bisected
+    assert rpm_mock.cmds == [["rpm", "-e", "--nodeps", "pkg1", "pkg2", "pkg3", "pkg4"], ["rpm", "-q", "pkg2", "pkg4"]]
+
+
+@pytest.mark.parametrize(
+    ("output", "expected"),
+    (
+        ("", []),
+        ("error: %preun(pkg1-1.0-1.el8.x86_64) scriptlet failed, exit status 1", ["pkg1-1.0-1.el8.x86_64"]),
+        ("error: %preun(pkg1-2:1.0-1.el8.x86_64) scriptlet failed, exit status 1", ["pkg1-1.0-1.el8.x86_64"]),
+        ("warning: %postun(pkg2-1.0-1.el8.x86_64) scriptlet failed, exit status 3", ["pkg2-1.0-1.el8.x86_64"]),
+        (
+            "error: %postun(pkg2-1.0-1.el8.x86_64) scriptlet failed, exit status 1\n"
+            "error: %preun(pkg1-1.0-1.el8.x86_64) scriptlet failed, exit status 1",
+            ["pkg1-1.0-1.el8.x86_64", "pkg2-1.0-1.el8.x86_64"],
+        ),
+        ("error: %preun(other-1.0-1.el8.x86_64) scriptlet failed, exit status 1", []),
+    ),
+)
+def test_get_pkgs_with_failed_scriptlets(output, expected):
+    nvras = ["pkg1-1.0-1.el8.x86_64", "pkg2-1.0-1.el8.x86_64"]
+
+    assert backup._get_pkgs_with_failed_scriptlets(output, nvras) == expected
+
+
+def test_remove_pkgs_with_rpm_single_transaction(monkeypatch):
+    rpm_mock = RpmMocked(["pkg%d" % number for number in range(100)])
+    monkeypatch.setattr(backup, "run_subprocess", rpm_mock)
+
+    backup.remove_pkgs(["pkg%d" % number for number in range(100)], backup=False, critical=False)
+
+    assert len(rpm_mock.cmds) == 1
+    assert rpm_mock.installed == []
+
+
+@pytest.mark.parametrize("scriptlet", ("%preun", None))
+def test_remove_pkgs_critical_names_failing_package(scriptlet, monkeypatch, caplog):
+    rpm_mock = RpmMocked(["pkg1", "pkg2", "pkg3"], ("pkg2",), scriptlet)
+    monkeypatch.setattr(backup, "run_subprocess", rpm_mock)
+
+    with pytest.raises(SystemExit):
+        backup.remove_pkgs(["pkg1", "pkg2", "pkg3"], backup=False, critical=True)
+
+    assert rpm_mock.cmds[0] == ["rpm", "-e", "--nodeps", "pkg1", "pkg2", "pkg3"]
+    assert rpm_mock.installed == ["pkg2"]
+    assert caplog.records[-1].message == "Error: Couldn't remove pkg2."
+
+
+def test_remove_pkgs_reports_each_failure(monkeypatch, caplog):
+    monkeypatch.setattr(backup, "run_subprocess", RpmMocked(["pkg1", "pkg2", "pkg3"], ("pkg1", "pkg3")))
+
+    backup.remove_pkgs(["pkg1", "pkg2", "pkg3"], backup=False, critical=False)
+
+    assert [record.message for record in caplog.records if record.levelname == "WARNING"] == [
+        "Couldn't remove pkg1.",
+        "Couldn't remove pkg3.",
+    ]
+
+
 @centos8
 def test_restorable_package_backup(pretend_os, monkeypatch, tmpdir):
     backup_dir = str(tmpdir)
@@ -504,6 +679,145 @@ class TestBackupController:
         with pytest.raises(IndexError, match="No backups to restore"):
             backup_controller.pop_all()
 
+    def test_resources(self, backup_controller, restorable, monkeypatch):
+        monkeypatch.setattr(backup.RestorableRpmKey, "enable", mock.Mock())
+        monkeypatch.setattr(backup.utils, "find_keyid", mock.Mock(return_value="keyid"))
+        backup_controller.push(backup.RestorableRpmKey("/key1"))
+        backup_controller.push(backup.RestorableRpmKey("/key2"))
+
+        assert backup_controller.resources == (backup.RESOURCE_RPMDB,)
+
+        backup_controller.push(restorable)
+
+        assert backup_controller.resources is None
+
+
+@pytest.mark.parametrize(
+    ("resources", "other_resources", "expected"),
+    (
+        ((backup.RESOURCE_RPMDB,), (backup.RESOURCE_RPMDB, "/"), True),
+        ((backup.RESOURCE_RPMDB,), (backup.RESOURCE_RHSM,), False),
+        (None, (), True),
+        (("/etc/yum.repos.d/",), ("/etc/yum.repos.d/centos.repo",), True),
+        (("/etc/yum/vars",), ("/etc/yum.repos.d/",), False),
+        (("/",), ("/etc/os-release",), True),
+        (("/etc/os-release",), (backup.RESOURCE_RPMDB,), False),
+    ),
+)
+def test_resources_overlap(resources, other_resources, expected):
+    assert backup._resources_overlap(resources, other_resources) is expected
+    assert backup._resources_overlap(other_resources, resources) is expected
+
+
+def test_restore_concurrently_keeps_order_of_a_resource():
+    restored = []
+    lock = threading.Lock()
+
+    def restore(name):
+        def _restore():
+            with lock:
+                restored.append(name)
+
+        return _restore
+
+    backup.restore_concurrently(
+        [
+            (restore("rpm1"), (backup.RESOURCE_RPMDB,)),
+            (restore("file1"), ("/etc/file",)),
+            (restore("rpm2"), (backup.RESOURCE_RPMDB,)),
+            (restore("everything"), None),
+            (restore("file2"), ("/etc/file",)),
+        ]
+    )
+
+    assert restored.index("rpm1") < restored.index("rpm2") < restored.index("everything")
+    assert restored.index("file1") < restored.index("everything") < restored.index("file2")
+
+
+def test_restore_concurrently_runs_independent_restores_together():
+    file_restored = threading.Event()
+
+    def restore_rpmdb():
+        # Only finishes when the restore after it runs at the same time.
+        assert file_restored.wait(10)
+
+    backup.restore_concurrently([(restore_rpmdb, (backup.RESOURCE_RPMDB,)), (file_restored.set, ("/etc/file",))])
+
+
+def test_restore_concurrently_failure():
+    rpmdb_failed = threading.Event()
+    restored = []
+
+    def restore_rpmdb():
+        rpmdb_failed.set()
+        raise SystemExit("Unable to restore the rpm database")
+
+    def restore_file():
+        assert rpmdb_failed.wait(10)
+        restored.append("file")
+
+    with pytest.raises(SystemExit, match="Unable to restore the rpm database"):
+        backup.restore_concurrently(
+            [
+                (restore_file, ("/etc/file",)),
+                (restore_rpmdb, (backup.RESOURCE_RPMDB,)),
+                (lambda: restored.append("rpmdb"), (backup.RESOURCE_RPMDB,)),
+            ]
+        )
+
+    # The running restore is finished, the ones after the failure aren't started.
+    assert restored == ["file"]
+
+
+def test_restore_concurrently_logs_in_order(caplog):
+    second_logged = threading.Event()
+    logger = logging.getLogger("convert2rhel.backup")
+
+    def first():
+        assert second_logged.wait(10)
+        logger.info("first restored")
+
+    def second():
+        logger.info("second restored")
+        second_logged.set()
+
+    backup.restore_concurrently([(first, (backup.RESOURCE_RPMDB,)), (second, ("/etc/file",))])
+
+    # The output of the first restore comes first even though it was logged last.
+    assert [message for message in caplog.messages if message.endswith("restored")] == [
+        "first restored",
+        "second restored",
+    ]
+
+
+def test_restore_concurrently_timeout(caplog):
+    release = threading.Event()
+    daemon = []
+    restored = []
+
+    def hang():
+        daemon.append(threading.current_thread().daemon)
+        logging.getLogger("convert2rhel.backup").info("hanging")
+        release.wait(30)
+
+    try:
+        with pytest.raises(backup.RestoreTimeoutError, match="did not finish within 0.5 seconds"):
+            backup.restore_concurrently(
+                [
+                    (hang, (backup.RESOURCE_RPMDB,)),
+                    (lambda: restored.append("rpmdb"), (backup.RESOURCE_RPMDB,)),
+                ],
+                timeout=0.5,
+            )
+    finally:
+        release.set()
+
+    # The hung restore does not keep convert2rhel from exiting.
+    assert daemon == [True]
+    # Nothing is restored after the hung restore, it may still be changing the rpmdb.
+    assert restored == []
+    assert "hanging" in caplog.messages
+
 
 @pytest.fixture
 def run_subprocess_with_empty_rpmdb(monkeypatch, tmpdir):
@@ -682,3 +996,132 @@ def test_restorable_file_remove(tmpdir, caplog, file, filepath, message):
     restorable_file.remove()
 
     assert message in caplog.text
+
+
+class TestRollbackJournal:
+    @pytest.fixture(autouse=True)
+    def controllers(self, monkeypatch):
+        monkeypatch.setattr(backup, "changed_pkgs_control", backup.ChangedRPMPackagesController())
+        monkeypatch.setattr(backup, "backup_control", backup.BackupController())
+
+    def test_changes_are_journaled(self, rollback_journal, monkeypatch):
+        monkeypatch.setattr(backup.RestorablePackage, "backup", mock.Mock())
+        rollback_journal.start(keep_rhsm=True)
+
+        backup.changed_pkgs_control.track_installed_pkgs(["subscription-manager", "python3-syspurpose"])
+        backup.changed_pkgs_control.backup_and_track_removed_pkg("centos-release")
+        rpm_key = backup.RestorableRpmKey(TestRestorableRpmKey.gpg_key)
+
+        def enable():
+            rpm_key.previously_installed = False
+
+        monkeypatch.setattr(rpm_key, "enable", enable)
+        backup.backup_control.push(rpm_key)
+
+        assert [(entry["type"], entry.get("entry")) for entry in rollback_journal.read()] == [
+            (journal.START, None),
+            (journal.INSTALLED_PKG, None),
+            (journal.COMPLETED, 1),
+            (journal.INSTALLED_PKG, None),
+            (journal.COMPLETED, 3),
+            (journal.REMOVED_PKG, None),
+            (journal.RESTORABLE, None),
+            (journal.COMPLETED, 6),
+        ]
+        entries = rollback_journal.read()
+        # The state of the key is only known once it has been imported
+        assert entries[6]["data"]["previously_installed"] is None
+        assert entries[7]["data"]["previously_installed"] is False
+
+    def test_changes_are_journaled_before_they_are_made(self, rollback_journal, restorable, monkeypatch):
+        rollback_journal.start()
+
+        def enable():
+            assert rollback_journal.read()[-1]["type"] == journal.RESTORABLE
+
+        monkeypatch.setattr(restorable, "enable", enable)
+        backup.backup_control.push(restorable)
+
+        backup.changed_pkgs_control.journal_pkgs_to_install(["subscription-manager"])
+        assert rollback_journal.read()[-1] == {"type": journal.INSTALLED_PKG, "pkg": "subscription-manager"}
+
+        backup.changed_pkgs_control.track_installed_pkgs(["subscription-manager"])
+        assert rollback_journal.read()[-1] == {"type": journal.COMPLETED, "entry": 3}
+
+    def test_unknown_restorable_is_journaled(self, rollback_journal, restorable):
+        rollback_journal.start()
+
+        backup.backup_control.push(restorable)
+
+        assert rollback_journal.read()[-2:] == [
+            {"type": journal.RESTORABLE, "name": "MinimalRestorable", "data": None},
+            {"type": journal.COMPLETED, "entry": 1, "data": None},
+        ]
+
+    def test_load_journal(self, caplog):
+        entries = [
+            {"type": journal.START, "options": {"keep_rhsm": True}},
+            {"type": journal.INSTALLED_PKG, "pkg": "subscription-manager"},
+            {"type": journal.COMPLETED, "entry": 1},
+            {"type": journal.REMOVED_PKG, "pkg": "centos-release", "path": "/backup/centos-release.rpm"},
+            {
+                "type": journal.RESTORABLE,
+                "name": "RestorableRpmKey",
+                "data": {"keyfile": "/gone/RPM-GPG-KEY", "keyid": "fd431d51", "previously_installed": None},
+            },
+            {
+                "type": journal.COMPLETED,
+                "entry": 4,
+                "data": {"keyfile": "/gone/RPM-GPG-KEY", "keyid": "fd431d51", "previously_installed": False},
+            },
+            {"type": journal.RESTORABLE, "name": "MinimalRestorable", "data": None},
+            {"type": journal.COMPLETED, "entry": 6, "data": None},
+        ]
+
+        assert backup.load_journal(entries) == {"keep_rhsm": True}
+
+        assert backup.changed_pkgs_control.installed_pkgs == ["subscription-manager"]
+        assert [(pkg.name, pkg.path) for pkg in backup.changed_pkgs_control.removed_pkgs] == [
+            ("centos-release", "/backup/centos-release.rpm")
+        ]
+        (rpm_key,) = backup.backup_control._restorables
+        assert rpm_key.enabled is True
+        assert rpm_key.keyid == "fd431d51"
+        assert rpm_key.previously_installed is False
+        assert "Unable to restore the MinimalRestorable change" in caplog.records[-1].message
+
+    @pytest.mark.parametrize(("installed",), ((True,), (False,)))
+    def test_load_journal_incomplete_install(self, installed, monkeypatch):
+        is_rpm_installed = mock.Mock(return_value=installed)
+        monkeypatch.setattr(backup.system_info, "is_rpm_installed", is_rpm_installed)
+
+        backup.load_journal([{"type": journal.START}, {"type": journal.INSTALLED_PKG, "pkg": "subscription-manager"}])
+
+        is_rpm_installed.assert_called_once_with("subscription-manager")
+        assert backup.changed_pkgs_control.installed_pkgs == (["subscription-manager"] if installed else [])
+
+    def test_restore_incomplete_rpm_key(self, monkeypatch, caplog):
+        run_subprocess_mock = mock.Mock(return_value=("", 0))
+        monkeypatch.setattr(utils, "run_subprocess", run_subprocess_mock)
+        data = {"keyfile": "/gone/RPM-GPG-KEY", "keyid": "fd431d51", "previously_installed": None}
+        backup.load_journal(
+            [{"type": journal.START}, {"type": journal.RESTORABLE, "name": "RestorableRpmKey", "data": data}]
+        )
+
+        backup.backup_control.pop_all()
+
+        assert "The RestorableRpmKey change may not have been made" in caplog.text
+        # The key may have been in the rpmdb before, so it is left there
+        run_subprocess_mock.assert_not_called()
+
+    def test_restore_loaded_rpm_key(self, monkeypatch):
+        run_subprocess_mock = mock.Mock(return_value=("", 0))
+        monkeypatch.setattr(utils, "run_subprocess", run_subprocess_mock)
+        data = {"keyfile": "/gone/RPM-GPG-KEY", "keyid": "fd431d51", "previously_installed": False}
+        backup.load_journal(
+            [{"type": journal.START}, {"type": journal.RESTORABLE, "name": "RestorableRpmKey", "data": data}]
+        )
+
+        backup.backup_control.pop_all()
+
+        run_subprocess_mock.assert_called_once_with(["rpm", "-e", "gpg-pubkey-fd431d51"])
@@ -386,3 +386,29 @@ def test_print_data_collection(telemetry_disabled, call_count, monkeypatch, capl
 
     if telemetry_disabled:
         assert "Skipping, telemetry disabled." in caplog.records[-1].message
+
+
+def test_set_action_metrics():
+    metrics = {"wall_time": 1.5, "cpu_time_self": 0.5, "cpu_time_children": 1.0, "peak_rss_delta": 0, "subprocesses": 2}
+    breadcrumbs.breadcrumbs.set_action_metrics(
+        {
+            "RanAction": {"status": 0, "error_id": None, "message": None, "metrics": metrics},
+            "SkippedAction": {"status": 101, "error_id": "SKIP", "message": "Skipped", "metrics": None},
+        }
+    )
+
+    assert breadcrumbs.breadcrumbs.data["action_metrics"] == {"RanAction": metrics}
+
+
+def test_save_rhsm_facts_without_action_metrics(monkeypatch, tmpdir):
+    rhsm_file = str(tmpdir.join("convert2rhel.facts"))
+    monkeypatch.setattr(breadcrumbs, "RHSM_CUSTOM_FACTS_FOLDER", str(tmpdir))
+    monkeypatch.setattr(breadcrumbs, "RHSM_CUSTOM_FACTS_FILE", rhsm_file)
+    monkeypatch.setattr(breadcrumbs.breadcrumbs, "action_metrics", {"RanAction": {"wall_time": 1.5}})
+
+    breadcrumbs.breadcrumbs._save_rhsm_facts()
+
+    with open(rhsm_file) as handler:
+        facts = json.load(handler)
+    assert not [fact for fact in facts if "action_metrics" in fact]
+    assert breadcrumbs.breadcrumbs.data["action_metrics"] == {"RanAction": {"wall_time": 1.5}}
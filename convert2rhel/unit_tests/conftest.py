@@ -4,7 +4,7 @@ import sys
 import pytest
 import six
 
-from convert2rhel import backup, cert, pkgmanager, redhatrelease, systeminfo, toolopts, utils
+from convert2rhel import backup, backup_store, cert, journal, pkgmanager, redhatrelease, systeminfo, toolopts, utils
 from convert2rhel.logger import setup_logger_handler
 from convert2rhel.systeminfo import system_info
 from convert2rhel.toolopts import tool_opts
@@ -109,6 +109,21 @@ def setup_logger(tmpdir):
     setup_logger_handler(log_name="convert2rhel", log_dir=str(tmpdir))
 
 
+@pytest.fixture(autouse=True)
+def rollback_journal(tmpdir, monkeypatch):
+    """Keep the rollback journal of each test in its own tmpdir."""
+    monkeypatch.setattr(journal, "JOURNAL_FILE", str(tmpdir.join("rollback-journal")))
+    monkeypatch.setattr(backup.rollback_journal, "active", False)
+    return backup.rollback_journal
+
+
+@pytest.fixture(autouse=True)
+def file_store(tmpdir, monkeypatch):
+    """Keep the backups of the files of each test in its own tmpdir."""
+    monkeypatch.setattr(backup_store, "STORE_DIR", str(tmpdir.join("backup-store")))
+    return backup_store.file_store
+
+
 @pytest.fixture
 def system_cert_with_target_path(monkeypatch, tmpdir, request):
     """
@@ -0,0 +1,111 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from convert2rhel import __version__, journal
+
+
+@pytest.fixture
+def rollback_journal(tmpdir):
+    return journal.RollbackJournal(str(tmpdir.join("journal", "rollback-journal")))
+
+
+def test_record_and_read(rollback_journal):
+    rollback_journal.start(keep_rhsm=True)
+    rollback_journal.record(journal.INSTALLED_PKG, pkg="subscription-manager")
+    rollback_journal.record(journal.REMOVED_PKG, pkg="centos-release", path="/backup/centos-release.rpm")
+
+    entries = rollback_journal.read()
+
+    assert entries[0]["type"] == journal.START
+    assert entries[0]["options"] == {"keep_rhsm": True}
+    assert entries[1:] == [
+        {"type": journal.INSTALLED_PKG, "pkg": "subscription-manager"},
+        {"type": journal.REMOVED_PKG, "pkg": "centos-release", "path": "/backup/centos-release.rpm"},
+    ]
+
+
+def test_complete(rollback_journal):
+    rollback_journal.start()
+    entry = rollback_journal.record(journal.INSTALLED_PKG, pkg="subscription-manager")
+    rollback_journal.complete(entry)
+
+    entries = rollback_journal.read()
+
+    assert entry == 1
+    assert entries[entry] == {"type": journal.INSTALLED_PKG, "pkg": "subscription-manager"}
+    assert entries[2] == {"type": journal.COMPLETED, "entry": 1}
+
+
+def test_record_not_started(rollback_journal):
+    assert rollback_journal.record(journal.INSTALLED_PKG, pkg="subscription-manager") is None
+    rollback_journal.complete(None)
+
+    assert not rollback_journal.exists()
+
+
+def test_start_with_interrupted_run(rollback_journal):
+    rollback_journal.start()
+    rollback_journal.stop()
+
+    with pytest.raises(journal.JournalError):
+        rollback_journal.start()
+
+    rollback_journal.remove()
+    assert not rollback_journal.exists()
+    rollback_journal.start()
+
+
+def test_read_incomplete_last_entry(rollback_journal):
+    rollback_journal.start()
+    rollback_journal.record(journal.INSTALLED_PKG, pkg="subscription-manager")
+    with open(rollback_journal.path, "a") as handler:
+        handler.write('{"type": "installed-pkg", "pkg": "subscr')
+
+    assert len(rollback_journal.read()) == 2
+
+
+@pytest.mark.parametrize(
+    ("lines", "message"),
+    (
+        (["not json", "{}"], "is corrupted at line 1"),
+        ([json.dumps({"type": journal.INSTALLED_PKG, "pkg": "pkg1"})], "is not in a known format"),
+        (
+            [json.dumps({"type": journal.START, "format": 1, "convert2rhel_version": "0.1"})],
+            "was written by convert2rhel 0.1",
+        ),
+    ),
+)
+def test_read_unusable_journal(lines, message, rollback_journal, tmpdir):
+    tmpdir.join("journal", "rollback-journal").write("\n".join(lines) + "\n", ensure=True)
+
+    with pytest.raises(journal.JournalError, match=message):
+        rollback_journal.read()
+
+
+def test_read_missing_journal(rollback_journal):
+    with pytest.raises(journal.JournalError, match="Unable to read the rollback journal"):
+        rollback_journal.read()
+
+
+def test_start_records_version(rollback_journal):
+    rollback_journal.start()
+
+    assert rollback_journal.read()[0]["convert2rhel_version"] == __version__
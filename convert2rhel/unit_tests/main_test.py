@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import functools
 import os
 import unittest
 
@@ -27,7 +28,7 @@ import six
 six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
 from six.moves import mock
 
-from convert2rhel import actions, backup, cert, checks, grub
+from convert2rhel import actions, backup, cert, checks, grub, journal
 from convert2rhel import logger as logger_module
 from convert2rhel import main, pkghandler, pkgmanager, redhatrelease, repo, subscription, toolopts, unit_tests, utils
 from convert2rhel.actions import report
@@ -214,8 +215,8 @@ def test_main(monkeypatch):
     resolve_system_info_mock = mock.Mock()
     print_system_information_mock = mock.Mock()
     collect_early_data_mock = mock.Mock()
-    clean_yum_metadata_mock = mock.Mock()
-    run_actions_mock = mock.Mock()
+    expire_yum_metadata_mock = mock.Mock()
+    run_actions_mock = mock.Mock(return_value={})
     find_actions_of_severity_mock = mock.Mock(return_value=[])
     clear_versionlock_mock = mock.Mock()
     report_summary_mock = mock.Mock()
@@ -238,7 +239,7 @@ def test_main(monkeypatch):
     monkeypatch.setattr(system_info, "print_system_information", print_system_information_mock)
     monkeypatch.setattr(breadcrumbs, "collect_early_data", collect_early_data_mock)
     monkeypatch.setattr(pkghandler, "clear_versionlock", clear_versionlock_mock)
-    monkeypatch.setattr(pkgmanager, "clean_yum_metadata", clean_yum_metadata_mock)
+    monkeypatch.setattr(pkgmanager, "expire_yum_metadata", expire_yum_metadata_mock)
     monkeypatch.setattr(actions, "run_actions", run_actions_mock)
     monkeypatch.setattr(actions, "find_actions_of_severity", find_actions_of_severity_mock)
     monkeypatch.setattr(report, "summary", report_summary_mock)
@@ -260,7 +261,7 @@ def test_main(monkeypatch):
     assert print_data_collection_mock.call_count == 1
     assert resolve_system_info_mock.call_count == 1
     assert collect_early_data_mock.call_count == 1
-    assert clean_yum_metadata_mock.call_count == 1
+    assert expire_yum_metadata_mock.call_count == 1
     assert find_actions_of_severity_mock.call_count == 1
     assert run_actions_mock.call_count == 1
     assert clear_versionlock_mock.call_count == 1
@@ -273,6 +274,8 @@ def test_main(monkeypatch):
     assert finish_collection_mock.call_count == 1
     assert check_kernel_boot_files_mock.call_count == 1
     assert update_rhsm_custom_facts_mock.call_count == 1
+    # The changes can't be rolled back past the point of no return
+    assert not backup.rollback_journal.exists()
 
 
 def test_main_rollback_post_cli_phase(monkeypatch, caplog):
@@ -308,8 +311,8 @@ def test_main_rollback_pre_ponr_changes_phase(monkeypatch, caplog):
     resolve_system_info_mock = mock.Mock()
     print_system_information_mock = mock.Mock()
     collect_early_data_mock = mock.Mock()
-    clean_yum_metadata_mock = mock.Mock()
-    run_actions_mock = mock.Mock()
+    expire_yum_metadata_mock = mock.Mock()
+    run_actions_mock = mock.Mock(return_value={})
     report_summary_mock = mock.Mock()
     clear_versionlock_mock = mock.Mock()
     find_actions_of_severity_mock = mock.Mock()
@@ -327,7 +330,7 @@ def test_main_rollback_pre_ponr_changes_phase(monkeypatch, caplog):
     monkeypatch.setattr(system_info, "print_system_information", print_system_information_mock)
     monkeypatch.setattr(breadcrumbs, "collect_early_data", collect_early_data_mock)
     monkeypatch.setattr(pkghandler, "clear_versionlock", clear_versionlock_mock)
-    monkeypatch.setattr(pkgmanager, "clean_yum_metadata", clean_yum_metadata_mock)
+    monkeypatch.setattr(pkgmanager, "expire_yum_metadata", expire_yum_metadata_mock)
     monkeypatch.setattr(actions, "run_actions", run_actions_mock)
     monkeypatch.setattr(report, "summary", report_summary_mock)
     monkeypatch.setattr(actions, "find_actions_of_severity", find_actions_of_severity_mock)
@@ -342,7 +345,7 @@ def test_main_rollback_pre_ponr_changes_phase(monkeypatch, caplog):
     assert print_data_collection_mock.call_count == 1
     assert resolve_system_info_mock.call_count == 1
     assert collect_early_data_mock.call_count == 1
-    assert clean_yum_metadata_mock.call_count == 1
+    assert expire_yum_metadata_mock.call_count == 1
     assert run_actions_mock.call_count == 1
     assert report_summary_mock.call_count == 1
     assert find_actions_of_severity_mock.call_count == 1
@@ -362,8 +365,8 @@ def test_main_rollback_analyze_exit_phase(global_tool_opts, monkeypatch):
     resolve_system_info_mock = mock.Mock()
     print_system_information_mock = mock.Mock()
     collect_early_data_mock = mock.Mock()
-    clean_yum_metadata_mock = mock.Mock()
-    run_actions_mock = mock.Mock()
+    expire_yum_metadata_mock = mock.Mock()
+    run_actions_mock = mock.Mock(return_value={})
     report_summary_mock = mock.Mock()
     clear_versionlock_mock = mock.Mock()
 
@@ -380,7 +383,7 @@ def test_main_rollback_analyze_exit_phase(global_tool_opts, monkeypatch):
     monkeypatch.setattr(system_info, "print_system_information", print_system_information_mock)
     monkeypatch.setattr(breadcrumbs, "collect_early_data", collect_early_data_mock)
     monkeypatch.setattr(pkghandler, "clear_versionlock", clear_versionlock_mock)
-    monkeypatch.setattr(pkgmanager, "clean_yum_metadata", clean_yum_metadata_mock)
+    monkeypatch.setattr(pkgmanager, "expire_yum_metadata", expire_yum_metadata_mock)
     monkeypatch.setattr(actions, "run_actions", run_actions_mock)
     monkeypatch.setattr(report, "summary", report_summary_mock)
     monkeypatch.setattr(breadcrumbs, "finish_collection", finish_collection_mock)
@@ -396,7 +399,7 @@ def test_main_rollback_analyze_exit_phase(global_tool_opts, monkeypatch):
     assert print_data_collection_mock.call_count == 1
     assert resolve_system_info_mock.call_count == 1
     assert collect_early_data_mock.call_count == 1
-    assert clean_yum_metadata_mock.call_count == 1
+    assert expire_yum_metadata_mock.call_count == 1
     assert run_actions_mock.call_count == 1
     assert report_summary_mock.call_count == 1
     assert clear_versionlock_mock.call_count == 1
@@ -413,8 +416,8 @@ def test_main_rollback_post_ponr_changes_phase(monkeypatch, caplog):
     resolve_system_info_mock = mock.Mock()
     print_system_information_mock = mock.Mock()
     collect_early_data_mock = mock.Mock()
-    clean_yum_metadata_mock = mock.Mock()
-    run_actions_mock = mock.Mock()
+    expire_yum_metadata_mock = mock.Mock()
+    run_actions_mock = mock.Mock(return_value={})
     find_actions_of_severity_mock = mock.Mock(return_value=[])
     report_summary_mock = mock.Mock()
     clear_versionlock_mock = mock.Mock()
@@ -434,7 +437,7 @@ def test_main_rollback_post_ponr_changes_phase(monkeypatch, caplog):
     monkeypatch.setattr(system_info, "print_system_information", print_system_information_mock)
     monkeypatch.setattr(breadcrumbs, "collect_early_data", collect_early_data_mock)
     monkeypatch.setattr(pkghandler, "clear_versionlock", clear_versionlock_mock)
-    monkeypatch.setattr(pkgmanager, "clean_yum_metadata", clean_yum_metadata_mock)
+    monkeypatch.setattr(pkgmanager, "expire_yum_metadata", expire_yum_metadata_mock)
     monkeypatch.setattr(actions, "run_actions", run_actions_mock)
     monkeypatch.setattr(actions, "find_actions_of_severity", find_actions_of_severity_mock)
     monkeypatch.setattr(report, "summary", report_summary_mock)
@@ -451,7 +454,7 @@ def test_main_rollback_post_ponr_changes_phase(monkeypatch, caplog):
     assert print_data_collection_mock.call_count == 1
     assert resolve_system_info_mock.call_count == 1
     assert collect_early_data_mock.call_count == 1
-    assert clean_yum_metadata_mock.call_count == 1
+    assert expire_yum_metadata_mock.call_count == 1
     assert run_actions_mock.call_count == 1
     assert find_actions_of_severity_mock.call_count == 1
     assert clear_versionlock_mock.call_count == 1
@@ -461,3 +464,151 @@ def test_main_rollback_post_ponr_changes_phase(monkeypatch, caplog):
     assert finish_collection_mock.call_count == 1
     assert "The system is left in an undetermined state that Convert2RHEL cannot fix." in caplog.records[-1].message
     assert update_rhsm_custom_facts_mock.call_count == 1
+
+
+def test_main_interrupted_run_not_rolled_back(rollback_journal, monkeypatch, caplog):
+    rollback_journal.start()
+    rollback_journal.stop()
+    clear_versionlock_mock = mock.Mock()
+    run_actions_mock = mock.Mock()
+    rollback_changes_mock = mock.Mock()
+
+    monkeypatch.setattr(utils, "require_root", mock.Mock())
+    monkeypatch.setattr(main, "initialize_logger", mock.Mock())
+    monkeypatch.setattr(toolopts, "CLI", mock.Mock())
+    monkeypatch.setattr(main, "perform_boilerplate", mock.Mock())
+    monkeypatch.setattr(main, "gather_system_info", mock.Mock())
+    monkeypatch.setattr(pkghandler, "clear_versionlock", clear_versionlock_mock)
+    monkeypatch.setattr(breadcrumbs, "finish_collection", mock.Mock())
+    monkeypatch.setattr(actions, "run_actions", run_actions_mock)
+    monkeypatch.setattr(main, "rollback_changes", rollback_changes_mock)
+
+    assert main.main() == 1
+    assert "Run 'convert2rhel rollback --resume' to roll them back first." in caplog.text
+    # The version locks are left as they are until the interrupted run is rolled back
+    assert clear_versionlock_mock.call_count == 0
+    assert run_actions_mock.call_count == 0
+    assert rollback_changes_mock.call_count == 0
+    assert rollback_journal.exists()
+
+
+def test_main_rollback_prepare_system_failure(rollback_journal, monkeypatch, caplog):
+    clear_versionlock_mock = mock.Mock()
+    rollback_changes_mock = mock.Mock()
+
+    monkeypatch.setattr(utils, "require_root", mock.Mock())
+    monkeypatch.setattr(main, "initialize_logger", mock.Mock())
+    monkeypatch.setattr(toolopts, "CLI", mock.Mock())
+    monkeypatch.setattr(main, "perform_boilerplate", mock.Mock())
+    monkeypatch.setattr(main, "gather_system_info", mock.Mock())
+    monkeypatch.setattr(pkghandler, "clear_versionlock", clear_versionlock_mock)
+    monkeypatch.setattr(pkgmanager, "expire_yum_metadata", mock.Mock(side_effect=Exception))
+    monkeypatch.setattr(breadcrumbs, "finish_collection", mock.Mock())
+    monkeypatch.setattr(main, "rollback_changes", rollback_changes_mock)
+
+    assert main.main() == 1
+    assert clear_versionlock_mock.call_count == 1
+    # The cleared version locks are restored
+    assert rollback_changes_mock.call_count == 1
+    assert "No changes were made to the system." not in caplog.text
+
+
+def test_rollback_changes_removes_journal(rollback_journal, file_store, tmpdir, monkeypatch):
+    for module, name in (
+        (subscription, "rollback"),
+        (backup.changed_pkgs_control, "restore_pkgs"),
+        (repo, "restore_varsdir"),
+        (repo, "restore_yum_repos"),
+        (redhatrelease.system_release_file, "restore"),
+        (redhatrelease.os_release_file, "restore"),
+        (pkghandler.versionlock_file, "restore"),
+        (cert.SystemCert, "remove"),
+        (backup.backup_control, "pop_all"),
+    ):
+        monkeypatch.setattr(module, name, mock.Mock())
+    monkeypatch.setattr(cert.SystemCert, "__init__", mock.Mock(return_value=None))
+    rollback_journal.start()
+    backed_up_file = tmpdir.join("file")
+    backed_up_file.write("content")
+    file_store.backup(str(backed_up_file))
+
+    main.rollback_changes()
+
+    assert not rollback_journal.active
+    assert not rollback_journal.exists()
+    assert not file_store.is_backed_up(str(backed_up_file))
+
+
+def test_rollback_changes_order(monkeypatch):
+    restored = []
+    for module, name in (
+        (subscription, "rollback"),
+        (backup.changed_pkgs_control, "restore_pkgs"),
+        (repo, "restore_varsdir"),
+        (repo, "restore_yum_repos"),
+        (pkghandler.versionlock_file, "restore"),
+        (main, "_remove_system_cert"),
+        (main, "_restore_backup_control"),
+    ):
+        monkeypatch.setattr(module, name, mock.Mock(side_effect=functools.partial(restored.append, name)))
+    monkeypatch.setattr(redhatrelease.system_release_file, "restore", mock.Mock())
+    monkeypatch.setattr(redhatrelease.os_release_file, "restore", mock.Mock())
+    monkeypatch.setattr(backup.BackupController, "resources", (backup.RESOURCE_RPMDB,))
+
+    main.rollback_changes()
+
+    # The system is unregistered before subscription-manager is removed and
+    # the files are restored after the packages that own them.
+    assert restored[:2] == ["rollback", "restore_pkgs"]
+    assert len(restored) == 7
+
+
+class TestResumeRollback:
+    @pytest.fixture(autouse=True)
+    def rollback_command(self, monkeypatch):
+        monkeypatch.setattr(main.sys, "argv", ["convert2rhel", "rollback", "--resume"])
+        monkeypatch.setattr(utils, "require_root", mock.Mock())
+        monkeypatch.setattr(main, "initialize_logger", mock.Mock())
+        monkeypatch.setattr(system_info, "resolve_system_info", mock.Mock())
+        monkeypatch.setattr(backup, "changed_pkgs_control", backup.ChangedRPMPackagesController())
+
+    def test_resume(self, rollback_journal, global_tool_opts, monkeypatch, caplog):
+        rollback_changes_mock = mock.Mock()
+        monkeypatch.setattr(main, "rollback_changes", rollback_changes_mock)
+        rollback_journal.start(keep_rhsm=True)
+        rollback_journal.complete(rollback_journal.record(journal.INSTALLED_PKG, pkg="subscription-manager"))
+        rollback_journal.stop()
+
+        assert main.main() == 0
+
+        assert global_tool_opts.activity == "rollback"
+        assert global_tool_opts.keep_rhsm is True
+        assert backup.changed_pkgs_control.installed_pkgs == ["subscription-manager"]
+        assert rollback_changes_mock.call_count == 1
+        assert "Rollback of the interrupted run of convert2rhel finished." in caplog.text
+
+    def test_nothing_to_resume(self, monkeypatch, caplog):
+        rollback_changes_mock = mock.Mock()
+        monkeypatch.setattr(main, "rollback_changes", rollback_changes_mock)
+
+        assert main.main() == 0
+
+        assert rollback_changes_mock.call_count == 0
+        assert "there is nothing to roll back" in caplog.text
+
+    def test_unusable_journal(self, rollback_journal, tmpdir, monkeypatch, caplog):
+        rollback_changes_mock = mock.Mock()
+        monkeypatch.setattr(main, "rollback_changes", rollback_changes_mock)
+        tmpdir.join("rollback-journal").write("not json\n{}\n")
+
+        assert main.main() == 1
+
+        assert rollback_changes_mock.call_count == 0
+        assert "is corrupted at line 1" in caplog.text
+        assert "Run 'convert2rhel rollback --resume' again to finish it." in caplog.records[-1].message
+
+    def test_resume_required(self, monkeypatch):
+        monkeypatch.setattr(main.sys, "argv", ["convert2rhel", "rollback"])
+
+        with pytest.raises(SystemExit):
+            main.main()
@@ -1584,6 +1584,7 @@ def test_get_installed_pkg_objects_yum(name, version, release, arch, total_pkgs_
     ),
 )
 def test_get_installed_pkg_objects_dnf(name, version, release, arch, total_pkgs_installed, monkeypatch):
+    monkeypatch.setattr(pkghandler, "_installed_pkgs_bases", {})
     monkeypatch.setattr(pkgmanager.query, "Query", QueryMocked())
     pkgs = pkghandler.get_installed_pkg_objects(name, version, release, arch)
 
@@ -1592,6 +1593,42 @@ def test_get_installed_pkg_objects_dnf(name, version, release, arch, total_pkgs_
         assert pkgs[0].name == "installed_pkg"
 
 
+def test_get_installed_pkgs_base_dnf_reused(monkeypatch, tmpdir):
+    rpmdb = tmpdir.join("rpmdb.sqlite")
+    rpmdb.write("1")
+    monkeypatch.setattr(pkghandler, "RPMDB_FILES", (str(rpmdb), str(tmpdir.join("Packages"))))
+    monkeypatch.setattr(pkghandler, "_installed_pkgs_bases", {})
+    base_mock = mock.Mock(side_effect=lambda: mock.Mock())
+    monkeypatch.setattr(pkgmanager, "Base", base_mock, raising=False)
+    monkeypatch.setattr(pkgmanager, "set_metadata_profile", mock.Mock())
+
+    base = pkghandler._get_installed_pkgs_base_dnf(pkgmanager.METADATA_SYSTEM)
+
+    assert pkghandler._get_installed_pkgs_base_dnf(pkgmanager.METADATA_SYSTEM) is base
+    base.fill_sack.assert_called_once_with(load_system_repo=True, load_available_repos=False)
+    # Each metadata profile has a base of its own
+    assert pkghandler._get_installed_pkgs_base_dnf(pkgmanager.METADATA_PRIMARY) is not base
+
+    # Installing or removing packages changes the rpm database
+    rpmdb.write("12")
+    assert pkghandler._get_installed_pkgs_base_dnf(pkgmanager.METADATA_SYSTEM) is not base
+    assert base_mock.call_count == 3
+
+
+def test_get_installed_pkgs_base_dnf_without_rpmdb(monkeypatch, tmpdir):
+    monkeypatch.setattr(pkghandler, "RPMDB_FILES", (str(tmpdir.join("Packages")),))
+    monkeypatch.setattr(pkghandler, "_installed_pkgs_bases", {})
+    base_mock = mock.Mock(side_effect=lambda: mock.Mock())
+    monkeypatch.setattr(pkgmanager, "Base", base_mock, raising=False)
+    monkeypatch.setattr(pkgmanager, "set_metadata_profile", mock.Mock())
+
+    pkghandler._get_installed_pkgs_base_dnf(pkgmanager.METADATA_SYSTEM)
+    pkghandler._get_installed_pkgs_base_dnf(pkgmanager.METADATA_SYSTEM)
+
+    # Without knowing the state of the rpm database, the base isn't reused
+    assert base_mock.call_count == 2
+
+
 @centos7
 def test_get_installed_pkgs_by_fingerprint_correct_fingerprint(pretend_os, monkeypatch):
     package = [
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+
+import pytest
+import six
+
+from convert2rhel import repo, staging
+from convert2rhel.pkgmanager.handlers import base
+from convert2rhel.systeminfo import system_info
+from convert2rhel.toolopts import tool_opts
+
+
+six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
+from six.moves import mock
+
+
+class DummyTransactionHandler(base.TransactionHandlerBase):
+    def __init__(self):
+        super(DummyTransactionHandler, self).__init__()
+        self.rpmdb_version = "1:abc"
+
+    def run_transaction(self, validate_transaction=False):
+        pass
+
+    def _get_rpmdb_version(self):
+        return self.rpmdb_version
+
+    def _process_transaction(self, validate_transaction, timings=None):
+        pass
+
+    def _get_install_nevras(self):
+        return set()
+
+    def _get_install_pkgs_dependencies(self):
+        return []
+
+    def _prepare_chunk(self, original_os_pkgs):
+        pass
+
+
+@pytest.fixture
+def record_file(tmpdir, monkeypatch):
+    path = str(tmpdir.join("validated-transaction.json"))
+    monkeypatch.setattr(base, "TRANSACTION_RECORD_FILE", path)
+    monkeypatch.setattr(system_info, "releasever", "8.5")
+    monkeypatch.setattr(system_info, "get_enabled_rhel_repos", mock.Mock(return_value=["appstream", "baseos"]))
+    monkeypatch.setattr(repo, "repomd_fingerprint", mock.Mock(return_value={"appstream": "abc", "baseos": "def"}))
+    return path
+
+
+class TestTransactionRecord:
+    def test_save_and_load(self, record_file):
+        handler = DummyTransactionHandler()
+        handler._save_transaction_record([["reinstall", "bash-0:4.4.20-1.el8.x86_64"]])
+
+        assert DummyTransactionHandler()._load_transaction_record() == [["reinstall", "bash-0:4.4.20-1.el8.x86_64"]]
+
+        handler._remove_transaction_record()
+        assert DummyTransactionHandler()._load_transaction_record() is None
+
+    @pytest.mark.parametrize(
+        "change",
+        (
+            lambda handler, monkeypatch: setattr(handler, "rpmdb_version", "2:def"),
+            lambda handler, monkeypatch: monkeypatch.setattr(system_info, "releasever", "8.6"),
+            lambda handler, monkeypatch: monkeypatch.setattr(
+                repo, "repomd_fingerprint", mock.Mock(return_value={"appstream": "abc", "baseos": "ghi"})
+            ),
+            lambda handler, monkeypatch: monkeypatch.setattr(repo, "repomd_fingerprint", mock.Mock(return_value=None)),
+        ),
+    )
+    def test_load_changed(self, record_file, monkeypatch, change, caplog):
+        DummyTransactionHandler()._save_transaction_record([["upgrade", "bash-0:4.4.20-2.el8.x86_64"]])
+
+        handler = DummyTransactionHandler()
+        change(handler, monkeypatch)
+
+        assert handler._load_transaction_record() is None
+        assert "changed since the transaction was validated" in caplog.records[-1].message
+
+    def test_load_other_version(self, record_file):
+        with open(record_file, "w") as handler:
+            json.dump({"format": 1, "convert2rhel_version": "0.1", "items": []}, handler)
+
+        assert DummyTransactionHandler()._load_transaction_record() is None
+
+
+@pytest.mark.parametrize(
+    ("kernel_pkg", "staged_parts"),
+    (
+        (mock.Mock(localPkg=mock.Mock(return_value="/cache/kernel.rpm")), [staging.TRANSACTION, staging.KERNEL]),
+        (None, [staging.TRANSACTION]),
+    ),
+)
+def test_stage_downloaded_packages(kernel_pkg, staged_parts, monkeypatch):
+    stage_mock = mock.Mock()
+    monkeypatch.setattr(staging, "stage", stage_mock)
+    transaction_pkgs = [mock.Mock(localPkg=mock.Mock(return_value="/cache/bash.rpm"))]
+
+    DummyTransactionHandler()._stage_downloaded_packages(transaction_pkgs, kernel_pkg)
+
+    assert [call[0][0] for call in stage_mock.call_args_list] == staged_parts
+    assert stage_mock.call_args_list[0][0][1] == ["/cache/bash.rpm"]
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    (
+        (512, "512 B"),
+        (1536, "1.5 KiB"),
+        (5 * 1024 * 1024, "5.0 MiB"),
+        (3 * 1024 ** 4, "3072.0 GiB"),
+    ),
+)
+def test_format_size(size, expected):
+    assert base.format_size(size) == expected
+
+
+class TestDownloadStatistics:
+    def test_summary(self, monkeypatch, caplog):
+        monkeypatch.setattr(base, "time", mock.Mock(time=mock.Mock(side_effect=(100.0, 100.5, 102.5, 104.0))))
+        statistics = base.DownloadStatistics()
+
+        statistics.start(6 * 1024 * 1024)
+        statistics.package_started("pkg-1")
+        statistics.package_finished("pkg-1", 4 * 1024 * 1024)
+        statistics.package_finished("pkg-2", 1024 * 1024)
+        statistics.finish()
+        statistics.log_summary()
+
+        assert statistics.durations == {"pkg-1": 2.0}
+        assert statistics.downloaded_size == 5 * 1024 * 1024
+        assert statistics.throughput == 5 * 1024 * 1024 / 4.0
+        assert "Downloaded pkg-1, 4.0 MiB in 2.0 seconds." in caplog.text
+        assert (
+            "Downloaded 2 packages, 5.0 MiB of the 6.0 MiB of the transaction, in 4.0 seconds (1.2 MiB/s)."
+            in caplog.records[-1].message
+        )
+
+    def test_summary_nothing_downloaded(self, caplog):
+        statistics = base.DownloadStatistics()
+        statistics.start(2048)
+        statistics.finish()
+        statistics.log_summary()
+
+        assert statistics.throughput == 0.0
+        assert "All the packages of the transaction, 2.0 KiB in total, were already downloaded." in caplog.text
+
+
+class TestTransactionTimings:
+    def test_events(self, monkeypatch):
+        monkeypatch.setattr(base, "time", mock.Mock(time=mock.Mock(side_effect=(10.0, 11.0, 13.0, 13.5, 20.0, 21.0))))
+        timings = base.TransactionTimings()
+
+        timings.event("bash-4.4.20-1.el8.x86_64", "Reinstalling")
+        timings.event("bash-4.4.20-1.el8.x86_64", "Reinstalling")
+        timings.end_event()
+        timings.event("kernel-4.18.0-348.el8.x86_64", "Running scriptlet")
+        timings.event("kernel-4.18.0-348.el8.x86_64", "Installing")
+        timings.finish()
+
+        assert timings.events == [
+            {"package": "bash-4.4.20-1.el8.x86_64", "action": "Reinstalling", "start": 0.0, "duration": 3.0},
+            {"package": "kernel-4.18.0-348.el8.x86_64", "action": "Running scriptlet", "start": 3.5, "duration": 6.5},
+            {"package": "kernel-4.18.0-348.el8.x86_64", "action": "Installing", "start": 10.0, "duration": 1.0},
+        ]
+        assert timings.duration == 11.0
+        assert [event["action"] for event in timings.slowest()] == ["Running scriptlet", "Reinstalling", "Installing"]
+
+    def test_summary_and_write(self, monkeypatch, tmpdir, caplog):
+        monkeypatch.setattr(base.TransactionTimings, "slowest_count", 2)
+        timings = base.TransactionTimings()
+        for package in ("pkg-1", "pkg-2", "pkg-3"):
+            timings.event(package, "Installing")
+        timings.finish()
+
+        path = str(tmpdir.join("log", "transaction-timings.json"))
+        timings.log_summary()
+        timings.write(path)
+
+        assert "The 2 slowest packages and scriptlets:" in caplog.text
+        with open(path) as handler:
+            data = json.load(handler)
+        assert [event["package"] for event in data["events"]] == ["pkg-1", "pkg-2", "pkg-3"]
+        assert len(data["slowest"]) == 2
+
+    def test_summary_without_events(self, caplog):
+        timings = base.TransactionTimings()
+        timings.finish()
+        timings.log_summary()
+
+        assert timings.duration == 0.0
+        assert not caplog.records
+
+
+def test_get_requirements():
+    packages = [
+        ("bash.x86_64", "bash-0:4.4.20-1.el8.x86_64", {"glibc", "libtinfo.so.6()(64bit)"}, {"bash", "/bin/sh"}),
+        ("glibc.x86_64", "glibc-0:2.28-164.el8.x86_64", {"glibc-common", "/bin/sh"}, {"glibc"}),
+        ("glibc-common.x86_64", "glibc-common-0:2.28-164.el8.x86_64", {"glibc"}, {"glibc-common"}),
+        ("ncurses-libs.x86_64", "ncurses-libs-0:6.1-9.el8.x86_64", set(), {"libtinfo.so.6()(64bit)"}),
+    ]
+
+    assert base.get_requirements(packages) == {
+        "bash.x86_64": {"glibc.x86_64", "ncurses-libs.x86_64"},
+        "glibc.x86_64": {"glibc-common.x86_64", "bash.x86_64"},
+        "glibc-common.x86_64": {"glibc.x86_64"},
+        "ncurses-libs.x86_64": set(),
+    }
+
+
+@pytest.mark.parametrize(
+    ("requirements", "chunk_size", "expected"),
+    (
+        ({"a": set(), "b": set(), "c": set()}, 2, [["a", "b"], ["c"]]),
+        # Dependencies first
+        ({"a": {"b"}, "b": {"c"}, "c": set()}, 1, [["c"], ["b"], ["a"]]),
+        # Packages requiring each other are never split
+        ({"a": {"b"}, "b": {"c"}, "c": {"a"}, "d": set()}, 2, [["a", "b", "c"], ["d"]]),
+        ({"a": set()}, 10, [["a"]]),
+        ({}, 10, []),
+    ),
+)
+def test_plan_chunks(requirements, chunk_size, expected):
+    assert base.plan_chunks(requirements, chunk_size) == expected
+
+
+def test_plan_chunks_long_chain():
+    requirements = dict(("pkg-%05d" % number, {"pkg-%05d" % (number + 1)}) for number in range(5000))
+    requirements["pkg-05000"] = set()
+
+    chunks = base.plan_chunks(requirements, 1000)
+
+    assert [len(chunk) for chunk in chunks] == [1000] * 5 + [1]
+    assert chunks[0][0] == "pkg-05000"
+
+
+class ChunkedTransactionHandler(DummyTransactionHandler):
+    """Pretend to replace the packages of the chunks."""
+
+    def __init__(self, packages, resolved=None, memory_per_pkg=0, processing_memory=0):
+        super(ChunkedTransactionHandler, self).__init__()
+        self.packages = packages
+        self.resolved = resolved if resolved else {}
+        self.chunks = []
+        self.processed = []
+        self.current = set()
+        # Memory used to resolve a chunk for each of its packages and to
+        # process the chunks
+        self.memory_per_pkg = memory_per_pkg
+        self.processing_memory = processing_memory
+        self.memory = 0
+
+    def get_peak_memory(self):
+        return self.memory
+
+    def _get_install_pkgs_dependencies(self):
+        return self.packages
+
+    def _prepare_chunk(self, original_os_pkgs):
+        self.chunks.append(original_os_pkgs)
+        nevras = dict((key, nevra) for key, nevra, _, _ in self.packages)
+        self.current = set(nevras[key] for key in original_os_pkgs)
+        for key in original_os_pkgs:
+            self.current.update(self.resolved.get(key, ()))
+        self.memory = self.memory_per_pkg * len(original_os_pkgs)
+
+    def _get_install_nevras(self):
+        return self.current
+
+    def _process_transaction(self, validate_transaction, timings=None):
+        self.processed.append((validate_transaction, timings))
+        self.memory = max(self.memory, self.processing_memory)
+
+
+class TestRunChunkedTransaction:
+    PACKAGES = [
+        ("bash.x86_64", "bash-4.4.20-1.el8.x86_64", {"glibc"}, {"bash"}),
+        ("glibc.x86_64", "glibc-2.28-164.el8.x86_64", set(), {"glibc"}),
+        ("tzdata.noarch", "tzdata-2021e-1.el8.noarch", set(), {"tzdata"}),
+    ]
+
+    @pytest.fixture(autouse=True)
+    def timings_file(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(base, "TRANSACTION_TIMINGS_FILE", str(tmpdir.join("transaction-timings.json")))
+
+    @pytest.fixture
+    def remaining_file(self, tmpdir, monkeypatch):
+        path = tmpdir.join("packages-not-replaced.txt")
+        monkeypatch.setattr(base, "REMAINING_PACKAGES_FILE", str(path))
+        return path
+
+    @staticmethod
+    def _measure(handler, monkeypatch):
+        monkeypatch.setattr(base, "reset_peak_memory", mock.Mock(return_value=True))
+        monkeypatch.setattr(base, "get_peak_memory", handler.get_peak_memory)
+
+    def test_chunks(self, caplog):
+        handler = ChunkedTransactionHandler(self.PACKAGES)
+
+        handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], 1)
+
+        assert handler.chunks == [["glibc.x86_64"], ["bash.x86_64"], ["tzdata.noarch"]]
+        assert len(handler.processed) == 3
+        # All the chunks record their timings together
+        assert all(timings is handler.processed[0][1] for _, timings in handler.processed)
+        assert "Peak memory usage of transaction 3" in caplog.text
+
+    def test_single_chunk(self):
+        handler = ChunkedTransactionHandler(self.PACKAGES)
+
+        handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], 10)
+
+        assert handler.chunks == []
+        assert handler.processed == [(False, None)]
+
+    def test_skips_packages_replaced_already(self, caplog):
+        # Replacing glibc pulls in tzdata as well
+        handler = ChunkedTransactionHandler(self.PACKAGES, resolved={"glibc.x86_64": ["tzdata-2021e-1.el8.noarch"]})
+
+        handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], 1)
+
+        assert handler.chunks == [["glibc.x86_64"], ["bash.x86_64"]]
+        assert "were not installed" not in caplog.text
+
+    def test_not_validated_packages(self, caplog):
+        handler = ChunkedTransactionHandler(self.PACKAGES, resolved={"glibc.x86_64": ["glibc-2.28-999.el8.x86_64"]})
+
+        with pytest.raises(SystemExit):
+            handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], 1)
+
+        assert handler.processed == []
+        assert (
+            "Transaction 1 installs packages that are not in the validated transaction." in caplog.records[-1].message
+        )
+
+    def test_memory_limit_splits_chunk(self, monkeypatch, caplog):
+        handler = ChunkedTransactionHandler(self.PACKAGES, memory_per_pkg=60)
+        self._measure(handler, monkeypatch)
+
+        handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], memory_limit=100)
+
+        # Resolving all the packages at once took too much memory, none were
+        # replaced until the chunk was split
+        assert handler.chunks == [
+            ["glibc.x86_64", "bash.x86_64", "tzdata.noarch"],
+            ["glibc.x86_64"],
+            ["bash.x86_64"],
+            ["tzdata.noarch"],
+        ]
+        assert len(handler.processed) == 3
+        assert "Resolving transaction 1 used 180 B of memory, more than the limit of 100 B." in caplog.text
+
+    def test_memory_limit_after_processing(self, monkeypatch, caplog):
+        handler = ChunkedTransactionHandler(self.PACKAGES, memory_per_pkg=10, processing_memory=500)
+        self._measure(handler, monkeypatch)
+
+        handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], 2, memory_limit=300)
+
+        # The remaining packages are replaced in smaller chunks
+        assert handler.chunks == [["glibc.x86_64", "bash.x86_64"], ["tzdata.noarch"]]
+        assert "Transaction 1 used more than the memory limit of 300 B." in caplog.text
+
+    def test_memory_limit_exceeded(self, monkeypatch, caplog, remaining_file):
+        packages = [
+            ("bash.x86_64", "bash-4.4.20-1.el8.x86_64", {"glibc"}, {"bash"}),
+            ("glibc.x86_64", "glibc-2.28-164.el8.x86_64", {"bash"}, {"glibc"}),
+            ("tzdata.noarch", "tzdata-2021e-1.el8.noarch", set(), {"tzdata"}),
+        ]
+        handler = ChunkedTransactionHandler(packages, memory_per_pkg=60)
+        self._measure(handler, monkeypatch)
+
+        with pytest.raises(SystemExit):
+            handler._run_chunked_transaction(["bash.x86_64", "glibc.x86_64", "tzdata.noarch"], memory_limit=100)
+
+        # bash and glibc require each other so they can't be split
+        assert handler.chunks[-1] == ["bash.x86_64", "glibc.x86_64"]
+        assert handler.processed == []
+        assert remaining_file.read() == "bash.x86_64\nglibc.x86_64\ntzdata.noarch\n"
+        assert "can't be split" in caplog.records[-1].message
+
+
+@pytest.mark.parametrize(
+    ("chunk_size", "memory_limit", "expected_args"),
+    (
+        (None, None, None),
+        (100, None, (["bash.x86_64"], 100, None)),
+        (None, 512, (["bash.x86_64"], None, 512 * 1024 * 1024)),
+    ),
+)
+def test_process_replacement_transaction(chunk_size, memory_limit, expected_args, monkeypatch):
+    monkeypatch.setattr(tool_opts, "transaction_chunk_size", chunk_size)
+    monkeypatch.setattr(tool_opts, "transaction_memory_limit", memory_limit)
+    handler = DummyTransactionHandler()
+    monkeypatch.setattr(handler, "_process_transaction", mock.Mock())
+    monkeypatch.setattr(handler, "_run_chunked_transaction", mock.Mock())
+
+    handler._process_replacement_transaction(["bash.x86_64"])
+
+    if expected_args:
+        handler._run_chunked_transaction.assert_called_once_with(*expected_args)
+        handler._process_transaction.assert_not_called()
+    else:
+        handler._process_transaction.assert_called_once_with(validate_transaction=False)
+
+
+def test_get_peak_memory():
+    assert base.get_peak_memory() > 1024 * 1024
+
+
+def test_reset_peak_memory():
+    # Allocate some memory so that there is a peak to reset
+    data = b"x" * (64 * 1024 * 1024)
+    peak = base.get_peak_memory()
+    del data
+
+    if not base.reset_peak_memory():
+        pytest.skip("The kernel can't reset the peak memory usage.")
+
+    assert base.get_peak_memory() < peak
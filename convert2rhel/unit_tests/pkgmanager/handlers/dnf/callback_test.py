@@ -153,6 +153,18 @@ class TestDnfPackageDownloadCallback:
 
         assert expected in caplog.records[-1].message
 
+    def test_end_records_statistics(self):
+        downloaded = PackageDownloadPayload("libicu-60.3-2.el8_1.x86_64.rpm", 37500)
+        cached = PackageDownloadPayload("libpng-1.6.34-5.el8.x86_64.rpm", 12500)
+        instance = PackageDownloadCallback()
+        instance.start(total_files=2, total_size=50000)
+        instance.progress(payload=downloaded, done=0)
+        instance.end(payload=downloaded, status=None, err_msg=None)
+        instance.end(payload=cached, status=pkgmanager.callback.STATUS_ALREADY_EXISTS, err_msg=None)
+
+        assert instance.statistics.sizes == {"libicu-60.3-2.el8_1.x86_64.rpm": 37500}
+        assert list(instance.statistics.durations) == ["libicu-60.3-2.el8_1.x86_64.rpm"]
+
     @pytest.mark.parametrize(
         ("packages", "status", "err_msg", "total_files", "total_size", "total_drpms", "expected_message"),
         (
@@ -222,6 +234,19 @@ class TestDnfTransactionDisplayCallback:
         assert len(caplog.records) == 1
         assert "Running scriptlet: libicu-60.3-2.el8_1.x86_64.rpm [1/1]" in caplog.records[-1].message
 
+    def test_progress_records_timings(self):
+        instance = TransactionDisplayCallback()
+        instance.progress(package="bash-4.4.20-1.el8.x86_64", action=6, ti_done=1, ti_total=2, ts_done=1, ts_total=2)
+        instance.progress(package="bash-4.4.20-1.el8.x86_64", action=6, ti_done=2, ti_total=2, ts_done=1, ts_total=2)
+        instance.scriptout(None)
+        instance.progress(package="bash-4.4.20-1.el8.x86_64", action=103, ti_done=1, ti_total=1, ts_done=2, ts_total=2)
+        instance.timings.finish()
+
+        assert [(event["package"], event["action"]) for event in instance.timings.events] == [
+            ("bash-4.4.20-1.el8.x86_64", "Reinstalling"),
+            ("bash-4.4.20-1.el8.x86_64", "Running scriptlet"),
+        ]
+
     def test_no_action_and_package(self, caplog):
         TransactionDisplayCallback().progress(None, None, None, None, None, None)
         assert "No action or package was provided in the callback." in caplog.records[-1].message
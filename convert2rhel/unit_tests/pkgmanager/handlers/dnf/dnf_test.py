@@ -17,11 +17,12 @@
 import pytest
 import six
 
-from convert2rhel import pkghandler, pkgmanager
+from convert2rhel import pkghandler, pkgmanager, repo
+from convert2rhel.pkgmanager.handlers import base
 from convert2rhel.pkgmanager.handlers.dnf import DnfTransactionHandler
 from convert2rhel.pkgmanager.handlers.dnf.callback import DependencySolverProgressIndicatorCallback
 from convert2rhel.systeminfo import system_info
-from convert2rhel.unit_tests import create_pkg_information
+from convert2rhel.unit_tests import create_pkg_information, create_pkg_obj
 from convert2rhel.unit_tests.conftest import centos8
 
 
@@ -44,12 +45,17 @@ class RepoDict:
         self.disabled = False
 
 
-class SackMock:
-    def __init__(self, packages=None):
-        if not packages:
-            packages = []
+class QueryMock(list):
+    def latest(self):
+        return self
 
-        self.packages = packages
+
+class SackMock:
+    def __init__(self, installed=None, available=None, upgrades=None, downgrades=None):
+        self._installed = installed or []
+        self._available = available or []
+        self._upgrades = upgrades or []
+        self._downgrades = downgrades or []
 
     def __call__(self, *args, **kwds):
         return self
@@ -57,14 +63,17 @@ class SackMock:
     def query(self):
         return self
 
-    def upgrades(self):
-        return self
+    def installed(self):
+        return QueryMock(self._installed)
 
-    def latest(self):
-        return self
+    def available(self):
+        return QueryMock(self._available)
+
+    def upgrades(self):
+        return QueryMock(self._upgrades)
 
-    def filter(self, *args, **kwargs):
-        return self.packages
+    def downgrades(self):
+        return QueryMock(self._downgrades)
 
 
 SYSTEM_PACKAGES = [
@@ -104,25 +113,39 @@ SYSTEM_PACKAGES = [
 ]
 
 
+def _create_dnf_pkgs(version):
+    """Create the dnf packages of the SYSTEM_PACKAGES in another version."""
+    return [
+        create_pkg_obj(pkg.nevra.name, version=version, release="1", arch=pkg.nevra.arch, manager="dnf")
+        for pkg in SYSTEM_PACKAGES
+    ]
+
+
+INSTALLED_PACKAGES = _create_dnf_pkgs("1.0.0")
+
+
 @pytest.mark.skipif(
     pkgmanager.TYPE != "dnf",
     reason="No dnf module detected on the system, skipping it.",
 )
 class TestDnfTransactionHandler:
     @pytest.fixture
-    def _mock_dnf_api_calls(self, monkeypatch):
+    def _mock_dnf_api_calls(self, monkeypatch, tmpdir):
         """Mocks all calls related to the dnf API transactions"""
+        monkeypatch.setattr(base, "TRANSACTION_RECORD_FILE", str(tmpdir.join("validated-transaction.json")))
+        monkeypatch.setattr(DnfTransactionHandler, "_get_rpmdb_version", mock.Mock(return_value="abc"))
         monkeypatch.setattr(pkgmanager.Base, "read_all_repos", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.repodict.RepoDict, "all", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.Base, "fill_sack", value=mock.Mock())
-        monkeypatch.setattr(pkgmanager.Base, "upgrade", value=mock.Mock())
-        monkeypatch.setattr(pkgmanager.Base, "reinstall", value=mock.Mock())
-        monkeypatch.setattr(pkgmanager.Base, "downgrade", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.Base, "package_upgrade", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.Base, "package_reinstall", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.Base, "package_downgrade", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.Base, "resolve", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.Base, "download_packages", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.Base, "do_transaction", value=mock.Mock())
-        monkeypatch.setattr(pkgmanager.Base, "transaction", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.Base, "transaction", value=mock.Mock(install_set=[]))
         monkeypatch.setattr(pkgmanager.Base, "sack", value=SackMock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf, "get_system_packages_for_replacement", mock.Mock(return_value=[]))
 
     @centos8
     def test_set_up_base(self, pretend_os):
@@ -132,6 +155,7 @@ class TestDnfTransactionHandler:
         assert isinstance(instance._base, pkgmanager.Base)
         assert instance._base.conf.substitutions["releasever"] == "8.5"
         assert instance._base.conf.module_platform_id == "platform:el8"
+        assert "filelists" in instance._base.conf.optional_metadata_types
         assert isinstance(instance._base._ds_callback, DependencySolverProgressIndicatorCallback)
 
     @centos8
@@ -220,12 +244,17 @@ class TestDnfTransactionHandler:
             "get_installed_pkg_information",
             value=lambda: SYSTEM_PACKAGES,
         )
+        monkeypatch.setattr(
+            pkgmanager.Base,
+            "sack",
+            value=SackMock(installed=INSTALLED_PACKAGES, available=_create_dnf_pkgs("1.0.0")),
+        )
         instance = DnfTransactionHandler()
         instance._set_up_base()
         instance._perform_operations()
 
-        assert pkgmanager.Base.reinstall.call_count == len(SYSTEM_PACKAGES)
-        assert pkgmanager.Base.downgrade.call_count == 0
+        assert pkgmanager.Base.package_reinstall.call_count == len(SYSTEM_PACKAGES)
+        assert pkgmanager.Base.package_downgrade.call_count == 0
 
     @centos8
     def test_package_marked_for_update(self, pretend_os, _mock_dnf_api_calls, monkeypatch):
@@ -235,50 +264,80 @@ class TestDnfTransactionHandler:
 
         This comes from: https://issues.redhat.com/browse/RHELC-899
         """
+        upgrades = _create_dnf_pkgs("2.0.0")
         monkeypatch.setattr(pkghandler, "get_installed_pkg_information", value=lambda: SYSTEM_PACKAGES)
-        monkeypatch.setattr(pkgmanager.Base, "sack", value=SackMock(packages=SYSTEM_PACKAGES))
+        monkeypatch.setattr(
+            pkgmanager.Base,
+            "sack",
+            value=SackMock(installed=INSTALLED_PACKAGES, available=_create_dnf_pkgs("1.0.0"), upgrades=upgrades),
+        )
         instance = DnfTransactionHandler()
         instance._set_up_base()
         instance._perform_operations()
 
-        assert pkgmanager.Base.upgrade.call_count == len(SYSTEM_PACKAGES)
-        assert pkgmanager.Base.reinstall.call_count == 0
-        assert pkgmanager.Base.downgrade.call_count == 0
+        assert pkgmanager.Base.package_upgrade.call_args_list == [mock.call(pkg) for pkg in upgrades]
+        assert pkgmanager.Base.package_reinstall.call_count == 0
+        assert pkgmanager.Base.package_downgrade.call_count == 0
 
     @centos8
-    def test_perform_operations_reinstall_exception(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
+    def test_perform_operations_downgrade(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
+        downgrades = _create_dnf_pkgs("0.9.0")
         monkeypatch.setattr(
             pkghandler,
             "get_installed_pkg_information",
             value=lambda: SYSTEM_PACKAGES,
         )
-        pkgmanager.Base.reinstall.side_effect = pkgmanager.exceptions.PackagesNotAvailableError
+        monkeypatch.setattr(
+            pkgmanager.Base,
+            "sack",
+            value=SackMock(installed=INSTALLED_PACKAGES, available=downgrades, downgrades=downgrades),
+        )
         instance = DnfTransactionHandler()
         instance._set_up_base()
         instance._perform_operations()
 
-        assert pkgmanager.Base.reinstall.call_count == len(SYSTEM_PACKAGES)
-        assert pkgmanager.Base.downgrade.call_count == len(SYSTEM_PACKAGES)
-        assert "not available in RHEL repositories" not in caplog.records[-1].message
+        assert pkgmanager.Base.package_reinstall.call_count == 0
+        assert pkgmanager.Base.package_downgrade.call_args_list == [mock.call(pkg) for pkg in downgrades]
+        assert "not available in RHEL repositories" not in caplog.text
 
     @centos8
-    def test_perform_operations_downgrade_exception(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
+    def test_perform_operations_not_available(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
         monkeypatch.setattr(
             pkghandler,
             "get_installed_pkg_information",
             value=lambda: SYSTEM_PACKAGES,
         )
-        pkgmanager.Base.reinstall.side_effect = pkgmanager.exceptions.PackagesNotAvailableError
-        pkgmanager.Base.downgrade.side_effect = pkgmanager.exceptions.PackagesNotInstalledError
+        monkeypatch.setattr(pkgmanager.Base, "sack", value=SackMock(installed=INSTALLED_PACKAGES))
 
         instance = DnfTransactionHandler()
         instance._set_up_base()
         instance._perform_operations()
 
-        assert pkgmanager.Base.reinstall.call_count == len(SYSTEM_PACKAGES)
-        assert pkgmanager.Base.downgrade.call_count == len(SYSTEM_PACKAGES)
+        assert pkgmanager.Base.package_reinstall.call_count == 0
+        assert pkgmanager.Base.package_downgrade.call_count == 0
         assert "not available in RHEL repositories" in caplog.records[-1].message
 
+    @centos8
+    def test_perform_operations_installonly(self, pretend_os, _mock_dnf_api_calls, monkeypatch):
+        kernels = [
+            create_pkg_obj("kernel", version=version, release="1", arch="x86_64", manager="dnf")
+            for version in ("1", "2")
+        ]
+        monkeypatch.setattr(
+            pkgmanager.handlers.dnf, "get_system_packages_for_replacement", mock.Mock(return_value=["kernel.x86_64"])
+        )
+        available = [
+            create_pkg_obj("kernel", version=version, release="1", arch="x86_64", manager="dnf")
+            for version in ("1", "2")
+        ]
+        monkeypatch.setattr(pkgmanager.Base, "sack", value=SackMock(installed=kernels, available=available))
+
+        instance = DnfTransactionHandler()
+        instance._set_up_base()
+        instance._perform_operations()
+
+        assert pkgmanager.Base.package_reinstall.call_args_list == [mock.call(pkg) for pkg in available]
+
     @centos8
     def test_resolve_dependencies(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
         instance = DnfTransactionHandler()
@@ -287,7 +346,33 @@ class TestDnfTransactionHandler:
 
         assert pkgmanager.Base.resolve.call_count == 1
         assert pkgmanager.Base.download_packages.call_count == 1
-        assert "Resolving the dependencies of the packages in the dnf transaction set." in caplog.records[-2].message
+        assert "Resolving the dependencies of the packages in the dnf transaction set." in caplog.text
+        assert (
+            "All the packages of the transaction, 0 B in total, were already downloaded." in caplog.records[-1].message
+        )
+
+    @centos8
+    def test_download_packages_statistics(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
+        install_set = [mock.Mock(downloadsize=3 * 1024 * 1024), mock.Mock(downloadsize=1024 * 1024)]
+        monkeypatch.setattr(pkgmanager.Base, "transaction", value=mock.Mock(install_set=install_set))
+
+        def download_packages(pkgs, callback):
+            callback.statistics.package_finished("pkg-1", 3 * 1024 * 1024)
+
+        pkgmanager.Base.download_packages.side_effect = download_packages
+        instance = DnfTransactionHandler()
+        instance._set_up_base()
+        instance._download_packages()
+
+        assert "Downloaded 1 packages, 3.0 MiB of the 4.0 MiB of the transaction" in caplog.records[-1].message
+
+    @centos8
+    def test_set_up_base_parallel_downloads(self, pretend_os, monkeypatch):
+        monkeypatch.setattr(pkgmanager.handlers.dnf.tool_opts, "parallel_downloads", 10)
+        instance = DnfTransactionHandler()
+        instance._set_up_base()
+
+        assert instance._base.conf.max_parallel_downloads == 10
 
     @centos8
     def test_resolve_dependencies_resolve_exception(self, pretend_os, _mock_dnf_api_calls, caplog, monkeypatch):
@@ -322,13 +407,18 @@ class TestDnfTransactionHandler:
         ),
     )
     @centos8
-    def test_process_transaction(self, pretend_os, validate_transaction, expected, _mock_dnf_api_calls, caplog):
+    def test_process_transaction(
+        self, pretend_os, validate_transaction, expected, _mock_dnf_api_calls, caplog, monkeypatch
+    ):
+        write_mock = mock.Mock()
+        monkeypatch.setattr(base.TransactionTimings, "write", write_mock)
         instance = DnfTransactionHandler()
         instance._set_up_base()
         instance._process_transaction(validate_transaction)
 
         assert pkgmanager.Base.do_transaction.called_once()
-        assert expected in caplog.records[-1].message
+        assert expected in caplog.text
+        assert write_mock.call_count == (0 if validate_transaction else 1)
 
     @centos8
     def test_process_transaction_exceptions(self, pretend_os, _mock_dnf_api_calls, caplog):
@@ -356,6 +446,7 @@ class TestDnfTransactionHandler:
         monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_perform_operations", mock.Mock())
         monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_resolve_dependencies", mock.Mock())
         monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_process_transaction", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_get_transaction_items", mock.Mock())
         instance = DnfTransactionHandler()
 
         instance.run_transaction(validate_transaction=validate_transaction)
@@ -364,3 +455,86 @@ class TestDnfTransactionHandler:
         assert instance._perform_operations.call_count == 1
         assert instance._resolve_dependencies.call_count == 1
         assert instance._process_transaction.call_count == 1
+
+    @centos8
+    def test_run_transaction_chunked(self, pretend_os, _mock_dnf_api_calls, monkeypatch):
+        monkeypatch.setattr(pkgmanager.handlers.dnf.tool_opts, "transaction_chunk_size", 100)
+        monkeypatch.setattr(
+            pkgmanager.handlers.dnf, "get_system_packages_for_replacement", mock.Mock(return_value=["bash.x86_64"])
+        )
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_enable_repos", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_perform_operations", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_resolve_dependencies", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_process_transaction", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_run_chunked_transaction", mock.Mock())
+        instance = DnfTransactionHandler()
+
+        instance.run_transaction(validate_transaction=False)
+
+        instance._run_chunked_transaction.assert_called_once_with(["bash.x86_64"], 100, None)
+        assert instance._process_transaction.call_count == 0
+
+    @centos8
+    def test_get_install_pkgs_dependencies(self, pretend_os, _mock_dnf_api_calls, monkeypatch):
+        pkg = create_pkg_obj("bash", version="4.4.20", release="1.el8", arch="x86_64", manager="dnf")
+        pkg.requires = ["glibc >= 2.28", "/bin/sh"]
+        pkg.provides = ["bash = 4.4.20-1.el8", "/bin/sh"]
+        pkg.files = ["/usr/bin/bash"]
+        monkeypatch.setattr(pkgmanager.Base, "transaction", value=mock.Mock(install_set=[pkg]))
+        instance = DnfTransactionHandler()
+        instance._set_up_base()
+
+        assert instance._get_install_pkgs_dependencies() == [
+            ("bash.x86_64", "bash-0:4.4.20-1.el8.x86_64", {"glibc", "/bin/sh"}, {"bash", "/bin/sh", "/usr/bin/bash"})
+        ]
+        assert instance._get_install_nevras() == {"bash-0:4.4.20-1.el8.x86_64"}
+
+    @centos8
+    def test_run_transaction_replays_validated_transaction(self, pretend_os, _mock_dnf_api_calls, monkeypatch):
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_enable_repos", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_perform_operations", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_resolve_dependencies", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_download_packages", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.dnf.DnfTransactionHandler, "_process_transaction", mock.Mock())
+        monkeypatch.setattr(
+            pkgmanager.handlers.dnf.DnfTransactionHandler, "_replay_transaction", mock.Mock(return_value=True)
+        )
+
+        instance = DnfTransactionHandler()
+        instance.run_transaction(validate_transaction=False)
+
+        assert instance._perform_operations.call_count == 0
+        assert instance._resolve_dependencies.call_count == 0
+        assert instance._download_packages.call_count == 1
+        assert instance._process_transaction.call_count == 1
+
+    @centos8
+    @pytest.mark.parametrize(
+        ("transaction_items", "expected"),
+        (
+            ([["reinstall", "pkg-1-0:1.0.0-1.x86_64"]], True),
+            ([["reinstall", "pkg-1-0:1.0.0-1.x86_64"], ["install", "pkg-2-0:1.0.0-1.x86_64"]], False),
+        ),
+    )
+    def test_replay_transaction(self, pretend_os, _mock_dnf_api_calls, monkeypatch, transaction_items, expected):
+        pkg = mock.Mock()
+        monkeypatch.setattr(
+            DnfTransactionHandler,
+            "_load_transaction_record",
+            mock.Mock(return_value=[["reinstall", "pkg-1-0:1.0.0-1.x86_64"]]),
+        )
+        monkeypatch.setattr(DnfTransactionHandler, "_get_transaction_items", mock.Mock(return_value=transaction_items))
+        monkeypatch.setattr(pkgmanager.handlers.dnf, "get_pkg_nevra", mock.Mock(return_value="pkg-1-0:1.0.0-1.x86_64"))
+        monkeypatch.setattr(pkgmanager.Base, "sack", value=mock.Mock())
+        pkgmanager.Base.sack.query.return_value.available.return_value = [pkg]
+        pkgmanager.Base.sack.query.return_value.installed.return_value = []
+        monkeypatch.setattr(pkgmanager.Base, "package_reinstall", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.Base, "reset", value=mock.Mock())
+
+        instance = DnfTransactionHandler()
+        instance._set_up_base()
+
+        assert instance._replay_transaction() == expected
+        pkgmanager.Base.package_reinstall.assert_called_once_with(pkg)
+        assert pkgmanager.Base.resolve.call_count == 1
+        assert pkgmanager.Base.reset.called != expected
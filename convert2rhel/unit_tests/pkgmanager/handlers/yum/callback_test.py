@@ -46,6 +46,16 @@ class TestPackageDownloadCallback(object):
         assert len(caplog.records) == 1
         assert "Downloading package: libicu-60.3-2.el8_1.x86_64.rpm" in caplog.records[-1].message
 
+    def test_update_progress_records_statistics(self):
+        instance = PackageDownloadCallback()
+        instance.updateProgress(name="libicu-60.3-2.el8_1.x86_64.rpm", frac=0.0, fread="", ftime="")
+        instance.last_amount_read = 1250
+        instance.updateProgress(name="libicu-60.3-2.el8_1.x86_64.rpm", frac=1.0, fread="1.2 k", ftime="00:01")
+        instance.updateProgress(name="repomd.xml", frac=1.0, fread="100", ftime="00:01")
+
+        assert instance.statistics.sizes == {"libicu-60.3-2.el8_1.x86_64.rpm": 1250}
+        assert list(instance.statistics.durations) == ["libicu-60.3-2.el8_1.x86_64.rpm"]
+
 
 @pytest.mark.skipif(
     pkgmanager.TYPE != "yum",
@@ -79,6 +89,26 @@ class TestTransactionDisplayCallback(object):
 
         assert len(caplog.records) == 2
 
+    def test_event_records_timings(self):
+        instance = TransactionDisplayCallback()
+        for package in ("libicu-60.3-2.el8_1.x86_64.rpm", "libicu-60.3-2.el8_1.x86_64.rpm"):
+            instance.event(package=package, action=20, te_current=1, te_total=1, ts_current=1, ts_total=2)
+        instance.scriptout("libicu-60.3-2.el8_1.x86_64.rpm", None)
+        instance.event(
+            package="breeze-icon-theme-5.102.0-1.fc37.noarch",
+            action=20,
+            te_current=1,
+            te_total=1,
+            ts_current=2,
+            ts_total=2,
+        )
+        instance.timings.finish()
+
+        assert [(event["package"], event["action"]) for event in instance.timings.events] == [
+            ("libicu-60.3-2.el8_1.x86_64.rpm", "Installing"),
+            ("breeze-icon-theme-5.102.0-1.fc37.noarch", "Installing"),
+        ]
+
     @pytest.mark.parametrize(
         ("package", "msgs", "expected"),
         (
@@ -27,10 +27,12 @@ import six
 six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
 from six.moves import mock
 
-from convert2rhel import pkghandler, pkgmanager, unit_tests, utils
+from convert2rhel import pkghandler, pkgmanager, repo, unit_tests, utils
+from convert2rhel.backup_store import file_store
+from convert2rhel.pkgmanager.handlers import base
 from convert2rhel.pkgmanager.handlers.yum import YumTransactionHandler
 from convert2rhel.systeminfo import system_info
-from convert2rhel.unit_tests import create_pkg_information, mock_decorator
+from convert2rhel.unit_tests import create_pkg_information, create_pkg_obj, mock_decorator
 from convert2rhel.unit_tests.conftest import centos7
 
 
@@ -90,7 +92,7 @@ SYSTEM_PACKAGES = [
 )
 class TestYumTransactionHandler(object):
     @pytest.fixture
-    def _mock_yum_api_calls(self, monkeypatch):
+    def _mock_yum_api_calls(self, monkeypatch, tmpdir):
         """ """
         monkeypatch.setattr(pkgmanager.RepoStorage, "enableRepo", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.RepoStorage, "disableRepo", value=mock.Mock())
@@ -99,6 +101,14 @@ class TestYumTransactionHandler(object):
         monkeypatch.setattr(pkgmanager.YumBase, "downgrade", value=mock.Mock())
         monkeypatch.setattr(pkgmanager.YumBase, "resolveDeps", value=mock.Mock(return_value=(0, "Success.")))
         monkeypatch.setattr(pkgmanager.YumBase, "processTransaction", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.YumBase, "downloadPkgs", value=mock.Mock(return_value={}))
+        monkeypatch.setattr(pkgmanager.YumBase, "save_ts", value=mock.Mock())
+        monkeypatch.setattr(pkgmanager.YumBase, "load_ts", value=mock.Mock())
+        monkeypatch.setattr(YumTransactionHandler, "_get_rpmdb_version", mock.Mock(return_value="1:abc"))
+        monkeypatch.setattr(base, "TRANSACTION_RECORD_FILE", str(tmpdir.join("validated-transaction.json")))
+        monkeypatch.setattr(
+            pkgmanager.handlers.yum, "YUM_TRANSACTION_FILE", str(tmpdir.join("validated-transaction.yumtx"))
+        )
 
     @centos7
     def test_set_up_base(self, pretend_os):
@@ -107,6 +117,7 @@ class TestYumTransactionHandler(object):
 
         assert isinstance(instance._base, pkgmanager.YumBase)
         assert instance._base.conf.yumvar["releasever"] == "7Server"
+        assert instance._base.conf.mdpolicy == "group:primary"
 
     @centos7
     @pytest.mark.parametrize(("enabled_rhel_repos"), ((["rhel-7-test-repo"])))
@@ -217,12 +228,47 @@ class TestYumTransactionHandler(object):
         ),
     )
     @centos7
-    def test_process_transaction(self, pretend_os, validate_transaction, expected, _mock_yum_api_calls, caplog):
+    def test_process_transaction(
+        self, pretend_os, validate_transaction, expected, _mock_yum_api_calls, caplog, monkeypatch
+    ):
+        write_mock = mock.Mock()
+        monkeypatch.setattr(base.TransactionTimings, "write", write_mock)
         instance = YumTransactionHandler()
         instance._set_up_base()
 
         instance._process_transaction(validate_transaction)
-        assert expected in caplog.records[-1].message
+        assert expected in caplog.text
+        assert write_mock.call_count == (0 if validate_transaction else 1)
+
+    @centos7
+    def test_download_packages(self, pretend_os, _mock_yum_api_calls, caplog, monkeypatch):
+        pkg = mock.Mock(size=2048)
+        pkg.localPkg.return_value = "/var/cache/yum/rhel-7-server-rpms/packages/pkg-1.0-1.el7.x86_64.rpm"
+
+        def download_pkgs(pkgs, callback_total):
+            callback_total([pkg], 2048, 0)
+            return {}
+
+        pkgmanager.YumBase.downloadPkgs.side_effect = download_pkgs
+        instance = YumTransactionHandler()
+        instance._set_up_base()
+        monkeypatch.setattr(instance._base, "tsInfo", mock.Mock())
+        instance._base.tsInfo.getMembersWithState.return_value = [mock.Mock(po=pkg)]
+
+        instance._download_packages()
+
+        assert "Downloaded 1 packages, 2.0 KiB of the 2.0 KiB of the transaction" in caplog.records[-1].message
+
+    @centos7
+    def test_download_packages_error(self, pretend_os, _mock_yum_api_calls, caplog):
+        pkgmanager.YumBase.downloadPkgs.return_value = {"pkg": ["No more mirrors to try."]}
+        instance = YumTransactionHandler()
+        instance._set_up_base()
+
+        with pytest.raises(SystemExit):
+            instance._download_packages()
+
+        assert "Failed to download the transaction packages." in caplog.records[-1].message
 
     @centos7
     def test_process_transaction_with_exceptions(self, pretend_os, _mock_yum_api_calls, caplog):
@@ -294,6 +340,89 @@ class TestYumTransactionHandler(object):
         assert pkgmanager.handlers.yum.YumTransactionHandler._perform_operations.call_count == perform_operations_count
         assert pkgmanager.handlers.yum.YumTransactionHandler._resolve_dependencies.called == resolve_dependencies_count
 
+    @centos7
+    def test_run_transaction_chunked(self, pretend_os, _mock_yum_api_calls, monkeypatch):
+        monkeypatch.setattr(pkgmanager.handlers.yum.tool_opts, "transaction_chunk_size", 100)
+        monkeypatch.setattr(
+            pkgmanager.handlers.yum, "get_system_packages_for_replacement", mock.Mock(return_value=["bash.x86_64"])
+        )
+        monkeypatch.setattr(pkgmanager.handlers.yum.YumTransactionHandler, "_perform_operations", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.yum.YumTransactionHandler, "_process_transaction", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.yum.YumTransactionHandler, "_run_chunked_transaction", mock.Mock())
+        original_func = pkgmanager.handlers.yum.YumTransactionHandler.run_transaction.__wrapped__
+        monkeypatch.setattr(
+            pkgmanager.handlers.yum.YumTransactionHandler, "run_transaction", mock_decorator(original_func)
+        )
+        instance = YumTransactionHandler()
+        instance._set_up_base()
+
+        instance.run_transaction(validate_transaction=False)
+
+        instance._run_chunked_transaction.assert_called_once_with(["bash.x86_64"], 100, None)
+        assert instance._process_transaction.call_count == 0
+
+    @centos7
+    def test_get_install_pkgs_dependencies(self, pretend_os, monkeypatch):
+        pkg = create_pkg_obj("bash", version="4.2.46", release="34.el7", arch="x86_64")
+        pkg.requires_names = ["glibc", "/bin/sh"]
+        pkg.provides_names = ["bash", "/bin/sh"]
+        pkg.returnFileEntries = mock.Mock(return_value=["/usr/bin/bash"])
+        monkeypatch.setattr(YumTransactionHandler, "_get_install_pkgs", mock.Mock(return_value=[pkg]))
+        instance = YumTransactionHandler()
+
+        assert instance._get_install_pkgs_dependencies() == [
+            ("bash.x86_64", "0:bash-4.2.46-34.el7.x86_64", {"glibc", "/bin/sh"}, {"bash", "/bin/sh", "/usr/bin/bash"})
+        ]
+        assert instance._get_install_nevras() == {"0:bash-4.2.46-34.el7.x86_64"}
+
+    @centos7
+    def test_run_transaction_replays_validated_transaction(self, pretend_os, _mock_yum_api_calls, monkeypatch):
+        monkeypatch.setattr(pkgmanager.handlers.yum.YumTransactionHandler, "_perform_operations", mock.Mock())
+        monkeypatch.setattr(pkgmanager.handlers.yum.YumTransactionHandler, "_process_transaction", mock.Mock())
+        monkeypatch.setattr(system_info, "get_enabled_rhel_repos", mock.Mock(return_value=["rhel-7-server-rpms"]))
+        monkeypatch.setattr(repo, "repomd_fingerprint", mock.Mock(return_value={"rhel-7-server-rpms": "abc"}))
+        original_func = pkgmanager.handlers.yum.YumTransactionHandler.run_transaction.__wrapped__
+        monkeypatch.setattr(
+            pkgmanager.handlers.yum.YumTransactionHandler, "run_transaction", mock_decorator(original_func)
+        )
+
+        instance = YumTransactionHandler()
+        instance._set_up_base()
+        instance.run_transaction(validate_transaction=True)
+
+        pkgmanager.YumBase.save_ts.assert_called_once_with(
+            filename=pkgmanager.handlers.yum.YUM_TRANSACTION_FILE, auto=False
+        )
+        assert os.path.exists(base.TRANSACTION_RECORD_FILE)
+        assert pkgmanager.handlers.yum.YumTransactionHandler._perform_operations.call_count == 1
+
+        instance = YumTransactionHandler()
+        instance.run_transaction(validate_transaction=False)
+
+        pkgmanager.YumBase.load_ts.assert_called_once_with(filename=pkgmanager.handlers.yum.YUM_TRANSACTION_FILE)
+        # The packages were not marked again
+        assert pkgmanager.handlers.yum.YumTransactionHandler._perform_operations.call_count == 1
+        assert pkgmanager.handlers.yum.YumTransactionHandler._process_transaction.call_count == 2
+        assert not os.path.exists(base.TRANSACTION_RECORD_FILE)
+
+    @centos7
+    def test_replay_transaction_load_ts_error(self, pretend_os, _mock_yum_api_calls, monkeypatch, caplog):
+        monkeypatch.setattr(
+            YumTransactionHandler,
+            "_load_transaction_record",
+            mock.Mock(return_value=pkgmanager.handlers.yum.YUM_TRANSACTION_FILE),
+        )
+        pkgmanager.YumBase.load_ts.side_effect = pkgmanager.Errors.YumBaseError("rpmdb ver mismatched")
+        monkeypatch.setattr(pkgmanager.YumBase, "close", mock.Mock())
+
+        instance = YumTransactionHandler()
+
+        assert not instance._replay_transaction()
+        assert "Unable to replay the validated transaction" in caplog.records[-1].message
+        # The yum base is closed before the transaction is built again
+        pkgmanager.YumBase.close.assert_called_once()
+        assert not hasattr(instance, "_base")
+
     @centos7
     def test_package_marked_for_update(self, pretend_os, _mock_yum_api_calls, monkeypatch):
         """
@@ -382,10 +511,10 @@ def test_resolve_yum_problematic_dependencies(
             pkgs_to_remove=expected_remove_pkgs,
             backup=True,
             critical=True,
-            reposdir=utils.BACKUP_DIR,
+            reposdir=file_store.get_backup_path(repo.DEFAULT_YUM_REPOFILE_DIR),
             set_releasever=True,
             custom_releasever=7,
-            varsdir=os.path.join(utils.BACKUP_DIR, "yum/vars"),
+            varsdir=file_store.get_backup_path(repo.DEFAULT_YUM_VARS_DIR),
         )
     else:
         assert "Unable to resolve dependency issues." in caplog.records[-1].message
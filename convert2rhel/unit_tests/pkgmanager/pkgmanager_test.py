@@ -51,15 +51,54 @@ def test_create_transaction_handler_dnf(monkeypatch):
     assert dnf_transaction_handler_mock.called
 
 
+@pytest.mark.parametrize(
+    ("profile", "expected"),
+    (
+        (pkgmanager.METADATA_SYSTEM, "instant"),
+        (pkgmanager.METADATA_PRIMARY, "group:primary"),
+        (pkgmanager.METADATA_FILELISTS, "group:main"),
+    ),
+)
+def test_set_metadata_profile_yum(profile, expected, monkeypatch):
+    monkeypatch.setattr(pkgmanager, "TYPE", "yum")
+    base = mock.Mock()
+
+    pkgmanager.set_metadata_profile(base, profile)
+
+    assert base.conf.mdpolicy == expected
+
+
+@pytest.mark.parametrize(
+    ("optional_metadata_types", "profile", "expected"),
+    (
+        (["filelists", "updateinfo"], pkgmanager.METADATA_SYSTEM, ["updateinfo"]),
+        (["filelists"], pkgmanager.METADATA_PRIMARY, []),
+        ([], pkgmanager.METADATA_FILELISTS, ["filelists"]),
+        (["filelists", "presto"], pkgmanager.METADATA_FILELISTS, ["filelists", "presto"]),
+    ),
+)
+def test_set_metadata_profile_dnf(optional_metadata_types, profile, expected, monkeypatch):
+    monkeypatch.setattr(pkgmanager, "TYPE", "dnf")
+    base = mock.Mock()
+    base.conf.optional_metadata_types = optional_metadata_types
+
+    pkgmanager.set_metadata_profile(base, profile)
+
+    assert base.conf.optional_metadata_types == expected
+
+
 @pytest.mark.parametrize(
     ("ret_code", "expected"),
-    ((0, "Cached repositories metadata cleaned successfully."), (1, "Failed to clean yum metadata")),
+    (
+        (0, "Cached repositories metadata marked to be checked for updates."),
+        (1, "Failed to expire the cached yum metadata"),
+    ),
 )
-def test_clean_yum_metadata(ret_code, expected, monkeypatch, caplog):
+def test_expire_yum_metadata(ret_code, expected, monkeypatch, caplog):
     run_subprocess_mock = mock.Mock(
         side_effect=run_subprocess_side_effect(
             (
-                ("yum", "clean", "metadata", "--enablerepo=*", "--quiet"),
+                ("yum", "clean", "expire-cache", "--enablerepo=*", "--quiet"),
                 (expected, ret_code),
             ),
         ),
@@ -70,7 +109,7 @@ def test_clean_yum_metadata(ret_code, expected, monkeypatch, caplog):
         value=run_subprocess_mock,
     )
 
-    pkgmanager.clean_yum_metadata()
+    pkgmanager.expire_yum_metadata()
 
     assert expected in caplog.records[-1].message
 
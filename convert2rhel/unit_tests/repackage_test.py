@@ -0,0 +1,249 @@
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import gzip
+import hashlib
+import io
+import os
+import stat
+import struct
+
+import pytest
+import six
+
+from convert2rhel import repackage
+
+
+six.add_move(six.MovedModule("mock", "mock", "unittest.mock"))
+from six.moves import mock
+
+
+def _strings(*values):
+    return (repackage._STRING_ARRAY, len(values), b"".join(value + b"\0" for value in values))
+
+
+def _numbers(entry_type, *values):
+    return (entry_type, len(values), struct.pack(">%d%s" % (len(values), repackage._TYPE_FORMATS[entry_type]), *values))
+
+
+def _install(header, installed_entries):
+    """Append the entries that rpm adds on install after the immutable region of a header."""
+    blob = header[len(repackage._HEADER_MAGIC) :]
+    index_length, data_length = struct.unpack(">ii", blob[:8])
+    index = blob[8 : 8 + index_length * 16]
+    data = bytearray(blob[8 + index_length * 16 :])
+    for tag, (entry_type, count, value) in sorted(installed_entries.items()):
+        data.extend(b"\0" * (-len(data) % 8))
+        index += struct.pack(">iiii", tag, entry_type, len(data), count)
+        data.extend(value)
+    return struct.pack(">ii", index_length + len(installed_entries), len(data)) + index + bytes(data)
+
+
+@pytest.fixture
+def installed_pkg(tmpdir):
+    """Files of a package installed in tmpdir and its header as exported by the rpm database."""
+    root = tmpdir.mkdir("root")
+    root.join("file").write("content")
+    root.join("link").mksymlinkto("file")
+    root.join("hardlink1").write("linked")
+    os.link(str(root.join("hardlink1")), str(root.join("hardlink2")))
+    root.mkdir("directory")
+
+    basenames = [b"directory", b"file", b"ghost", b"hardlink1", b"hardlink2", b"link"]
+    modes = [stat.S_IFDIR | 0o755, stat.S_IFREG | 0o644, stat.S_IFREG | 0o644]
+    modes += [stat.S_IFREG | 0o644, stat.S_IFREG | 0o644, stat.S_IFLNK | 0o777]
+    header = repackage._build_header(
+        {
+            repackage._NAME: repackage._string_entry(b"pkg"),
+            repackage._VERSION: repackage._string_entry(b"1.0"),
+            repackage._RELEASE: repackage._string_entry(b"1.el8"),
+            repackage._ARCH: repackage._string_entry(b"x86_64"),
+            repackage._DIRNAMES: _strings(str(root).encode("utf-8") + b"/"),
+            repackage._DIRINDEXES: _numbers(repackage._INT32, *[0] * 6),
+            repackage._BASENAMES: _strings(*basenames),
+            repackage._FILEMODES: _numbers(repackage._INT16, *modes),
+            repackage._FILEFLAGS: _numbers(repackage._INT32, 0, 0, repackage._FILE_GHOST, 0, 0, 0),
+            repackage._FILEMTIMES: _numbers(repackage._INT32, *[1000000000] * 6),
+            repackage._FILEDEVICES: _numbers(repackage._INT32, *[1] * 6),
+            repackage._FILEINODES: _numbers(repackage._INT32, 1, 2, 3, 4, 4, 5),
+            repackage._PAYLOADCOMPRESSOR: repackage._string_entry(b"xz"),
+            repackage._PAYLOADDIGEST: _strings(b"0" * 64),
+            repackage._PAYLOADDIGESTALGO: _numbers(repackage._INT32, 8),
+        }
+    )
+    return root, _install(header, {repackage._FILESTATES: _numbers(repackage._CHAR, *[0] * 6)})
+
+
+def _read_header(blob):
+    index_length, data_length = struct.unpack(">ii", blob[8:16])
+    return blob[: 16 + index_length * 16 + data_length]
+
+
+def _read_cpio(archive):
+    entries = []
+    position = 0
+    while True:
+        fields = [int(archive[position + 6 + number * 8 : position + 14 + number * 8], 16) for number in range(13)]
+        name_start = position + 110
+        name = archive[name_start : name_start + fields[11] - 1]
+        data_start = name_start + fields[11] + (-(110 + fields[11]) % 4)
+        if name == b"TRAILER!!!":
+            return entries
+        entries.append((name, fields[1], fields[4], archive[data_start : data_start + fields[6]]))
+        position = data_start + fields[6] + (-fields[6] % 4)
+
+
+def test_parse_installed_header(installed_pkg):
+    _, blob = installed_pkg
+
+    immutable, installed = repackage._parse_header(blob)
+
+    assert repackage._get_nvra(immutable) == "pkg-1.0-1.el8.x86_64"
+    assert list(installed) == [repackage._FILESTATES]
+    assert repackage._parse_header(repackage._build_header(immutable)) == (immutable, {})
+
+
+def test_parse_header_without_region():
+    blob = struct.pack(">ii", 1, 4) + struct.pack(">iiii", repackage._NAME, repackage._STRING, 0, 1) + b"pkg\0"
+
+    with pytest.raises(repackage.RepackageError, match="no immutable region"):
+        repackage._parse_header(blob)
+
+
+def test_write_payload(installed_pkg):
+    root, blob = installed_pkg
+    handler = io.BytesIO()
+
+    repackage._write_payload(repackage._get_files(*repackage._parse_header(blob)), handler)
+
+    entries = dict((name, (mode, nlink, content)) for name, mode, nlink, content in _read_cpio(handler.getvalue()))
+    prefix = b"." + str(root).encode("utf-8") + b"/"
+    assert entries == {
+        prefix + b"directory": (stat.S_IFDIR | 0o755, 1, b""),
+        prefix + b"file": (stat.S_IFREG | 0o644, 1, b"content"),
+        # The content of hard links is only in the last of them.
+        prefix + b"hardlink1": (stat.S_IFREG | 0o644, 2, b""),
+        prefix + b"hardlink2": (stat.S_IFREG | 0o644, 2, b"linked"),
+        prefix + b"link": (stat.S_IFLNK | 0o777, 1, b"file"),
+    }
+
+
+def test_get_files_not_installed(installed_pkg):
+    _, blob = installed_pkg
+    immutable, installed = repackage._parse_header(blob)
+    installed[repackage._FILESTATES] = _numbers(repackage._CHAR, 0, 2, 0, 0, 0, 0)
+
+    with pytest.raises(repackage.RepackageError, match="was not installed with the package"):
+        repackage._get_files(immutable, installed)
+
+
+def test_repackage_pkg(installed_pkg, tmpdir, monkeypatch):
+    _, blob = installed_pkg
+    run_subprocess_mock = mock.Mock(return_value=("", 0))
+    monkeypatch.setattr(repackage.utils, "run_subprocess", run_subprocess_mock)
+
+    path = repackage._repackage_pkg("pkg-1.0-1.el8.x86_64", blob, str(tmpdir))
+
+    assert path == str(tmpdir.join("pkg-1.0-1.el8.x86_64.rpm"))
+    assert run_subprocess_mock.call_args_list[0][0][0][:2] == ["rpm", "-V"]
+    assert run_subprocess_mock.call_args_list[1][0][0] == ["rpm", "-K", "--nosignature", path]
+    assert not os.path.exists(path + ".payload")
+
+    with open(path, "rb") as handler:
+        package = handler.read()
+    assert package[:4] == repackage._LEAD_MAGIC
+    signature = _read_header(package[96:])
+    header = _read_header(package[96 + len(signature) + (-len(signature) % 8) :])
+    payload = package[96 + len(signature) + (-len(signature) % 8) + len(header) :]
+
+    signature_entries, _ = repackage._parse_header(signature, region_tag=repackage._HEADERSIGNATURES)
+    header_entries, _ = repackage._parse_header(header)
+    assert repackage._get_strings(signature_entries[repackage._SIGTAG_SHA256]) == [
+        hashlib.sha256(header).hexdigest().encode("ascii")
+    ]
+    assert signature_entries[repackage._SIGTAG_MD5][2] == hashlib.md5(header + payload).digest()
+    assert repackage._get_numbers(signature_entries[repackage._SIGTAG_SIZE]) == [len(header) + len(payload)]
+    assert repackage._get_strings(header_entries[repackage._PAYLOADCOMPRESSOR]) == [b"gzip"]
+    assert repackage._get_strings(header_entries[repackage._PAYLOADDIGEST]) == [
+        hashlib.sha256(payload).hexdigest().encode("ascii")
+    ]
+    archive = gzip.GzipFile(fileobj=io.BytesIO(payload)).read()
+    assert repackage._get_numbers(signature_entries[repackage._SIGTAG_PAYLOADSIZE]) == [len(archive)]
+    assert len(_read_cpio(archive)) == 5
+
+
+@pytest.mark.parametrize(
+    ("rpm_verify", "rpm_check", "message"),
+    (
+        (("S.5......  c /etc/pkg.conf", 1), ("", 0), "have changed since it was installed"),
+        (("", 0), ("digests SIGNATURES NOT OK", 1), "digests of the rebuilt"),
+    ),
+)
+def test_repackage_pkg_failure(rpm_verify, rpm_check, message, installed_pkg, tmpdir, monkeypatch):
+    _, blob = installed_pkg
+    monkeypatch.setattr(repackage.utils, "run_subprocess", mock.Mock(side_effect=[rpm_verify, rpm_check]))
+
+    with pytest.raises(repackage.RepackageError, match=message):
+        repackage._repackage_pkg("pkg-1.0-1.el8.x86_64", blob, str(tmpdir))
+
+    assert not tmpdir.join("pkg-1.0-1.el8.x86_64.rpm").exists()
+
+
+def test_repackage_pkgs(monkeypatch, caplog):
+    headers = {"pkg1-1.0-1.el8.x86_64": b"header1", "pkg2-1:1.0-1.el8.x86_64": b"header2"}
+    monkeypatch.setattr(repackage, "_get_headers", mock.Mock(return_value=headers))
+
+    def repackage_pkg(pkg, blob, dest):
+        if blob == b"header2":
+            raise repackage.RepackageError("The files of pkg2 have changed since it was installed")
+        return os.path.join(dest, "%s.rpm" % pkg)
+
+    monkeypatch.setattr(repackage, "_repackage_pkg", repackage_pkg)
+
+    repackaged = repackage.repackage_pkgs(["pkg1-1.0-1.el8.x86_64", "pkg2-1:1.0-1.el8.x86_64", "pkg3"], "/backup")
+
+    assert repackaged == {"pkg1-1.0-1.el8.x86_64": "/backup/pkg1-1.0-1.el8.x86_64.rpm"}
+    assert "Backed up pkg1-1.0-1.el8.x86_64 by rebuilding it from the rpm database." in caplog.text
+
+
+def test_get_headers(monkeypatch):
+    class HeaderMocked(dict):
+        def unload(self):
+            return b"header of %s" % self[repackage._NAME].encode("utf-8")
+
+    def header(name, epoch):
+        return HeaderMocked(
+            {
+                repackage._NAME: name,
+                repackage._EPOCH: epoch,
+                repackage._VERSION: "1.0",
+                repackage._RELEASE: "1.el8",
+                repackage._ARCH: "x86_64",
+            }
+        )
+
+    transaction_set = mock.Mock()
+    transaction_set.dbMatch.return_value = [header("pkg1", None), header("pkg2", 1), header("pkg3", None)]
+    monkeypatch.setattr(repackage.rpm, "TransactionSet", mock.Mock(return_value=transaction_set))
+
+    headers = repackage._get_headers(["pkg1-1.0-1.el8.x86_64", "pkg2-1:1.0-1.el8.x86_64", "1:pkg2-1.0-1.el8.x86_64"])
+
+    assert headers == {
+        "pkg1-1.0-1.el8.x86_64": b"header of pkg1",
+        "pkg2-1:1.0-1.el8.x86_64": b"header of pkg2",
+        "1:pkg2-1.0-1.el8.x86_64": b"header of pkg2",
+    }
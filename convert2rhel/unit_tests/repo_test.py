@@ -15,12 +15,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import hashlib
 import os
 
 import pytest
 import six
 
-from convert2rhel import repo
+from convert2rhel import backup_store, repo
+from convert2rhel.logger import LogLevelFile
 from convert2rhel.unit_tests.conftest import all_systems, centos8
 
 
@@ -78,57 +80,32 @@ def test_get_hardcoded_repofiles_dir(pretend_os, path_exists, expected, monkeypa
 
 
 @pytest.fixture
-def generate_vars_dir(tmpdir):
+def generate_vars_dir(tmpdir, monkeypatch):
     tmpdir = tmpdir.mkdir("etc")
     yum_vars = tmpdir.mkdir("yum").mkdir("vars").join("yum_test_var")
     dnf_vars = tmpdir.mkdir("dnf").mkdir("vars").join("dnf_test_var")
     yum_vars.write("test_var")
     dnf_vars.write("test_var")
+    monkeypatch.setattr(repo, "DEFAULT_DNF_VARS_DIR", os.path.dirname(str(dnf_vars)))
+    monkeypatch.setattr(repo, "DEFAULT_YUM_VARS_DIR", os.path.dirname(str(yum_vars)))
 
     return str(dnf_vars), str(yum_vars)
 
 
-@pytest.fixture
-def generate_backup_vars_dir(tmpdir):
-    # Same idea as `generate_vars_dir`, but for backup to test restore.
-    tmpdir = tmpdir.mkdir("backup")
-    yum_vars = tmpdir.mkdir("yum").mkdir("vars").join("yum_test_var")
-    dnf_vars = tmpdir.mkdir("dnf").mkdir("vars").join("dnf_test_var")
-    yum_vars.write("test_var")
-    dnf_vars.write("test_var")
-
-    return str(dnf_vars), str(yum_vars)
-
-
-@pytest.mark.parametrize(
-    ("create_backup_dirs"),
-    (
-        (True),
-        (False),
-    ),
-)
 @all_systems
-def test_backup_varsdir(pretend_os, create_backup_dirs, generate_vars_dir, tmpdir, caplog):
-    dnf_vars_dir, yum_vars_dir = generate_vars_dir
-    repo.DEFAULT_DNF_VARS_DIR = os.path.dirname(dnf_vars_dir)
-    repo.DEFAULT_YUM_VARS_DIR = os.path.dirname(yum_vars_dir)
-    tmpdir = tmpdir.mkdir("backup")
-    if create_backup_dirs:
-        tmpdir.mkdir("dnf").mkdir("vars")
-        tmpdir.mkdir("yum").mkdir("vars")
-
-    repo.BACKUP_DIR = str(tmpdir)
+def test_backup_varsdir(pretend_os, generate_vars_dir, file_store, caplog):
+    dnf_var, yum_var = generate_vars_dir
 
     repo.backup_varsdir()
+
     assert "Backed up variable file" in caplog.records[-1].message
+    assert file_store.is_backed_up(yum_var)
+    assert file_store.is_backed_up(dnf_var) == (repo.system_info.version.major == 8)
 
 
 @all_systems
-def test_backup_varsdir_without_variables(pretend_os, generate_vars_dir, tmpdir, caplog):
+def test_backup_varsdir_without_variables(pretend_os, generate_vars_dir, caplog):
     dnf_vars_dir, yum_vars_dir = generate_vars_dir
-    repo.DEFAULT_DNF_VARS_DIR = os.path.dirname(dnf_vars_dir)
-    repo.DEFAULT_YUM_VARS_DIR = os.path.dirname(yum_vars_dir)
-    repo.BACKUP_DIR = str(tmpdir)
 
     os.remove(dnf_vars_dir)
     os.remove(yum_vars_dir)
@@ -138,39 +115,68 @@ def test_backup_varsdir_without_variables(pretend_os, generate_vars_dir, tmpdir,
 
 
 @all_systems
-def test_restore_varsdir(pretend_os, generate_backup_vars_dir, generate_vars_dir, tmpdir, caplog):
-    dnf_vars_dir, yum_vars_dir = generate_vars_dir
-
-    repo.DEFAULT_DNF_VARS_DIR = os.path.dirname(dnf_vars_dir)
-    repo.DEFAULT_YUM_VARS_DIR = os.path.dirname(yum_vars_dir)
-    os.remove(dnf_vars_dir)
-    os.remove(yum_vars_dir)
-
-    repo.BACKUP_DIR = os.path.join(str(tmpdir), "backup")
+def test_restore_varsdir(pretend_os, generate_vars_dir, caplog):
+    dnf_var, yum_var = generate_vars_dir
+    repo.backup_varsdir()
+    os.remove(dnf_var)
+    os.remove(yum_var)
 
     repo.restore_varsdir()
+
     assert "Restored variable file" in caplog.records[-1].message
+    assert os.path.exists(yum_var)
+    assert os.path.exists(dnf_var) == (repo.system_info.version.major == 8)
 
 
 @all_systems
-def test_restore_varsdir_without_variables(pretend_os, generate_backup_vars_dir, generate_vars_dir, tmpdir, caplog):
-    dnf_vars_dir, yum_vars_dir = generate_vars_dir
-    backup_dnf_var, backup_yum_var = generate_backup_vars_dir
+def test_restore_varsdir_unchanged(pretend_os, generate_vars_dir, file_store, monkeypatch, caplog):
+    repo.backup_varsdir()
+    clone_mock = mock.Mock()
+    monkeypatch.setattr(backup_store, "_clone", clone_mock)
+
+    caplog.set_level(LogLevelFile.level)
+    repo.restore_varsdir()
 
-    repo.DEFAULT_DNF_VARS_DIR = os.path.dirname(dnf_vars_dir)
-    repo.DEFAULT_YUM_VARS_DIR = os.path.dirname(yum_vars_dir)
-    repo.BACKUP_DIR = os.path.join(str(tmpdir), "backup")
+    assert "hasn't changed since the backup" in caplog.records[-1].message
+    assert clone_mock.call_count == 0
 
-    os.remove(backup_dnf_var)
-    os.remove(backup_yum_var)
 
+@centos8
+def test_restore_varsdir_without_backup(pretend_os, generate_vars_dir, caplog):
     repo.restore_varsdir()
-    assert "No varaibles files to rollback" in caplog.records[-1].message
 
+    assert "No variables files to rollback." in caplog.records[-1].message
 
-@centos8
-def test_restore_varsdir_without_backup(pretend_os, tmpdir, caplog):
-    repo.BACKUP_DIR = str(tmpdir)
 
-    repo.restore_varsdir()
-    assert "Couldn't find backup directory at" in caplog.records[-1].message
+def test_backup_and_restore_yum_repos(tmpdir, file_store, monkeypatch):
+    repofile_dir = tmpdir.mkdir("yum.repos.d")
+    monkeypatch.setattr(repo, "DEFAULT_YUM_REPOFILE_DIR", str(repofile_dir))
+    repofile_dir.join("centos.repo").write("[baseos]")
+    repofile_dir.join("redhat.repo").write("[rhel]")
+    repofile_dir.join("centos.repo.rpmsave").write("[baseos]")
+
+    repo.backup_yum_repos()
+    repofile_dir.join("centos.repo").remove()
+
+    repo.restore_yum_repos()
+
+    assert repofile_dir.join("centos.repo").read() == "[baseos]"
+    assert file_store.get_backed_up_paths(str(repofile_dir)) == [str(repofile_dir.join("centos.repo"))]
+    # The yum handler reads the backed up repositories from the tree of the store.
+    assert os.listdir(file_store.get_backup_path(str(repofile_dir))) == ["centos.repo"]
+
+
+def test_repomd_fingerprint(tmpdir, monkeypatch):
+    monkeypatch.setattr(repo, "DNF_REPOMD_GLOB", str(tmpdir.join("dnf", "%s-*", "repodata", "repomd.xml")))
+    monkeypatch.setattr(repo, "YUM_REPOMD_GLOB", str(tmpdir.join("yum", "*", "*", "%s", "repomd.xml")))
+
+    tmpdir.join("dnf", "baseos-0123456789abcdef", "repodata", "repomd.xml").write("baseos", ensure=True)
+    # A repository whose id starts with the id of another one
+    tmpdir.join("dnf", "baseos-eus-0123456789abcdef", "repodata", "repomd.xml").write("eus", ensure=True)
+    tmpdir.join("yum", "x86_64", "7Server", "server", "repomd.xml").write("server", ensure=True)
+
+    assert repo.repomd_fingerprint(["baseos", "server"]) == {
+        "baseos": hashlib.sha256(b"baseos").hexdigest(),
+        "server": hashlib.sha256(b"server").hexdigest(),
+    }
+    assert repo.repomd_fingerprint(["baseos", "appstream"]) is None
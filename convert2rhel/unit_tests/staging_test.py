@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from convert2rhel import staging
+from convert2rhel.systeminfo import system_info
+
+
+@pytest.fixture
+def staging_dir(tmpdir, monkeypatch):
+    staging_dir = tmpdir.join("staged-payload")
+    monkeypatch.setattr(staging, "STAGING_DIR", str(staging_dir))
+    monkeypatch.setattr(staging, "MANIFEST_FILE", str(staging_dir.join("manifest.json")))
+    monkeypatch.setattr(system_info, "releasever", "8.5")
+    return staging_dir
+
+
+@pytest.fixture
+def downloaded_pkgs(tmpdir):
+    cache = tmpdir.join("cache", "baseos", "packages")
+    paths = []
+    for name in ("bash-4.4.20-1.el8.x86_64.rpm", "kernel-4.18.0-348.el8.x86_64.rpm"):
+        cache.join(name).write(name, ensure=True)
+        paths.append(str(cache.join(name)))
+    return paths
+
+
+def test_stage_and_restore(staging_dir, downloaded_pkgs, tmpdir):
+    staging.stage(staging.TRANSACTION, downloaded_pkgs)
+
+    manifest = json.loads(staging_dir.join("manifest.json").read())
+    assert sorted(manifest["payload"][staging.TRANSACTION]) == [
+        "bash-4.4.20-1.el8.x86_64.rpm",
+        "kernel-4.18.0-348.el8.x86_64.rpm",
+    ]
+
+    # The package cache was cleaned in between
+    tmpdir.join("cache").remove()
+
+    assert staging.restore(staging.TRANSACTION) == downloaded_pkgs
+    assert tmpdir.join("cache", "baseos", "packages", "bash-4.4.20-1.el8.x86_64.rpm").read() == (
+        "bash-4.4.20-1.el8.x86_64.rpm"
+    )
+    assert staging.restore(staging.SUBSCRIPTION_MANAGER) is None
+
+
+def test_stage_replaces_part(staging_dir, downloaded_pkgs):
+    staging.stage(staging.TRANSACTION, downloaded_pkgs)
+    staging.stage(staging.KERNEL, downloaded_pkgs[1:])
+    staging.stage(staging.TRANSACTION, downloaded_pkgs[:1])
+
+    assert staging_dir.join(staging.TRANSACTION).listdir() == [
+        staging_dir.join(staging.TRANSACTION, "bash-4.4.20-1.el8.x86_64.rpm")
+    ]
+    assert sorted(staging.load_manifest()) == [staging.KERNEL, staging.TRANSACTION]
+
+
+def test_restore_corrupted(staging_dir, downloaded_pkgs, caplog):
+    staging.stage(staging.TRANSACTION, downloaded_pkgs)
+    staging_dir.join(staging.TRANSACTION, "bash-4.4.20-1.el8.x86_64.rpm").write("corrupted")
+
+    assert staging.restore(staging.TRANSACTION) is None
+    assert "The staged package bash-4.4.20-1.el8.x86_64.rpm is corrupted" in caplog.records[-1].message
+
+
+def test_restore_missing(staging_dir, downloaded_pkgs, caplog):
+    staging.stage(staging.TRANSACTION, downloaded_pkgs)
+    staging_dir.join(staging.TRANSACTION, "bash-4.4.20-1.el8.x86_64.rpm").remove()
+
+    assert staging.restore(staging.TRANSACTION) is None
+    assert "Unable to restore the staged transaction packages" in caplog.records[-1].message
+
+
+def test_load_manifest_other_releasever(staging_dir, downloaded_pkgs, monkeypatch):
+    staging.stage(staging.TRANSACTION, downloaded_pkgs)
+    monkeypatch.setattr(system_info, "releasever", "8.6")
+
+    assert staging.load_manifest() == {}
+    assert staging.restore(staging.TRANSACTION) is None
+
+
+def test_stage_missing_package(staging_dir, downloaded_pkgs, caplog):
+    staging.stage(staging.TRANSACTION, downloaded_pkgs + ["/nonexistent/pkg.rpm"])
+
+    assert "Unable to stage the transaction packages" in caplog.records[-1].message
+    assert staging.load_manifest() == {}
@@ -27,7 +27,7 @@ import dbus.exceptions
 import pytest
 import six
 
-from convert2rhel import backup, pkghandler, subscription, toolopts, unit_tests, utils
+from convert2rhel import backup, pkghandler, staging, subscription, toolopts, unit_tests, utils
 from convert2rhel.systeminfo import EUS_MINOR_VERSIONS, system_info
 from convert2rhel.unit_tests import GetLoggerMocked, get_pytest_marker, run_subprocess_side_effect
 from convert2rhel.unit_tests.conftest import centos7, centos8
@@ -256,13 +256,21 @@ class TestInstallSubscriptionManager(object):
         monkeypatch.setattr(os.path, "exists", lambda x: cafile_installed)
         monkeypatch.setattr(os.path, "isdir", lambda x: True)
         monkeypatch.setattr(os, "listdir", lambda x: ["filename"])
-        monkeypatch.setattr(pkghandler, "filter_installed_pkgs", DumbCallable())
-        monkeypatch.setattr(pkghandler, "get_pkg_names_from_rpm_paths", DumbCallable())
+        monkeypatch.setattr(pkghandler, "filter_installed_pkgs", mock.Mock(return_value=["python-syspurpose"]))
         monkeypatch.setattr(
             pkghandler,
-            "call_yum_cmd",
-            lambda command, args, print_output, enable_repos, disable_repos, set_releasever: (None, 0),
+            "get_pkg_names_from_rpm_paths",
+            mock.Mock(return_value=["subscription-manager", "python-syspurpose"]),
         )
+        journal_pkgs_to_install = mock.Mock()
+        monkeypatch.setattr(backup.changed_pkgs_control, "journal_pkgs_to_install", journal_pkgs_to_install)
+
+        def call_yum_cmd(command, args, print_output, enable_repos, disable_repos, set_releasever):
+            # The packages are journaled before they are installed
+            journal_pkgs_to_install.assert_called_once_with(["subscription-manager"])
+            return None, 0
+
+        monkeypatch.setattr(pkghandler, "call_yum_cmd", call_yum_cmd)
         monkeypatch.setattr(backup.changed_pkgs_control, "track_installed_pkgs", DumbCallable())
         monkeypatch.setattr(subscription, "track_installed_submgr_pkgs", DumbCallable())
 
@@ -276,7 +284,7 @@ class TestInstallSubscriptionManager(object):
 
         subscription.install_rhel_subscription_manager()
 
-        assert pkghandler.get_pkg_names_from_rpm_paths.called == 1
+        assert pkghandler.get_pkg_names_from_rpm_paths.call_count == 1
         assert "\nPackages installed:\n" in caplog.text
         assert subscription.track_installed_submgr_pkgs.called == 1
 
@@ -1028,6 +1036,29 @@ class TestDownloadRHSMPkgs(object):
         assert "Skipping due to the use of --keep-rhsm." in caplog.text
         subscription._download_rhsm_pkgs.assert_not_called()
 
+    def test_download_rhsm_pkgs_staged(self, monkeypatch):
+        monkeypatch.setattr(subscription, "_download_rhsm_pkgs", mock.Mock())
+        monkeypatch.setattr(
+            staging, "restore", mock.Mock(return_value=["/usr/share/convert2rhel/subscription-manager/a.rpm"])
+        )
+
+        subscription.download_rhsm_pkgs()
+
+        staging.restore.assert_called_once_with(staging.SUBSCRIPTION_MANAGER)
+        subscription._download_rhsm_pkgs.assert_not_called()
+
+    def test__download_rhsm_pkgs_prestage(self, monkeypatch, tmpdir, tool_opts):
+        download_rpms_directory = tmpdir.join("submgr-downloads")
+        monkeypatch.setattr(subscription, "SUBMGR_RPMS_DIR", str(download_rpms_directory))
+        monkeypatch.setattr(utils, "store_content_to_file", StoreContentMocked())
+        monkeypatch.setattr(utils, "download_pkgs", mock.Mock(return_value=["/path/to/testpkg.rpm"]))
+        monkeypatch.setattr(staging, "stage", mock.Mock())
+        tool_opts.prestage = True
+
+        subscription._download_rhsm_pkgs(["testpkg"], "/path/to.repo", "content")
+
+        staging.stage.assert_called_once_with(staging.SUBSCRIPTION_MANAGER, ["/path/to/testpkg.rpm"])
+
     def test__download_rhsm_pkgs(self, monkeypatch, tmpdir):
         """Smoketest that _download_rhsm_pkgs works in the happy path"""
         download_rpms_directory = tmpdir.join("submgr-downloads")
@@ -445,3 +445,40 @@ def test_print_system_information(pretend_os, caplog):
     assert "8.5" in caplog.records[-3].message
     assert "x86_64" in caplog.records[-2].message
     assert "centos-8-x86_64.cfg" in caplog.records[-1].message
+
+
+def test_get_loaded_kmods(monkeypatch, tmpdir):
+    proc_modules = tmpdir.join("modules")
+    proc_modules.write(
+        "xfs 1556480 2 - Live 0x0000000000000000\n"
+        "nf-tables 180224 0 - Live 0x0000000000000000\n"
+        "system76_io 16384 0 - Live 0x0000000000000000 (OE)\n"
+        "missing 16384 0 - Live 0x0000000000000000\n"
+    )
+    modules_dir = tmpdir.mkdir("lib-modules").mkdir("4.18.0-240.el8.x86_64")
+    modules_dir.join("modules.dep").write(
+        "kernel/fs/xfs/xfs.ko.xz: kernel/lib/libcrc32c.ko.xz\n"
+        "kernel/net/netfilter/nf_tables.ko.xz: kernel/net/netfilter/nfnetlink.ko.xz\n"
+        "extra/system76-io.ko:\n"
+    )
+    modules_dir.join("modules.builtin").write("kernel/fs/ext4/ext4.ko\n")
+    monkeypatch.setattr(systeminfo, "PROC_MODULES", str(proc_modules))
+    monkeypatch.setattr(systeminfo, "KERNEL_MODULES_DIR", str(tmpdir.join("lib-modules")))
+    run_subprocess_mock = mock.Mock(return_value=("modinfo: ERROR: Module missing not found.\n", 1))
+    monkeypatch.setattr(systeminfo, "run_subprocess", run_subprocess_mock)
+
+    info = systeminfo.SystemInfo()
+    info.booted_kernel = "4.18.0-240.el8.x86_64"
+
+    assert info.get_loaded_kmods() == [
+        systeminfo.LoadedKernelModule("xfs", str(modules_dir.join("kernel/fs/xfs/xfs.ko.xz")), ""),
+        systeminfo.LoadedKernelModule("nf-tables", str(modules_dir.join("kernel/net/netfilter/nf_tables.ko.xz")), ""),
+        systeminfo.LoadedKernelModule("system76_io", str(modules_dir.join("extra/system76-io.ko")), "OE"),
+        systeminfo.LoadedKernelModule("missing", None, ""),
+    ]
+    # modinfo only runs for the module missing from the indexes
+    run_subprocess_mock.assert_called_once_with(["modinfo", "-F", "filename", "missing"], print_output=False)
+
+    # The modules are only read once
+    proc_modules.remove()
+    assert len(info.get_loaded_kmods()) == 4
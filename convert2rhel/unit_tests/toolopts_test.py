@@ -63,6 +63,85 @@ class TestTooloptsParseFromCLI(object):
         assert global_tool_opts.enablerepo == ["foo"]
         assert global_tool_opts.disablerepo == ["*"]
 
+    def test_cmdline_only_and_skip(self, monkeypatch, global_tool_opts):
+        monkeypatch.setenv("CONVERT2RHEL_EXPERIMENTAL_ANALYSIS", "1")
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            mock_cli_arguments(["--only", "IS_LOADED_KERNEL_LATEST,TAINTED_KMODS", "--only", "RHEL_COMPATIBLE_KERNEL"]),
+        )
+        convert2rhel.toolopts.CLI()
+        assert global_tool_opts.only_actions == ["IS_LOADED_KERNEL_LATEST", "TAINTED_KMODS", "RHEL_COMPATIBLE_KERNEL"]
+        assert global_tool_opts.skip_actions == []
+
+    def test_cmdline_only_and_skip_need_analysis(self, caplog, monkeypatch, global_tool_opts):
+        monkeypatch.delenv("CONVERT2RHEL_EXPERIMENTAL_ANALYSIS", raising=False)
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--skip", "PACKAGE_UPDATES"]))
+
+        with pytest.raises(SystemExit):
+            convert2rhel.toolopts.CLI()
+
+        assert "The --only and --skip options can only be used when analyzing the system" in caplog.text
+
+    def test_cmdline_timeouts(self, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--action-timeout", "1800", "--command-timeout", "600"]))
+        convert2rhel.toolopts.CLI()
+        assert global_tool_opts.action_timeout == 1800
+        assert global_tool_opts.command_timeout == 600
+
+    def test_cmdline_timeouts_must_be_positive(self, caplog, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--command-timeout", "0"]))
+
+        with pytest.raises(SystemExit):
+            convert2rhel.toolopts.CLI()
+
+        assert "The command timeout must be a positive number of seconds." in caplog.text
+
+    def test_cmdline_parallel_downloads(self, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--parallel-downloads", "10"]))
+        convert2rhel.toolopts.CLI()
+        assert global_tool_opts.parallel_downloads == 10
+
+    @pytest.mark.parametrize("parallel_downloads", ("0", "21"))
+    def test_cmdline_parallel_downloads_out_of_range(self, parallel_downloads, caplog, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--parallel-downloads", parallel_downloads]))
+
+        with pytest.raises(SystemExit):
+            convert2rhel.toolopts.CLI()
+
+        assert "The parallel downloads must be a number between 1 and 20." in caplog.text
+
+    def test_cmdline_transaction_chunk_size(self, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--transaction-chunk-size", "200"]))
+        convert2rhel.toolopts.CLI()
+        assert global_tool_opts.transaction_chunk_size == 200
+
+    def test_cmdline_transaction_chunk_size_invalid(self, caplog, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--transaction-chunk-size", "0"]))
+
+        with pytest.raises(SystemExit):
+            convert2rhel.toolopts.CLI()
+
+        assert "The transaction chunk size must be a positive number of packages." in caplog.text
+
+    def test_cmdline_transaction_memory_limit(self, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--transaction-memory-limit", "1024"]))
+        convert2rhel.toolopts.CLI()
+        assert global_tool_opts.transaction_memory_limit == 1024
+
+    def test_cmdline_transaction_memory_limit_invalid(self, caplog, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--transaction-memory-limit", "-1"]))
+
+        with pytest.raises(SystemExit):
+            convert2rhel.toolopts.CLI()
+
+        assert "The transaction memory limit must be a positive number of MiB." in caplog.text
+
+    def test_cmdline_prestage(self, monkeypatch, global_tool_opts):
+        monkeypatch.setattr(sys, "argv", mock_cli_arguments(["--prestage"]))
+        convert2rhel.toolopts.CLI()
+        assert global_tool_opts.prestage is True
+
     #
     # Parsing of serverurl
     #
@@ -509,6 +588,124 @@ def test_options_from_config_files_specified(content, output, content_lower_prio
         assert "Unsupported option" in caplog.text
 
 
+@pytest.mark.parametrize(
+    ("content", "fail_fast", "cheap_first"),
+    (
+        ("[settings]\nfail_fast = true\n", True, None),
+        ("[settings]\nfail_fast = no\ncheap_first = yes\n", False, True),
+        ("[subscription_manager]\nfail_fast = true\n", None, None),
+    ),
+)
+def test_options_from_config_files_settings(content, fail_fast, cheap_first, monkeypatch, tmpdir, caplog):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write(content)
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    opts = convert2rhel.toolopts.options_from_config_files()
+
+    assert opts["fail_fast"] is fail_fast
+    assert opts["cheap_first"] is cheap_first
+    if "subscription_manager" in content:
+        assert "Unsupported option fail_fast" in caplog.text
+
+
+def test_options_from_config_files_settings_not_boolean(monkeypatch, tmpdir):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write("[settings]\nfail_fast = maybe\n")
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    with pytest.raises(SystemExit, match="The value of fail_fast in .* must be either true or false."):
+        convert2rhel.toolopts.options_from_config_files()
+
+
+@pytest.mark.parametrize(
+    ("content", "action_timeout", "command_timeout"),
+    (
+        ("[settings]\naction_timeout = 1800\n", 1800, None),
+        ("[settings]\naction_timeout = 1800\ncommand_timeout = 600\n", 1800, 600),
+    ),
+)
+def test_options_from_config_files_timeouts(content, action_timeout, command_timeout, monkeypatch, tmpdir):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write(content)
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    opts = convert2rhel.toolopts.options_from_config_files()
+
+    assert opts["action_timeout"] == action_timeout
+    assert opts["command_timeout"] == command_timeout
+
+
+def test_options_from_config_files_parallel_downloads(monkeypatch, tmpdir):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write("[settings]\nparallel_downloads = 8\n")
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    assert convert2rhel.toolopts.options_from_config_files()["parallel_downloads"] == 8
+
+
+@pytest.mark.parametrize(
+    ("argv", "debug"),
+    (
+        (["rollback", "--resume"], False),
+        (["rollback", "--resume", "--debug"], True),
+    ),
+)
+def test_rollback_cli(argv, debug, monkeypatch, global_tool_opts):
+    monkeypatch.setattr(sys, "argv", mock_cli_arguments(argv))
+
+    convert2rhel.toolopts.RollbackCLI()
+
+    assert global_tool_opts.activity == "rollback"
+    assert global_tool_opts.debug is debug
+
+
+@pytest.mark.parametrize("argv", (["rollback"], ["rollback", "--resume", "--username", "user"]))
+def test_rollback_cli_invalid(argv, monkeypatch, global_tool_opts):
+    monkeypatch.setattr(sys, "argv", mock_cli_arguments(argv))
+
+    with pytest.raises(SystemExit):
+        convert2rhel.toolopts.RollbackCLI()
+
+
+def test_options_from_config_files_transaction_chunk_size(monkeypatch, tmpdir):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write("[settings]\ntransaction_chunk_size = 150\n")
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    assert convert2rhel.toolopts.options_from_config_files()["transaction_chunk_size"] == 150
+
+
+def test_options_from_config_files_transaction_memory_limit(monkeypatch, tmpdir):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write("[settings]\ntransaction_memory_limit = 768\n")
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    assert convert2rhel.toolopts.options_from_config_files()["transaction_memory_limit"] == 768
+
+
+def test_options_from_config_files_prestage(monkeypatch, tmpdir):
+    path = os.path.join(str(tmpdir), "convert2rhel.ini")
+    with open(path, "w") as file:
+        file.write("[settings]\nprestage = yes\n")
+    os.chmod(path, 0o600)
+    monkeypatch.setattr(convert2rhel.toolopts, "CONFIG_PATHS", value=[path])
+
+    assert convert2rhel.toolopts.options_from_config_files()["prestage"] is True
+
+
 @pytest.mark.parametrize(
     "supported_opts",
     (
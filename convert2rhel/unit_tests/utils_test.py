@@ -19,7 +19,9 @@ import json
 import logging
 import os
 import shutil
+import subprocess
 import sys
+import time
 import unittest
 
 from pickle import PicklingError
@@ -182,6 +184,16 @@ class TestUtils(unittest.TestCase):
 
         self.assertEqual(path, None)
 
+    @unit_tests.mock(system_info, "releasever", "7Server")
+    @unit_tests.mock(system_info, "version", namedtuple("Version", ["major", "minor"])(7, 0))
+    @unit_tests.mock(utils, "run_cmd_in_pty", RunSubprocessMocked(ret_code=1))
+    @unit_tests.mock(os, "environ", {})
+    @unit_tests.mock(toolopts.tool_opts, "activity", "conversion")
+    def test_download_pkg_failed_download_not_reported(self):
+        path = utils.download_pkg("kernel", report_failure=False)
+
+        self.assertEqual(path, None)
+
     @unit_tests.mock(system_info, "releasever", "7Server")
     @unit_tests.mock(system_info, "version", namedtuple("Version", ["major", "minor"])(7, 0))
     @unit_tests.mock(utils, "run_cmd_in_pty", RunSubprocessMocked(ret_code=0))
@@ -834,7 +846,7 @@ class DummyPopenOutput(unit_tests.MockFunction):
         self.call_count = 0
         self.output = output
 
-    def __call__(self, args, stdout, stderr, bufsize):
+    def __call__(self, args, stdout, stderr, bufsize, preexec_fn=None):
         return self
 
     @property
@@ -867,6 +879,100 @@ def test_run_subprocess_env(monkeypatch):
     assert 0 == rc
 
 
+def test_run_subprocess_timeout(monkeypatch):
+    popen = mock.Mock(wraps=subprocess.Popen)
+    monkeypatch.setattr(utils.subprocess, "Popen", popen)
+
+    start = time.time()
+    with pytest.raises(utils.CommandTimeoutError, match="did not finish within 0.5 seconds") as excinfo:
+        utils.run_subprocess(["sh", "-c", "echo started; exec sleep 30"], timeout=0.5)
+
+    assert time.time() - start < 10
+    assert excinfo.value.output == "started\n"
+    assert excinfo.value.timeout == 0.5
+    # The command stays in our process group so that a Ctrl-C reaches it
+    assert "preexec_fn" not in popen.call_args[1]
+    assert "start_new_session" not in popen.call_args[1]
+
+
+def _is_running(pid, wait=5):
+    # SIGKILL is delivered asynchronously, give the process time to exit
+    deadline = time.time() + wait
+    while True:
+        try:
+            with open("/proc/%d/stat" % pid) as stat_file:
+                # Killed processes may linger as zombies until they are reaped
+                running = stat_file.read().rsplit(")", 1)[-1].split()[0] != "Z"
+        except (IOError, OSError):
+            running = False
+        if not running or time.time() > deadline:
+            return running
+        time.sleep(0.05)
+
+
+def test_run_subprocess_timeout_kills_descendants():
+    start = time.time()
+    with pytest.raises(utils.CommandTimeoutError) as excinfo:
+        # The background sleep keeps the output pipe open after sh is killed
+        utils.run_subprocess(["sh", "-c", "sleep 30 & echo $!; wait"], timeout=0.5)
+
+    assert time.time() - start < 10
+    grandchild = int(excinfo.value.output)
+    assert not _is_running(grandchild)
+
+
+def test_run_subprocess_timeout_stops_reading():
+    start = time.time()
+    with pytest.raises(utils.CommandTimeoutError) as excinfo:
+        # The sleep is re-parented to init so it is not killed with sh, and
+        # it holds the output pipe open for longer than the timeout
+        utils.run_subprocess(["sh", "-c", "(sleep 5 &); echo started; exec sleep 30"], timeout=0.5)
+
+    assert time.time() - start < 4
+    assert excinfo.value.output == "started\n"
+
+
+def test_get_descendant_pids():
+    process = subprocess.Popen(["sh", "-c", "sleep 30 & sleep 30 & wait"])
+    try:
+        # Wait for sh to start both of its children
+        for _ in range(50):
+            descendants = utils._get_descendant_pids(process.pid)
+            if len(descendants) == 2:
+                break
+            time.sleep(0.1)
+
+        assert len(descendants) == 2
+        assert utils._get_descendant_pids(descendants[0]) == []
+    finally:
+        utils._kill_process_tree(process)
+        process.wait()
+
+    assert not any(_is_running(pid) for pid in descendants)
+
+
+def test_run_subprocess_command_timeouts():
+    with utils.command_timeouts(timeout=10, deadline=time.time() + 0.5):
+        assert utils.run_subprocess(["echo", "foobar"]) == ("foobar\n", 0)
+        with pytest.raises(utils.CommandTimeoutError):
+            utils.run_subprocess(["sleep", "30"])
+
+    with utils.command_timeouts(timeout=0.5):
+        with pytest.raises(utils.CommandTimeoutError):
+            utils.run_subprocess(["sleep", "30"], timeout=10)
+
+    # The limits only apply inside of the with statement
+    assert utils.run_subprocess(["sh", "-c", "sleep 1"]) == ("", 0)
+
+
+def test_run_cmd_in_pty_timeout(capfd):
+    with capfd.disabled():
+        with pytest.raises(utils.CommandTimeoutError) as excinfo:
+            utils.run_cmd_in_pty(["sh", "-c", "echo started; sleep 30"], timeout=0.5)
+
+    assert excinfo.value.output.strip() == "started"
+
+
 class DummyGetUID(unit_tests.MockFunction):
     def __init__(self, uid):
         self.uid = uid
@@ -987,7 +1093,7 @@ class MockProcess:
     def start(self):
         pass
 
-    def join(self):
+    def join(self, timeout=None):
         pass
 
     def is_alive(self):
@@ -1001,6 +1107,17 @@ class MockProcess:
         return self._exception
 
 
+def test_run_as_child_process_timeout():
+    decorated = utils.run_as_child_process(time.sleep)
+
+    start = time.time()
+    with utils.command_timeouts(timeout=0.5):
+        with pytest.raises(utils.CommandTimeoutError, match="Command 'sleep' did not finish within 0.5 seconds"):
+            decorated(30)
+
+    assert time.time() - start < 10
+
+
 def test_run_as_child_process_with_keyboard_interrupt(monkeypatch):
     monkeypatch.setattr(utils, "Process", MockProcess(KeyboardInterrupt))
     decorated = utils.run_as_child_process(RunAsChildProcessFunctions.raise_keyboard_interrupt_exception)
@@ -26,14 +26,19 @@ import logging
 import multiprocessing
 import os
 import re
+import select
 import shutil
+import signal
 import struct
 import subprocess
 import sys
 import tempfile
 import termios
+import threading
+import time
 import traceback
 
+from contextlib import contextmanager
 from functools import wraps
 
 import pexpect
@@ -54,6 +59,18 @@ class ImportGPGKeyError(Exception):
     """Raised for failures during the rpm import of gpg keys."""
 
 
+class CommandTimeoutError(Exception):
+    """Raised when a command runs for longer than it is allowed to and is killed."""
+
+    def __init__(self, cmd, timeout, output=""):
+        super(CommandTimeoutError, self).__init__(
+            "Command '%s' did not finish within %g seconds and was killed." % (" ".join(cmd), round(timeout, 1))
+        )
+        self.cmd = cmd
+        self.timeout = timeout
+        self.output = output
+
+
 class Color(object):
     PURPLE = "\033[95m"
     CYAN = "\033[96m"
@@ -74,6 +91,158 @@ TMP_DIR = "/var/lib/convert2rhel/"
 BACKUP_DIR = os.path.join(TMP_DIR, "backup")
 
 
+#: Number of child processes started through the helpers in this module, per
+#: thread.  Read it with :func:`get_subprocess_count`.
+_subprocess_counter = threading.local()
+
+
+def _count_subprocess():
+    """Record that a child process is being started from the current thread."""
+    _subprocess_counter.value = get_subprocess_count() + 1
+
+
+#: Limits on how long the commands started from the current thread may run.
+#: Set them with :func:`command_timeouts`.
+_command_limits = threading.local()
+
+
+@contextmanager
+def command_timeouts(timeout=None, deadline=None):
+    """
+    Limit how long the commands started from the current thread may run.
+
+    Applies to :func:`run_subprocess`, :func:`run_cmd_in_pty` and the
+    functions decorated with :func:`run_as_child_process`.  A command which
+    runs past its limit is killed and :exc:`CommandTimeoutError` is raised.
+
+    :param timeout: Seconds that each command may run for.
+    :type timeout: float | None
+    :param deadline: Time (as returned by :func:`time.time`) by which every
+        command has to be done.
+    :type deadline: float | None
+    """
+    previous = getattr(_command_limits, "value", (None, None))
+    _command_limits.value = (timeout, deadline)
+    try:
+        yield
+    finally:
+        _command_limits.value = previous
+
+
+def _get_command_timeout(timeout=None):
+    """
+    Work out how long a command may run for.
+
+    :param timeout: Timeout asked for by the caller.
+    :type timeout: float | None
+    :returns: The shortest of ``timeout`` and the limits set with
+        :func:`command_timeouts`, or None when there is no limit.
+    :rtype: float | None
+    """
+    thread_limits = getattr(_command_limits, "value", None) or (None, None)
+    deadline = thread_limits[1]
+    limits = [limit for limit in (timeout, thread_limits[0]) if limit is not None]
+    if deadline is not None:
+        limits.append(max(deadline - time.time(), 0))
+
+    return min(limits) if limits else None
+
+
+def _kill_process_group(pid):
+    """Kill a process which leads its own process group, along with all of its children."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        # The processes have already exited
+        pass
+
+
+def _get_descendant_pids(pid):
+    """
+    Find all the processes started by a process, directly or not.
+
+    :param pid: The process id of the process.
+    :type pid: int
+    :returns: Process ids of the children of the process, of their children
+        and so on.
+    :rtype: list[int]
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join("/proc", entry, "stat")) as stat_file:
+                stat = stat_file.read()
+        except (IOError, OSError):
+            # The process has exited in the meantime
+            continue
+        # The name of the command is in parentheses and may contain spaces
+        # or parentheses itself.  The parent pid is the second field after it.
+        fields = stat.rsplit(")", 1)[-1].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    descendants = []
+    parents = [pid]
+    while parents:
+        for child in children.get(parents.pop(), []):
+            descendants.append(child)
+            parents.append(child)
+
+    return descendants
+
+
+def _kill_process_tree(process):
+    """
+    Kill a command started with :class:`subprocess.Popen` along with all the processes it started.
+
+    :param process: The command to kill.
+    :type process: subprocess.Popen
+    """
+    # The descendants have to be found before the command is killed.  Once it
+    # is gone, its children are re-parented to init and can't be told apart
+    # from the other processes on the system.
+    descendants = _get_descendant_pids(process.pid)
+    for pid in [process.pid] + descendants:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            # The process has already exited
+            pass
+
+
+def _kill_child_process(process):
+    """
+    Stop a :class:`Process`, killing it when it does not exit on SIGTERM.
+
+    :param process: The child process to stop.
+    :type process: Process
+    """
+    process.terminate()
+    # rpm installs its own signal handlers in the child process so it may
+    # not exit on SIGTERM
+    process.join(1)
+    if process.is_alive():
+        try:
+            os.kill(process.pid, signal.SIGKILL)
+        except OSError:
+            # The process has exited in the meantime
+            pass
+        process.join()
+
+
+def get_subprocess_count():
+    """
+    Return how many child processes the current thread has started so far.
+
+    Only processes started by :func:`run_subprocess`, :func:`run_cmd_in_pty`
+    and :func:`run_as_child_process` are counted.
+
+    :rtype: int
+    """
+    return getattr(_subprocess_counter, "value", 0)
+
+
 class UnableToSerialize(Exception):
     """
     Internal class that is used to declare that a object was not able to be
@@ -208,6 +377,8 @@ def run_as_child_process(func):
             will be re-raised to the stack once it is caught.
         :raises Exception: Raise any general exception that can occur during
             the execution of the child process.
+        :raises CommandTimeoutError: If the child process runs past the limits
+            set with :func:`command_timeouts`.  The child process is killed.
 
         :return: If the Queue is not empty, return anything in it, otherwise,
             return `None`.
@@ -237,13 +408,20 @@ def run_as_child_process(func):
         # is raised, as all childs will be terminated with it.
         # https://docs.python.org/2.7/library/multiprocessing.html#multiprocessing.Process.daemon
         process.daemon = True
+        timeout = _get_command_timeout()
         try:
+            _count_subprocess()
             process.start()
-            process.join()
+            process.join(timeout)
 
             if process.exception:
                 raise process.exception
 
+            if timeout is not None and process.is_alive():
+                loggerinst.debug("Process with pid %s did not finish within %g seconds", process.pid, timeout)
+                _kill_child_process(process)
+                raise CommandTimeoutError([func.__name__], timeout)
+
             if process.is_alive():
                 # If the process is still alive for some reason, try to
                 # terminate it.
@@ -342,13 +520,20 @@ def restart_system():
         loggerinst.warning("In order to boot the RHEL kernel, restart of the system is needed.")
 
 
-def run_subprocess(cmd, print_cmd=True, print_output=True):
+def run_subprocess(cmd, print_cmd=True, print_output=True, timeout=None):
     """Call the passed command and optionally log the called command (print_cmd=True) and its
     output (print_output=True). Switching off printing the command can be useful in case it contains
     a password in plain text.
 
     The cmd is specified as a list starting with the command and followed by a list of arguments.
     Example: ["dnf", "repoquery", "kernel"]
+
+    When the command runs for longer than ``timeout`` seconds (or the limits set with
+    :func:`command_timeouts`), it is killed along with the processes it started and
+    CommandTimeoutError is raised.  The command stays in our process group so that a Ctrl-C still
+    reaches it, and changing the process group of a child from a threaded program is not safe, so
+    its descendants are looked up in /proc instead.  Reading the output stops at the timeout even
+    when a process that escaped still holds the output pipe open.
     """
     # This check is here because we passed in strings in the past and changed to a list
     # for security hardening.  Remove this once everyone is comfortable with using a list
@@ -359,27 +544,113 @@ def run_subprocess(cmd, print_cmd=True, print_output=True):
     if print_cmd:
         loggerinst.debug("Calling command '%s'" % " ".join(cmd))
 
+    timeout = _get_command_timeout(timeout)
+
+    _count_subprocess()
     process = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         bufsize=1,
     )
-    output = ""
-    for line in iter(process.stdout.readline, b""):
+
+    timed_out = []
+
+    def expire():
+        if timed_out:
+            return
+        timed_out.append(True)
+        _kill_process_tree(process)
+
+    watchdog = None
+    if timeout is not None:
+        # Kills the command even when it closes its output and keeps running
+        watchdog = threading.Timer(timeout, expire)
+        watchdog.daemon = True
+        watchdog.start()
+
+    output_lines = []
+
+    def process_line(line):
         line = line.decode("utf8")
-        output += line
+        output_lines.append(line)
         if print_output:
             loggerinst.info(line.rstrip("\n"))
 
-    # Call communicate() to wait for the process to terminate so that we can
-    # get the return code.
-    process.communicate()
+    try:
+        if timeout is None:
+            for line in iter(process.stdout.readline, b""):
+                process_line(line)
+        else:
+            _read_lines_until(process.stdout, time.time() + timeout, process_line, expire)
+
+        if timed_out:
+            process.stdout.close()
+            process.wait()
+        else:
+            # Call communicate() to wait for the process to terminate so that we can
+            # get the return code.
+            process.communicate()
+    finally:
+        if watchdog:
+            watchdog.cancel()
+
+    output = "".join(output_lines)
+
+    if timed_out:
+        raise CommandTimeoutError(cmd, timeout, output)
 
     return output, process.returncode
 
 
-def run_cmd_in_pty(cmd, expect_script=(), print_cmd=True, print_output=True, columns=150):
+def _read_lines_until(stream, deadline, process_line, expire):
+    """
+    Read lines from a pipe until it is closed or until a deadline.
+
+    Unlike :meth:`readline`, this does not block past the deadline when the
+    writing end of the pipe is held open by a process which does not exit.
+
+    :param stream: The reading end of the pipe.
+    :param deadline: Time (as returned by :func:`time.time`) at which to stop reading.
+    :type deadline: float
+    :param process_line: Called with each line read, including the newline.
+    :type process_line: Callable[[bytes], None]
+    :param expire: Called when the deadline is reached.
+    :type expire: Callable[[], None]
+    """
+    fd = stream.fileno()
+    pending = b""
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            expire()
+            break
+
+        try:
+            ready = select.select([fd], [], [], remaining)[0]
+        except select.error as e:
+            # Python 2 does not retry select() when it is interrupted by a signal
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+
+        if not ready:
+            continue
+
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            break
+
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            process_line(line + b"\n")
+
+    if pending:
+        process_line(pending)
+
+
+def run_cmd_in_pty(cmd, expect_script=(), print_cmd=True, print_output=True, columns=150, timeout=None):
     """Similar to run_subprocess(), but the command is executed in a pseudo-terminal.
 
     The pseudo-terminal can be useful when a command prints out a different output with or without an active terminal
@@ -401,8 +672,12 @@ def run_cmd_in_pty(cmd, expect_script=(), print_cmd=True, print_output=True, col
     :type print_output: bool
     :param columns: Number of columns of the pseudo-terminal (characters on a line). This may influence the output.
     :type columns: int
+    :param timeout: Seconds after which the command is killed along with its children. The limits set with
+        :func:`command_timeouts` apply as well.
+    :type timeout: float | None
     :return: The output (combined stdout and stderr) and the return code of the executed command
     :rtype: tuple
+    :raises CommandTimeoutError: When the command runs for too long.
 
     .. warning:: unittests which utilize this may fail on pexpect-2.3 (RHEL7) unless capfd
         (pytest's capture of stdout) is disabled.  Look at the
@@ -417,6 +692,10 @@ def run_cmd_in_pty(cmd, expect_script=(), print_cmd=True, print_output=True, col
     if print_cmd:
         loggerinst.debug("Calling command '%s'" % " ".join(cmd))
 
+    timeout = _get_command_timeout(timeout)
+    deadline = time.time() + timeout if timeout is not None else None
+
+    _count_subprocess()
     process = PexpectSpawnWithDimensions(
         cmd[0],
         cmd[1:],
@@ -429,11 +708,18 @@ def run_cmd_in_pty(cmd, expect_script=(), print_cmd=True, print_output=True, col
         dimensions=(1, columns),
     )
 
-    for expect, send in expect_script:
-        process.expect(expect)
-        process.send(send)
+    try:
+        for expect, send in expect_script:
+            process.expect(expect, timeout=_remaining_time(deadline))
+            process.send(send)
+
+        process.expect(pexpect.EOF, timeout=_remaining_time(deadline))
+    except pexpect.TIMEOUT:
+        # pexpect starts the command in a session of its own so this also kills its children
+        _kill_process_group(process.pid)
+        process.close(force=True)
+        raise CommandTimeoutError(cmd, timeout, process.before.decode())
 
-    process.expect(pexpect.EOF)
     try:
         process.wait()
     except pexpect.ExceptionPexpect:
@@ -453,6 +739,13 @@ def run_cmd_in_pty(cmd, expect_script=(), print_cmd=True, print_output=True, col
     return output, return_code
 
 
+def _remaining_time(deadline):
+    """Return the seconds left until deadline, None when there is no deadline."""
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0)
+
+
 class PexpectSpawnWithDimensions(pexpect.spawn):
     """
     Pexpect.spawn class that can set terminal size before starting process.
@@ -637,6 +930,7 @@ def download_pkg(
     set_releasever=True,
     custom_releasever=None,
     varsdir=None,
+    report_failure=True,
 ):
     """Download an rpm using yumdownloader and return its filepath.
 
@@ -659,6 +953,10 @@ def download_pkg(
     :type custom_releasever: int | str
     :param varsdir: The path to the variables directory.
     :type varsdir: str
+    :param report_failure: Whether a failed download is reported with
+        :func:`report_failed_download`. Callers with another way to back up
+        the package report it themselves.
+    :type report_failure: bool
 
     :return: The filepath of the downloaded package.
     :rtype: str | None
@@ -700,60 +998,9 @@ def download_pkg(
     output, ret_code = run_cmd_in_pty(cmd, print_output=False)
     if ret_code != 0:
         loggerinst.warning("Output from the yumdownloader call:\n%s" % (output))
-
-        # Note: Checking toolopts here is a temporary solution. We need to
-        # restructure this to raise an exception on error and have the caller
-        # handle whether to use INCOMPLETE_ROLLBACK to do something for several
-        # reasons:
-        # (1) utils should be simple functions that take input and produce
-        #     output from it. Having knowledge of things specific to the
-        #     program (for instance, the environment variable that convert2rhel
-        #     uses) makes the utils depend on the specific place that they are
-        #     run instead.
-        # (2) Where an error condition arises, they should "return" that to the
-        #     caller to decide how to handle it by using an exception. Handling
-        #     it inside the function ties us to one specific behaviour on
-        #     error. (For instance, the incomplete rollback message here ties
-        #     downloading packages and performing rollbacks. But what about
-        #     downloading packages that are not tied to rollbacks. Maybe we
-        #     have to download a package in order for insights or
-        #     subscription-manager to run. In those cases, we either cannot use
-        #     this function or we might show the user a misleading message).
-        # (3) Functions in utils should be free of other dependencies within
-        #     convert2rhel.  That allows us to use utils with no fear of
-        #     circular dependency issues.
-        # (4) Making the choices here mean that when used inside of the Action
-        #     framework, we are limited to returning a FAILURE for the Action
-        #     plugin whereas returning SKIP would be more accurate.
-        from convert2rhel import toolopts
-
-        if toolopts.tool_opts.activity == "conversion":
-            if "CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK" not in os.environ:
-                loggerinst.critical(
-                    "Couldn't download the %s package. This means we will not be able to do a"
-                    " complete rollback and may put the system in a broken state.\n"
-                    "Check to make sure that the %s repositories are enabled"
-                    " and the package is updated to its latest version.\n"
-                    "If you would rather ignore this check set the environment variable"
-                    " 'CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK'." % (pkg, system_info.name)
-                )
-            else:
-                loggerinst.warning(
-                    "Couldn't download the %s package. This means we will not be able to do a"
-                    " complete rollback and may put the system in a broken state.\n"
-                    "'CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK' environment variable detected, continuing conversion."
-                    % (pkg)
-                )
-            return None
-        else:
-            loggerinst.critical(
-                "Couldn't download the %s package which is needed to do a rollback of this action."
-                " Check to make sure that the %s repositories are enabled and the package is"
-                " updated to its latest version.\n"
-                "Note that you can choose to ignore this check when actually running a conversion by"
-                " setting the environment variable 'CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK'"
-                " but not during pre-conversion analysis." % (pkg, system_info.name)
-            )
+        if report_failure:
+            report_failed_download(pkg)
+        return None
 
     path = get_rpm_path_from_yumdownloader_output(cmd, output, dest)
     if path:
@@ -763,6 +1010,70 @@ def download_pkg(
     return path
 
 
+def report_failed_download(pkg):
+    """Report that a package needed for the rollback couldn't be downloaded.
+
+    The conversion stops unless the CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK
+    environment variable is set, the analysis always stops.
+
+    :param pkg: The package that couldn't be downloaded.
+    :type pkg: str
+    """
+    # Note: Checking toolopts here is a temporary solution. We need to
+    # restructure this to raise an exception on error and have the caller
+    # handle whether to use INCOMPLETE_ROLLBACK to do something for several
+    # reasons:
+    # (1) utils should be simple functions that take input and produce
+    #     output from it. Having knowledge of things specific to the
+    #     program (for instance, the environment variable that convert2rhel
+    #     uses) makes the utils depend on the specific place that they are
+    #     run instead.
+    # (2) Where an error condition arises, they should "return" that to the
+    #     caller to decide how to handle it by using an exception. Handling
+    #     it inside the function ties us to one specific behaviour on
+    #     error. (For instance, the incomplete rollback message here ties
+    #     downloading packages and performing rollbacks. But what about
+    #     downloading packages that are not tied to rollbacks. Maybe we
+    #     have to download a package in order for insights or
+    #     subscription-manager to run. In those cases, we either cannot use
+    #     this function or we might show the user a misleading message).
+    # (3) Functions in utils should be free of other dependencies within
+    #     convert2rhel.  That allows us to use utils with no fear of
+    #     circular dependency issues.
+    # (4) Making the choices here mean that when used inside of the Action
+    #     framework, we are limited to returning a FAILURE for the Action
+    #     plugin whereas returning SKIP would be more accurate.
+    from convert2rhel import toolopts
+    from convert2rhel.systeminfo import system_info
+
+    if toolopts.tool_opts.activity == "conversion":
+        if "CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK" not in os.environ:
+            loggerinst.critical(
+                "Couldn't download the %s package. This means we will not be able to do a"
+                " complete rollback and may put the system in a broken state.\n"
+                "Check to make sure that the %s repositories are enabled"
+                " and the package is updated to its latest version.\n"
+                "If you would rather ignore this check set the environment variable"
+                " 'CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK'." % (pkg, system_info.name)
+            )
+        else:
+            loggerinst.warning(
+                "Couldn't download the %s package. This means we will not be able to do a"
+                " complete rollback and may put the system in a broken state.\n"
+                "'CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK' environment variable detected, continuing conversion."
+                % (pkg)
+            )
+    else:
+        loggerinst.critical(
+            "Couldn't download the %s package which is needed to do a rollback of this action."
+            " Check to make sure that the %s repositories are enabled and the package is"
+            " updated to its latest version.\n"
+            "Note that you can choose to ignore this check when actually running a conversion by"
+            " setting the environment variable 'CONVERT2RHEL_UNSUPPORTED_INCOMPLETE_ROLLBACK'"
+            " but not during pre-conversion analysis." % (pkg, system_info.name)
+        )
+
+
 def get_rpm_path_from_yumdownloader_output(cmd, output, dest):
     """Parse the output of yumdownloader to get the filepath of the downloaded rpm.
 
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import click
+
+from convert2rhel.actions import registry
+
+
+# Each measurement runs in a fresh interpreter so that no module has been
+# imported yet.
+CONSTRUCT_STAGES = """
+import time
+start = time.time()
+from convert2rhel import actions
+if %(eager)s:
+    actions.registry.ACTIONS.clear()
+for stage_name in actions.STAGE_NAMES:
+    actions.Stage(stage_name)
+print(time.time() - start)
+"""
+
+IMPORT_MODULE = """
+import importlib
+import time
+from convert2rhel import actions
+start = time.time()
+importlib.import_module(%(module)r)
+print(time.time() - start)
+"""
+
+
+def _measure(code, repeat):
+    timings = []
+    with open(os.devnull, "w") as devnull:
+        for _ in range(repeat):
+            output = subprocess.check_output([sys.executable, "-c", code], stderr=devnull)
+            timings.append(float(output.decode().strip().splitlines()[-1]))
+    return min(timings)
+
+
+@click.command()
+@click.option("--repeat", default=5, show_default=True, help="Take the best of this many runs.")
+def benchmark_action_imports(repeat):
+    """Compare constructing the Stages with and without the action registry.
+
+    Also shows how long importing the module of each Action takes when it is
+    about to run.  Needs to run where the Action modules can be imported:
+
+    ```bash
+    python scripts/benchmark_action_imports.py --repeat 10
+    ```
+
+    \f
+    :param repeat: How many times to measure each import.
+    :type repeat: int
+    """
+    eager = _measure(CONSTRUCT_STAGES % {"eager": True}, repeat)
+    lazy = _measure(CONSTRUCT_STAGES % {"eager": False}, repeat)
+    click.echo("Constructing the stages, importing every action module: %.3fs" % eager)
+    click.echo("Constructing the stages from the registry:               %.3fs" % lazy)
+    click.echo("")
+
+    modules = sorted(set(entry["module"] for entries in registry.ACTIONS.values() for entry in entries))
+    click.echo("Importing each action module on its own:")
+    for module in modules:
+        click.echo("  %-60s %.3fs" % (module, _measure(IMPORT_MODULE % {"module": module}, repeat)))
+
+
+if __name__ == "__main__":
+    benchmark_action_imports()
@@ -0,0 +1,132 @@
+import json
+import subprocess
+import sys
+
+import click
+
+from convert2rhel import pkgmanager
+
+
+# Each measurement runs in a fresh interpreter so that the peak memory usage
+# is the one of loading the metadata alone.
+LOAD_METADATA = """
+import json
+import resource
+import time
+from convert2rhel import pkgmanager
+start = time.time()
+profile = %(profile)r
+if pkgmanager.TYPE == "yum":
+    base = pkgmanager.YumBase()
+    base.doConfigSetup(init_plugins=False)
+    if profile:
+        pkgmanager.set_metadata_profile(base, profile)
+    if profile == pkgmanager.METADATA_SYSTEM:
+        count = len(base.rpmdb.returnPackages())
+    else:
+        count = len(base.pkgSack.returnPackages())
+else:
+    base = pkgmanager.Base()
+    base.conf.module_platform_id = "platform:el8"
+    if profile:
+        pkgmanager.set_metadata_profile(base, profile)
+    base.read_all_repos()
+    base.fill_sack(load_available_repos=profile != pkgmanager.METADATA_SYSTEM)
+    count = len(base.sack.query())
+print(json.dumps({
+    "duration": time.time() - start,
+    "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "packages": count,
+}))
+"""
+
+
+# Querying the installed packages the way the Actions do, several times in
+# a row.
+QUERY_INSTALLED = """
+import json
+import resource
+import time
+from convert2rhel import pkghandler
+start = time.time()
+for _ in range(%(queries)d):
+    count = len(pkghandler.get_installed_pkg_objects())
+print(json.dumps({
+    "duration": time.time() - start,
+    "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "packages": count,
+}))
+"""
+
+
+def _run(script):
+    output = subprocess.check_output([sys.executable, "-c", script])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def _measure(profile):
+    return _run(LOAD_METADATA % {"profile": profile})
+
+
+PROFILES = ("default", pkgmanager.METADATA_SYSTEM, pkgmanager.METADATA_PRIMARY, pkgmanager.METADATA_FILELISTS)
+
+
+@click.command()
+@click.option(
+    "--profile",
+    "profiles",
+    type=click.Choice(PROFILES),
+    multiple=True,
+    help="Measure only this profile, can be repeated.  Defaults to all of them.",
+)
+@click.option(
+    "--installed-queries",
+    type=int,
+    default=0,
+    help="Also measure querying the installed packages this many times in a row.",
+)
+def benchmark_metadata_profiles(profiles, installed_queries):
+    """Compare loading the metadata of the enabled repositories with each metadata profile.
+
+    "default" is what yum or dnf load when no profile is set.  Needs to run
+    as root on a system with yum or dnf and the repositories enabled.  Only
+    the first measurement downloads the metadata, to compare the downloads
+    measure one profile at a time after a `yum clean metadata`:
+
+    ```bash
+    python scripts/benchmark_metadata_profiles.py
+    yum clean metadata && python scripts/benchmark_metadata_profiles.py --profile default
+    yum clean metadata && python scripts/benchmark_metadata_profiles.py --profile primary
+    ```
+
+    Querying the installed packages repeatedly shows what reusing the loaded
+    installed packages saves, compare its result before and after a change:
+
+    ```bash
+    python scripts/benchmark_metadata_profiles.py --profile system --installed-queries 20
+    ```
+
+    \f
+    :param profiles: The profiles to measure, all of them when empty.
+    :type profiles: tuple[str]
+    :param installed_queries: How many times to query the installed packages,
+        not measured when 0.
+    :type installed_queries: int
+    """
+    for profile in profiles or PROFILES:
+        result = _measure(None if profile == "default" else profile)
+        click.echo(
+            "%-10s %6d packages in %7.3fs, peak memory %6.1f MiB"
+            % (profile, result["packages"], result["duration"], result["peak_rss"] / 1024.0 / 1024.0)
+        )
+
+    if installed_queries > 0:
+        result = _run(QUERY_INSTALLED % {"queries": installed_queries})
+        click.echo(
+            "%d queries of the %d installed packages in %7.3fs, peak memory %6.1f MiB"
+            % (installed_queries, result["packages"], result["duration"], result["peak_rss"] / 1024.0 / 1024.0)
+        )
+
+
+if __name__ == "__main__":
+    benchmark_metadata_profiles()
@@ -0,0 +1,190 @@
+__metaclass__ = type
+
+import time
+
+import click
+
+from convert2rhel.pkgmanager.handlers import dnf as dnf_handler
+
+
+class SyntheticPackage:
+    def __init__(self, name, version, arch="x86_64", epoch=0, release="1.el8"):
+        self.name = name
+        self.epoch = epoch
+        self.version = version
+        self.release = release
+        self.arch = arch
+        self.installed = False
+
+    def evr_key(self):
+        return (self.epoch, tuple(int(part) for part in self.version.split(".")), self.release)
+
+
+class SyntheticQuery(list):
+    """Query over a synthetic sack.
+
+    Like hawkey, every query method scans the whole set of packages it is
+    called on and returns a new query.
+    """
+
+    def installed(self):
+        return SyntheticQuery(pkg for pkg in self if pkg.installed)
+
+    def available(self):
+        return SyntheticQuery(pkg for pkg in self if not pkg.installed)
+
+    def _compared_to_installed(self, compare):
+        installed = dict(((pkg.name, pkg.arch), pkg) for pkg in self.installed())
+        return SyntheticQuery(
+            pkg
+            for pkg in self.available()
+            if (pkg.name, pkg.arch) in installed and compare(pkg.evr_key(), installed[(pkg.name, pkg.arch)].evr_key())
+        )
+
+    def upgrades(self):
+        return self._compared_to_installed(lambda available, installed: available > installed)
+
+    def downgrades(self):
+        return self._compared_to_installed(lambda available, installed: available < installed)
+
+    def latest(self):
+        latest = {}
+        for pkg in self:
+            key = (pkg.name, pkg.arch)
+            if key not in latest or pkg.evr_key() > latest[key].evr_key():
+                latest[key] = pkg
+        return SyntheticQuery(latest.values())
+
+    def filter(self, **kwargs):
+        return SyntheticQuery(pkg for pkg in self if all(getattr(pkg, key) == value for key, value in kwargs.items()))
+
+
+class PackagesNotAvailableError(Exception):
+    pass
+
+
+class SyntheticBase:
+    """Marks packages like dnf.Base, resolving package specs against the whole sack."""
+
+    def __init__(self, sack):
+        self.sack = sack
+        self.marked = []
+
+    def _resolve_spec(self, pkg_spec):
+        name, arch = pkg_spec.rsplit(".", 1)
+        return self.sack.query().filter(name=name, arch=arch)
+
+    def upgrade(self, pkg_spec):
+        self.marked.append(("upgrade", self._resolve_spec(pkg_spec).upgrades().latest()[0]))
+
+    def reinstall(self, pkg_spec):
+        query = self._resolve_spec(pkg_spec)
+        installed = [(pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch) for pkg in query.installed()]
+        available = [
+            pkg for pkg in query.available() if (pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch) in installed
+        ]
+        if not available:
+            raise PackagesNotAvailableError(pkg_spec)
+        self.marked.extend(("reinstall", pkg) for pkg in available)
+
+    def downgrade(self, pkg_spec):
+        self.marked.append(("downgrade", self._resolve_spec(pkg_spec).downgrades().latest()[0]))
+
+    def package_upgrade(self, pkg):
+        self.marked.append(("upgrade", pkg))
+
+    def package_reinstall(self, pkg):
+        self.marked.append(("reinstall", pkg))
+
+    def package_downgrade(self, pkg):
+        self.marked.append(("downgrade", pkg))
+
+
+class SyntheticSack:
+    def __init__(self, packages):
+        self.packages = packages
+
+    def query(self):
+        return SyntheticQuery(self.packages)
+
+
+def create_sack(count):
+    """Create a sack with `count` installed packages.
+
+    Every tenth package has an upgrade and every hundredth only a downgrade
+    available, the others are available in the installed version.
+    """
+    packages = []
+    for number in range(count):
+        name = "package-%d" % number
+        installed = SyntheticPackage(name, "2.0")
+        installed.installed = True
+        packages.append(installed)
+        if number % 100 == 0:
+            packages.append(SyntheticPackage(name, "1.0"))
+        else:
+            packages.append(SyntheticPackage(name, "2.0"))
+            if number % 10 == 0:
+                packages.append(SyntheticPackage(name, "3.0"))
+    return SyntheticSack(packages)
+
+
+def perform_operations_by_spec(base, original_os_pkgs):
+    """The marking done before the sack was indexed: a query and a spec per package."""
+    upgrades = base.sack.query().upgrades().latest()
+    for pkg in original_os_pkgs:
+        name, arch = tuple(pkg.rsplit(".", 1))
+        upgrade_pkg = next(iter(upgrades.filter(name=name, arch=arch)), None)
+        if upgrade_pkg:
+            base.upgrade(pkg_spec=pkg)
+            continue
+
+        try:
+            base.reinstall(pkg_spec=pkg)
+        except PackagesNotAvailableError:
+            base.downgrade(pkg_spec=pkg)
+
+
+def perform_operations_indexed(base, original_os_pkgs):
+    handler = dnf_handler.DnfTransactionHandler()
+    handler._base = base
+    dnf_handler.get_system_packages_for_replacement = lambda: original_os_pkgs
+    handler._perform_operations()
+
+
+@click.command()
+@click.option("--packages", default=5000, show_default=True, help="Number of installed packages in the sack.")
+def benchmark_perform_operations(packages):
+    """Compare marking the packages by spec with the indexed marking of the dnf handler.
+
+    The sack is synthetic, so no repositories are needed, but the dnf handler
+    has to be importable:
+
+    ```bash
+    python scripts/benchmark_perform_operations.py --packages 5000
+    ```
+
+    \f
+    :param packages: How many installed packages the synthetic sack has.
+    :type packages: int
+    """
+    sack = create_sack(packages)
+    original_os_pkgs = ["package-%d.x86_64" % number for number in range(packages)]
+
+    results = {}
+    for label, perform_operations in (
+        ("by spec", perform_operations_by_spec),
+        ("indexed", perform_operations_indexed),
+    ):
+        base = SyntheticBase(sack)
+        start = time.time()
+        perform_operations(base, original_os_pkgs)
+        click.echo("Marking %d packages %s: %.3fs" % (packages, label, time.time() - start))
+        results[label] = sorted((operation, id(pkg)) for operation, pkg in base.marked)
+
+    if results["by spec"] != results["indexed"]:
+        raise click.ClickException("The two ways of marking the packages marked different packages.")
+
+
+if __name__ == "__main__":
+    benchmark_perform_operations()
@@ -0,0 +1,112 @@
+import os
+
+import click
+
+from convert2rhel import actions
+
+
+REGISTRY_PATH = os.path.join(os.path.dirname(actions.__file__), "registry.py")
+
+HEADER = '''# Copyright(C) 2023 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# This file is generated by scripts/generate_action_registry.py.  Do not edit
+# it by hand, run the script again after adding, removing or changing the
+# class attributes of an Action.
+"""
+The Actions that ship with convert2rhel, per Stage.
+
+:class:`convert2rhel.actions.Stage` uses this to order the Actions and check
+their dependencies without importing the modules that they live in.
+"""
+
+__metaclass__ = type
+
+ACTIONS = {
+'''
+
+
+def _format_sequence(values, indent):
+    if not values:
+        return "()"
+    if len(values) == 1:
+        return '("%s",)' % values[0]
+
+    lines = ["("]
+    lines.extend('%s    "%s",' % (indent, value) for value in values)
+    lines.append("%s)" % indent)
+    return "\n".join(lines)
+
+
+def render_registry(stage_names):
+    """Return the source code of the registry for the given Stages."""
+    lines = [HEADER.rstrip("\n")]
+    for stage_name in stage_names:
+        package = actions.Stage._actions_dir % stage_name
+        lines.append('    "%s": (' % package)
+        stage_actions = actions.get_actions(
+            [os.path.join(os.path.dirname(actions.__file__), stage_name)], package + "."
+        )
+        for action in sorted(stage_actions, key=lambda action: action.id):
+            indent = " " * 12
+            lines.extend(
+                (
+                    "        {",
+                    '            "id": "%s",' % action.id,
+                    '            "module": "%s",' % action.__module__,
+                    '            "class_name": "%s",' % action.__name__,
+                    '            "dependencies": %s,' % _format_sequence(action.dependencies, indent),
+                    '            "parallel_safe": %s,' % action.parallel_safe,
+                    '            "resources": %s,' % _format_sequence(action.resources, indent),
+                    '            "estimated_cost": %r,' % action.estimated_cost,
+                    "        },",
+                )
+            )
+        lines.append("    ),")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+@click.command()
+@click.option("--check", is_flag=True, help="Only check that the registry is up to date.")
+def generate_action_registry(check):
+    """Regenerate convert2rhel/actions/registry.py from the Action classes.
+
+    Needs to run where the Action modules can be imported (for instance in
+    one of the test containers):
+
+    ```bash
+    python scripts/generate_action_registry.py
+    ```
+
+    \f
+    :param check: Whether to only compare the registry with the Action classes.
+    :type check: bool
+    """
+    content = render_registry(actions.STAGE_NAMES)
+
+    if check:
+        with open(REGISTRY_PATH) as registry_file:
+            if registry_file.read() != content:
+                raise click.ClickException("%s is out of date." % REGISTRY_PATH)
+        return
+
+    with open(REGISTRY_PATH, "w") as registry_file:
+        registry_file.write(content)
+    click.echo("Wrote %s" % REGISTRY_PATH)
+
+
+if __name__ == "__main__":
+    generate_action_registry()
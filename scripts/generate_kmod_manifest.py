@@ -0,0 +1,46 @@
+import os
+import platform
+import re
+
+import click
+
+from convert2rhel.actions import kmod_index
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "convert2rhel", "data")
+
+
+@click.command()
+@click.option("--version", "version", required=True, help="RHEL releasever the manifest is for, e.g. 8.5 or 7Server.")
+@click.option("--repoid", "repoids", required=True, multiple=True, help="RHEL repository to index. Repeatable.")
+@click.option("--releasever", help="releasever to use for the repositories. Defaults to --version.")
+@click.option("--arch", default=platform.machine(), show_default=True, help="Architecture of the repositories.")
+def generate_kmod_manifest(version, repoids, releasever, arch):
+    """Write the manifest of the kernel modules available in a RHEL release.
+
+    Needs to run on a system of the same major version and architecture with
+    access to the RHEL repositories, for instance:
+
+    ```bash
+    python scripts/generate_kmod_manifest.py --version 8.5 \\
+        --repoid rhel-8-for-x86_64-baseos-eus-rpms --repoid rhel-8-for-x86_64-appstream-eus-rpms
+    ```
+
+    The manifest is written under convert2rhel/data/<major>/<arch>/kmod-manifests/
+    from where the packaging installs it to the data directory of convert2rhel.
+
+    The script runs with the Python of the RHEL release, Python 2 included.
+    """
+    index = kmod_index.build_index(list(repoids), releasever=releasever if releasever else version)
+    if not index:
+        raise click.ClickException("No kernel modules found in %s." % ", ".join(repoids))
+
+    major = re.match(r"\d+", version).group()
+    manifests_dir = os.path.join(DATA_DIR, major, arch, "kmod-manifests")
+    path = kmod_index.get_manifest_path(version, manifests_dir)
+    kmod_index.write_manifest(path, index, version, arch, repoids)
+    click.echo("Wrote %s: %s kernel modules from %s packages." % (path, len(index), len(set(index.values()))))
+
+
+if __name__ == "__main__":
+    generate_kmod_manifest()
@@ -178,15 +178,15 @@ def test_c2r_latest_older_unsupported_version(convert2rhel, c2r_version, version
 @pytest.mark.test_clean_cache
 def test_clean_cache(convert2rhel):
     """
-    Verify that the yum clean is done before any other check that c2r does
+    Verify that the cached yum metadata is expired before any other check that c2r does
     """
     with convert2rhel("--no-rpm-va --debug") as c2r:
         # We need to get past the data collection acknowledgement.
         c2r.expect("Continue with the system conversion?")
         c2r.sendline("y")
 
-        assert c2r.expect("Prepare: Clean yum cache metadata", timeout=300) == 0
-        assert c2r.expect("Cached repositories metadata cleaned successfully.", timeout=300) == 0
+        assert c2r.expect("Prepare: Expire yum cache metadata", timeout=300) == 0
+        assert c2r.expect("Cached repositories metadata marked to be checked for updates.", timeout=300) == 0
 
         c2r.sendcontrol("c")
 
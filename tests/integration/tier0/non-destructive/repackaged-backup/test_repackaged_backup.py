@@ -0,0 +1,54 @@
+import ast
+import os.path
+
+import pytest
+
+
+# A package without config files, which stay unchanged on the disk
+PACKAGE = "tar"
+
+
+@pytest.fixture
+def repackaged_pkg(shell, tmp_path):
+    """
+    Fixture.
+    Rebuild the installed package from the rpm database with convert2rhel.
+    """
+    nvra = shell(f"rpm -q --qf '%{{NAME}}-%{{VERSION}}-%{{RELEASE}}.%{{ARCH}}' {PACKAGE}").output.strip()
+    # convert2rhel runs on the Python of the system, platform-python on EL8
+    python = "/usr/libexec/platform-python" if os.path.exists("/usr/libexec/platform-python") else "python2"
+    result = shell(
+        f"{python} -c \"from convert2rhel import repackage; print(repackage.repackage_pkgs(['{nvra}'], '{tmp_path}'))\""
+    )
+    assert result.returncode == 0
+
+    repackaged = ast.literal_eval(result.output.strip().splitlines()[-1])
+    assert nvra in repackaged
+
+    return repackaged[nvra]
+
+
+@pytest.mark.test_repackaged_backup_installs
+def test_repackaged_backup_installs(shell, repackaged_pkg):
+    """
+    Verify that the rebuilt package passes the digest checks of rpm, has the
+    files of the installed package and can be installed over it, as the
+    rollback does.
+    """
+    assert shell(f"rpm -K --nosignature {repackaged_pkg}").returncode == 0
+
+    assert shell(f"rpm -qlp {repackaged_pkg}").output == shell(f"rpm -ql {PACKAGE}").output
+
+    assert shell(f"rpm -i --replacepkgs {repackaged_pkg}").returncode == 0
+    assert shell(f"rpm -V {PACKAGE}").returncode == 0
+
+
+@pytest.mark.test_repackaged_backup_unsigned
+def test_repackaged_backup_unsigned(shell, repackaged_pkg):
+    """
+    Verify that the rebuilt package is not signed, so rpm refuses to install
+    it when signatures are enforced.
+    """
+    result = shell(f"rpm -i --replacepkgs --test --define '_pkgverify_level signature' {repackaged_pkg}")
+
+    assert result.returncode != 0